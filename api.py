@@ -0,0 +1,286 @@
+"""
+Headless JSON API for integrations (POS systems, bank statement pushers)
+Runs as its own process next to the Streamlit app, against the same
+database, and reads and writes through utils.helpers and its storage
+backend like the pages do:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Clients log in with POST /api/v1/sessions and send the returned token as
+"Authorization: Bearer <token>". Transactions use the column names of the
+app's tables (Tanggal, Jenis, Item, Jumlah, Catatan, Kategori). Single
+POST /api/v1/transactions requests of one user that arrive together are
+written as one apply_transaction_changes call (see IngestBatcher), listings
+are keyset-paginated newest first, and the CSV export is streamed.
+
+Every transaction, summary and export endpoint works on the user's own book,
+or on a shared ledger (see utils.ledgers) with ?ledger=<id>: members may
+read it, and only its pemilik and editors write to it.
+"""
+import asyncio
+import datetime
+import json
+import os
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from utils import categories, export, helpers, ledgers, session, storage
+from utils.db_writer import is_busy_error
+
+BATCH_WINDOW = 0.005  # seconds a single ingest waits for others of the same user
+BATCH_MAX_ROWS = 500  # a batch is written as soon as it holds this many rows
+BULK_MAX_ROWS = 10000
+PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class IngestBatcher:
+    """
+    Groups the single-row ingests into a book that arrive within window seconds
+    into one apply_transaction_changes call: one thread hop, one commit and
+    one data version write per batch instead of per request
+    """
+
+    def __init__(self, window=BATCH_WINDOW, max_rows=BATCH_MAX_ROWS):
+        self.window = window
+        self.max_rows = max_rows
+        self._pending = {}  # (book, kategori_pengguna) -> [(values, future)]
+        self._tasks = set()
+
+    async def submit(self, book, kategori_pengguna, values):
+        """Queue one row; returns its new id once the batch is committed"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (book, kategori_pengguna)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(self.window, self._flush, key, batch)
+        batch.append((values, future))
+        if len(batch) >= self.max_rows:
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key, batch):
+        if self._pending.get(key) is not batch:
+            return  # Already written when it filled up
+        del self._pending[key]
+        task = asyncio.ensure_future(self._write(*key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, book, kategori_pengguna, batch):
+        try:
+            result = await anyio.to_thread.run_sync(
+                lambda: helpers.apply_transaction_changes(book, [values for values, _ in batch], kategori_pengguna=kategori_pengguna)
+            )
+        except Exception as e:
+            if len(batch) > 1 and not is_busy_error(e):
+                # One bad row fails the whole diff: write them one by one so only it is rejected
+                for item in batch:
+                    await self._write(book, kategori_pengguna, [item])
+                return
+            self._settle(batch, error=e)
+        else:
+            _retrain_if_labelled(book, [values for values, _ in batch])
+            self._settle(batch, ids=result["ids"])
+
+    @staticmethod
+    def _settle(batch, ids=None, error=None):
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue  # The client went away
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(ids[i])
+
+batcher = IngestBatcher()
+
+def _retrain_if_labelled(book, rows):
+    # Rows sent with a Kategori are training examples, as when labelled in Lihat Catatan
+    if any(row.get("Kategori") for row in rows):
+        categories.schedule_retrain(book)
+
+def _run(fn, *args, **kwargs):
+    """Run a blocking helpers call on the worker threads"""
+    return anyio.to_thread.run_sync(lambda: fn(*args, **kwargs))
+
+async def _user(request):
+    """(email, nama, kategori_pengguna) of the request's bearer token"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    user = await _run(session.get_session, token) if scheme.lower() == "bearer" else None
+    if user is None:
+        raise ApiError(401, "Token tidak valid atau sudah kedaluwarsa")
+    return user
+
+async def _book(request, email, write=False):
+    """The book a request works on: the user's own, or the ledger of the ledger query parameter"""
+    ledger = request.query_params.get("ledger")
+    book = email if ledger is None else ledgers.book_key(_int(ledger, "ledger", None, 1, 2 ** 63 - 1))
+    role = await _run(ledgers.role, email, book)
+    if role is None:
+        raise ApiError(404, "Buku tidak ditemukan")
+    if write and not ledgers.can_write(role):
+        raise ApiError(403, "Anda hanya pembaca di buku ini")
+    return book
+
+async def _body(request):
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise ApiError(400, "Body harus berupa JSON")
+    if not isinstance(body, dict):
+        raise ApiError(400, "Body harus berupa objek JSON")
+    return body
+
+def _date(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ApiError(400, f"{name} harus berformat YYYY-MM-DD")
+
+def _int(value, name, default, low, high):
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(400, f"{name} harus berupa angka")
+    if not low <= number <= high:
+        raise ApiError(400, f"{name} harus antara {low} dan {high}")
+    return number
+
+def _records(df):
+    # Column lists zipped into dicts: several times faster than DataFrame.to_dict("records")
+    columns = {name: df[name].tolist() for name in df.columns}
+    columns["Tanggal"] = [str(tanggal)[:10] for tanggal in columns["Tanggal"]]
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+def _cursor(after):
+    """Keyset cursor from its 'YYYY-MM-DD_id' form in the after query parameter"""
+    if after is None:
+        return None
+    tanggal, _, transaction_id = after.partition("_")
+    return _date(tanggal, "after"), _int(transaction_id, "after", None, 1, 2 ** 63 - 1)
+
+async def create_session(request):
+    body = await _body(request)
+    user = await _run(helpers.verify_user, str(body.get("email", "")), str(body.get("password", "")))
+    if user is None:
+        raise ApiError(401, "Email atau password salah")
+    token = await _run(session.create_session, body["email"])
+    return JSONResponse({"token": token, "nama": user[0], "kategori_pengguna": user[1]}, status_code=201)
+
+async def delete_session(request):
+    await _user(request)
+    await _run(session.revoke_session, request.headers["authorization"].partition(" ")[2])
+    return Response(status_code=204)
+
+async def list_transactions(request):
+    email, _, _ = await _user(request)
+    book = await _book(request, email)
+    limit = _int(request.query_params.get("limit"), "limit", PAGE_LIMIT, 1, MAX_PAGE_LIMIT)
+    # The backend's page as stored: ISO dates and whole rupiah are JSON-ready without
+    # the datetime and category conversions of helpers.get_recent_transactions
+    df, after = await _run(storage.get_storage().page_transactions, book, limit, _cursor(request.query_params.get("after")))
+    return JSONResponse({
+        "transactions": _records(df),
+        "next": f"{after[0]}_{after[1]}" if after else None,
+    })
+
+async def create_transaction(request):
+    email, _, kategori_pengguna = await _user(request)
+    book = await _book(request, email, write=True)
+    transaction_id = await batcher.submit(book, kategori_pengguna, await _body(request))
+    return JSONResponse({"id": transaction_id}, status_code=201)
+
+async def bulk_ingest(request):
+    email, _, kategori_pengguna = await _user(request)
+    book = await _book(request, email, write=True)
+    rows = (await _body(request)).get("transactions")
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ApiError(400, "transactions harus berupa daftar objek")
+    if len(rows) > BULK_MAX_ROWS:
+        raise ApiError(413, f"Maksimal {BULK_MAX_ROWS} transaksi per permintaan")
+    result = await _run(helpers.apply_transaction_changes, book, rows, kategori_pengguna=kategori_pengguna)
+    _retrain_if_labelled(book, rows)
+    return JSONResponse({"inserted": result["inserted"], "ids": result["ids"]}, status_code=201)
+
+async def update_transaction(request):
+    email, _, _ = await _user(request)
+    book = await _book(request, email, write=True)
+    values = await _body(request)
+    if not values:
+        raise ApiError(400, "Tidak ada kolom yang diubah")
+    result = await _run(helpers.apply_transaction_changes, book, updates={request.path_params["id"]: values})
+    if not result["updated"]:
+        raise ApiError(404, "Transaksi tidak ditemukan")
+    _retrain_if_labelled(book, [values])
+    return Response(status_code=204)
+
+async def delete_transaction(request):
+    email, _, _ = await _user(request)
+    book = await _book(request, email, write=True)
+    if not await _run(helpers.delete_transactions, book, [request.path_params["id"]]):
+        raise ApiError(404, "Transaksi tidak ditemukan")
+    return Response(status_code=204)
+
+async def summary(request):
+    email, _, _ = await _user(request)
+    book = await _book(request, email)
+    start = _date(request.query_params.get("start"), "start")
+    end = _date(request.query_params.get("end"), "end")
+    return JSONResponse(await _run(helpers.get_summary, book, start, end))
+
+async def export_csv(request):
+    email, _, _ = await _user(request)
+    book = await _book(request, email)
+    # A sync iterator: Starlette reads each chunk on a worker thread
+    return StreamingResponse(
+        export.iter_csv(book),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="transaksi.csv"'},
+    )
+
+async def _api_error(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=exc.status)
+
+async def _value_error(request, exc):
+    # Validation errors of helpers, e.g. an unknown Jenis or a missing Tanggal
+    return JSONResponse({"error": str(exc)}, status_code=400)
+
+@asynccontextmanager
+async def lifespan(app):
+    await _run(helpers.bootstrap_db)
+    yield
+
+app = Starlette(
+    routes=[
+        Route("/api/v1/sessions", create_session, methods=["POST"]),
+        Route("/api/v1/sessions", delete_session, methods=["DELETE"]),
+        Route("/api/v1/transactions", list_transactions, methods=["GET"]),
+        Route("/api/v1/transactions", create_transaction, methods=["POST"]),
+        Route("/api/v1/transactions/bulk", bulk_ingest, methods=["POST"]),
+        Route("/api/v1/transactions/{id:int}", update_transaction, methods=["PATCH"]),
+        Route("/api/v1/transactions/{id:int}", delete_transaction, methods=["DELETE"]),
+        Route("/api/v1/summary", summary, methods=["GET"]),
+        Route("/api/v1/export.csv", export_csv, methods=["GET"]),
+    ],
+    exception_handlers={ApiError: _api_error, ValueError: _value_error},
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("API_HOST", "127.0.0.1"), port=int(os.getenv("API_PORT", "8000")))
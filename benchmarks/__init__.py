@@ -0,0 +1,4 @@
+"""
+Benchmarks for Keuangan-Pintar
+Run them from the repository root, e.g. python -m benchmarks.bench_fragments
+"""
@@ -0,0 +1,168 @@
+"""
+Load test of the headless JSON API (api.py)
+
+Fills a database with synthetic transactions (100,000 by default, see
+benchmarks.synthetic), starts the API under uvicorn in a separate process
+against it, logs every user in and then drives each endpoint in turn from
+several client processes, each running a number of threads with keep-alive
+connections:
+
+    ingest   POST /api/v1/transactions, one row per request (the POS case)
+    bulk     POST /api/v1/transactions/bulk with --bulk-rows rows per request
+    summary  GET /api/v1/summary for the whole history
+    list     GET /api/v1/transactions, the newest 50 rows
+
+and reports requests/sec, p50/p99 latency and errors per endpoint. Run with
+--no-batching to write every single-row ingest on its own, as before
+IngestBatcher.
+
+Usage: python -m benchmarks.bench_api [--transactions 100000] [--users 20] [--requests 4000] [--concurrency 64] [--no-batching]
+"""
+import argparse
+import concurrent.futures
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks import synthetic
+from utils import helpers, storage
+
+PHASES = ["ingest", "bulk", "summary", "list"]
+
+def serve(path, port, batching):
+    """Server side of the benchmark: the API on the given database file"""
+    import uvicorn
+
+    import api
+    helpers.DB_PATH = path
+    if not batching:
+        api.batcher.max_rows = 1
+    uvicorn.run(api.app, host="127.0.0.1", port=port, log_level="warning")
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_for(url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError("API server did not start")
+
+def _request(http, phase, base, token, rng, bulk_rows):
+    headers = {"Authorization": f"Bearer {token}"}
+    if phase == "ingest":
+        row = {"Tanggal": "2025-12-31", "Jenis": "Pengeluaran", "Item": "Kopi", "Jumlah": rng.randrange(5000, 50000)}
+        return http.post(f"{base}/api/v1/transactions", json=row, headers=headers)
+    if phase == "bulk":
+        rows = [
+            {"Tanggal": "2025-12-31", "Jenis": "Pemasukan", "Item": "Penjualan", "Jumlah": rng.randrange(5000, 500000)}
+            for _ in range(bulk_rows)
+        ]
+        return http.post(f"{base}/api/v1/transactions/bulk", json={"transactions": rows}, headers=headers)
+    if phase == "summary":
+        return http.get(f"{base}/api/v1/summary", headers=headers)
+    return http.get(f"{base}/api/v1/transactions", params={"limit": 50}, headers=headers)
+
+def _drive(phase, base, tokens, count, threads, bulk_rows, seed):
+    """One client process: count requests spread over threads; returns (latencies in ms, errors)"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        local, failed = [], 0
+        with requests.Session() as http:
+            barrier.wait()
+            for i in range(count // threads):
+                token = tokens[(index + i) % len(tokens)]
+                start = time.perf_counter()
+                response = _request(http, phase, base, token, rng, bulk_rows)
+                local.append((time.perf_counter() - start) * 1000)
+                failed += response.status_code >= 400
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=client, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, errors[0]
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=4000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=64, help="client threads in total")
+    parser.add_argument("--processes", type=int, default=4, help="client processes the threads are spread over")
+    parser.add_argument("--bulk-rows", type=int, default=100)
+    parser.add_argument("--no-batching", action="store_true", help="write every single-row ingest on its own")
+    parser.add_argument("--serve", metavar="DB_PATH", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.port, not args.no_batching)
+        return
+
+    path = os.path.join(tempfile.mkdtemp(), "api.db")
+    storage.set_storage(storage.create_storage("sqlite"))
+    emails = sorted(synthetic.generate(path, args.users, args.transactions))
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    command = [sys.executable, "-m", "benchmarks.bench_api", "--serve", path, "--port", str(port)]
+    server = subprocess.Popen(command + (["--no-batching"] if args.no_batching else []))
+    try:
+        _wait_for(base, server)
+        tokens = [
+            requests.post(f"{base}/api/v1/sessions", json={"email": email, "password": "password"}).json()["token"]
+            for email in emails
+        ]
+        print(f"{args.transactions} synthetic transactions for {len(emails)} users; "
+              f"{args.concurrency} client threads in {args.processes} processes, "
+              f"ingest batching {'off' if args.no_batching else 'on'}")
+        print(f"{'endpoint':8} {'req/s':>8} {'rows/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        threads = max(1, args.concurrency // args.processes)
+        per_process = args.requests // args.processes
+        with concurrent.futures.ProcessPoolExecutor(args.processes) as pool:
+            for phase in PHASES:
+                start = time.perf_counter()
+                results = list(pool.map(
+                    _drive, [phase] * args.processes, [base] * args.processes, [tokens] * args.processes,
+                    [per_process] * args.processes, [threads] * args.processes, [args.bulk_rows] * args.processes,
+                    range(args.processes),
+                ))
+                elapsed = time.perf_counter() - start
+                latencies = [value for process_latencies, _ in results for value in process_latencies]
+                errors = sum(process_errors for _, process_errors in results)
+                rate = len(latencies) / elapsed
+                rows = rate * (args.bulk_rows if phase == "bulk" else 1) if phase in ("ingest", "bulk") else 0
+                print(f"{phase:8} {rate:8.0f} {rows:8.0f} {_percentile(latencies, 0.5):8.1f} "
+                      f"{_percentile(latencies, 0.99):8.1f} {errors:7d}")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Reads before and after archiving closed years
+
+Fills a database with synthetic transactions spread over --years years
+ending 31 December 2025 (see benchmarks.synthetic), then times the reads of
+the pages for the heaviest user and a median one: Catatan's default (the
+current year), every year, the newest page on Beranda, a whole-year and a
+mid-month summary and a search. Everything before 2025 is then archived with
+utils.archive and the same reads are timed again. Also reports the time the
+archiving took and the size of the live table and its index.
+
+Usage: python -m benchmarks.bench_archive [--transactions 1000000] [--users 200] [--years 5] [--repeat 20]
+"""
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import synthetic
+from utils import archive, helpers, storage
+
+TODAY = datetime.date(2025, 12, 31)
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def _reads(email):
+    year = TODAY.year
+    return {
+        "this year": lambda: helpers.get_transactions(email, start=f"{year}-01-01", end=f"{year}-12-31"),
+        "all years": lambda: helpers.get_transactions(email),
+        "newest 50": lambda: helpers.get_recent_transactions(email, 50),
+        "summary year": lambda: helpers.get_summary(email, f"{year - 1}-01-01", f"{year - 1}-12-31"),
+        "summary range": lambda: helpers.get_summary(email, f"{year}-03-15", f"{year}-06-15"),
+        "search kopi": lambda: helpers.search_transactions(email, "kopi"),
+    }
+
+def _live_table_kb():
+    conn = helpers.get_connection()
+    try:
+        rows = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        pages = conn.execute("""
+            SELECT SUM(pgsize) FROM dbstat WHERE name IN ('transactions', 'idx_transactions_live')
+        """).fetchone()[0]
+        return rows, pages // 1024
+    except Exception:
+        return rows, None  # dbstat is not compiled into every SQLite
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    storage.set_storage(storage.create_storage("sqlite"))
+    start = time.perf_counter()
+    synthetic.generate(os.path.join(tempfile.mkdtemp(), "archive.db"), args.users, args.transactions,
+                       days=365 * args.years, end_date=TODAY)
+    print(f"generated {args.transactions} rows over {args.years} years in {time.perf_counter() - start:.1f}s")
+
+    conn = helpers.get_connection()
+    counts = conn.execute("SELECT email, COUNT(*) FROM transactions GROUP BY email ORDER BY 2 DESC").fetchall()
+    conn.close()
+    users = [("heaviest", counts[0]), ("median", counts[len(counts) // 2])]
+
+    results = {}
+    for phase in ("before", "after"):
+        if phase == "after":
+            start = time.perf_counter()
+            moved = archive.archive(before=TODAY.year, today=TODAY)
+            print(f"archived {sum(moved.values())} rows of {len(moved)} years in {time.perf_counter() - start:.1f}s")
+        rows, size = _live_table_kb()
+        print(f"{phase}: {rows} live rows" + (f", table and index {size} KB" if size is not None else ""))
+        for label, (email, _) in users:
+            for name, read in _reads(email).items():
+                results[(label, name, phase)] = _median_ms(read, args.repeat)
+
+    print(f"\n{'user':9} {'read':14} {'before ms':>10} {'after ms':>10}")
+    for label, (email, count) in users:
+        for name in _reads(email):
+            print(f"{label:9} {name:14} {results[(label, name, 'before')]:10.2f} {results[(label, name, 'after')]:10.2f}")
+
+if __name__ == "__main__":
+    main()
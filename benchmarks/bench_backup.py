@@ -0,0 +1,138 @@
+"""
+Write latency while the database is being backed up
+
+Fills a database with synthetic transactions (200,000 by default, see
+benchmarks.synthetic) and has concurrent writers call helpers.save_transaction
+at --rate writes/sec in total for --seconds per mode, while in the background:
+
+    idle         nothing: the baseline
+    stepped      utils.backup snapshots back to back, STEP_PAGES pages per step
+    one-step     the same snapshots with the whole file copied in one step
+    locked-copy  the file copied under BEGIN IMMEDIATE, the safe way to copy it
+                 without the backup API (writers wait for the whole copy)
+    wal-archive  utils.backup.WalArchive runs
+
+with --interval seconds between backup runs. Reports writes/sec and
+p50/p99/max write latency per mode, with the number of backups completed and
+their average duration.
+
+Usage: python -m benchmarks.bench_backup [--transactions 200000] [--writers 8] [--rate 200] [--seconds 5] [--interval 1]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks import synthetic
+from utils import backup, helpers, storage
+
+MODES = ["idle", "stepped", "one-step", "locked-copy", "wal-archive"]
+STEP_PAGES = backup.STEP_PAGES
+
+def _locked_copy(path, target):
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # The database and its WAL together; without the lock a commit could tear the copy
+        shutil.copyfile(path, target)
+        shutil.copyfile(path + "-wal", target + "-wal")
+        conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+
+def _background(mode, root, stop, interval):
+    """Run the mode's backups until stop is set; returns their durations"""
+    durations = []
+    archive = backup.WalArchive(root=root) if mode == "wal-archive" else None
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            if mode in ("stepped", "one-step"):
+                backup.snapshot(root=root)
+                backup.prune(keep=1, root=root)
+            elif mode == "locked-copy":
+                _locked_copy(helpers.DB_PATH, os.path.join(root, "copy.db"))
+            elif mode == "wal-archive":
+                archive.poll()
+            else:
+                stop.wait(0.1)
+                continue
+            durations.append(time.perf_counter() - start)
+            stop.wait(interval)
+    finally:
+        if archive is not None:
+            archive.close()
+    return durations
+
+def run(mode, writers, rate, seconds, interval, root):
+    backup.STEP_PAGES = -1 if mode == "one-step" else STEP_PAGES
+    latencies, lock = [], threading.Lock()
+    stop = threading.Event()
+
+    def writer(index):
+        email = synthetic._user_email(index)
+        local = []
+        due = time.perf_counter() + index / rate
+        while not stop.is_set():
+            # A fixed schedule: a write delayed by the backup does not slow down the next ones
+            time.sleep(max(0.0, due - time.perf_counter()))
+            start = time.perf_counter()
+            helpers.save_transaction(email, "2025-12-31", "Pribadi", "Pengeluaran", "Kopi", 25000, "")
+            local.append((time.perf_counter() - start) * 1000)
+            due += writers / rate
+        with lock:
+            latencies.extend(local)
+
+    os.makedirs(root, exist_ok=True)
+    durations = []
+    background = threading.Thread(target=lambda: durations.extend(_background(mode, root, stop, interval)))
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(writers)]
+    background.start()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads + [background]:
+        thread.join()
+    shutil.rmtree(root)
+
+    latencies.sort()
+    return {
+        "writes_per_sec": len(latencies) / seconds,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "max": latencies[-1],
+        "backups": len(durations),
+        "backup_seconds": statistics.mean(durations) if durations else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=200, help="writes/sec of all writers together")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each mode")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between backup runs")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    storage.set_storage(storage.create_storage("sqlite"))
+    synthetic.generate(os.path.join(workdir, "keuangan.db"), args.users, args.transactions)
+    size = os.path.getsize(helpers.DB_PATH) // (1024 * 1024)
+    print(f"{args.transactions} transactions ({size} MB), {args.writers} writers at {args.rate:.0f} writes/s, "
+          f"{args.seconds:.0f}s per mode")
+    print(f"{'mode':12}{'writes/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'backups':>9}{'avg s':>8}")
+    for mode in args.modes:
+        result = run(mode, args.writers, args.rate, args.seconds, args.interval, os.path.join(workdir, "backups"))
+        print(f"{mode:12}{result['writes_per_sec']:>10.0f}{result['p50']:>9.1f}{result['p99']:>9.1f}"
+              f"{result['max']:>9.1f}{result['backups']:>9}{result['backup_seconds']:>8.2f}")
+    shutil.rmtree(workdir)
+
+if __name__ == "__main__":
+    main()
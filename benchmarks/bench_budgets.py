@@ -0,0 +1,108 @@
+"""
+Insert latency with budget counters and alert evaluation
+
+Fills a database with synthetic transactions (200,000 by default, see
+benchmarks.synthetic), then saves transactions for the heaviest user through
+helpers.save_transaction, first without budgets and then with a Pengeluaran
+budget plus a budget on every synthetic Pengeluaran item, so each insert also
+updates a counter and evaluates its thresholds. The trigger cost is also
+measured on its own, as a batch insert inside one transaction without the
+commit. Reading the month's alerts is compared with summing the month from
+the transactions table.
+
+Usage: python -m benchmarks.bench_budgets [--transactions 200000] [--users 50] [--inserts 500]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks import synthetic
+from utils import budgets, helpers, storage
+
+def _percentiles_ms(timings):
+    timings = sorted(timings)
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)]
+
+def _save_timings(email, inserts, items):
+    timings = []
+    for i in range(inserts):
+        start = time.perf_counter()
+        helpers.save_transaction(email, "2025-12-15", "Pribadi", "Pengeluaran", items[i % len(items)], 25000, "")
+        timings.append((time.perf_counter() - start) * 1000)
+    return _percentiles_ms(timings)
+
+def _batch_us(path, email, inserts, items):
+    """Microseconds per row of an uncommitted batch insert, i.e. the statement and trigger work alone"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        start = time.perf_counter()
+        conn.executemany("""
+            INSERT INTO transactions (email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan)
+            VALUES (?, '2025-12-16', 'Pribadi', 'Pengeluaran', ?, 25000, '')
+        """, [(email, items[i % len(items)]) for i in range(inserts)])
+        elapsed = time.perf_counter() - start
+        conn.execute("ROLLBACK")
+        return elapsed * 1e6 / inserts
+    finally:
+        conn.close()
+
+def _median_ms(fn, repeat):
+    return _percentiles_ms([_timed(fn) for _ in range(repeat)])[0]
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--inserts", type=int, default=500)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "budgets.db")
+    storage.set_storage(storage.create_storage("sqlite"))
+    synthetic.generate(path, args.users, args.transactions)
+    conn = sqlite3.connect(path)
+    email, rows = conn.execute("SELECT email, COUNT(*) FROM transactions GROUP BY email ORDER BY 2 DESC").fetchone()
+    conn.close()
+    items = synthetic.JENIS_PROFILE["Pengeluaran"][3]
+    print(f"{args.transactions} transactions; heaviest user {email} with {rows} rows")
+
+    without = _save_timings(email, args.inserts, items)
+    batch_without = _batch_us(path, email, args.inserts * 10, items)
+    budgets.set_budget(email, "Pengeluaran", 10**12)
+    for item in items:
+        budgets.set_budget(email, item, 100000, scope="item")
+    with_budgets = _save_timings(email, args.inserts, items)
+    batch_with = _batch_us(path, email, args.inserts * 10, items)
+
+    print(f"{'':32} {'p50':>8} {'p95':>8}  (ms)")
+    print(f"{'save_transaction, no budgets':32} {without[0]:8.3f} {without[1]:8.3f}")
+    print(f"{f'save_transaction, {len(items) + 1} budgets':32} {with_budgets[0]:8.3f} {with_budgets[1]:8.3f}")
+    print(f"batch insert per row: {batch_without:.1f} us without budgets, {batch_with:.1f} us with "
+          f"({batch_with - batch_without:+.1f} us for the counter and threshold triggers)")
+
+    alerts = _median_ms(lambda: budgets.alerts(email, "2025-12"), 50)
+
+    def rescan():
+        # On a new connection like the storage backend's reads, so both include opening it
+        conn = helpers.get_connection()
+        try:
+            return conn.execute("""
+                SELECT lower(trim(item)), SUM(jumlah) FROM transactions
+                WHERE email = ? AND deleted_at IS NULL AND jenis = 'Pengeluaran' AND tanggal BETWEEN '2025-12-01' AND '2025-12-31'
+                GROUP BY 1
+            """, (email,)).fetchall()
+        finally:
+            conn.close()
+
+    print(f"read the month's alerts: {alerts:.3f} ms; summing the month from transactions instead: {_median_ms(rescan, 50):.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Training and batch classification time of the automatic categories
+
+Fills a database with synthetic transactions (500,000 by default, see
+benchmarks.synthetic) and labels a share of the heaviest user's rows (20% by
+default) with the kategori of their item from ITEM_KATEGORI, as a user
+correcting categories in Lihat Catatan would. It then times the steps of
+categories.retrain on that user: reading the rows, training, classifying the
+unlabelled rows, and the whole retrain including writing the predictions.
+Accuracy is measured on the unlabelled rows, for the seed examples alone and
+after training on the labels.
+
+Usage: python -m benchmarks.bench_categories [--transactions 500000] [--users 20] [--labelled 0.2]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks import synthetic
+from utils import categories, storage
+
+# The kategori a user would give each synthetic item; a few differ from the seed examples
+ITEM_KATEGORI = {
+    "Makan siang": "Makanan & Minuman", "Kopi": "Makanan & Minuman", "Jajan": "Makanan & Minuman",
+    "Belanja bulanan": "Belanja", "Bensin": "Transportasi", "Ojek online": "Transportasi", "Parkir": "Transportasi",
+    "Pulsa": "Tagihan", "Listrik": "Tagihan", "Air PDAM": "Tagihan", "Internet": "Tagihan",
+    "Sewa kos": "Tempat Tinggal", "Laundry": "Belanja", "Obat": "Kesehatan",
+    "Gaji": "Pendapatan", "Bonus": "Pendapatan", "Penjualan": "Pendapatan", "Transfer masuk": "Pendapatan",
+    "Honor": "Pendapatan", "Komisi": "Pendapatan",
+    "Tabungan bank": "Tabungan & Investasi", "Deposito": "Tabungan & Investasi", "Reksa dana": "Tabungan & Investasi",
+    "Emas": "Tabungan & Investasi",
+    "Cicilan motor": "Cicilan & Hutang", "Pinjaman teman": "Cicilan & Hutang", "Kartu kredit": "Cicilan & Hutang",
+    "Paylater": "Cicilan & Hutang",
+    "Sumbangan": "Lainnya", "Arisan": "Hiburan", "Hadiah": "Lainnya", "Lain-lain": "Lainnya",
+}
+
+def _timed_ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+def _accuracy(predicted, rows):
+    expected = rows["Item"].map(ITEM_KATEGORI).to_numpy(dtype=object)
+    return np.mean(predicted == expected), np.mean([value is None for value in predicted])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=500000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--labelled", type=float, default=0.2, help="share of the user's rows labelled")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "categories.db")
+    storage.set_storage(storage.create_storage("sqlite"))
+    synthetic.generate(path, args.users, args.transactions)
+    conn = sqlite3.connect(path)
+    email, count = conn.execute("SELECT email, COUNT(*) FROM transactions GROUP BY email ORDER BY 2 DESC").fetchone()
+    rows = conn.execute("SELECT id, item FROM transactions WHERE email = ?", (email,)).fetchall()
+    labelled = random.Random(7).sample(rows, int(len(rows) * args.labelled))
+    with conn:
+        conn.executemany(
+            "UPDATE transactions SET kategori = ?, kategori_label = 1 WHERE id = ?",
+            [(ITEM_KATEGORI[item], transaction_id) for transaction_id, item in labelled],
+        )
+    conn.close()
+    print(f"{args.transactions} transactions; heaviest user {email} with {count} rows, {len(labelled)} labelled")
+
+    backend = storage.get_storage()
+    frame, read_ms = _timed_ms(lambda: backend.get_category_rows(email))
+    unlabelled = frame[frame["Label"] == 0]
+    seed_only = categories.classify(categories.train([], []), unlabelled)
+    model, train_ms = _timed_ms(lambda: categories.train_user(frame))
+    predicted, classify_ms = _timed_ms(lambda: categories.classify(model, unlabelled))
+    written, retrain_ms = _timed_ms(lambda: categories.retrain(email))
+    _, again_ms = _timed_ms(lambda: categories.retrain(email))
+
+    print(f"read rows: {read_ms:.0f} ms; train: {train_ms:.0f} ms ({len(model.features)} features, "
+          f"{len(model.to_bytes()) / 1024:.0f} KiB stored); classify {len(unlabelled)} rows: {classify_ms:.0f} ms")
+    print(f"retrain with writes: {retrain_ms:.0f} ms ({written} rows written); "
+          f"retrain again, nothing changed: {again_ms:.0f} ms")
+    for label, values in (("seed examples only", seed_only), ("trained on labels", predicted)):
+        accuracy, unsure = _accuracy(values, unlabelled)
+        print(f"accuracy, {label}: {accuracy:.1%} ({unsure:.1%} left without a kategori)")
+
+    suggestions = [("Makan siang", "Pengeluaran", ""), ("Arisan kantor", "Lainnya", ""), ("Kopi susu", "Pengeluaran", "QRIS")]
+    start = time.perf_counter()
+    for i in range(1000):
+        categories.suggest(email, *suggestions[i % len(suggestions)])
+    print(f"suggest with the loaded model: {(time.perf_counter() - start) * 1e6 / 1000:.0f} us per call")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Data-layer and page-computation benchmark on synthetic data
+
+For each scale (total transactions), a fresh database is filled by
+benchmarks.synthetic and the heaviest user's workload is timed:
+get_transactions, save_transaction, calculate_summary, the Grafik chart
+series, and CSV/PDF export. Results are written as JSON; pass --baseline to
+compare against an earlier run and fail on regressions.
+
+Usage:
+    python -m benchmarks.bench_data_layer --output benchmarks/results.json
+    python -m benchmarks.bench_data_layer --baseline benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from utils import helpers
+from utils.export import export_to_csv, export_to_pdf
+from views.grafik import chart_series
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def run_scale(transactions, users, repeat, pdf_max_rows, db_dir):
+    db_path = os.path.join(db_dir, f"bench_{transactions}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    counts = synthetic.generate(db_path, users, transactions)
+    email = max(counts, key=counts.get)
+
+    df = helpers.get_transactions(email)
+    end = synthetic.DEFAULT_END_DATE
+    month_start = end.replace(day=1)
+    results = {
+        "user_rows": len(df),
+        "get_transactions_ms": _median_ms(lambda: helpers.get_transactions(email), repeat),
+        "calculate_summary_ms": _median_ms(lambda: helpers.calculate_summary(df), repeat),
+        "chart_series_month_ms": _median_ms(lambda: chart_series(df.copy(), month_start, end), repeat),
+        "chart_series_all_ms": _median_ms(lambda: chart_series(df.copy(), None, None), repeat),
+        "export_csv_ms": _median_ms(lambda: export_to_csv(df), repeat),
+    }
+    if len(df) <= pdf_max_rows:
+        results["export_pdf_ms"] = _median_ms(lambda: export_to_pdf(df), max(1, repeat // 3))
+
+    # Writes last so the reads above see the generated data only
+    tanggal = datetime.date(2025, 12, 31)
+    results["save_transaction_ms"] = _median_ms(
+        lambda: helpers.save_transaction(email, tanggal, "Pribadi", "Pengeluaran", "Kopi", 25000, ""),
+        repeat * 5,
+    )
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print metrics slower than tolerance x baseline; return the number of regressions"""
+    regressions = 0
+    for scale, metrics in results["results"].items():
+        for name, value in metrics.items():
+            base = baseline.get("results", {}).get(scale, {}).get(name)
+            if not name.endswith("_ms") or not base:
+                continue
+            ratio = value / base
+            status = "REGRESSION" if ratio > tolerance else "ok"
+            if ratio > tolerance:
+                regressions += 1
+            print(f"{scale:>8} {name:28} {base:10.2f} -> {value:10.2f} ms  x{ratio:5.2f}  {status}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1000,10000,100000", help="comma separated transaction totals")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pdf-max-rows", type=int, default=5000, help="skip PDF export above this many rows")
+    parser.add_argument("--db-dir", default=None, help="where benchmark databases are created (default: temp dir)")
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--baseline", default=None, help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown ratio before failing")
+    args = parser.parse_args()
+
+    db_dir = args.db_dir or tempfile.mkdtemp()
+    results = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "users": args.users,
+        },
+        "results": {},
+    }
+    for scale in [int(s) for s in args.scales.split(",")]:
+        results["results"][str(scale)] = run_scale(scale, args.users, args.repeat, args.pdf_max_rows, db_dir)
+        print(f"{scale:>8}: " + ", ".join(
+            f"{name}={value:.2f}" if isinstance(value, float) else f"{name}={value}"
+            for name, value in results["results"][str(scale)].items()
+        ))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Memory and filter speed of raw vs typed transaction frames
+
+Loads one user's transactions (100k rows by default) both as the storage
+backend returns them (object strings, float amounts) and as
+helpers.get_transactions types them (datetime64 Tanggal, category Jenis,
+int64 Jumlah), then times the operations the pages repeat on every rerun.
+
+Usage: python -m benchmarks.bench_dtypes [--rows 100000] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks import synthetic
+from utils import helpers, storage
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    counts = synthetic.generate(os.path.join(tempfile.mkdtemp(), "dtypes.db"), 1, args.rows)
+    email = next(iter(counts))
+    start, end = pd.Timestamp("2025-06-01"), pd.Timestamp("2025-06-30")
+
+    raw = storage.get_storage().get_transactions(email)
+    typed = helpers.get_transactions(email)
+
+    def raw_range():
+        # What the charts page did on every rerun: reparse the strings, then compare
+        dates = pd.to_datetime(raw["Tanggal"])
+        return raw[(dates >= start) & (dates <= end)]
+
+    rows = [
+        ("load all columns", _median_ms(lambda: storage.get_storage().get_transactions(email), 3),
+         _median_ms(lambda: helpers.get_transactions(email), 3)),
+        ("load Tanggal/Jenis/Jumlah", None,
+         _median_ms(lambda: helpers.get_transactions(email, ["Tanggal", "Jenis", "Jumlah"]), 3)),
+        ("Jenis == 'Pengeluaran'", _median_ms(lambda: raw[raw["Jenis"] == "Pengeluaran"], args.repeat),
+         _median_ms(lambda: typed[typed["Jenis"] == "Pengeluaran"], args.repeat)),
+        ("date range filter", _median_ms(raw_range, args.repeat),
+         _median_ms(lambda: typed[(typed["Tanggal"] >= start) & (typed["Tanggal"] <= end)], args.repeat)),
+        ("sum per Jenis", _median_ms(lambda: raw.groupby("Jenis")["Jumlah"].sum(), args.repeat),
+         _median_ms(lambda: typed.groupby("Jenis", observed=True)["Jumlah"].sum(), args.repeat)),
+    ]
+
+    print(f"{len(typed)} rows for {email}")
+    print(f"{'memory (deep)':28}{raw.memory_usage(deep=True).sum() / 1e6:>10.1f} MB{typed.memory_usage(deep=True).sum() / 1e6:>10.1f} MB")
+    subset = helpers.get_transactions(email, ["Tanggal", "Jenis", "Jumlah"])
+    print(f"{'memory, 3 columns':28}{'':>13}{subset.memory_usage(deep=True).sum() / 1e6:>10.1f} MB")
+    print(f"{'median ms':28}{'raw':>13}{'typed':>13}")
+    for name, raw_ms, typed_ms in rows:
+        raw_text = f"{raw_ms:.2f}" if raw_ms is not None else "-"
+        print(f"{name:28}{raw_text:>13}{typed_ms:>13.2f}")
+    print("dtypes:", ", ".join(f"{column}={dtype}" for column, dtype in typed.dtypes.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Time and peak memory of the XLSX report
+
+Fills a database with --transactions synthetic transactions of one user (see
+benchmarks.synthetic), with spending categories spread over the rows, then
+writes the user's XLSX report two ways:
+
+    in-memory   helpers.get_transactions into a DataFrame, written with
+                DataFrame.to_excel (XlsxWriter engine) to a BytesIO: the
+                straightforward way, holding every row twice
+    streaming   utils.export.write_xlsx: rows from one cursor into XlsxWriter's
+                constant_memory mode, straight to a file
+
+Each way runs in a fresh process; peak memory is how far the write raised its
+peak resident set size over what the process held before. Also times utils.export.xlsx_report for the same data version once the report
+is on disk.
+
+Usage: python -m benchmarks.bench_export [--transactions 500000]
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks import synthetic
+from utils import export, helpers, storage
+
+def _run(mode, db_path, email, path):
+    """Write the report one way in this (fresh) process; returns (seconds, peak MB added, file MB)"""
+    helpers.DB_PATH = db_path
+    storage.set_storage(storage.create_storage("sqlite"))
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == "in-memory":
+        size = _in_memory(email)
+    else:
+        export.write_xlsx(email, path)
+        size = os.path.getsize(path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before  # KB on Linux
+    return elapsed, peak / 1024, size / 1024 / 1024
+
+def _in_memory(email):
+    df = helpers.get_transactions(email, export.XLSX_COLUMNS)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        df.to_excel(writer, sheet_name="Transaksi", index=False)
+        monthly = df.pivot_table(index=df["Tanggal"].dt.strftime("%Y-%m"), columns="Jenis", values="Jumlah",
+                                 aggfunc="sum", fill_value=0, observed=True)
+        monthly.to_excel(writer, sheet_name="Ringkasan Bulanan")
+        spending = df[df["Jenis"] == "Pengeluaran"]
+        spending.pivot_table(index=spending["Tanggal"].dt.strftime("%Y-%m"), columns="Kategori", values="Jumlah",
+                             aggfunc="sum", fill_value=0).to_excel(writer, sheet_name="Pivot Pengeluaran")
+    return len(buffer.getvalue())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=500000)
+    args = parser.parse_args()
+
+    storage.set_storage(storage.create_storage("sqlite"))
+    directory = tempfile.mkdtemp()
+    counts = synthetic.generate(os.path.join(directory, "export.db"), 1, args.transactions)
+    email = next(iter(counts))
+    conn = sqlite3.connect(helpers.DB_PATH)
+    kategori = [k for k in helpers.KATEGORI_OPTIONS if k != "Pendapatan"]
+    conn.execute(f"""
+        UPDATE transactions SET kategori = CASE abs(random()) % {len(kategori)}
+        {" ".join(f"WHEN {i} THEN '{k}'" for i, k in enumerate(kategori))} END
+    """)
+    conn.commit()
+    conn.close()
+    print(f"{args.transactions} transactions of one user")
+
+    spawn = multiprocessing.get_context("spawn")
+    for mode in ("in-memory", "streaming"):
+        with spawn.Pool(1) as pool:
+            elapsed, peak, size = pool.apply(_run, (mode, helpers.DB_PATH, email, os.path.join(directory, "report.xlsx")))
+        print(f"{mode:10} {elapsed:7.1f} s  peak +{peak:7.1f} MB  {size:.1f} MB file")
+
+    export.xlsx_report(email)
+    start = time.perf_counter()
+    export.xlsx_report(email)
+    print(f"cached report for the same data version: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Backtest and latency of the cash-flow forecasts
+
+Fills a database with synthetic transactions (300,000 by default, see
+benchmarks.synthetic) and gives every user a monthly salary, rent and internet
+bill on fixed days, so the recurring-item detection has something to find.
+For the users with the most rows, forecasts are made from several month-end
+origins and compared with what actually followed: the weighted absolute
+percentage error (WAPE) of the monthly Pemasukan and Pengeluaran totals,
+against repeating the last month and the mean of the last three, and how
+often the actual month fell inside the forecast's 80% band. Forecast latency
+is timed on the same frames, as Grafik & Insight computes it on a cache miss.
+
+Usage: python -m benchmarks.bench_forecast [--transactions 300000] [--users 100] [--backtest-users 20] [--horizon 6]
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from utils import forecast, helpers, storage
+
+ORIGINS = ["2024-12-31", "2025-03-31", "2025-06-30"]
+# item, jenis, day of month, amount
+RECURRING = [("Gaji", "Pemasukan", 25, 6000000), ("Sewa kos", "Pengeluaran", 1, 1500000), ("Internet", "Pengeluaran", 10, 350000)]
+
+def _add_recurring(path, emails, start, end):
+    months = pd.period_range(start, end, freq="M")
+    rows = [
+        (email, f"{month}-{day:02d}", "Pribadi", jenis, item, jumlah, "")
+        for email in emails for month in months for item, jenis, day, jumlah in RECURRING
+    ]
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO transactions (email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    conn.close()
+
+def _actual(df, months):
+    """Monthly Pemasukan/Pengeluaran totals for the given YYYY-MM months"""
+    totals = df.groupby([df["Tanggal"].dt.strftime("%Y-%m"), "Jenis"], observed=True)["Jumlah"].sum().unstack(fill_value=0)
+    return totals.reindex(index=months, columns=list(forecast.SERIES), fill_value=0)
+
+def _wape(errors, actuals):
+    return sum(errors) / max(sum(actuals), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=300000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--backtest-users", type=int, default=20)
+    parser.add_argument("--horizon", type=int, default=6)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "forecast.db")
+    storage.set_storage(storage.create_storage("sqlite"))
+    synthetic.generate(path, args.users, args.transactions)
+    conn = sqlite3.connect(path)
+    counts = conn.execute("SELECT email, COUNT(*) FROM transactions GROUP BY email ORDER BY 2 DESC").fetchall()
+    conn.close()
+    end = synthetic.DEFAULT_END_DATE
+    _add_recurring(path, [email for email, _ in counts], end - datetime.timedelta(days=729), end)
+    print(f"{args.transactions} synthetic transactions plus {len(RECURRING)} recurring items a month for {len(counts)} users")
+
+    errors = {name: {"forecast": [], "last month": [], "mean of 3": []} for name in forecast.SERIES}
+    actual_totals = {name: [] for name in forecast.SERIES}
+    inside, bands, timings = 0, 0, []
+    for email, _ in counts[:args.backtest_users]:
+        df = helpers.get_transactions(email, ["Tanggal", "Jenis", "Item", "Jumlah"])
+        for origin in ORIGINS:
+            today = datetime.date.fromisoformat(origin)
+            history = df[df["Tanggal"] <= pd.Timestamp(origin)]
+            start = time.perf_counter()
+            result = forecast.forecast(history, args.horizon, today)
+            timings.append((time.perf_counter() - start) * 1000)
+
+            future = result.monthly.iloc[1:]  # the origin is a month end, so month 0 has no days left
+            actual = _actual(df, list(future.index))
+            past = _actual(df, [str(month) for month in pd.period_range(end=origin, periods=3, freq="M")])
+            for name in forecast.SERIES:
+                truth = actual[name].to_numpy()
+                actual_totals[name].append(truth.sum())
+                errors[name]["forecast"].append(np.abs(future[name].to_numpy() - truth).sum())
+                errors[name]["last month"].append(np.abs(past[name].iloc[-1] - truth).sum())
+                errors[name]["mean of 3"].append(np.abs(past[name].mean() - truth).sum())
+                inside += ((truth >= future[f"{name}_bawah"].to_numpy()) & (truth <= future[f"{name}_atas"].to_numpy())).sum()
+                bands += len(truth)
+
+    runs = len(timings)
+    print(f"backtest: {args.backtest_users} users x {len(ORIGINS)} origins, {args.horizon}-month horizon")
+    print(f"{'WAPE':12} {'forecast':>9} {'last month':>11} {'mean of 3':>10}")
+    for name in forecast.SERIES:
+        row = [_wape(errors[name][method], actual_totals[name]) for method in ("forecast", "last month", "mean of 3")]
+        print(f"{name:12} {row[0]:9.1%} {row[1]:11.1%} {row[2]:10.1%}")
+    print(f"actual months inside the 80% band: {inside / bands:.1%}")
+
+    timings.sort()
+    print(f"forecast latency over {runs} runs: p50 {statistics.median(timings):.2f} ms, "
+          f"p95 {timings[max(0, int(runs * 0.95) - 1)]:.2f} ms, max {timings[-1]:.2f} ms "
+          f"(largest history {counts[0][1] + 24 * len(RECURRING)} rows)")
+
+if __name__ == "__main__":
+    main()
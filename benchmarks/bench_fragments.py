@@ -0,0 +1,85 @@
+"""
+Before/after benchmark of script execution time per widget interaction on
+Grafik & Insight
+
+"Full rerun" is what every interaction cost before fragments: app.py runs
+from the top (database bootstrap, session setup, CSS, sidebar, page). "Fragment rerun"
+executes only analysis_fragment, which is what Streamlit now reruns when the
+date range or chart type changes.
+
+Usage: python -m benchmarks.bench_fragments [--rows 5000] [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import datetime
+
+from streamlit.testing.v1 import AppTest
+
+from utils import helpers
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+EMAIL = "bench@example.com"
+CHART_TYPES = ["Batang", "Area", "Garis"]
+
+def _fragment_script(email, version):
+    from views.grafik import analysis_fragment
+    analysis_fragment(email, version)
+
+def _seed(rows):
+    helpers.init_db()
+    helpers.create_user("Bench", EMAIL, "bench", "Pribadi")
+    today = datetime.date.today()
+    conn = helpers.get_connection()
+    conn.executemany("""
+        INSERT INTO transactions (email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (EMAIL, str(today - datetime.timedelta(days=i % 60)), "Pribadi",
+         ("Pemasukan", "Pengeluaran", "Tabungan")[i % 3], f"item {i}", 1000 + i, "")
+        for i in range(rows)
+    ])
+    conn.commit()
+    conn.close()
+
+def _time_interactions(at, runs):
+    at.run()
+    timings = []
+    for i in range(runs):
+        at.selectbox[0].set_value(CHART_TYPES[i % len(CHART_TYPES)])
+        start = time.perf_counter()
+        at.run()
+        timings.append((time.perf_counter() - start) * 1000)
+        assert not at.exception, at.exception
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    helpers.DB_PATH = os.path.join(tempfile.mkdtemp(), "keuangan.db")
+    _seed(args.rows)
+
+    full = AppTest.from_file(APP_PATH, default_timeout=60)
+    full.session_state.logged_in = True
+    full.session_state.email = EMAIL
+    full.session_state.nama = "Bench"
+    full.session_state.kategori_pengguna = "Pribadi"
+    full.session_state.menu = "Grafik & Insight"
+    full_times = _time_interactions(full, args.runs)
+
+    fragment = AppTest.from_function(_fragment_script, args=(EMAIL, helpers.get_data_version(EMAIL)), default_timeout=60)
+    fragment_times = _time_interactions(fragment, args.runs)
+
+    print(f"Grafik & Insight, {args.rows} rows, {args.runs} chart-type changes")
+    print(f"{'':18}{'median ms':>12}{'p95 ms':>12}")
+    for label, timings in (("full rerun", full_times), ("fragment rerun", fragment_times)):
+        p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+        print(f"{label:18}{statistics.median(timings):>12.1f}{p95:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Integer vs REAL money: migration cost and aggregation speed
+
+Builds a database at schema version 4 (jumlah REAL) from the synthetic
+generator, times the same aggregates, applies the integer money migration,
+times them again on INTEGER amounts, then runs the reconciliation. Also
+compares pandas float64 and int64 sums.
+
+Usage: python -m benchmarks.bench_money [--users 50] [--transactions 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from utils import helpers, reconcile, storage
+
+QUERIES = {
+    "SUM per user and jenis": "SELECT email, jenis, SUM(jumlah) FROM transactions GROUP BY email, jenis",
+    "SUM one user (indexed)": "SELECT jenis, SUM(jumlah) FROM transactions WHERE email = 'user00000@bench.local' GROUP BY jenis",
+    "SUM all": "SELECT SUM(jumlah) FROM transactions",
+}
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def _time_queries(path, repeat):
+    conn = sqlite3.connect(path)
+    try:
+        return {name: _median_ms(lambda: conn.execute(query).fetchall(), repeat) for name, query in QUERIES.items()}
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "money.db")
+    helpers.DB_PATH = path
+    storage.set_storage(storage.create_storage("sqlite"))
+    helpers.init_db(path, helpers.MIGRATIONS[:4])
+    conn = sqlite3.connect(path)
+    conn.executemany("""
+        INSERT INTO transactions (email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, synthetic.generate_rows(args.users, args.transactions))
+    conn.commit()
+    conn.close()
+
+    real = _time_queries(path, args.repeat)
+    start = time.perf_counter()
+    helpers.init_db()
+    migration_s = time.perf_counter() - start
+    integer = _time_queries(path, args.repeat)
+    checked = reconcile.reconcile()
+
+    rng = np.random.default_rng(42)
+    amounts = rng.integers(500, 5000000, args.transactions)
+    as_float = amounts.astype(np.float64)
+    jenis = pd.Categorical.from_codes(rng.integers(0, 5, args.transactions), list(synthetic.JENIS_PROFILE))
+    frame_int = pd.DataFrame({"Jenis": jenis, "Jumlah": amounts})
+    frame_float = frame_int.astype({"Jumlah": "float64"})
+    print(f"{args.transactions} transactions, {args.users} users; migration took {migration_s:.1f}s, "
+          f"{int(checked['ok'].sum())}/{len(checked)} users reconcile")
+    print(f"{'median ms':28}{'REAL':>10}{'INTEGER':>10}")
+    for name in QUERIES:
+        print(f"{name:28}{real[name]:>10.2f}{integer[name]:>10.2f}")
+    print(f"{'pandas groupby(Jenis).sum':28}"
+          f"{_median_ms(lambda: frame_float.groupby('Jenis', observed=True)['Jumlah'].sum(), args.repeat):>10.2f}"
+          f"{_median_ms(lambda: frame_int.groupby('Jenis', observed=True)['Jumlah'].sum(), args.repeat):>10.2f}")
+    print(f"{'numpy sum':28}{_median_ms(as_float.sum, args.repeat):>10.2f}{_median_ms(amounts.sum, args.repeat):>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+OCR accuracy and throughput harness for receipt extraction
+
+Renders synthetic receipts (benchmarks.receipts), runs them through the same
+stages as extract_financial_data_from_image (preprocess, OCR, parse) and
+reports field-level accuracy, receipts/sec and per-stage latency.
+
+Modes:
+    full    preprocess + Tesseract + parse; needs OpenCV, pytesseract and a
+            local tesseract binary (no network access is used)
+    parser  parse only, on the printed receipt text with simulated OCR
+            confusions; works without Tesseract
+    auto    full when Tesseract is installed, parser otherwise (default)
+
+Usage: python -m benchmarks.bench_ocr [--count 100] [--mode auto] [--distortion 1.0]
+"""
+import argparse
+import json
+import random
+import shutil
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.receipts import corpus, corrupt_text
+from utils.image_input import parse_receipt_text, preprocess_receipt_image, ocr_image
+
+FIELDS = ("total", "date", "store", "type", "items")
+
+def tesseract_available():
+    try:
+        import cv2  # noqa: F401
+        import pytesseract  # noqa: F401
+    except ImportError:
+        return False
+    return shutil.which("tesseract") is not None
+
+def score(parsed, truth, text):
+    """Per-field correctness of one extraction"""
+    transaction_type, amount, description, _, receipt_date = parsed
+    text_lower = text.lower()
+    found_items = sum(1 for name, _, _ in truth["items"] if name.lower() in text_lower)
+    return {
+        "total": amount == truth["total"],
+        "date": receipt_date == truth["date"],
+        "store": description == truth["store"].title(),
+        "type": transaction_type == "Pengeluaran",
+        "items": found_items / len(truth["items"]),
+    }
+
+def run(count, mode, distortion, seed):
+    rng = random.Random(seed)
+    stages = {"preprocess": [], "ocr": [], "parse": []}
+    scores = []
+
+    for image, truth in corpus(count, seed=seed, distortion=distortion):
+        if mode == "full":
+            bgr = np.stack([np.asarray(image)] * 3, axis=-1)
+            start = time.perf_counter()
+            thresh = preprocess_receipt_image(bgr)
+            stages["preprocess"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            text = ocr_image(thresh)
+            stages["ocr"].append(time.perf_counter() - start)
+        else:
+            text = corrupt_text(truth["text"], rng, 0.02 * distortion)
+
+        start = time.perf_counter()
+        parsed = parse_receipt_text(text)
+        stages["parse"].append(time.perf_counter() - start)
+        scores.append(score(parsed, truth, text))
+
+    total_time = sum(sum(timings) for timings in stages.values())
+    report = {
+        "mode": mode,
+        "receipts": count,
+        "distortion": distortion,
+        "receipts_per_sec": count / total_time if total_time else float("inf"),
+        "accuracy": {field: sum(s[field] for s in scores) / count for field in FIELDS},
+        "latency_ms": {},
+    }
+    for stage, timings in stages.items():
+        if timings:
+            ordered = sorted(timings)
+            report["latency_ms"][stage] = {
+                "median": statistics.median(ordered) * 1000,
+                "p95": ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000,
+            }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--mode", choices=["auto", "full", "parser"], default="auto")
+    parser.add_argument("--distortion", type=float, default=1.0, help="0 renders clean receipts")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="optional JSON report path")
+    args = parser.parse_args()
+
+    mode = args.mode
+    if mode == "auto":
+        mode = "full" if tesseract_available() else "parser"
+    elif mode == "full" and not tesseract_available():
+        parser.error("full mode needs OpenCV, pytesseract and the tesseract binary")
+
+    report = run(args.count, mode, args.distortion, args.seed)
+
+    print(f"mode={report['mode']} receipts={report['receipts']} distortion={report['distortion']}")
+    print(f"throughput: {report['receipts_per_sec']:.1f} receipts/sec")
+    print("accuracy:")
+    for field, value in report["accuracy"].items():
+        print(f"  {field:8} {value:6.1%}")
+    print("latency (ms):")
+    for stage, values in report["latency_ms"].items():
+        print(f"  {stage:10} median {values['median']:8.2f}  p95 {values['p95']:8.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Full-text search latency over the FTS5 index
+
+Fills a database with synthetic transactions (1,000,000 by default, see
+benchmarks.synthetic), then times helpers.search_transactions for prefix and
+diacritic queries on the heaviest user and on a typical one, against a pandas
+str.contains scan of the user's already loaded frame. The index column times
+the storage backend alone, without building the typed DataFrame. The FTS
+index is built by the insert triggers while the rows are generated.
+
+Usage: python -m benchmarks.bench_search [--transactions 1000000] [--users 200] [--repeat 50]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import synthetic
+from utils import helpers, storage
+
+QUERIES = ["kop", "kopi", "belanja bul", "gaji", "qris", "tabungan bank", "ojek onl", "tunai", "kafé", "xyz"]
+
+def _timings_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--db", default=None, help="reuse an existing database instead of generating one")
+    args = parser.parse_args()
+
+    if args.db:
+        helpers.DB_PATH = args.db
+        helpers.init_db()
+    else:
+        start = time.perf_counter()
+        synthetic.generate(os.path.join(tempfile.mkdtemp(), "search.db"), args.users, args.transactions)
+        print(f"generated {args.transactions} rows for {args.users} users in {time.perf_counter() - start:.1f}s")
+
+    conn = helpers.get_connection()
+    counts = conn.execute("SELECT email, COUNT(*) FROM transactions GROUP BY email ORDER BY 2 DESC").fetchall()
+    total = sum(count for _, count in counts)
+    conn.close()
+    users = [("heaviest", counts[0]), ("median", counts[len(counts) // 2])]
+    print(f"{total} transactions; heaviest user {counts[0][1]} rows, median user {counts[len(counts) // 2][1]} rows")
+
+    print(f"{'user':9} {'query':14} {'hits':>5} {'index':>8} {'fts p50':>8} {'fts p95':>8} {'page 5':>8} {'pandas':>8}  (ms)")
+    for label, (email, _) in users:
+        df = helpers.get_transactions(email)
+        for query in QUERIES:
+            hits, _ = helpers.search_transactions(email, query, page_size=20)
+            words = helpers.search_terms(query)
+            index, _ = _timings_ms(lambda: storage.get_storage().search_transactions(email, words), args.repeat)
+            p50, p95 = _timings_ms(lambda: helpers.search_transactions(email, query), args.repeat)
+            deep, _ = _timings_ms(lambda: helpers.search_transactions(email, query, page=5), args.repeat)
+            text = df["Item"].str.cat(df["Catatan"], sep=" ").str.lower()
+            scan, _ = _timings_ms(lambda: df[text.str.contains(words[0], regex=False)], 5)
+            print(f"{label:9} {query:14} {len(hits):5} {index:8.2f} {p50:8.2f} {p95:8.2f} {deep:8.2f} {scan:8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Write throughput of the sharded backend as shards are added
+
+For each shard count, concurrent writers (one user each) call
+helpers.save_transaction on a fresh database; every shard commits on its own
+writer thread. With --processes the writers are split over several server
+processes that compete for the same files, as several Streamlit workers
+would. Reports writes/sec, p50/p99 latency and how evenly the users spread
+over the shards.
+
+Usage: python -m benchmarks.bench_shards [--shards 1 2 4 8] [--writers 64] [--writes 50] [--processes 1]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from utils import helpers, storage
+from utils.storage.sharded import ShardedStorage
+
+def _write_users(workdir, shards, first, writers, writes, start_at):
+    """
+    One server process: a thread per user, each doing `writes` saves;
+    returns (latencies, first start, last finish)
+    """
+    helpers.DB_PATH = os.path.join(workdir, "keuangan.db")
+    storage.set_storage(ShardedStorage(shards, os.path.join(workdir, "shards")))
+
+    latencies, started, finished = [], [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(writers)
+
+    def writer(index):
+        email = f"user{index:05d}@bench.local"
+        local = []
+        barrier.wait()
+        # Processes start together so they really compete for the files
+        time.sleep(max(0.0, start_at - time.time()))
+        started.append(time.time())
+        for i in range(writes):
+            start = time.perf_counter()
+            helpers.save_transaction(email, "2025-12-31", "Pribadi", "Pengeluaran", "Kopi", 25000 + i, "")
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+            finished.append(time.time())
+
+    threads = [threading.Thread(target=writer, args=(first + i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, min(started), max(finished)
+
+def run(shards, writers, writes, processes=1):
+    workdir = tempfile.mkdtemp()
+    helpers.DB_PATH = os.path.join(workdir, "keuangan.db")
+    backend = ShardedStorage(shards, os.path.join(workdir, "shards"))
+    storage.set_storage(backend)
+    backend.init_schema()
+
+    per_process = writers // processes
+    # Leave the spawned processes time to import before the writers start
+    start_at = time.time() + (0.1 if processes == 1 else 5.0)
+    jobs = [(workdir, shards, p * per_process, per_process, writes, start_at) for p in range(processes)]
+    if processes == 1:
+        results = [_write_users(*jobs[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            results = pool.starmap(_write_users, jobs)
+    latencies = [value for result in results for value in result[0]]
+    elapsed = max(result[2] for result in results) - min(result[1] for result in results)
+
+    stats = backend.shard_stats()
+    latencies.sort()
+    return {
+        "shards": shards,
+        "writes_per_sec": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "users_min": int(stats["users"].min()),
+        "users_max": int(stats["users"].max()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--writes", type=int, default=50, help="writes per writer")
+    parser.add_argument("--processes", type=int, default=1, help="server processes sharing the writers")
+    args = parser.parse_args()
+
+    print(f"writers={args.writers} writes/writer={args.writes} processes={args.processes}")
+    print(f"{'shards':>6}{'writes/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'users/shard':>14}")
+    for shards in args.shards:
+        result = run(shards, args.writers, args.writes, args.processes)
+        print(f"{result['shards']:>6}{result['writes_per_sec']:>10.0f}{result['p50']:>9.1f}{result['p99']:>9.1f}"
+              f"{result['users_min']:>8}-{result['users_max']}")
+
+if __name__ == "__main__":
+    main()
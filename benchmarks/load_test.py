@@ -0,0 +1,115 @@
+"""
+Concurrent sessions load test for the SQLite write path
+
+Simulates N sessions (threads) that each alternate save_transaction and
+get_transactions for their own user against one database, and reports
+p50/p99 latency, throughput and errors.
+
+Modes:
+    queue   the application path: writes go through the single-writer queue
+            with group commit, reads retry on SQLITE_BUSY
+    direct  the previous behaviour: every write opens its own connection and
+            commits, reads are not retried
+
+Usage: python -m benchmarks.load_test [--sessions 200] [--ops 20] [--mode queue]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from benchmarks import synthetic
+from utils import helpers, storage
+
+def _direct_save(email):
+    conn = sqlite3.connect(helpers.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO transactions (email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (email, "2025-12-31", "Pribadi", "Pengeluaran", "Kopi", 25000, ""))
+    conn.commit()
+    conn.close()
+
+def _direct_read(email):
+    conn = sqlite3.connect(helpers.DB_PATH)
+    try:
+        return pd.read_sql_query("SELECT tanggal, jenis, item, jumlah, catatan FROM transactions WHERE email = ?", conn, params=(email,))
+    finally:
+        conn.close()
+
+def _queue_save(email):
+    helpers.save_transaction(email, "2025-12-31", "Pribadi", "Pengeluaran", "Kopi", 25000, "")
+
+def _queue_read(email):
+    # Call the backend directly: helpers.get_transactions hides errors behind an empty frame
+    return storage.get_storage().get_transactions(email)
+
+def _percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=20, help="write+read pairs per session")
+    parser.add_argument("--mode", choices=["queue", "direct"], default="queue")
+    parser.add_argument("--seed-transactions", type=int, default=50000)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "load.db")
+    counts = synthetic.generate(db_path, args.sessions, args.seed_transactions)
+    emails = sorted(counts)
+    save, read = (_queue_save, _queue_read) if args.mode == "queue" else (_direct_save, _direct_read)
+
+    latencies = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.sessions)
+
+    def session(email):
+        local = {"write": [], "read": []}
+        local_errors = {"write": 0, "read": 0}
+        barrier.wait()
+        for _ in range(args.ops):
+            for kind, fn in (("write", save), ("read", read)):
+                start = time.perf_counter()
+                try:
+                    fn(email)
+                    local[kind].append((time.perf_counter() - start) * 1000)
+                except sqlite3.Error:
+                    local_errors[kind] += 1
+                except Exception as e:
+                    if "locked" not in str(e):
+                        raise
+                    local_errors[kind] += 1
+        with lock:
+            for kind in latencies:
+                latencies[kind].extend(local[kind])
+                errors[kind] += local_errors[kind]
+
+    threads = [threading.Thread(target=session, args=(emails[i % len(emails)],)) for i in range(args.sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"mode={args.mode} sessions={args.sessions} ops/session={args.ops} elapsed={elapsed:.2f}s")
+    print(f"{'':6}{'ok':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'ops/s':>10}")
+    for kind in ("write", "read"):
+        values = latencies[kind]
+        mean = statistics.mean(values) if values else float("nan")
+        print(f"{kind:6}{len(values):>8}{errors[kind]:>8}{_percentile(values, 0.5):>10.1f}"
+              f"{_percentile(values, 0.99):>10.1f}{mean:>10.1f}{len(values) / elapsed:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Deterministic synthetic data for Keuangan-Pintar benchmarks
+
+Fills a database with N users and M transactions. Activity per user follows a
+Pareto distribution (a few heavy users, many light ones), jenis and amounts
+follow per-jenis weights and log-normal amounts rounded to Rp500, and dates
+are spread over the `days` before a fixed end date. The same seed always
+produces the same rows.
+
+Usage: python -m benchmarks.synthetic --users 50 --transactions 100000 --db database/benchmark.db
+"""
+import argparse
+import datetime
+import math
+import random
+import sqlite3
+
+from utils import helpers
+
+DEFAULT_END_DATE = datetime.date(2025, 12, 31)
+CHUNK_SIZE = 10000
+
+KATEGORI_PENGGUNA = ["Keluarga", "Pribadi", "Siswa/Mahasiswa", "Pedagang", "UMKM", "Pengusaha", "Pebisnis"]
+
+# jenis: (weight, median amount in rupiah, log-normal sigma, items)
+JENIS_PROFILE = {
+    "Pengeluaran": (0.70, 50000, 1.0, [
+        "Makan siang", "Kopi", "Belanja bulanan", "Bensin", "Pulsa", "Listrik", "Air PDAM",
+        "Ojek online", "Sewa kos", "Laundry", "Obat", "Internet", "Parkir", "Jajan",
+    ]),
+    "Pemasukan": (0.12, 3500000, 0.6, ["Gaji", "Bonus", "Penjualan", "Transfer masuk", "Honor", "Komisi"]),
+    "Tabungan": (0.10, 500000, 0.7, ["Tabungan bank", "Deposito", "Reksa dana", "Emas"]),
+    "Hutang": (0.05, 1000000, 0.8, ["Cicilan motor", "Pinjaman teman", "Kartu kredit", "Paylater"]),
+    "Lainnya": (0.03, 100000, 1.0, ["Sumbangan", "Arisan", "Hadiah", "Lain-lain"]),
+}
+CATATAN = ["", "", "", "", "", "", "", "Tunai", "Transfer", "QRIS", "Dibayar bersama"]
+
+def _user_email(index):
+    return f"user{index:05d}@bench.local"
+
+def _transaction_counts(rng, users, transactions):
+    """Split the transaction total across users with Pareto-distributed weights"""
+    weights = [rng.paretovariate(1.2) for _ in range(users)]
+    total = sum(weights)
+    counts = [int(transactions * w / total) for w in weights]
+    # Hand out the rounding remainder to the heaviest users
+    order = sorted(range(users), key=lambda i: -weights[i])
+    for i in range(transactions - sum(counts)):
+        counts[order[i % users]] += 1
+    return counts
+
+def generate_rows(users, transactions, seed=42, days=730, end_date=DEFAULT_END_DATE):
+    """
+    Yield (email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan) tuples
+    """
+    rng = random.Random(seed)
+    jenis_names = list(JENIS_PROFILE)
+    jenis_weights = [JENIS_PROFILE[name][0] for name in jenis_names]
+
+    for index, count in enumerate(_transaction_counts(rng, users, transactions)):
+        email = _user_email(index)
+        kategori = rng.choice(KATEGORI_PENGGUNA)
+        jenis_column = rng.choices(jenis_names, weights=jenis_weights, k=count)
+        for jenis in jenis_column:
+            _, median, sigma, items = JENIS_PROFILE[jenis]
+            jumlah = max(500, round(rng.lognormvariate(math.log(median), sigma) / 500) * 500)
+            tanggal = end_date - datetime.timedelta(days=rng.randrange(days))
+            yield (email, str(tanggal), kategori, jenis, rng.choice(items), jumlah, rng.choice(CATATAN))
+
+def generate(db_path, users, transactions, seed=42, days=730, end_date=DEFAULT_END_DATE):
+    """
+    Fill db_path with synthetic users and transactions and point utils.helpers at it;
+    return {email: transaction count}
+    """
+    helpers.DB_PATH = db_path
+    helpers.init_db()
+
+    conn = sqlite3.connect(db_path)
+    password_hash = helpers.hash_password("password")
+    rng = random.Random(seed)
+    conn.executemany("""
+        INSERT OR IGNORE INTO users (nama, email, password_hash, kategori_pengguna)
+        VALUES (?, ?, ?, ?)
+    """, [
+        (f"Pengguna {index}", _user_email(index), password_hash, rng.choice(KATEGORI_PENGGUNA))
+        for index in range(users)
+    ])
+
+    counts = {}
+    chunk = []
+    for row in generate_rows(users, transactions, seed, days, end_date):
+        counts[row[0]] = counts.get(row[0], 0) + 1
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            _insert(conn, chunk)
+            chunk = []
+    if chunk:
+        _insert(conn, chunk)
+
+    conn.executemany("""
+        INSERT INTO data_versions (email, version) VALUES (?, 1)
+        ON CONFLICT(email) DO UPDATE SET version = version + 1
+    """, [(email,) for email in counts])
+    conn.commit()
+    conn.close()
+    return counts
+
+def _insert(conn, rows):
+    conn.executemany("""
+        INSERT INTO transactions (email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="database/benchmark.db")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=730)
+    args = parser.parse_args()
+
+    counts = generate(args.db, args.users, args.transactions, args.seed, args.days)
+    heaviest = max(counts, key=counts.get)
+    print(f"{sum(counts.values())} transactions for {len(counts)} users written to {args.db}")
+    print(f"heaviest user: {heaviest} ({counts[heaviest]} transactions)")
+
+if __name__ == "__main__":
+    main()
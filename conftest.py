@@ -0,0 +1,66 @@
+import os
+import uuid
+
+import pytest
+
+from utils import helpers, ledgers, session, storage
+
+
+def _use_backend(backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_storage", backend)
+    monkeypatch.setattr(session, "SECRET_FILE", str(tmp_path / ".session_secret"))
+    monkeypatch.setattr(session, "_secret", None)
+    session.clear_session_cache()
+    ledgers.forget_ledgers()
+    backend.init_schema()
+    helpers.create_user("Budi", "budi@example.com", "rahasia", "Pribadi")
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point the database layer at a throwaway SQLite file"""
+    monkeypatch.setattr(helpers, "DB_PATH", str(tmp_path / "keuangan.db"))
+    _use_backend(storage.create_storage("sqlite"), tmp_path, monkeypatch)
+    yield helpers.DB_PATH
+    session.clear_session_cache()
+    helpers.close_read_connections()
+
+
+@pytest.fixture
+def sharded_db(tmp_path, monkeypatch):
+    """Throwaway main database plus three shard files"""
+    monkeypatch.setattr(helpers, "DB_PATH", str(tmp_path / "keuangan.db"))
+    backend = storage.create_storage("sharded", shards=3, shard_dir=str(tmp_path / "shards"))
+    _use_backend(backend, tmp_path, monkeypatch)
+    yield backend
+    session.clear_session_cache()
+    helpers.close_read_connections()
+
+
+@pytest.fixture(params=["sqlite", "sharded", "postgres"])
+def backend_db(request, tmp_path, monkeypatch):
+    """
+    Run a test once per storage backend, each with Budi registered; postgres
+    runs in a throwaway schema of TEST_DATABASE_URL and is skipped without it
+    """
+    if request.param == "sqlite":
+        yield request.getfixturevalue("temp_db")
+        return
+    if request.param == "sharded":
+        yield request.getfixturevalue("sharded_db")
+        return
+
+    dsn = os.getenv("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("set TEST_DATABASE_URL to run the shared suite against PostgreSQL")
+    pytest.importorskip("psycopg_pool")
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    backend = storage.create_storage("postgres", dsn=dsn, max_size=4, schema=schema)
+    _use_backend(backend, tmp_path, monkeypatch)
+    yield dsn
+    session.clear_session_cache()
+    backend.close()
+    import psycopg
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(f'DROP SCHEMA "{schema}" CASCADE')
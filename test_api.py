@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Test script for the headless JSON API
+"""
+import asyncio
+import json
+
+import pytest
+
+import api
+from utils import categories, export, helpers, ledgers, session
+
+EMAIL = "budi@example.com"
+
+
+async def _call(method, path, body=None, token=None, query=""):
+    """Drive the ASGI app directly; returns (status, headers, body bytes)"""
+    headers = [(b"content-type", b"application/json")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": headers, "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+    }
+    requests = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()  # The client stays connected until the response is complete
+
+    async def send(message):
+        sent.append(message)
+
+    await api.app(scope, receive, send)
+    start = next(message for message in sent if message["type"] == "http.response.start")
+    content = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), content
+
+
+def call(*args, **kwargs):
+    status, _, content = asyncio.run(_call(*args, **kwargs))
+    return status, json.loads(content) if content else None
+
+
+def _login():
+    status, body = call("POST", "/api/v1/sessions", {"email": EMAIL, "password": "rahasia"})
+    assert status == 201
+    return body["token"]
+
+
+def test_login_is_required(temp_db):
+    assert call("POST", "/api/v1/sessions", {"email": EMAIL, "password": "salah"})[0] == 401
+    assert call("GET", "/api/v1/summary")[0] == 401
+    assert call("GET", "/api/v1/summary", token="palsu.token")[0] == 401
+
+    token = _login()
+    assert call("GET", "/api/v1/summary", token=token)[0] == 200
+    assert call("DELETE", "/api/v1/sessions", token=token)[0] == 204
+    assert call("GET", "/api/v1/summary", token=token)[0] == 401
+
+
+def test_transaction_crud_and_keyset_listing(temp_db):
+    token = _login()
+    ids = [
+        call("POST", "/api/v1/transactions", {"Tanggal": f"2024-03-0{day}", "Jenis": "Pengeluaran", "Item": "Kopi", "Jumlah": day * 1000}, token)[1]["id"]
+        for day in (1, 2, 2, 3)
+    ]
+
+    pages, after = [], None
+    while True:
+        status, body = call("GET", "/api/v1/transactions", token=token, query=f"limit=3&after={after}" if after else "limit=3")
+        assert status == 200
+        pages.append([row["id"] for row in body["transactions"]])
+        after = body["next"]
+        if after is None:
+            break
+    assert pages == [[ids[3], ids[2], ids[1]], [ids[0]]]
+
+    assert call("PATCH", f"/api/v1/transactions/{ids[0]}", {"Jumlah": 1500, "Catatan": "diskon"}, token)[0] == 204
+    assert call("DELETE", f"/api/v1/transactions/{ids[1]}", token=token)[0] == 204
+    assert call("DELETE", f"/api/v1/transactions/{ids[1]}", token=token)[0] == 404
+    assert call("PATCH", f"/api/v1/transactions/{ids[0]}", {"Jenis": "Kopi"}, token)[0] == 400
+    df = helpers.get_transactions(EMAIL, ["id", "Jumlah", "Catatan"])
+    assert df.values.tolist() == [[ids[0], 1500, "diskon"], [ids[2], 2000, ""], [ids[3], 3000, ""]]
+
+    # Other users' rows are out of reach
+    helpers.create_user("Siti", "siti@example.com", "rahasia", "Pribadi")
+    status, body = call("POST", "/api/v1/sessions", {"email": "siti@example.com", "password": "rahasia"})
+    assert call("DELETE", f"/api/v1/transactions/{ids[0]}", token=body["token"])[0] == 404
+    assert call("GET", "/api/v1/transactions", token=body["token"])[1] == {"transactions": [], "next": None}
+
+
+def test_concurrent_ingests_are_written_as_one_batch(temp_db, monkeypatch):
+    token = _login()
+    calls = []
+    apply = helpers.apply_transaction_changes
+    monkeypatch.setattr(helpers, "apply_transaction_changes", lambda email, inserts=(), **kwargs: calls.append(len(inserts)) or apply(email, inserts, **kwargs))
+    rows = [{"Tanggal": "2024-03-01", "Jenis": "Pemasukan", "Item": f"Penjualan {i}", "Jumlah": 1000} for i in range(20)]
+    rows[7]["Jenis"] = "Kopi"
+
+    async def ingest():
+        return await asyncio.gather(*(_call("POST", "/api/v1/transactions", row, token) for row in rows))
+
+    statuses = [status for status, _, _ in asyncio.run(ingest())]
+    assert statuses == [201] * 7 + [400] + [201] * 12
+    # The invalid row failed the batch, which was then written row by row
+    assert calls[0] == 20 and calls[1:] == [1] * 20
+    assert helpers.get_summary(EMAIL)["pemasukan"] == 19000
+    assert helpers.get_data_version(EMAIL) == 19
+
+    calls.clear()
+    del rows[7]
+    asyncio.run(ingest())
+    assert calls == [19]
+
+
+def test_a_bad_row_fails_only_its_own_ingest(temp_db, monkeypatch):
+    token = _login()
+    rows = [{"Tanggal": "2024-03-01", "Jenis": "Pemasukan", "Item": "Penjualan", "Jumlah": 1000} for _ in range(4)]
+    rows[1]["Item"] = ["x"]
+    rows[2]["Jumlah"] = 1e300
+
+    async def ingest():
+        return await asyncio.gather(*(_call("POST", "/api/v1/transactions", row, token) for row in rows))
+
+    assert [status for status, _, _ in asyncio.run(ingest())] == [201, 400, 400, 201]
+    assert helpers.get_summary(EMAIL)["pemasukan"] == 2000
+
+    # Errors the validation does not catch also fall back to row by row
+    apply = helpers.apply_transaction_changes
+
+    def failing(email, inserts=(), **kwargs):
+        if len(inserts) > 1:
+            raise OverflowError("Python int too large to convert to SQLite INTEGER")
+        return apply(email, inserts, **kwargs)
+
+    monkeypatch.setattr(helpers, "apply_transaction_changes", failing)
+    rows = [{"Tanggal": "2024-03-01", "Jenis": "Pemasukan", "Item": "Penjualan", "Jumlah": 1000}] * 3
+    assert [status for status, _, _ in asyncio.run(ingest())] == [201] * 3
+    assert helpers.get_summary(EMAIL)["pemasukan"] == 5000
+
+
+def test_bulk_ingest_summary_and_export(temp_db):
+    token = _login()
+    rows = [
+        {"Tanggal": "2024-01-25", "Jenis": "Pemasukan", "Item": "Gaji", "Jumlah": 5000000},
+        {"Tanggal": "2024-02-01", "Jenis": "Pengeluaran", "Item": "Sewa kos", "Jumlah": 1500000, "Kategori": "Tempat Tinggal"},
+        {"Tanggal": "2024-02-03", "Jenis": "Pengeluaran", "Item": "Kopi", "Jumlah": 25000, "Catatan": "QRIS"},
+    ]
+    status, body = call("POST", "/api/v1/transactions/bulk", {"transactions": rows}, token)
+    assert status == 201 and body["inserted"] == 3 and len(body["ids"]) == 3
+    assert call("POST", "/api/v1/transactions/bulk", {"transactions": [{"Jenis": "Pemasukan"}]}, token)[0] == 400
+
+    assert call("GET", "/api/v1/summary", token=token)[1] == helpers.get_summary(EMAIL)
+    status, body = call("GET", "/api/v1/summary", token=token, query="start=2024-02-01&end=2024-02-29")
+    assert body == {"pemasukan": 0, "pengeluaran": 1525000, "tabungan": 0, "saldo": -1525000}
+    assert call("GET", "/api/v1/summary", token=token, query="start=Februari")[0] == 400
+
+    status, headers, content = asyncio.run(_call("GET", "/api/v1/export.csv", token=token))
+    assert status == 200 and headers[b"content-type"].startswith(b"text/csv")
+    assert content.decode().splitlines() == [
+        "Tanggal,Jenis,Item,Jumlah,Catatan",
+        "2024-02-03,Pengeluaran,Kopi,25000,QRIS",
+        "2024-02-01,Pengeluaran,Sewa kos,1500000,",
+        "2024-01-25,Pemasukan,Gaji,5000000,",
+    ]
+    # One chunk per keyset page, the header only in the first
+    assert b"".join(export.iter_csv(EMAIL, page_size=2)) == content
+    assert len(list(export.iter_csv(EMAIL, page_size=2))) == 2
+    # Sewa kos came with a Kategori, so the user's model is retrained
+    assert categories.wait_for_retrains(10)
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=abc", "after=2024-01-01", "after=kemarin_3"])
+def test_invalid_listing_parameters(temp_db, query):
+    assert call("GET", "/api/v1/transactions", token=_login(), query=query)[0] == 400
+
+
+def test_ledger_parameter(temp_db):
+    helpers.create_user("Siti", "siti@example.com", "rahasia", "Keluarga")
+    ledger = ledgers.create_ledger(EMAIL, "Keuangan Keluarga")
+    token = _login()
+    siti = call("POST", "/api/v1/sessions", {"email": "siti@example.com", "password": "rahasia"})[1]["token"]
+    row = {"Tanggal": "2024-03-01", "Jenis": "Pengeluaran", "Item": "Belanja", "Jumlah": 750000}
+
+    assert call("POST", "/api/v1/transactions", row, token, query=f"ledger={ledger}")[0] == 201
+    assert helpers.get_summary(ledgers.book_key(ledger))["pengeluaran"] == 750000
+    assert helpers.get_summary(EMAIL)["pengeluaran"] == 0
+    # Non-members cannot see the ledger, pembaca cannot write to it
+    assert call("GET", "/api/v1/summary", token=siti, query=f"ledger={ledger}")[0] == 404
+    ledgers.set_member(EMAIL, ledger, "siti@example.com", "pembaca")
+    assert call("GET", "/api/v1/summary", token=siti, query=f"ledger={ledger}")[1]["pengeluaran"] == 750000
+    assert call("POST", "/api/v1/transactions", row, siti, query=f"ledger={ledger}")[0] == 403
+    assert call("GET", "/api/v1/summary", token=token, query="ledger=buku")[0] == 400
+
+
+def test_ledger_key_is_no_own_book(temp_db):
+    ledger = ledgers.create_ledger(EMAIL, "Keuangan Keluarga")
+    book = ledgers.book_key(ledger)
+    helpers.save_transaction(book, "2024-03-01", "Keluarga", "Pengeluaran", "Belanja", 750000, "")
+    assert call("POST", "/api/v1/sessions", {"email": book, "password": "rahasia"})[0] == 401
+
+    # An account under the key, registered before such emails were refused, reads nothing
+    helpers.run_write(lambda cursor: cursor.execute(
+        "INSERT INTO users (nama, email, password_hash, kategori_pengguna) VALUES (?, ?, ?, ?)",
+        ("Mallory", book, helpers.hash_password("rahasia"), "Pribadi"),
+    ))
+    token = session.create_session(book)
+    assert call("GET", "/api/v1/summary", token=token)[0] == 404
+    assert call("GET", "/api/v1/transactions", token=token)[0] == 404
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for archiving closed years
+"""
+import datetime
+import sqlite3
+import time
+
+import pytest
+
+from utils import archive, helpers, storage
+from utils.storage.sharded import ShardedStorage, rebalance
+
+EMAIL = "budi@example.com"
+TODAY = datetime.date(2026, 3, 1)
+
+ROWS = [
+    ("2024-02-10", "Pemasukan", "Gaji", 5000000),
+    ("2024-12-31", "Pengeluaran", "Kopi Tahun Baru", 30000),
+    ("2025-06-15", "Pengeluaran", "Kopi", 25000),
+    ("2026-01-05", "Pengeluaran", "Kopi", 27000),
+    ("2026-02-20", "Pemasukan", "Gaji", 5500000),
+]
+
+
+def _fill():
+    for tanggal, jenis, item, jumlah in ROWS:
+        helpers.save_transaction(EMAIL, tanggal, "Pribadi", jenis, item, jumlah, "")
+
+
+def _live_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT tanggal FROM transactions ORDER BY tanggal")]
+    finally:
+        conn.close()
+
+
+def test_closed_years_move_out_of_the_live_table(temp_db):
+    _fill()
+    version = helpers.get_data_version(EMAIL)
+    before = helpers.get_transactions(EMAIL, ["id"] + storage.TRANSACTION_COLUMNS)
+    totals = [helpers.get_summary(EMAIL), helpers.get_summary(EMAIL, "2024-01-01", "2024-12-31"),
+              helpers.get_summary(EMAIL, "2024-12-15", "2026-01-10")]
+
+    assert archive.archive(today=TODAY) == {"2024": 2, "2025": 1}
+    assert _live_rows(temp_db) == ["2026-01-05", "2026-02-20"]
+    assert archive.transaction_years(EMAIL) == [("2026", False), ("2025", True), ("2024", True)]
+
+    # Reads see the same transactions, totals and version as before
+    assert helpers.get_transactions(EMAIL, ["id"] + storage.TRANSACTION_COLUMNS).equals(before)
+    assert [helpers.get_summary(EMAIL), helpers.get_summary(EMAIL, "2024-01-01", "2024-12-31"),
+            helpers.get_summary(EMAIL, "2024-12-15", "2026-01-10")] == totals
+    assert helpers.get_data_version(EMAIL) == version
+    assert helpers.get_transactions(EMAIL, ["Item"], "2025-01-01", "2025-12-31")["Item"].tolist() == ["Kopi"]
+    assert storage.get_storage().count_transactions(EMAIL) == 5
+
+    # Search and newest-first pages continue into the archives
+    assert helpers.search_transactions(EMAIL, "kopi")[0]["Tanggal"].dt.year.tolist() == [2026, 2025, 2024]
+    page, after = helpers.get_recent_transactions(EMAIL, 3)
+    assert page["Tanggal"].dt.year.tolist() == [2026, 2026, 2025]
+    page, after = helpers.get_recent_transactions(EMAIL, 3, after)
+    assert page["Item"].tolist() == ["Kopi Tahun Baru", "Gaji"] and after is None
+
+    # Archived rows are read-only; running again moves nothing
+    archived_id = int(before["id"].iloc[0])
+    assert not helpers.update_transaction(EMAIL, archived_id, Jumlah=1)
+    assert archive.archive(today=TODAY) == {}
+
+
+def test_reads_only_reach_the_archives_they_need(temp_db):
+    _fill()
+    archive.archive(today=TODAY)
+    # With the archive tables gone, reads that need them fail and the others do not notice
+    conn = sqlite3.connect(temp_db)
+    conn.execute("ALTER TABLE transactions_2024 RENAME TO hidden_2024")
+    conn.execute("ALTER TABLE transactions_2025 RENAME TO hidden_2025")
+    conn.commit()
+    conn.close()
+
+    assert len(helpers.get_transactions(EMAIL, start="2026-01-01", end="2026-12-31")) == 2
+    assert helpers.get_recent_transactions(EMAIL, 2)[0]["Item"].tolist() == ["Gaji", "Kopi"]
+    assert helpers.get_summary(EMAIL, "2024-01-01", "2024-12-31")["pemasukan"] == 5000000
+    assert helpers.get_summary(EMAIL, "2026-01-02", "2026-02-27")["saldo"] == 5473000
+    with pytest.raises(sqlite3.OperationalError):
+        storage.get_storage().get_transactions(EMAIL, start="2025-01-01")
+
+
+def test_archived_rows_keep_budgets_and_labels(temp_db):
+    _fill()
+    helpers.save_transaction(EMAIL, "2025-03-01", "Pribadi", "Pengeluaran", "Bensin", 40000, "", "Transportasi")
+    archive.archive(today=TODAY)
+
+    # A new item budget counts archived months too; labelled rows still train the classifier
+    budget = storage.get_storage().set_budget(EMAIL, "item", "Kopi", 20000)
+    assert storage.get_storage().get_budgets(EMAIL, "2025-06")["terpakai"].tolist() == [25000]
+    assert budget in storage.get_storage().budget_alerts(EMAIL, "2025-06")["id"].tolist()
+    rows = storage.get_storage().get_category_rows(EMAIL)
+    assert rows.loc[rows["Label"] == 1, "Item"].tolist() == ["Bensin"]
+    assert len(rows) == 3  # the labelled archived row and the live ones
+
+
+def test_open_years_are_not_archived(temp_db):
+    _fill()
+    # Within the grace period, last year is still open
+    assert archive.first_open_year(datetime.date(2026, 1, 15)) == 2025
+    assert archive.archive(today=datetime.date(2026, 1, 15)) == {"2024": 2}
+    with pytest.raises(ValueError, match="belum ditutup"):
+        archive.archive(before=2026, today=datetime.date(2026, 1, 15))
+
+
+def test_sharded_archives_survive_a_rebalance(sharded_db):
+    emails = [f"user{i}@example.com" for i in range(20)]
+    for email in emails:
+        helpers.save_transaction(email, "2024-05-01", "Pribadi", "Pengeluaran", "Kopi", 1000, "")
+        helpers.save_transaction(email, "2026-01-01", "Pribadi", "Pengeluaran", "Roti", 2000, "")
+    assert archive.archive(today=TODAY) == {"2024": 20}
+    assert sharded_db.archived_years()["rows"].tolist() == [20]
+
+    grown = ShardedStorage(shards=5, shard_dir=sharded_db.shard_dir)
+    storage.set_storage(grown)
+    moves = rebalance(grown)
+    assert moves and all(rows == 2 for _, _, _, rows in moves)
+    for email in emails:
+        assert helpers.get_transactions(email, ["Item"])["Item"].tolist() == ["Kopi", "Roti"]
+        assert helpers.get_summary(email)["pengeluaran"] == 3000
+        assert helpers.search_transactions(email, "kopi")[0]["Item"].tolist() == ["Kopi"]
+    assert grown.archived_years()["rows"].tolist() == [20 - len(moves)]
+
+
+def test_scheduler_archives_closed_years(temp_db):
+    helpers.save_transaction(EMAIL, "2001-01-01", "Pribadi", "Pemasukan", "Gaji", 1000, "")
+    archive.start_scheduler(interval=60)
+    try:
+        deadline = time.time() + 10
+        while _live_rows(temp_db) and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        archive.stop_scheduler()
+    assert _live_rows(temp_db) == []
+    assert archive.transaction_years(EMAIL) == [("2001", True)]
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test script for online backups and point-in-time restore
+"""
+import datetime
+import gzip
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from utils import backup, helpers
+
+EMAIL = "budi@example.com"
+
+
+def _save(item, jumlah=1000):
+    helpers.save_transaction(EMAIL, "2024-03-01", "Pribadi", "Pengeluaran", item, jumlah, "")
+
+
+def _items(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT item FROM transactions WHERE deleted_at IS NULL ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_snapshot_verify_and_restore(temp_db, tmp_path):
+    root = str(tmp_path / "backups")
+    _save("Kopi")
+    name = backup.snapshot(root=root)
+    _save("Roti")
+
+    assert [manifest["name"] for manifest in backup.list_snapshots(root)] == [name]
+    assert backup.verify(root=root) == []
+    restored = backup.restore(str(tmp_path / "restored"), root=root)
+    assert restored == [str(tmp_path / "restored" / "keuangan.db")]
+    assert _items(restored[0]) == ["Kopi"]
+    with pytest.raises(ValueError, match="already exists"):
+        backup.restore(str(tmp_path / "restored"), root=root)
+
+    # A damaged copy is caught by its checksum
+    with gzip.open(os.path.join(root, "snapshots", name, "keuangan.db.gz"), "wb") as f:
+        f.write(b"bukan database")
+    assert backup.verify(name, root) == ["keuangan.db: checksum mismatch"]
+
+
+def test_snapshot_is_consistent_while_writing(temp_db, tmp_path, monkeypatch):
+    # One page per step: the copy spans many commits of the writer below
+    monkeypatch.setattr(backup, "STEP_PAGES", 1)
+    monkeypatch.setattr(backup, "STEP_SLEEP", 0)
+    for i in range(200):
+        _save(f"Awal {i}")
+    stop = threading.Event()
+
+    def write():
+        while not stop.is_set():
+            _save("Kopi")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        backup.snapshot(root=str(tmp_path / "backups"))
+    finally:
+        stop.set()
+        writer.join()
+
+    path = backup.restore(str(tmp_path / "restored"), root=str(tmp_path / "backups"))[0]
+    conn = sqlite3.connect(path)
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        version = conn.execute("SELECT version FROM data_versions WHERE email = ?", (EMAIL,)).fetchone()[0]
+    finally:
+        conn.close()
+    # Every save bumps the data version once: both come from the same moment
+    assert count == version >= 200
+
+
+def test_point_in_time_restore(temp_db, tmp_path, monkeypatch):
+    root = str(tmp_path / "backups")
+    # Checkpoint on every run, so the WAL restarts between the archived commits
+    monkeypatch.setattr(backup, "WAL_RESTART_BYTES", 0)
+    _save("Sebelum")
+    archive = backup.WalArchive(root=root)
+    try:
+        name = backup.snapshot(archive, root)
+        _save("Kopi")
+        archive.poll()
+        _save("Roti")
+        archive.poll()
+        after_roti = datetime.datetime.now(datetime.timezone.utc)
+        time.sleep(0.01)
+        for i in range(50):
+            _save(f"Makan {i}", 25000)
+        helpers.delete_transactions(EMAIL, helpers.get_transactions(EMAIL, ["id"])["id"][:1].tolist())
+        archive.poll()
+    finally:
+        archive.close()
+
+    restored = backup.restore(str(tmp_path / "roti"), until=after_roti, root=root)[0]
+    assert _items(restored) == ["Sebelum", "Kopi", "Roti"]
+    latest = backup.restore(str(tmp_path / "latest"), until=datetime.datetime.now(datetime.timezone.utc), root=root)[0]
+    assert _items(latest) == _items(temp_db)
+    assert _items(backup.restore(str(tmp_path / "base"), name, root=root)[0]) == ["Sebelum"]
+
+    # Without the segments after the snapshot the restore cannot go on
+    for path, seq, _ in backup._segments(root, archive.generation, "keuangan.db"):
+        if seq == 1:
+            os.remove(path)
+    with pytest.raises(ValueError, match="segment 1 is missing"):
+        backup.restore(str(tmp_path / "gap"), until=datetime.datetime.now(datetime.timezone.utc), root=root)
+
+
+def test_retention(temp_db, tmp_path):
+    root = str(tmp_path / "backups")
+    archive = backup.WalArchive(root=root)
+    try:
+        names = []
+        for item in ("Kopi", "Roti", "Susu"):
+            _save(item)
+            names.append(backup.snapshot(archive, root))
+        backup.prune(keep=2, root=root, current_generation=archive.generation)
+    finally:
+        archive.close()
+
+    assert [manifest["name"] for manifest in backup.list_snapshots(root)] == names[1:]
+    # Segments only the deleted snapshot replayed are gone
+    kept = backup.list_snapshots(root)[0]["wal"]["start"]["keuangan.db"]
+    assert [seq for _, seq, _ in backup._segments(root, archive.generation, "keuangan.db")] == list(range(kept, 3))
+
+
+def test_sharded_snapshot(sharded_db, tmp_path):
+    root = str(tmp_path / "backups")
+    _save("Kopi")
+    name = backup.snapshot(root=root)
+    files = backup.list_snapshots(root)[0]["files"]
+    assert list(files)[0] == "keuangan.db" and len(files) == 4
+    assert backup.verify(name, root) == []
+    restored = backup.restore(str(tmp_path / "restored"), root=root)
+    shard = os.path.relpath(sharded_db.transactions_path(EMAIL), os.path.dirname(helpers.DB_PATH))
+    assert _items(str(tmp_path / "restored" / shard)) == ["Kopi"] and len(restored) == 4
+
+
+def test_scheduler_archives_in_one_process(temp_db, tmp_path, monkeypatch):
+    root = str(tmp_path / "backups")
+    monkeypatch.setattr(backup, "BACKUP_DIR", root)
+    monkeypatch.setattr(backup, "WAL_ARCHIVE", True)
+    monkeypatch.setattr(backup, "WAL_INTERVAL", 0.05)
+    backup.start_scheduler()
+    try:
+        deadline = time.time() + 10
+        while not backup.list_snapshots(root) and time.time() < deadline:
+            time.sleep(0.05)
+        # Another process finds the scheduler taken
+        assert backup._lock(root) is None
+        _save("Kopi")
+        time.sleep(0.3)
+    finally:
+        backup.stop_scheduler()
+
+    assert len(backup.list_snapshots(root)) == 1
+    restored = backup.restore(str(tmp_path / "restored"), until=datetime.datetime.now(datetime.timezone.utc), root=root)
+    assert _items(restored[0]) == ["Kopi"]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for monthly budgets and their alerts
+"""
+import pytest
+
+from utils import budgets, helpers
+
+EMAIL = "budi@example.com"
+
+
+def _spend(tanggal, item, jumlah, jenis="Pengeluaran"):
+    helpers.save_transaction(EMAIL, tanggal, "Pribadi", jenis, item, jumlah, "")
+
+
+def _levels(bulan="2024-01"):
+    df = budgets.alerts(EMAIL, bulan)
+    return dict(zip(df["kategori"], df["level"]))
+
+
+def test_alerts_follow_each_write(backend_db):
+    budgets.set_budget(EMAIL, "Pengeluaran", 1000000)
+    budgets.set_budget(EMAIL, "  Makan Siang ", 100000, scope="item")
+
+    _spend("2024-01-03", "makan siang", 50000)
+    _spend("2024-01-04", "Gaji", 5000000, jenis="Pemasukan")
+    assert _levels() == {}
+
+    _spend("2024-01-05", "MAKAN SIANG", 35000)
+    assert _levels() == {"makan siang": 80}
+    _spend("2024-01-06", "Laptop", 900000)
+    assert _levels() == {"Pengeluaran": 80, "makan siang": 80}
+    _spend("2024-01-07", "Makan siang", 20000)
+    assert _levels() == {"Pengeluaran": 100, "makan siang": 100}
+    # Other months and users have their own counters
+    _spend("2024-02-01", "Makan siang", 20000)
+    assert _levels("2024-02") == {}
+    assert budgets.alerts("siti@example.com", "2024-01").empty
+
+    df = budgets.list_budgets(EMAIL, "2024-01")
+    assert dict(zip(df["kategori"], df["terpakai"])) == {"Pengeluaran": 1005000, "makan siang": 105000}
+
+
+def test_edits_and_deletes_lower_the_counters(backend_db):
+    budgets.set_budget(EMAIL, "Kopi", 50000, scope="item")
+    _spend("2024-01-03", "Kopi", 30000)
+    _spend("2024-01-04", "Kopi", 25000)
+    assert _levels() == {"kopi": 100}
+
+    ids = helpers.get_transactions(EMAIL, ["id"])["id"].tolist()
+    helpers.update_transaction(EMAIL, ids[0], Jumlah=15000)
+    assert _levels() == {"kopi": 80}
+    helpers.update_transaction(EMAIL, ids[1], Item="Teh")
+    assert _levels() == {}
+    helpers.update_transaction(EMAIL, ids[1], Item="kopi", Tanggal="2024-02-01")
+    assert _levels("2024-02") == {}
+    helpers.delete_transactions(EMAIL, [ids[0]])
+    assert budgets.list_budgets(EMAIL, "2024-01")["terpakai"].tolist() == [0]
+
+
+def test_new_and_changed_budgets_count_past_spending(backend_db):
+    _spend("2024-01-03", "Bensin", 300000)
+    _spend("2024-01-20", "bensin", 200000)
+
+    budget_id = budgets.set_budget(EMAIL, "Bensin", 600000, scope="item")
+    assert _levels() == {"bensin": 80}
+    assert budgets.set_budget(EMAIL, "bensin", 400000, scope="item") == budget_id
+    assert _levels() == {"bensin": 100}
+    budgets.set_budget(EMAIL, "Pengeluaran", 10000000)
+    assert _levels() == {"bensin": 100}
+
+    assert budgets.delete_budget(EMAIL, budget_id)
+    assert not budgets.delete_budget(EMAIL, budget_id)
+    assert list(budgets.list_budgets(EMAIL)["kategori"]) == ["Pengeluaran"]
+
+
+def test_invalid_budgets_are_rejected(backend_db):
+    for kategori, batas, scope in [("Pemasukan", 1000, "jenis"), ("Kopi", 0, "item"), (" ", 1000, "item"), ("Kopi", 1000, "bulan")]:
+        with pytest.raises(ValueError):
+            budgets.set_budget(EMAIL, kategori, batas, scope)
+    assert budgets.list_budgets(EMAIL).empty
+
+
+def test_budgets_move_with_their_user(sharded_db):
+    from utils.storage import sharded
+
+    budgets.set_budget(EMAIL, "Kopi", 50000, scope="item")
+    _spend("2024-01-03", "Kopi", 45000)
+    source = sharded_db.transactions_path(EMAIL)
+    target = next(path for path in sharded_db.transaction_files() if path != source)
+    sharded._move_user(EMAIL, source, target)
+    sharded_db.transactions_path = lambda email: target
+
+    assert _levels() == {"kopi": 80}
+    _spend("2024-01-04", "kopi", 5000)
+    assert _levels() == {"kopi": 100}
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for automatic categories
+"""
+import pytest
+
+from utils import categories, helpers
+
+EMAIL = "budi@example.com"
+
+
+@pytest.fixture(autouse=True)
+def _fresh_models():
+    categories.forget_models()
+    yield
+    categories.wait_for_retrains(10)
+    categories.forget_models()
+
+
+def _kategori():
+    df = helpers.get_transactions(EMAIL, ["Item", "Kategori"])
+    return dict(zip(df["Item"], df["Kategori"]))
+
+
+def test_seed_examples_categorize_common_items():
+    model = categories.train([], [])
+    kategori, _ = model.predict([
+        ("Makan malam", "Pengeluaran", ""), ("Bensin motor", "Pengeluaran", ""),
+        ("Gaji Januari", "Pemasukan", ""), ("Token listrik", "Pengeluaran", ""), ("qwzx", "Pengeluaran", ""),
+    ])
+    assert kategori.tolist() == ["Makanan & Minuman", "Transportasi", "Pendapatan", "Tagihan", None]
+
+
+def test_features_ignore_case_and_diacritics():
+    assert categories.features("Kafé Latte", "Pengeluaran") == categories.features("kafe LATTE", "Pengeluaran")
+    assert "c:qris" in categories.features("Kopi", catatan="bayar QRIS")
+
+
+def test_user_labels_outweigh_the_seed_examples():
+    model = categories.train([("Kopi kantor", "Pengeluaran", "")] * 3, ["Tagihan"] * 3)
+    kategori, _ = model.predict([("kopi kantor", "Pengeluaran", ""), ("Kopi", "Pengeluaran", "")])
+    assert kategori[0] == "Tagihan"
+
+    restored = categories.Model.from_bytes(model.to_bytes(), model.labels)
+    assert restored.labels == 3
+    assert restored.predict([("kopi kantor", "Pengeluaran", "")])[0][0] == "Tagihan"
+
+
+def test_retrain_classifies_unlabelled_rows_only(backend_db):
+    helpers.save_transaction(EMAIL, "2024-01-05", "Pribadi", "Pengeluaran", "Makan siang", 25000, "")
+    helpers.save_transaction(EMAIL, "2024-01-06", "Pribadi", "Pengeluaran", "Bensin", 30000, "")
+    helpers.save_transaction(EMAIL, "2024-01-07", "Pribadi", "Pengeluaran", "Sewa kos", 900000, "", kategori="Tagihan")
+    helpers.save_transaction(EMAIL, "2024-01-08", "Pribadi", "Pengeluaran", "Sewa kos", 900000, "")
+    version = helpers.get_data_version(EMAIL)
+
+    assert categories.retrain(EMAIL) == 3
+    assert _kategori() == {"Makan siang": "Makanan & Minuman", "Bensin": "Transportasi", "Sewa kos": "Tagihan"}
+    # Once per changed row, so cached frames and snapshots pick the kategori up
+    assert helpers.get_data_version(EMAIL) == version + 3
+    assert categories.retrain(EMAIL) == 0
+    assert helpers.get_data_version(EMAIL) == version + 3
+    assert categories.has_model(EMAIL)
+
+
+def test_labels_are_never_overwritten(backend_db):
+    helpers.save_transaction(EMAIL, "2024-01-05", "Pribadi", "Pengeluaran", "Bensin", 30000, "", kategori="Lainnya")
+    helpers.save_transaction(EMAIL, "2024-01-06", "Pribadi", "Pengeluaran", "Kopi", 15000, "")
+    ids = helpers.get_transactions(EMAIL, ["id"])["id"].tolist()
+    helpers.update_transaction(EMAIL, ids[1], Kategori="Hiburan")
+
+    assert categories.retrain(EMAIL) == 0
+    assert _kategori() == {"Bensin": "Lainnya", "Kopi": "Hiburan"}
+
+
+def test_background_retrain_uses_new_labels(backend_db):
+    helpers.save_transaction(EMAIL, "2024-01-05", "Pribadi", "Pengeluaran", "Langganan gym", 300000, "", kategori="Kesehatan")
+    helpers.save_transaction(EMAIL, "2024-01-06", "Pribadi", "Pengeluaran", "Langganan gym", 300000, "")
+
+    for _ in range(3):
+        categories.schedule_retrain(EMAIL)
+    assert categories.wait_for_retrains(10)
+    assert categories.suggest(EMAIL, "langganan gym", "Pengeluaran") == "Kesehatan"
+    assert set(_kategori().values()) == {"Kesehatan"}
+
+
+def test_unknown_kategori_is_rejected(backend_db):
+    with pytest.raises(ValueError):
+        helpers.apply_transaction_changes(EMAIL, [{"Tanggal": "2024-01-05", "Jenis": "Pengeluaran", "Jumlah": 1, "Kategori": "Kopi"}], {}, [])
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared scheduler, lock and file helpers
+"""
+import os
+import threading
+
+import pytest
+
+from utils import concurrency
+
+
+def test_scheduler_runs_once_per_process(monkeypatch):
+    runs = threading.Semaphore(0)
+    scheduler = concurrency.Scheduler("test-scheduler", concurrency.periodic(runs.release, "test job"), "TEST_SCHEDULER")
+    thread = scheduler.start(60)
+    try:
+        assert scheduler.start(60) is thread
+        assert runs.acquire(timeout=10)
+    finally:
+        scheduler.stop()
+    assert not thread.is_alive()
+
+    monkeypatch.setenv("TEST_SCHEDULER", "0")
+    assert scheduler.start(60) is None
+
+
+def test_periodic_survives_failures_and_ends_when_unsupported():
+    calls = []
+
+    def job():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database is gone")
+        raise NotImplementedError
+
+    # Returns after the NotImplementedError, without waiting out the next interval
+    concurrency.periodic(job, "test job")(threading.Event(), 0)
+    assert len(calls) == 2
+
+
+def test_keyed_locks():
+    locks = concurrency.KeyedLocks()
+    assert locks("budi@example.com") is locks("budi@example.com")
+    assert locks("budi@example.com") is not locks("siti@example.com")
+
+
+def test_atomic_path_and_remove_file(tmp_path):
+    path = str(tmp_path / "report.txt")
+    with concurrency.atomic_path(path) as tmp:
+        assert tmp != path
+        with open(tmp, "w") as f:
+            f.write("lengkap")
+    with pytest.raises(ValueError):
+        with concurrency.atomic_path(path) as tmp:
+            with open(tmp, "w") as f:
+                f.write("setengah")
+            raise ValueError
+    with open(path) as f:
+        assert f.read() == "lengkap"
+    assert os.listdir(tmp_path) == ["report.txt"]
+
+    assert concurrency.file_key("budi@example.com") == concurrency.file_key("budi@example.com")
+    assert "budi" not in concurrency.file_key("budi@example.com")
+    assert concurrency.remove_file(path) and not concurrency.remove_file(path)
+
+
+def test_concurrent_atomic_writes_do_not_collide(tmp_path):
+    path = str(tmp_path / "report.txt")
+    start = threading.Barrier(8)
+    errors = []
+
+    def write(i):
+        try:
+            with concurrency.atomic_path(path) as tmp:
+                with open(tmp, "w") as f:
+                    start.wait()
+                    f.write(f"laporan {i}" * 1000)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with open(path) as f:
+        content = f.read()
+    assert content in {f"laporan {i}" * 1000 for i in range(8)}
+    assert os.listdir(tmp_path) == ["report.txt"]
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming XLSX report
+"""
+import datetime
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from utils import archive, export, helpers
+
+pytest.importorskip("xlsxwriter")
+
+EMAIL = "budi@example.com"
+NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+RELATIONSHIP = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+
+def _column(reference):
+    index = 0
+    for letter in re.match(r"[A-Z]+", reference).group():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def _read_xlsx(path):
+    """{sheet name: rows of cell values}, read straight from the XML of the file"""
+    with zipfile.ZipFile(path) as xlsx:
+        workbook = ET.fromstring(xlsx.read("xl/workbook.xml"))
+        targets = {
+            rel.get("Id"): rel.get("Target")
+            for rel in ET.fromstring(xlsx.read("xl/_rels/workbook.xml.rels"))
+        }
+        sheets = {}
+        for sheet in workbook.find("m:sheets", NS):
+            rows = []
+            for row in ET.fromstring(xlsx.read("xl/" + targets[sheet.get(RELATIONSHIP)])).iter(f"{{{NS['m']}}}row"):
+                values = {}
+                for cell in row.findall("m:c", NS):
+                    text = cell.find("m:is/m:t", NS) if cell.get("t") == "inlineStr" else cell.find("m:v", NS)
+                    value = text.text if cell.get("t") == "inlineStr" else float(text.text)
+                    values[_column(cell.get("r"))] = value
+                rows.append([values.get(i) for i in range(max(values) + 1)])
+            sheets[sheet.get("name")] = rows
+        charts = [name for name in xlsx.namelist() if name.startswith("xl/charts/")]
+    return sheets, charts
+
+
+def _date(serial):
+    return str(datetime.date.fromordinal(int(serial) + export.EXCEL_EPOCH))
+
+
+def _fill():
+    helpers.save_transaction(EMAIL, "2023-12-30", "Pribadi", "Pengeluaran", "Kopi", 20000, "", "Makanan & Minuman")
+    helpers.save_transaction(EMAIL, "2024-01-05", "Pribadi", "Pemasukan", "Gaji", 5000000, "Januari")
+    helpers.save_transaction(EMAIL, "2024-01-06", "Pribadi", "Pengeluaran", "Bensin", 40000, "", "Transportasi")
+    helpers.save_transaction(EMAIL, "2024-01-20", "Pribadi", "Pengeluaran", "Sate", 35000, "", "Makanan & Minuman")
+    helpers.save_transaction(EMAIL, "2024-02-01", "Pribadi", "Pengeluaran", "Pulsa", 50000, "")
+    helpers.save_transaction(EMAIL, "2024-02-03", "Pribadi", "Tabungan", "Deposito", 500000, "")
+
+
+def test_report_sheets(temp_db):
+    _fill()
+    # Archived rows are streamed too
+    archive.archive(before=2024, today=datetime.date(2024, 3, 1))
+
+    sheets, charts = _read_xlsx(export.xlsx_report(EMAIL))
+    assert list(sheets) == ["Transaksi", "Ringkasan Bulanan", "Pivot Pengeluaran"]
+
+    transaksi = sheets["Transaksi"]
+    assert transaksi[0] == export.XLSX_COLUMNS
+    assert [_date(row[0]) for row in transaksi[1:]] == [
+        "2023-12-30", "2024-01-05", "2024-01-06", "2024-01-20", "2024-02-01", "2024-02-03",
+    ]
+    assert transaksi[2] == [transaksi[2][0], "Pemasukan", "Gaji", 5000000, "Januari"]
+    assert transaksi[3][5] == "Transportasi"
+
+    assert sheets["Ringkasan Bulanan"] == [
+        ["Bulan", "Pemasukan", "Pengeluaran", "Tabungan", "Saldo", "Transaksi"],
+        ["2023-12", 0, 20000, 0, -20000, 1],
+        ["2024-01", 5000000, 75000, 0, 4925000, 3],
+        ["2024-02", 0, 50000, 500000, -50000, 2],
+    ]
+    assert sheets["Pivot Pengeluaran"] == [
+        ["Bulan", "Makanan & Minuman", "Transportasi", export.NO_KATEGORI, "Total"],
+        ["2023-12", 20000, 0, 0, 20000],
+        ["2024-01", 35000, 40000, 0, 75000],
+        ["2024-02", 0, 0, 50000, 50000],
+    ]
+    assert len(charts) == 1
+
+
+def test_report_is_cached_per_data_version(temp_db, monkeypatch):
+    _fill()
+    writes = []
+    write_xlsx = export.write_xlsx
+    monkeypatch.setattr(export, "write_xlsx", lambda email, path: writes.append(path) or write_xlsx(email, path))
+
+    first = export.xlsx_report(EMAIL)
+    assert export.export_to_xlsx(EMAIL)[:2] == b"PK"
+    assert export.xlsx_report(EMAIL) == first and len(writes) == 1
+
+    # A new transaction is a new data version: a new report, and the old one is gone
+    helpers.save_transaction(EMAIL, "2024-02-04", "Pribadi", "Pengeluaran", "Roti", 15000, "")
+    second = export.xlsx_report(EMAIL)
+    assert second != first and len(writes) == 2
+    assert os.listdir(os.path.dirname(second)) == [os.path.basename(second)]
+    assert len(_read_xlsx(second)[0]["Transaksi"]) == 8
+
+
+def test_rows_continue_on_new_sheets(temp_db, monkeypatch):
+    _fill()
+    monkeypatch.setattr(export, "XLSX_SHEET_ROWS", 4)
+
+    sheets, _ = _read_xlsx(export.xlsx_report(EMAIL))
+    assert list(sheets)[:2] == ["Transaksi", "Transaksi 2"]
+    assert [len(sheets["Transaksi"]), len(sheets["Transaksi 2"])] == [5, 3]
+    assert sheets["Transaksi 2"][1][2] == "Pulsa"
+
+
+def test_empty_report(temp_db):
+    sheets, charts = _read_xlsx(export.xlsx_report(EMAIL))
+    assert sheets["Transaksi"] == [export.XLSX_COLUMNS]
+    assert len(sheets["Ringkasan Bulanan"]) == 1 and not charts
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for cash-flow forecasts
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import forecast
+
+TODAY = datetime.date(2025, 3, 10)
+
+
+def _history(rows):
+    df = pd.DataFrame(rows, columns=["Tanggal", "Jenis", "Item", "Jumlah"])
+    df["Tanggal"] = pd.to_datetime(df["Tanggal"])
+    return df
+
+
+def _monthly(day, jenis, item, jumlah, months):
+    return [(f"{month[:7]}-{day:02d}", jenis, item, jumlah) for month in months]
+
+
+MONTHS = [str(month) for month in pd.period_range("2024-01", "2025-02", freq="M")]
+
+
+def test_recurring_items_land_on_their_day():
+    df = _history(
+        _monthly(25, "Pemasukan", "Gaji", 5000000, MONTHS)
+        + _monthly(28, "Pengeluaran", "Sewa kos", 1500000, MONTHS)
+        + [("2025-03-05", "Pengeluaran", "sewa kos ", 1500000)]
+    )
+    result = forecast.forecast(df, 3, TODAY)
+
+    recurring = result.recurring.set_index("Item")
+    assert recurring.loc["Gaji", "Jumlah"] == 5000000 and recurring.loc["Gaji", "Hari"] == 25
+    # Matched ignoring case and spaces, and shown as last written
+    assert "sewa kos " in recurring.index
+    income = result.daily["Pemasukan"]
+    assert income[income > 0].index.strftime("%Y-%m-%d").tolist() == ["2025-03-25", "2025-04-25", "2025-05-25", "2025-06-25"]
+    # Already paid this month, so March gets no second rent
+    rent = result.daily["Pengeluaran"]
+    assert rent[rent > 0].index.strftime("%Y-%m-%d").tolist() == ["2025-04-28", "2025-05-28", "2025-06-28"]
+
+
+def test_saldo_continues_from_history_and_the_band_widens():
+    rng = np.random.default_rng(3)
+    rows = _monthly(25, "Pemasukan", "Gaji", 4000000, MONTHS)
+    for day in pd.date_range("2024-01-01", TODAY):
+        rows += [(day, "Pengeluaran", "Jajan", int(rng.integers(20000, 60000)))]
+    df = _history(rows)
+    result = forecast.forecast(df, 6, TODAY)
+
+    daily = result.daily
+    assert daily.index[0] == pd.Timestamp("2025-03-11") and daily.index[-1] == pd.Timestamp("2025-09-30")
+    saldo_awal = df.loc[df["Jenis"] == "Pemasukan", "Jumlah"].sum() - df.loc[df["Jenis"] == "Pengeluaran", "Jumlah"].sum()
+    assert daily["Saldo"].iloc[0] == pytest.approx(saldo_awal + daily["Pemasukan"].iloc[0] - daily["Pengeluaran"].iloc[0])
+    width = daily["Saldo_atas"] - daily["Saldo_bawah"]
+    assert width.iloc[-1] > width.iloc[0] > 0
+    # About 40,000 a day of spending, spread over the remaining days
+    assert result.monthly.loc["2025-05", "Pengeluaran"] == pytest.approx(31 * 40000, rel=0.1)
+    assert result.monthly.loc["2025-09", "Saldo"] == pytest.approx(daily["Saldo"].iloc[-1])
+
+
+def test_seasonal_month_of_year_pattern():
+    rows = []
+    for month in pd.period_range("2022-01", "2025-02", freq="M"):
+        # Lebaran shopping every April
+        rows.append((f"{month}-10", "Pengeluaran", f"Belanja {month}", 3000000 if month.month == 4 else 1000000))
+    result = forecast.forecast(_history(rows), 3, TODAY)
+
+    monthly = result.monthly["Pengeluaran"]
+    assert monthly["2025-04"] > 2 * monthly["2025-05"]
+
+
+def test_empty_history_and_invalid_horizon():
+    result = forecast.forecast(_history([]), 3, TODAY)
+    assert len(result.monthly) == 4 and (result.daily["Saldo"] == 0).all()
+    assert result.recurring.empty
+
+    with pytest.raises(ValueError):
+        forecast.forecast(_history([]), 0, TODAY)
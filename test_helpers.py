@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test script for the database helpers
+"""
+import os
+import sqlite3
+
+from utils import helpers
+
+
+def test_migrations_set_schema_version(temp_db):
+    """init_db applies every migration and records the schema version"""
+    conn = sqlite3.connect(temp_db)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+
+    assert version == helpers.SCHEMA_VERSION
+    assert {"users", "transactions", "sessions", "data_versions"} <= tables
+    assert helpers.db_health_check()
+
+
+def test_migrations_upgrade_legacy_database(tmp_path, monkeypatch):
+    """A database created before migrations existed is upgraded in place"""
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, nama TEXT NOT NULL, email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, kategori_pengguna TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT, tanggal TEXT, kategori_pengguna TEXT, jenis TEXT, item TEXT, jumlah REAL, catatan TEXT)")
+    conn.execute("INSERT INTO transactions (email, tanggal, jenis, item, jumlah) VALUES ('a@b.c', '2024-01-01', 'Pemasukan', 'Gaji', 100)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(helpers, "DB_PATH", path)
+    assert not helpers.db_health_check()
+    helpers.init_db()
+    assert helpers.db_health_check()
+    assert len(helpers.get_transactions("a@b.c")) == 1
+
+
+def test_bootstrap_runs_once(temp_db, monkeypatch):
+    """bootstrap_db only migrates on the first call for a database"""
+    calls = []
+    monkeypatch.setattr(helpers, "_bootstrapped_path", None)
+    monkeypatch.setattr(helpers, "init_db", lambda: calls.append(1))
+
+    for _ in range(3):
+        helpers.bootstrap_db()
+
+    assert calls == [1]
+
+
+def test_concurrent_writes_are_grouped(temp_db):
+    """Writes from many threads all commit through the writer queue"""
+    import threading
+
+    def worker(n):
+        for i in range(10):
+            helpers.save_transaction("budi@example.com", "2024-01-01", "Pribadi", "Pengeluaran", f"item {n}-{i}", 1000, "")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(helpers.get_transactions("budi@example.com")) == 200
+    assert helpers.get_data_version("budi@example.com") == 200
+
+
+def test_failed_write_does_not_affect_others(temp_db):
+    """A job that raises is rolled back on its own and the error reaches its caller"""
+    assert not helpers.create_user("Budi", "budi@example.com", "lagi", "Pribadi")
+    assert helpers.create_user("Siti", "siti@example.com", "rahasia", "UMKM")
+    assert helpers.get_user_info("siti@example.com") == ("Siti", "UMKM")
+
+
+def test_database_uses_wal(temp_db):
+    conn = sqlite3.connect(temp_db)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_money_migration_rounds_to_integer_rupiah(tmp_path, monkeypatch):
+    """Amounts stored as REAL become whole rupiah and reconcile with the audit"""
+    from utils import reconcile, storage
+
+    path = str(tmp_path / "v4.db")
+    helpers.init_db(path, helpers.MIGRATIONS[:4])
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO transactions (email, tanggal, jenis, item, jumlah) VALUES (?, '2024-01-01', 'Pengeluaran', 'x', ?)",
+        [("a@b.c", 1000.5), ("a@b.c", 2000.4), ("a@b.c", 3000.0), ("d@e.f", 0.1)],
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(helpers, "DB_PATH", path)
+    monkeypatch.setattr(storage, "_storage", storage.create_storage("sqlite"))
+    helpers.init_db()
+
+    conn = sqlite3.connect(path)
+    amounts = conn.execute("SELECT jumlah, typeof(jumlah) FROM transactions ORDER BY id").fetchall()
+    conn.close()
+    assert amounts == [(1001, "integer"), (2000, "integer"), (3000, "integer"), (0, "integer")]
+
+    # AUTOINCREMENT carries on after the rebuilt table
+    helpers.save_transaction("a@b.c", "2024-01-02", "Pribadi", "Pengeluaran", "y", 12.5, "")
+    df = reconcile.reconcile().set_index("email")
+    assert df["ok"].all()
+    assert df.loc["a@b.c", "fractional_rows"] == 2
+    assert df.loc["a@b.c", "expected_total"] == 6001
+    assert helpers.get_transactions("a@b.c")["Jumlah"].tolist() == [1001, 2000, 3000, 13]
+
+
+def test_rollup_is_backfilled_and_maintained(tmp_path, monkeypatch):
+    """monthly_totals starts from the existing rows and follows every later write"""
+    from utils import storage
+
+    path = str(tmp_path / "v5.db")
+    helpers.init_db(path, helpers.MIGRATIONS[:5])
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO transactions (email, tanggal, jenis, item, jumlah) VALUES ('a@b.c', ?, ?, 'x', ?)",
+        [("2024-01-05", "Pemasukan", 1000), ("2024-01-20", "Pemasukan", 500), ("2024-02-01", "Pengeluaran", 200)],
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(helpers, "DB_PATH", path)
+    monkeypatch.setattr(storage, "_storage", storage.create_storage("sqlite"))
+    helpers.init_db()
+    helpers.save_transaction("a@b.c", "2024-02-10", "Pribadi", "Pengeluaran", "y", 300, "")
+    ids = helpers.get_transactions("a@b.c", ["id"])["id"].tolist()
+    helpers.update_transaction("a@b.c", ids[0], Tanggal="2024-02-05")
+    helpers.delete_transactions("a@b.c", [ids[1]])
+
+    conn = sqlite3.connect(path)
+    rollup = conn.execute("SELECT bulan, jenis, total, rows FROM monthly_totals WHERE rows > 0 ORDER BY bulan, jenis").fetchall()
+    conn.close()
+    assert rollup == [("2024-02", "Pemasukan", 1000, 1), ("2024-02", "Pengeluaran", 500, 2)]
+
+
+def test_search_index_is_backfilled(tmp_path, monkeypatch):
+    from utils import storage
+
+    path = str(tmp_path / "v7.db")
+    helpers.init_db(path, helpers.MIGRATIONS[:7])
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO transactions (email, tanggal, jenis, item, jumlah, catatan, deleted_at) VALUES (?, '2024-01-05', 'Pengeluaran', ?, 1, ?, ?)",
+        [("a@b.c", "Nasi goreng", "", None), ("a@b.c", "Es teh", "warung", None), ("a@b.c", "Nasi uduk", "", 1), ("x@y.z", "Nasi", "", None)],
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(helpers, "DB_PATH", path)
+    monkeypatch.setattr(storage, "_storage", storage.create_storage("sqlite"))
+    helpers.init_db()
+    assert helpers.search_transactions("a@b.c", "nasi")[0]["Item"].tolist() == ["Nasi goreng"]
+    assert helpers.search_transactions("a@b.c", "war")[0]["Item"].tolist() == ["Es teh"]
+
+
+def test_to_rupiah_rounds_half_away_from_zero():
+    assert [helpers.to_rupiah(v) for v in (2.5, 3.5, -2.5, 0.49, "1500", 10**15 + 0.5)] == [3, 4, -3, 0, 1500, 10**15 + 1]
+
+
+def test_read_connections_are_pooled_per_file(tmp_path):
+    """Reads reuse idle connections, but never one opened on a replaced file"""
+    path, replacement = str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    for name, target in (("lama", path), ("baru", replacement)):
+        conn = sqlite3.connect(target)
+        conn.execute("CREATE TABLE t (name TEXT)")
+        conn.execute("INSERT INTO t VALUES (?)", (name,))
+        conn.commit()
+        conn.close()
+
+    with helpers.read_connection(path) as conn:
+        first = conn
+    with helpers.read_connection(path) as conn:
+        assert conn is first
+
+    # A restore swaps the file: the pooled connection would still read the old one
+    os.replace(replacement, path)
+    with helpers.read_connection(path) as conn:
+        assert conn is not first
+        assert conn.execute("SELECT name FROM t").fetchall() == [("baru",)]
+    helpers.close_read_connections()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for shared ledgers (buku bersama)
+"""
+import pytest
+
+from utils import helpers, ledgers, storage
+
+EMAIL = "budi@example.com"
+SITI = "siti@example.com"
+ANI = "ani@example.com"
+
+
+@pytest.fixture
+def ledger(backend_db):
+    helpers.create_user("Siti", SITI, "rahasia", "Keluarga")
+    helpers.create_user("Ani", ANI, "rahasia", "Keluarga")
+    ledger = ledgers.create_ledger(EMAIL, "  Keuangan Keluarga ")
+    ledgers.set_member(EMAIL, ledger, SITI, "editor")
+    return ledger
+
+
+def test_members_share_one_book(ledger):
+    book = ledgers.book_key(ledger)
+    assert ledgers.ledger_id(book) == ledger and ledgers.ledger_id(EMAIL) is None
+    helpers.save_transaction(book, "2024-03-01", "Keluarga", "Pemasukan", "Gaji Budi", 5000000, "")
+    helpers.save_transaction(book, "2024-03-02", "Keluarga", "Pengeluaran", "Belanja", 750000, "Siti")
+    helpers.save_transaction(EMAIL, "2024-03-03", "Pribadi", "Pengeluaran", "Kopi", 25000, "")
+
+    # The ledger is its own book, summarized like a single user's
+    assert helpers.get_summary(book) == {"pemasukan": 5000000, "pengeluaran": 750000, "tabungan": 0, "saldo": 4250000}
+    assert helpers.get_summary(EMAIL)["pengeluaran"] == 25000
+    assert helpers.get_data_version(book) == 2
+    assert helpers.get_transactions(book, ["Item"])["Item"].tolist() == ["Gaji Budi", "Belanja"]
+
+
+def test_roles_and_ledger_lists(ledger):
+    helpers.create_user("Zaki", "zaki@example.com", "rahasia", "Pribadi")
+    book = ledgers.book_key(ledger)
+    assert ledgers.user_ledgers(EMAIL).values.tolist() == [[ledger, "Keuangan Keluarga", "pemilik"]]
+    assert ledgers.role(SITI, book) == "editor" and ledgers.can_write("editor")
+    assert ledgers.role(ANI, book) is None
+    assert ledgers.role(ANI, ANI) == "pemilik"
+
+    ledgers.set_member(EMAIL, ledger, ANI, "pembaca")
+    assert ledgers.role(ANI, book) == "pembaca" and not ledgers.can_write("pembaca")
+    assert ledgers.members(ledger)["email"].tolist() == [EMAIL, SITI, ANI]
+
+    # Only a pemilik manages members
+    with pytest.raises(PermissionError):
+        ledgers.set_member(SITI, ledger, "zaki@example.com", "pembaca")
+    with pytest.raises(PermissionError):
+        ledgers.remove_member(SITI, ledger, ANI)
+    with pytest.raises(ValueError, match="belum terdaftar"):
+        ledgers.set_member(EMAIL, ledger, "tidak.ada@example.com", "editor")
+    with pytest.raises(ValueError, match="Nama buku"):
+        ledgers.create_ledger(EMAIL, "  ")
+
+    # Members may leave; the cached lists follow right away
+    assert ledgers.remove_member(ANI, ledger, ANI)
+    assert ledgers.user_ledgers(ANI).empty and ledgers.role(ANI, book) is None
+
+
+def test_ledger_keys_are_not_accounts(ledger):
+    book = ledgers.book_key(ledger)
+    with pytest.raises(ValueError, match="Email tidak valid"):
+        helpers.create_user("Mallory", book, "rahasia", "Pribadi")
+    with pytest.raises(ValueError, match="Email tidak valid"):
+        storage.get_storage().create_user("Mallory", book, helpers.hash_password("rahasia"), "Pribadi")
+    with pytest.raises(ValueError, match="Email tidak valid"):
+        ledgers.set_member(EMAIL, ledger, book, "editor")
+    assert helpers.verify_user(book, "rahasia") is None
+    # Logged in as the key or not, nobody owns a ledger's book by name alone
+    assert ledgers.role(book, book) is None
+
+
+def test_a_ledger_keeps_an_owner(ledger):
+    with pytest.raises(ValueError, match="minimal satu pemilik"):
+        ledgers.set_member(EMAIL, ledger, EMAIL, "editor")
+    with pytest.raises(ValueError, match="minimal satu pemilik"):
+        ledgers.remove_member(EMAIL, ledger, EMAIL)
+
+    ledgers.set_member(EMAIL, ledger, SITI, "pemilik")
+    ledgers.remove_member(EMAIL, ledger, EMAIL)
+    assert ledgers.members(ledger).values.tolist() == [[SITI, "Siti", "pemilik"]]
+
+
+def test_ledger_lists_are_cached(ledger, monkeypatch):
+    calls = []
+    backend = storage.get_storage()
+    fetch = backend.get_user_ledgers
+    monkeypatch.setattr(backend, "get_user_ledgers", lambda email: calls.append(email) or fetch(email))
+    ledgers.forget_ledgers()
+
+    for _ in range(3):
+        assert ledgers.role(SITI, ledgers.book_key(ledger)) == "editor"
+    assert calls == [SITI]
+
+    # Expired entries are read again
+    monkeypatch.setattr(ledgers, "LEDGER_CACHE_TTL", -1)
+    ledgers.forget_ledgers(SITI)
+    ledgers.user_ledgers(SITI)
+    ledgers.user_ledgers(SITI)
+    assert calls == [SITI] * 3
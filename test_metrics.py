@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for the instrumentation layer
+"""
+import threading
+
+import pytest
+
+from utils import helpers, metrics
+
+
+@pytest.fixture
+def enabled_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def test_timed_disabled_records_nothing(monkeypatch):
+    """With instrumentation off, decorated functions run untouched"""
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.reset()
+
+    @metrics.timed("noop")
+    def noop(x):
+        return x * 2
+
+    assert noop(21) == 42
+    with metrics.timed("block"):
+        pass
+    assert metrics.summary() == []
+
+
+def test_rerun_counts_sql_queries(temp_db, enabled_metrics):
+    """SQL statements issued between begin_rerun and end_rerun are counted"""
+    metrics.begin_rerun()
+    helpers.get_transactions("budi@example.com")
+    helpers.get_user_info("budi@example.com")
+    metrics.end_rerun("Beranda")
+
+    last = metrics.last_rerun()
+    assert last["page"] == "Beranda"
+    assert last["queries"] >= 2
+    names = {row["name"] for row in metrics.summary()}
+    assert {"helpers.get_transactions", "rerun", "rerun_sql_queries.Beranda"} <= names
+
+
+def test_prometheus_export(tmp_path, enabled_metrics):
+    """Histograms are exported with cumulative buckets"""
+    metrics.observe("export.export_to_pdf", 3)
+    metrics.observe("export.export_to_pdf", 30)
+    path = tmp_path / "metrics.prom"
+    metrics.write_prometheus(str(path))
+
+    text = path.read_text()
+    assert "# TYPE smartkeuangan_latency_ms histogram" in text
+    assert 'smartkeuangan_latency_ms_bucket{op="export.export_to_pdf",le="5"} 1' in text
+    assert 'smartkeuangan_latency_ms_bucket{op="export.export_to_pdf",le="+Inf"} 2' in text
+    assert 'smartkeuangan_latency_ms_count{op="export.export_to_pdf"} 2' in text
+
+
+def test_rerun_exports_once_and_survives_export_failures(tmp_path, enabled_metrics, monkeypatch):
+    """Reruns ending together write METRICS_FILE once; a failed write is logged, not raised"""
+    writes = []
+    monkeypatch.setattr(metrics, "METRICS_FILE", str(tmp_path / "metrics.prom"))
+    monkeypatch.setattr(metrics, "_last_export", 0.0)
+    monkeypatch.setattr(metrics, "write_prometheus", writes.append)
+
+    threads = [threading.Thread(target=lambda: (metrics.begin_rerun(), metrics.end_rerun("Beranda"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(writes) == 1
+
+    def failing(path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(metrics, "_last_export", 0.0)
+    monkeypatch.setattr(metrics, "write_prometheus", failing)
+    metrics.begin_rerun()
+    metrics.end_rerun("Beranda")
+    assert metrics.last_rerun()["page"] == "Beranda"
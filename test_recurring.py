@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for recurring transaction rules and their scheduler
+"""
+import datetime
+import multiprocessing
+import threading
+
+import pytest
+
+from utils import helpers, recurring, storage
+
+EMAIL = "budi@example.com"
+
+
+def _dates():
+    return helpers.get_transactions(EMAIL)["Tanggal"].dt.strftime("%Y-%m-%d").tolist()
+
+
+def test_monthly_rules_keep_the_day_of_month():
+    start = datetime.date(2024, 1, 31)
+    dates = [recurring.occurrence_date(start, "month", 1, i).isoformat() for i in range(4)]
+    assert dates == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]
+    assert recurring.occurrence_date(datetime.date(2024, 11, 15), "month", 3, 1) == datetime.date(2025, 2, 15)
+    assert recurring.occurrence_date(start, "week", 2, 1) == datetime.date(2024, 2, 14)
+
+
+def test_missed_periods_are_caught_up(backend_db):
+    recurring.create_rule(EMAIL, "Pribadi", "Pemasukan", "Gaji", 5000000, "", "2024-01-25", today=datetime.date(2024, 1, 31))
+
+    assert recurring.run_due(datetime.date(2024, 4, 30)) == 3
+    assert _dates() == ["2024-01-25", "2024-02-25", "2024-03-25", "2024-04-25"]
+    # Once per inserted row, so snapshots append them
+    assert helpers.get_data_version(EMAIL) == 4
+    rule = recurring.list_rules(EMAIL).iloc[0]
+    assert (rule["next_index"], rule["next_date"]) == (4, "2024-05-25")
+
+
+def test_end_date_and_custom_interval(backend_db):
+    recurring.create_rule(
+        EMAIL, "Pribadi", "Pengeluaran", "Sewa", 1500000, "", "2024-01-01", "week", 4, "2024-03-01", today=datetime.date(2023, 12, 1),
+    )
+
+    recurring.run_due(datetime.date(2024, 12, 31))
+    assert _dates() == ["2024-01-01", "2024-01-29", "2024-02-26"]
+    assert recurring.list_rules(EMAIL).iloc[0]["next_date"] is None
+
+
+def test_rerunning_after_a_crash_inserts_nothing_twice(backend_db, monkeypatch):
+    # Occurrences inserted, but the process died before advancing the rule
+    with monkeypatch.context() as patch:
+        patch.setattr(storage.get_storage(), "advance_rule", lambda *args: False, raising=False)
+        recurring.create_rule(EMAIL, "Pribadi", "Pengeluaran", "Listrik", 300000, "", "2024-01-05", today=datetime.date(2024, 3, 5))
+
+    assert len(helpers.get_transactions(EMAIL)) == 3
+    assert recurring.run_due(datetime.date(2024, 3, 5)) == 0
+    assert len(helpers.get_transactions(EMAIL)) == 3
+    assert recurring.list_rules(EMAIL).iloc[0]["next_date"] == "2024-04-05"
+
+
+def test_concurrent_schedulers_materialize_once(backend_db):
+    recurring.create_rule(EMAIL, "Pribadi", "Pemasukan", "Uang saku", 50000, "", "2024-01-01", "day", 1, today=datetime.date(2023, 12, 31))
+    today = datetime.date(2024, 3, 31)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(recurring.run_due(today))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(results) == 91
+    assert len(helpers.get_transactions(EMAIL)) == 91
+    assert helpers.get_data_version(EMAIL) == 91
+
+
+def _run_due_in_process(db_path, today):
+    helpers.DB_PATH = db_path
+    return recurring.run_due(today)
+
+
+def test_scheduler_processes_materialize_once(temp_db):
+    """Separate processes have separate writer threads and only share the database file"""
+    recurring.create_rule(EMAIL, "Pribadi", "Pemasukan", "Uang saku", 50000, "", "2024-01-01", "day", 1, today=datetime.date(2023, 12, 31))
+
+    with multiprocessing.get_context("spawn").Pool(3) as pool:
+        results = pool.starmap(_run_due_in_process, [(temp_db, datetime.date(2024, 12, 31))] * 3)
+
+    assert sum(results) == 366
+    assert len(helpers.get_transactions(EMAIL)) == 366
+    assert helpers.get_data_version(EMAIL) == 366
+
+
+def test_deleted_rules_stop(backend_db):
+    rule_id = recurring.create_rule(EMAIL, "Pribadi", "Pengeluaran", "Internet", 350000, "", "2024-01-10", today=datetime.date(2024, 2, 10))
+
+    assert not recurring.delete_rule("siti@example.com", rule_id)
+    assert recurring.delete_rule(EMAIL, rule_id)
+    assert recurring.run_due(datetime.date(2024, 6, 10)) == 0
+    assert len(helpers.get_transactions(EMAIL)) == 2
+
+
+def test_invalid_rules_are_rejected(backend_db):
+    with pytest.raises(ValueError):
+        recurring.create_rule(EMAIL, "Pribadi", "Pengeluaran", "x", 1, "", "2024-01-10", "year")
+    with pytest.raises(ValueError):
+        recurring.create_rule(EMAIL, "Pribadi", "Pengeluaran", "x", 1, "", "2024-01-10", end_date="2024-01-01")
+    assert recurring.list_rules(EMAIL).empty
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for full-text search over item and catatan
+"""
+import pytest
+
+from utils import helpers, storage
+
+EMAIL = "budi@example.com"
+
+
+def _items(query, **kwargs):
+    df, _ = helpers.search_transactions(EMAIL, query, **kwargs)
+    return df["Item"].tolist()
+
+
+def test_prefix_search_ranks_item_hits_first(backend_db):
+    helpers.save_transaction(EMAIL, "2024-01-05", "Pribadi", "Pengeluaran", "Kopi susu", 25000, "")
+    helpers.save_transaction(EMAIL, "2024-01-06", "Pribadi", "Pengeluaran", "Sarapan", 30000, "kopi dan roti")
+    helpers.save_transaction(EMAIL, "2024-01-07", "Pribadi", "Pengeluaran", "Kopi hitam", 15000, "bayar QRIS")
+    helpers.save_transaction(EMAIL, "2024-01-08", "Pribadi", "Pengeluaran", "Bensin", 50000, "")
+    helpers.save_transaction("siti@example.com", "2024-01-08", "Pribadi", "Pengeluaran", "Kopi", 20000, "")
+
+    assert _items("kop") == ["Kopi hitam", "Kopi susu", "Sarapan"]
+    assert _items("KOPI qr") == ["Kopi hitam"]
+    assert _items("teh") == []
+    assert _items("  --  ") == []
+
+
+@pytest.mark.parametrize("backend", ["temp_db", "sharded_db"])
+def test_diacritics_are_ignored(request, backend):
+    # SQLite only: PostgreSQL's 'simple' configuration keeps accents
+    request.getfixturevalue(backend)
+    helpers.save_transaction(EMAIL, "2024-01-05", "Pribadi", "Pengeluaran", "Kafé Çikini", 45000, "crème brûlée")
+
+    assert _items("kafe cik") == ["Kafé Çikini"]
+    assert _items("creme") == ["Kafé Çikini"]
+    assert _items("brûl") == ["Kafé Çikini"]
+
+
+def test_edits_and_deletes_are_reindexed(backend_db):
+    helpers.save_transaction(EMAIL, "2024-01-05", "Pribadi", "Pengeluaran", "Parkir", 5000, "")
+    helpers.save_transaction(EMAIL, "2024-01-06", "Pribadi", "Pengeluaran", "Tol", 12000, "")
+    ids = helpers.get_transactions(EMAIL, ["id"])["id"].tolist()
+
+    helpers.update_transaction(EMAIL, ids[0], Item="Parkir mall")
+    helpers.delete_transactions(EMAIL, [ids[1]])
+
+    assert _items("mall") == ["Parkir mall"]
+    assert _items("tol") == []
+    assert helpers.compact_deleted(retention=-1) == 1
+    assert _items("parkir") == ["Parkir mall"]
+
+
+def test_pages(backend_db):
+    for day in range(1, 26):
+        helpers.save_transaction(EMAIL, f"2024-01-{day:02d}", "Pribadi", "Pengeluaran", f"Makan siang {day}", 20000, "")
+
+    first, more = helpers.search_transactions(EMAIL, "makan", page_size=10)
+    last, last_more = helpers.search_transactions(EMAIL, "makan", page=2, page_size=10)
+    assert more and not last_more
+    assert first["Item"].iloc[0] == "Makan siang 25"
+    assert last["Item"].tolist() == [f"Makan siang {day}" for day in range(5, 0, -1)]
+    assert list(first.columns) == ["id"] + storage.TRANSACTION_COLUMNS
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script for persistent login sessions
+"""
+
+import os
+
+from utils import session
+
+
+def test_session_roundtrip(temp_db):
+    """A created session restores the user and is cached afterwards"""
+    token = session.create_session("budi@example.com")
+
+    assert session.get_session(token) == ("budi@example.com", "Budi", "Pribadi")
+    # Second lookup is served from the in-process cache
+    os.remove(temp_db)
+    assert session.get_session(token) == ("budi@example.com", "Budi", "Pribadi")
+
+
+def test_session_survives_restart(temp_db):
+    """Tokens stay valid once the in-process cache is gone"""
+    token = session.create_session("budi@example.com")
+    session.clear_session_cache()
+    session._secret = None
+
+    assert session.get_session(token) == ("budi@example.com", "Budi", "Pribadi")
+
+
+def test_session_rejects_invalid_tokens(temp_db):
+    """Forged, expired and revoked tokens are refused"""
+    token = session.create_session("budi@example.com")
+    session_id = token.rsplit('.', 1)[0]
+
+    assert session.get_session(None) is None
+    assert session.get_session(session_id + ".bogus") is None
+
+    expired = session.create_session("budi@example.com", ttl=-1)
+    assert session.get_session(expired) is None
+
+    session.revoke_session(token)
+    assert session.get_session(token) is None
+
+
+def test_revocation_elsewhere_is_noticed(temp_db, monkeypatch):
+    """A session revoked by another process stops working once the cached copy is due for a check"""
+    token = session.create_session("budi@example.com")
+    assert session.get_session(token) is not None
+
+    # Another process logs out: this one's cache is untouched
+    session.storage.get_storage().delete_session(session._storage_key(token.rsplit('.', 1)[0]))
+    assert session.get_session(token) is not None
+
+    now = session.time.time()
+    monkeypatch.setattr(session.time, "time", lambda: now + session.SESSION_CACHE_TTL + 1)
+    assert session.get_session(token) is None
+
+
+def test_secret_file_is_private_and_shared(temp_db):
+    """The first process creates the secret file with mode 0600; the others read it"""
+    session._secret = None
+    if os.path.exists(session.SECRET_FILE):
+        os.remove(session.SECRET_FILE)
+    created = session._get_secret()
+    assert os.stat(session.SECRET_FILE).st_mode & 0o777 == 0o600
+
+    # Another process that loses the race uses the winner's secret
+    session._secret = None
+    assert session._get_secret() == created
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for the sharded storage backend
+"""
+import os
+import sqlite3
+
+from utils import helpers, storage
+from utils.storage.sharded import HashRing, ShardedStorage, rebalance, shard_name
+
+EMAILS = [f"user{i}@example.com" for i in range(2000)]
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    count = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_ring_spreads_users_evenly():
+    ring = HashRing([shard_name(i) for i in range(4)])
+    counts = {}
+    for email in EMAILS:
+        shard = ring.node_for(email)
+        counts[shard] = counts.get(shard, 0) + 1
+
+    assert len(counts) == 4
+    assert all(0.15 < count / len(EMAILS) < 0.35 for count in counts.values())
+
+
+def test_adding_a_shard_only_moves_users_to_it():
+    before = HashRing([shard_name(i) for i in range(4)])
+    after = HashRing([shard_name(i) for i in range(5)])
+    moved = [email for email in EMAILS if before.node_for(email) != after.node_for(email)]
+
+    assert all(after.node_for(email) == shard_name(4) for email in moved)
+    assert 0.1 < len(moved) / len(EMAILS) < 0.3
+
+
+def test_user_calls_touch_one_shard(sharded_db):
+    helpers.save_transaction("budi@example.com", "2024-01-01", "Pribadi", "Pemasukan", "Gaji", 5000000, "")
+    helpers.save_transaction("budi@example.com", "2024-01-02", "Pribadi", "Pengeluaran", "Kopi", 25000, "")
+
+    home = sharded_db.transactions_path("budi@example.com")
+    assert _rows(home) == 2
+    assert _rows(helpers.DB_PATH) == 0
+    assert sum(_rows(sharded_db.shard_path(shard)) for shard in sharded_db.shards) == 2
+    assert helpers.get_summary("budi@example.com")["saldo"] == 4975000
+
+
+def test_rebalance_moves_rows_and_bumps_versions(sharded_db, tmp_path):
+    for i in range(60):
+        helpers.save_transaction(f"user{i}@example.com", "2024-01-01", "Pribadi", "Pengeluaran", "Kopi", 1000 + i, "")
+    versions = {f"user{i}@example.com": helpers.get_data_version(f"user{i}@example.com") for i in range(60)}
+
+    grown = ShardedStorage(shards=5, shard_dir=sharded_db.shard_dir)
+    storage.set_storage(grown)
+    moves = rebalance(grown)
+
+    assert moves and all(target.endswith(("shard_03.db", "shard_04.db")) for _, _, target, _ in moves)
+    assert sum(_rows(grown.shard_path(shard)) for shard in grown.shards) == 60
+    for i in range(60):
+        email = f"user{i}@example.com"
+        assert helpers.get_transactions(email)["Jumlah"].tolist() == [1000 + i]
+        if any(move[0] == email for move in moves):
+            assert helpers.get_data_version(email) > versions[email]
+    assert rebalance(grown) == []
+
+
+def test_rebalance_migrates_unsharded_database(temp_db, tmp_path):
+    helpers.save_transaction("budi@example.com", "2024-01-01", "Pribadi", "Pemasukan", "Gaji", 5000000, "")
+
+    sharded = ShardedStorage(shards=3, shard_dir=str(tmp_path / "shards"))
+    storage.set_storage(sharded)
+    moves = rebalance(sharded)
+
+    assert [(move[0], move[3]) for move in moves] == [("budi@example.com", 1)]
+    assert _rows(temp_db) == 0
+    assert helpers.get_transactions("budi@example.com")["Item"].tolist() == ["Gaji"]
+
+
+def test_cross_shard_queries(sharded_db):
+    for i in range(30):
+        helpers.save_transaction(f"user{i}@example.com", "2024-01-01", "Pribadi", "Pengeluaran", "Kopi", 1000, "")
+
+    stats = sharded_db.shard_stats()
+    assert stats["transactions"].sum() == 30
+    assert stats["users"].sum() == 30
+    totals = sharded_db.query_all("SELECT SUM(jumlah) AS total FROM transactions")
+    assert totals["total"].sum() == 30000
+    assert all(os.path.exists(sharded_db.shard_path(shard)) for shard in sharded_db.shards)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for the columnar analytics snapshots
+"""
+import os
+
+import pytest
+
+from utils import helpers, snapshot
+
+pytest.importorskip("pyarrow")
+
+EMAIL = "budi@example.com"
+
+
+@pytest.fixture
+def snapshots(temp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    return snapshot.snapshot_dir(EMAIL)
+
+
+def _save(item, jumlah, jenis="Pengeluaran"):
+    helpers.save_transaction(EMAIL, "2024-01-01", "Pribadi", jenis, item, jumlah, "")
+
+
+def _assert_matches_database(df):
+    expected = helpers.get_transactions(EMAIL)
+    assert df["Item"].tolist() == expected["Item"].tolist()
+    assert df["Jumlah"].tolist() == expected["Jumlah"].tolist()
+    assert df["Jenis"].astype(str).tolist() == expected["Jenis"].tolist()
+
+
+def test_snapshot_matches_database(snapshots):
+    _save("Gaji", 5000000, "Pemasukan")
+    _save("Kopi", 25000)
+
+    df = snapshot.load(EMAIL)
+    assert list(df.columns) == ["Tanggal", "Jenis", "Item", "Jumlah", "Catatan"]
+    assert str(df["Jenis"].dtype) == "category"
+    _assert_matches_database(df)
+
+
+def test_inserts_are_appended_as_deltas(snapshots):
+    _save("Gaji", 5000000, "Pemasukan")
+    snapshot.load(EMAIL)
+    base = snapshot._read_meta(snapshots)["base"]
+
+    _save("Kopi", 25000)
+    _save("Bensin", 30000)
+    df = snapshot.load(EMAIL)
+
+    meta = snapshot._read_meta(snapshots)
+    assert meta["base"] == base and len(meta["deltas"]) == 1
+    _assert_matches_database(df)
+
+
+def test_deltas_are_compacted(snapshots, monkeypatch):
+    monkeypatch.setattr(snapshot, "MAX_DELTAS", 2)
+    _save("Item 0", 1000)
+    snapshot.load(EMAIL)
+    for i in range(1, 5):
+        _save(f"Item {i}", 1000 + i)
+        snapshot.load(EMAIL)
+
+    meta = snapshot._read_meta(snapshots)
+    assert len(meta["deltas"]) <= 2
+    assert sorted(os.listdir(snapshots)) == sorted([meta["base"], "meta.json"] + meta["deltas"])
+    _assert_matches_database(snapshot.load(EMAIL))
+
+
+def test_changed_rows_trigger_rebuild(snapshots):
+    _save("Kopi", 25000)
+    snapshot.load(EMAIL)
+
+    # An edit that bumps the version without inserting must not be appended
+    def edit(cursor):
+        cursor.execute("UPDATE transactions SET jumlah = 30000 WHERE email = ?", (EMAIL,))
+        helpers.bump_data_version(cursor, EMAIL)
+    helpers.run_write(edit)
+
+    assert snapshot.load(EMAIL)["Jumlah"].tolist() == [30000]
+    assert snapshot._read_meta(snapshots)["deltas"] == []
+
+
+def test_edits_and_deletes_are_patched(snapshots, monkeypatch):
+    _save("Gaji", 5000000, "Pemasukan")
+    _save("Kopi", 25000)
+    _save("Bensin", 30000)
+    snapshot.load(EMAIL)
+    ids = helpers.get_transactions(EMAIL, ["id", "Item"]).set_index("Item")["id"]
+
+    # Later refreshes read only the changed rows
+    monkeypatch.setattr(snapshot, "_rebuild", None)
+    helpers.update_transaction(EMAIL, ids["Kopi"], Jumlah=27000)
+    helpers.delete_transactions(EMAIL, [ids["Bensin"]])
+    df = snapshot.load(EMAIL)
+
+    assert sorted(zip(df["Item"], df["Jumlah"])) == [("Gaji", 5000000), ("Kopi", 27000)]
+    assert snapshot._read_meta(snapshots)["rows"] == 2
+
+
+def test_load_survives_a_concurrent_refresh(snapshots, monkeypatch):
+    _save("Kopi", 25000)
+    stale = snapshot.refresh(EMAIL)
+    # Another reader's refresh writes a new base and unlinks the one stale names
+    helpers.delete_transactions(EMAIL, helpers.get_transactions(EMAIL, ["id"])["id"].tolist())
+    _save("Teh", 10000)
+    snapshot.refresh(EMAIL)
+    assert not os.path.exists(os.path.join(snapshots, stale["base"]))
+
+    refresh = snapshot.refresh
+    calls = []
+    monkeypatch.setattr(snapshot, "refresh", lambda email, version=None: calls.append(version) or (stale if len(calls) == 1 else refresh(email, version)))
+    assert snapshot.load_table(EMAIL)["Item"].to_pylist() == ["Teh"]
+    assert len(calls) == 2
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the monthly PDF statements
+"""
+import datetime
+import os
+import time
+
+from utils import helpers, ledgers, statements, storage
+
+EMAIL = "budi@example.com"
+TODAY = datetime.date(2024, 3, 10)
+
+
+def _fill():
+    helpers.save_transaction(EMAIL, "2024-01-05", "Pribadi", "Pemasukan", "Gaji", 5000000, "")
+    helpers.save_transaction(EMAIL, "2024-01-06", "Pribadi", "Pengeluaran", "Bensin", 40000, "", "Transportasi")
+    helpers.save_transaction(EMAIL, "2024-01-20", "Pribadi", "Pengeluaran", "Sate", 35000, "", "Makanan & Minuman")
+    helpers.save_transaction(EMAIL, "2024-01-21", "Pribadi", "Pengeluaran", "Sate", 30000, "")
+    helpers.save_transaction(EMAIL, "2024-02-01", "Pribadi", "Pengeluaran", "Pulsa", 50000, "")
+    # The current month has not ended yet
+    helpers.save_transaction(EMAIL, "2024-03-02", "Pribadi", "Pengeluaran", "Kopi", 25000, "")
+
+
+def _objects():
+    return sorted(name for _, _, names in os.walk(os.path.join(statements._root(), "objects")) for name in names)
+
+
+def test_statements_of_ended_months(temp_db):
+    _fill()
+    assert statements.generate(TODAY) == 2
+    assert statements.available(EMAIL) == ["2024-02", "2024-01"]
+    assert statements.read(EMAIL, "2024-01").startswith(b"%PDF")
+    assert statements.read(EMAIL, "2024-03") is None
+    assert statements.month_label("2024-01") == "Januari 2024"
+
+    content = statements.statement_content("2024-01", statements._month_rows(EMAIL, "2024-01"), "Budi")
+    assert (content["pemasukan"], content["pengeluaran"], content["saldo"], content["transaksi"]) == (
+        5000000, 105000, 4895000, 4,
+    )
+    assert content["kategori"] == [["Transportasi", 40000], ["Makanan & Minuman", 35000], [statements.NO_KATEGORI, 30000]]
+    assert content["item"] == [["Sate", 2, 65000], ["Bensin", 1, 40000]]
+    assert len(content["harian"]) == 31 and content["harian"][5] == 40000
+    assert statements.content_key(EMAIL, content) == statements._read_index(EMAIL)["months"]["2024-01"]["key"]
+
+
+def test_only_changed_months_are_rendered_again(temp_db):
+    _fill()
+    statements.generate(TODAY)
+    january = statements.read(EMAIL, "2024-01")
+    objects = _objects()
+
+    # Nothing changed: nothing rendered; a change in the open month does not count either
+    assert statements.generate(TODAY) == 0
+    helpers.save_transaction(EMAIL, "2024-03-05", "Pribadi", "Pengeluaran", "Roti", 15000, "")
+    assert statements.generate(TODAY) == 0
+
+    # An edit in February renders February only and replaces its old file
+    february = storage.get_storage().get_transactions(EMAIL, ["id"], "2024-02-01", "2024-02-29")["id"].iloc[0]
+    helpers.update_transaction(EMAIL, int(february), Item="Paket Data")
+    assert statements.generate(TODAY) == 1
+    assert statements.read(EMAIL, "2024-01") == january
+    assert len(_objects()) == 2 and _objects() != objects
+
+    # Moving February's row into March empties February; March gets its statement once it ends
+    helpers.update_transaction(EMAIL, int(february), Tanggal="2024-03-01")
+    assert statements.generate(TODAY) == 0
+    assert statements.available(EMAIL) == ["2024-01"]
+    assert statements.generate(datetime.date(2024, 4, 1)) == 1
+    assert statements.available(EMAIL) == ["2024-03", "2024-01"]
+    assert len(_objects()) == 2
+
+
+def test_ledger_statements(temp_db):
+    ledger = ledgers.create_ledger(EMAIL, "Keluarga")
+    book = ledgers.book_key(ledger)
+    helpers.save_transaction(book, "2024-02-10", "Keluarga", "Pengeluaran", "Listrik", 300000, "")
+    assert statements.generate(TODAY) == 1
+    assert statements.available(book) == ["2024-02"]
+    assert statements.available(EMAIL) == []
+
+
+def test_rendered_in_a_process_pool(temp_db, monkeypatch):
+    _fill()
+    monkeypatch.setattr(statements, "RENDER_BATCH", 1)
+    assert statements.generate(TODAY, workers=2) == 2
+    assert statements.read(EMAIL, "2024-02").startswith(b"%PDF")
+
+
+def test_sharded_statements(sharded_db):
+    for i in range(6):
+        helpers.save_transaction(f"user{i}@example.com", "2024-01-15", "Pribadi", "Pengeluaran", "Kopi", 1000, "")
+    assert statements.generate(TODAY) == 6
+    assert all(statements.available(f"user{i}@example.com") == ["2024-01"] for i in range(6))
+
+
+def test_scheduler_renders_statements(temp_db):
+    helpers.save_transaction(EMAIL, "2001-01-01", "Pribadi", "Pengeluaran", "Kopi", 1000, "")
+    statements.start_scheduler(interval=60)
+    try:
+        deadline = time.time() + 10
+        while not statements.available(EMAIL) and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        statements.stop_scheduler()
+    assert statements.available(EMAIL) == ["2001-01"]
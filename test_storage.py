@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Shared test suite for the storage backends; every test runs against SQLite
+and, when TEST_DATABASE_URL is set, against PostgreSQL
+"""
+import pytest
+
+from utils import helpers, session, storage
+
+EMAIL = "budi@example.com"
+
+
+def _fill(rows):
+    for tanggal, jenis, jumlah in rows:
+        helpers.save_transaction(EMAIL, tanggal, "Pribadi", jenis, f"{jenis} {tanggal}", jumlah, "")
+
+
+def test_users(backend_db):
+    assert helpers.db_health_check()
+    assert helpers.verify_user(EMAIL, "rahasia") == ("Budi", "Pribadi")
+    assert helpers.verify_user(EMAIL, "salah") is None
+    assert not helpers.create_user("Budi", EMAIL, "lagi", "Pribadi")
+    assert helpers.get_user_info(EMAIL) == ("Budi", "Pribadi")
+    assert helpers.get_user_info("siapa@example.com") is None
+
+
+def test_transactions_and_data_version(backend_db):
+    assert helpers.get_data_version(EMAIL) == 0
+    assert helpers.get_transactions(EMAIL).empty
+
+    _fill([("2024-01-05", "Pemasukan", 5000000), ("2024-01-06", "Pengeluaran", 25000)])
+
+    df = helpers.get_transactions(EMAIL)
+    assert list(df.columns) == ["Tanggal", "Jenis", "Item", "Jumlah", "Catatan"]
+    assert df["Tanggal"].dt.strftime("%Y-%m-%d").tolist() == ["2024-01-05", "2024-01-06"]
+    assert df["Jumlah"].tolist() == [5000000, 25000]
+    assert helpers.get_data_version(EMAIL) == 2
+
+
+def test_transactions_are_typed(backend_db):
+    _fill([("2024-01-06", "Pengeluaran", 25000.4), ("2024-01-05", "Pemasukan", 5000000)])
+
+    df = helpers.get_transactions(EMAIL)
+    assert str(df["Tanggal"].dtype).startswith("datetime64")
+    assert str(df["Jenis"].dtype) == "category"
+    assert str(df["Jumlah"].dtype) == "int64"
+    # Ordered by date, whatever the insertion order
+    assert df["Jumlah"].tolist() == [5000000, 25000]
+
+    subset = helpers.get_transactions(EMAIL, ["Jenis", "Jumlah"])
+    assert list(subset.columns) == ["Jenis", "Jumlah"]
+
+
+def test_summary_matches_pandas(backend_db):
+    _fill([
+        ("2024-01-05", "Pemasukan", 5000000),
+        ("2024-01-06", "Pengeluaran", 25000),
+        ("2024-02-01", "Pengeluaran", 75000),
+        ("2024-02-03", "Tabungan", 500000),
+    ])
+
+    assert helpers.get_summary(EMAIL) == helpers.calculate_summary(helpers.get_transactions(EMAIL))
+    february = helpers.get_summary(EMAIL, "2024-02-01", "2024-02-29")
+    assert february == {"pemasukan": 0, "pengeluaran": 75000, "tabungan": 500000, "saldo": -75000}
+
+
+def test_keyset_pagination(backend_db):
+    # Two rows share a date so the id tiebreaker is exercised
+    _fill([(f"2024-03-{day:02d}", "Pengeluaran", day * 1000) for day in (1, 2, 2, 3, 4, 5, 6)])
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = helpers.get_recent_transactions(EMAIL, limit=3, after=cursor)
+        pages.append(page["Jumlah"].tolist())
+        if cursor is None:
+            break
+
+    assert pages == [[6000, 5000, 4000], [3000, 2000, 2000], [1000]]
+
+
+def test_iter_transactions_streams_in_batches(backend_db):
+    _fill([(f"2024-03-{day:02d}", "Pengeluaran", day * 1000) for day in (5, 1, 3, 2, 4)])
+
+    batches = list(storage.get_storage().iter_transactions(EMAIL, ["Tanggal", "Jumlah"], batch=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [tuple(row) for batch in batches for row in batch] == [
+        (f"2024-03-{day:02d}", day * 1000) for day in (1, 2, 3, 4, 5)
+    ]
+
+
+def test_sessions(backend_db):
+    token = session.create_session(EMAIL)
+    session.clear_session_cache()
+    assert session.get_session(token) == (EMAIL, "Budi", "Pribadi")
+
+    session.revoke_session(token)
+    session.clear_session_cache()
+    assert session.get_session(token) is None
+
+
+def _ids():
+    return helpers.get_transactions(EMAIL, ["id", "Item"]).set_index("Item")["id"]
+
+
+def test_edit_and_delete_as_one_diff(backend_db):
+    _fill([("2024-01-05", "Pemasukan", 5000000), ("2024-01-06", "Pengeluaran", 25000), ("2024-02-01", "Pengeluaran", 75000)])
+    ids = _ids()
+
+    result = helpers.apply_transaction_changes(
+        EMAIL,
+        inserts=[{"Tanggal": "2024-02-03", "Jenis": "Tabungan", "Jumlah": 500000, "Item": "Deposito"}],
+        updates={ids["Pengeluaran 2024-01-06"]: {"Jumlah": 30000, "Tanggal": "2024-02-02"}},
+        deletes=[ids["Pengeluaran 2024-02-01"]],
+        kategori_pengguna="Pribadi",
+    )
+
+    assert result == {"inserted": 1, "updated": 1, "deleted": 1, "ids": [_ids()["Deposito"]]}
+    # Once per row written, like inserts
+    assert helpers.get_data_version(EMAIL) == 6
+    df = helpers.get_transactions(EMAIL)
+    assert df["Item"].tolist() == ["Pemasukan 2024-01-05", "Pengeluaran 2024-01-06", "Deposito"]
+    assert df["Jumlah"].tolist() == [5000000, 30000, 500000]
+    # Totals from the rollup follow the edits
+    assert helpers.get_summary(EMAIL) == helpers.calculate_summary(df)
+    assert helpers.get_summary(EMAIL, "2024-02-01", "2024-02-29")["pengeluaran"] == 30000
+    assert helpers.get_summary(EMAIL, "2024-01-01", "2024-01-31")["pengeluaran"] == 0
+    page, _ = helpers.get_recent_transactions(EMAIL, limit=10)
+    assert len(page) == 3
+
+
+def test_edits_only_touch_own_rows(backend_db):
+    _fill([("2024-01-05", "Pengeluaran", 25000)])
+    transaction_id = _ids().iloc[0]
+
+    assert not helpers.update_transaction("siti@example.com", transaction_id, Jumlah=1)
+    assert helpers.delete_transactions("siti@example.com", [transaction_id]) == 0
+    assert helpers.delete_transactions(EMAIL, [transaction_id]) == 1
+    # Already deleted
+    assert helpers.delete_transactions(EMAIL, [transaction_id]) == 0
+    assert not helpers.update_transaction(EMAIL, transaction_id, Jumlah=1)
+    assert helpers.get_transactions(EMAIL).empty
+    assert helpers.get_summary(EMAIL)["pengeluaran"] == 0
+
+
+def test_invalid_edits_are_rejected(backend_db):
+    _fill([("2024-01-05", "Pengeluaran", 25000)])
+    transaction_id = _ids().iloc[0]
+
+    for values in (
+        {"Jenis": "Hadiah"}, {"Tanggal": "kemarin"}, {"Jumlah": None}, {"Saldo": 1},
+        {"Item": ["x"]}, {"Catatan": 5}, {"Jumlah": 1e300}, {"Jumlah": 2 ** 63}, {"Kategori": ["Lainnya"]},
+    ):
+        with pytest.raises(ValueError):
+            helpers.update_transaction(EMAIL, transaction_id, **values)
+    with pytest.raises(ValueError):
+        helpers.apply_transaction_changes(EMAIL, inserts=[{"Jenis": "Pemasukan", "Jumlah": 1}])
+    assert helpers.get_data_version(EMAIL) == 1
+
+
+def test_changes_and_compaction(backend_db):
+    _fill([("2024-01-05", "Pengeluaran", 25000), ("2024-01-06", "Pengeluaran", 30000)])
+    ids = _ids()
+    helpers.delete_transactions(EMAIL, [ids["Pengeluaran 2024-01-05"]])
+    backend = storage.get_storage()
+
+    changes = backend.get_changes(EMAIL, 2)
+    assert changes["id"].tolist() == [ids["Pengeluaran 2024-01-05"]]
+    assert changes["deleted"].tolist() == [True]
+
+    # Recently deleted rows are kept, older ones purged
+    assert helpers.compact_deleted() == 0
+    assert helpers.compact_deleted(retention=-1) == 1
+    assert backend.get_changes(EMAIL, 2) is None
+    assert backend.get_changes(EMAIL, 3).empty
+    assert helpers.get_transactions(EMAIL)["Jumlah"].tolist() == [30000]
@@ -1,6 +1,9 @@
 import os
 import pandas as pd
 
+from utils.metrics import timed
+
+@timed("ai.generate_financial_advice")
 def generate_financial_advice(df, kategori_pengguna):
     pemasukan_total = df[df['Jenis'] == 'Pemasukan']['Jumlah'].sum()
     pengeluaran_total = df[df['Jenis'] == 'Pengeluaran']['Jumlah'].sum()
@@ -24,12 +27,13 @@ Berikut adalah data keuangan saya bulan ini:
 Berikan saya saran keuangan singkat dalam 2-3 poin yang relevan dengan kondisi ini.
 """
 
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=150,
-                temperature=0.7,
-            )
+            with timed("ai.openai_request"):
+                response = openai.ChatCompletion.create(
+                    model="gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=150,
+                    temperature=0.7,
+                )
             advice = response['choices'][0]['message']['content'].strip()
         except Exception as e:
             advice = f"Gagal mendapatkan saran AI. Silakan cek koneksi atau API key Anda. Error: {str(e)}"
@@ -0,0 +1,99 @@
+"""
+Cold-data archiving for Keuangan-Pintar
+The transactions of closed years move out of the transactions table into one
+archive table per year (transactions_2023, ...) in the same database file, so
+the table every page reads holds recent years only. Archived rows keep their
+ids, their monthly totals, budget counters and search entries; reads whose
+date range reaches an archived year union its table back in (see
+utils.storage.sqlite). Archived transactions can no longer be edited.
+
+A year is closed ARCHIVE_GRACE_DAYS after it ended, leaving time for late
+entries. A background thread in each server process archives the closed
+years once per ARCHIVE_INTERVAL; archiving is idempotent, so several
+processes may run it. Run it by hand with:
+
+    python -m utils.archive run [--before 2025]
+    python -m utils.archive list
+
+PostgreSQL keeps every year in one table, where the (email, tanggal) index
+already narrows reads to a date range; archiving only applies to the SQLite
+backends.
+
+Configuration (environment):
+    ARCHIVE_GRACE_DAYS   days into a year before the previous one is archived (default 31)
+    ARCHIVE_INTERVAL     seconds between scheduler runs (default 86400)
+    ARCHIVE_SCHEDULER    set to 0 to not start the scheduler thread
+"""
+import argparse
+import datetime
+import logging
+import os
+
+from utils import concurrency, helpers, storage
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+GRACE_DAYS = int(os.getenv("ARCHIVE_GRACE_DAYS", "31"))
+SCHEDULER_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", "86400"))
+
+def first_open_year(today=None):
+    """The oldest year that is not closed yet; every year before it may be archived"""
+    today = today or datetime.date.today()
+    return (today - datetime.timedelta(days=GRACE_DAYS)).year
+
+@timed("archive.run")
+def archive(before=None, today=None):
+    """
+    Move the transactions of every year before the given one (default:
+    first_open_year) into their archives; returns {tahun: rows moved}
+    """
+    open_year = first_open_year(today)
+    before = open_year if before is None else int(before)
+    if before > open_year:
+        raise ValueError(f"Tahun {open_year} belum ditutup dan tidak bisa diarsipkan")
+    return storage.get_storage().archive_before(before)
+
+def transaction_years(email):
+    """(tahun, archived) for every year the user has transactions in, newest first"""
+    return storage.get_storage().transaction_years(email)
+
+def _run_scheduled():
+    moved = archive()
+    if moved:
+        logger.info("archived %d transactions of %s", sum(moved.values()), ", ".join(sorted(moved)))
+
+_scheduler = concurrency.Scheduler("archive-scheduler", concurrency.periodic(_run_scheduled, "archive scheduler"), "ARCHIVE_SCHEDULER")
+
+def start_scheduler(interval=None):
+    """Start the background archiver once per process; the first run happens immediately"""
+    return _scheduler.start(interval or SCHEDULER_INTERVAL)
+
+def stop_scheduler():
+    """Stop the scheduler thread, e.g. in tests"""
+    _scheduler.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=helpers.DB_PATH, help="main database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="archive the closed years")
+    run_parser.add_argument("--before", type=int, default=None, help="archive the years before this one")
+    commands.add_parser("list", help="archived years and their rows")
+    args = parser.parse_args()
+
+    helpers.DB_PATH = args.db
+    helpers.bootstrap_db()
+    if args.command == "run":
+        try:
+            moved = archive(args.before)
+        except (ValueError, NotImplementedError) as e:
+            parser.error(str(e) or "the storage backend does not archive transactions")
+        for tahun, rows in sorted(moved.items()):
+            print(f"{tahun}: {rows} transactions archived")
+        print(f"archived {sum(moved.values())} transactions")
+    else:
+        print(storage.get_storage().archived_years().to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,572 @@
+"""
+Online backups and point-in-time restore for the SQLite backends
+A snapshot copies every database file (the main database and, with the
+sharded backend, each shard) with SQLite's online backup API in steps of
+STEP_PAGES pages. The copy runs inside one read transaction on the source,
+so it is consistent, never restarts when the app writes, and in WAL mode
+never blocks the writers. Each copy is gzipped into BACKUP_DIR/snapshots/<time>/
+with a manifest of checksums; the newest BACKUP_KEEP snapshots are kept.
+The verify command checks a snapshot's checksums and runs integrity_check
+on it, away from the live database.
+
+With BACKUP_WAL_ARCHIVE=1 the committed WAL frames are also archived every
+BACKUP_WAL_INTERVAL seconds (see WalArchive), so a snapshot can be rolled
+forward to any later point in time, to within that interval.
+
+One server process runs the scheduler at a time (a lock file in BACKUP_DIR);
+the others skip it. Postgres has its own tools (pg_dump, WAL archiving).
+
+Configuration (environment):
+    BACKUP_DIR           snapshots and WAL archive (default: backups/ next to DB_PATH)
+    BACKUP_INTERVAL      seconds between scheduled snapshots (default 86400)
+    BACKUP_KEEP          snapshots kept (default 7)
+    BACKUP_SCHEDULER     set to 0 to not start the backup thread
+    BACKUP_WAL_ARCHIVE   set to 1 to archive the WAL for point-in-time restore
+    BACKUP_WAL_INTERVAL  seconds between WAL archive runs (default 10)
+
+Command line:
+
+    python -m utils.backup snapshot
+    python -m utils.backup list
+    python -m utils.backup verify [SNAPSHOT]
+    python -m utils.backup restore [SNAPSHOT] TARGET_DIR [--until 2026-10-19T08:30]
+"""
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+
+from utils import concurrency, helpers, storage
+from utils.db_writer import BUSY_TIMEOUT
+from utils.storage.sqlite import SQLiteStorage
+
+try:
+    import fcntl
+except ImportError:  # Windows: no scheduler lock, run a single server process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = os.getenv("BACKUP_DIR")
+BACKUP_INTERVAL = int(os.getenv("BACKUP_INTERVAL", "86400"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+WAL_ARCHIVE = os.getenv("BACKUP_WAL_ARCHIVE", "0") == "1"
+WAL_INTERVAL = int(os.getenv("BACKUP_WAL_INTERVAL", "10"))
+
+RETRY_DELAY = 300  # seconds before a failed snapshot is tried again
+STEP_PAGES = 256  # pages copied per backup step, 1 MB with 4 KB pages
+STEP_SLEEP = 0.005  # seconds between steps, leaving the disk to the writers
+COMPRESS_LEVEL = 1  # gzip -1: 3-4x faster than the default for ~15% larger files, the app gets the CPU
+WAL_RESTART_BYTES = 16 * 1024 * 1024  # a WAL grown past this is fully checkpointed so it can restart
+RESTART_TAIL_BYTES = 1024 * 1024  # at most this much is checkpointed under the write lock, if the disk keeps up
+RESTART_ROUNDS = 4
+WAL_HEADER = 32
+FRAME_HEADER = 24
+MANIFEST = "manifest.json"
+
+def backup_dir():
+    return BACKUP_DIR or os.path.join(os.path.dirname(helpers.DB_PATH), "backups")
+
+def database_files():
+    """Every SQLite file of the configured backend, the main database first"""
+    backend = storage.get_storage()
+    if not isinstance(backend, SQLiteStorage):
+        raise ValueError(f"Backups cover the SQLite backends, not {backend.name}")
+    return backend.transaction_files()
+
+def _relative(path):
+    """A database file's name in snapshots, relative to the directory of DB_PATH"""
+    return os.path.relpath(path, os.path.dirname(os.path.abspath(helpers.DB_PATH)))
+
+def _stamp():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds")
+
+def online_backup(source, target, pages=STEP_PAGES, sleep=STEP_SLEEP):
+    """
+    Copy the database file source to target with the backup API, pages at a
+    time; the read transaction held throughout keeps the copy consistent
+    """
+    src = sqlite3.connect(source, timeout=BUSY_TIMEOUT, isolation_level=None)
+    dst = sqlite3.connect(target)
+    try:
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dst, pages=pages, sleep=sleep)
+        src.execute("COMMIT")
+    finally:
+        dst.close()
+        src.close()
+
+def _compress(path, target):
+    """gzip path into target; returns the sha256 of the uncompressed bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as raw, gzip.open(target, "wb", compresslevel=COMPRESS_LEVEL) as packed:
+        for chunk in iter(lambda: raw.read(1024 * 1024), b""):
+            digest.update(chunk)
+            packed.write(chunk)
+    return digest.hexdigest()
+
+def _decompress(path, target):
+    digest = hashlib.sha256()
+    with gzip.open(path, "rb") as packed, open(target, "wb") as raw:
+        for chunk in iter(lambda: packed.read(1024 * 1024), b""):
+            digest.update(chunk)
+            raw.write(chunk)
+    return digest.hexdigest()
+
+def _integrity(path):
+    """(integrity_check result, user_version) of a database file"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0], conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+def _user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+class _WalFile:
+    """Archive of one database file's WAL: numbered, gzipped segments of whole commits"""
+
+    def __init__(self, db_path, directory):
+        self.db_path = db_path
+        self.directory = directory
+        self.seq = 0  # number of the next segment
+        self._salts = None
+        self._offset = 0
+        self._frame_size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._reader = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._pin()
+
+    def _pin(self):
+        # An open read transaction keeps SQLite from checkpointing away or
+        # overwriting frames that are not archived yet
+        self._reader.execute("BEGIN")
+        self._reader.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+    def _checkpoint(self):
+        """Checkpoint what is archived; returns (frames in the WAL, frames not checkpointed)"""
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        try:
+            _, frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        finally:
+            conn.close()
+        return frames, frames - checkpointed
+
+    def _read_frames(self, committed=None):
+        """
+        Header and bytes of the whole commits appended since the last read,
+        up to frame number committed if given; (None, b"") if there are none
+        """
+        try:
+            with open(self.db_path + "-wal", "rb") as f:
+                header = f.read(WAL_HEADER)
+                if len(header) < WAL_HEADER:
+                    return None, b""
+                salts = header[16:24]
+                # A new salt means the WAL restarted: its frames start over from the beginning
+                offset = self._offset if salts == self._salts else WAL_HEADER
+                page_size = struct.unpack_from(">I", header, 8)[0]
+                frame = FRAME_HEADER + (65536 if page_size == 1 else page_size)
+                f.seek(offset)
+                data = f.read(-1 if committed is None else max(0, WAL_HEADER + committed * frame - offset))
+                if committed is not None:
+                    f.seek(0)
+                    if f.read(WAL_HEADER) != header:
+                        return None, b""  # Restarted while reading
+        except FileNotFoundError:
+            return None, b""
+        end = 0
+        for start in range(0, len(data) - frame + 1, frame):
+            if data[start + 8:start + 16] != salts:
+                break  # Left over from an earlier WAL generation
+            if committed is not None or struct.unpack_from(">I", data, start + 4)[0]:
+                end = start + frame  # A commit frame: everything up to here is durable
+        self._salts, self._offset, self._frame_size = salts, offset + end, frame
+        return header, data[:end]
+
+    def _archive(self, restart=False):
+        """Read the commits made since the last run and pin the WAL at its end; returns a pending segment"""
+        lock = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        try:
+            # Writers wait only while the latest frames are read and the WAL pinned again
+            lock.execute("BEGIN IMMEDIATE")
+            try:
+                header, frames = self._read_frames()
+                self._reader.execute("COMMIT")
+                if restart:
+                    # Everything is archived: with the last frames checkpointed the WAL restarts on the next write
+                    self._reader.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                self._pin()
+            finally:
+                lock.execute("ROLLBACK")
+        finally:
+            lock.close()
+        return header, frames, int(time.time() * 1000)
+
+    def poll(self):
+        """Archive the commits made since the last poll; returns the frames' byte count"""
+        # Most frames are read without the write lock: the pin keeps them in place, and
+        # the WAL holds committed frames up to the count the checkpoint reports
+        committed, _ = self._checkpoint()
+        header, frames = self._read_frames(committed)
+        pending = [(header, frames, int(time.time() * 1000))]
+        pending.append(self._archive())
+        for rounds_left in reversed(range(RESTART_ROUNDS)):
+            _, left = self._checkpoint()
+            if self._offset <= WAL_RESTART_BYTES:
+                break
+            if left * self._frame_size <= RESTART_TAIL_BYTES or not rounds_left:
+                # Only the few frames written meanwhile are checkpointed under the write lock
+                pending.append(self._archive(restart=True))
+                break
+            pending.append(self._archive())
+
+        # Compressed once the locks are released
+        for header, frames, archived_at in pending:
+            if frames:
+                seq, self.seq = self.seq, self.seq + 1
+                path = os.path.join(self.directory, f"{seq:08d}-{archived_at}.wal.gz")
+                with gzip.open(path + ".partial", "wb", compresslevel=COMPRESS_LEVEL) as f:
+                    f.write(header + frames)
+                os.replace(path + ".partial", path)
+        return sum(len(frames) for _, frames, _ in pending)
+
+    def close(self):
+        self._reader.close()
+
+class WalArchive:
+    """
+    Archives the committed WAL frames of every database file into
+    BACKUP_DIR/wal/<generation>/. A generation starts with a snapshot taken
+    once the archive is running; restoring replays its segments onto it.
+
+    Between runs each file's WAL is pinned by a read transaction, so no frame
+    is checkpointed away or overwritten before it is archived. A run takes the
+    write lock only while it reads the frames appended since the last one, and
+    checkpoints outside it. Once the WAL is past WAL_RESTART_BYTES, further
+    rounds archive and checkpoint the frames written meanwhile until only
+    RESTART_TAIL_BYTES are left, which a last locked step checkpoints so the
+    WAL can restart. Segments are compressed after the locks are released.
+    """
+
+    def __init__(self, files=None, root=None):
+        self.generation = _stamp()
+        self.directory = os.path.join(root or backup_dir(), "wal", self.generation)
+        self._files = [_WalFile(path, os.path.join(self.directory, _relative(path))) for path in files or database_files()]
+
+    def poll(self):
+        return sum(wal.poll() for wal in self._files)
+
+    def positions(self):
+        """Next segment number per database file"""
+        return {_relative(wal.db_path): wal.seq for wal in self._files}
+
+    def close(self):
+        for wal in self._files:
+            wal.close()
+
+def snapshot(archive=None, root=None):
+    """Take a compressed snapshot of every database file; returns its name"""
+    root = root or backup_dir()
+    name = _stamp()
+    partial = os.path.join(root, "snapshots", f".{name}.partial")
+    os.makedirs(partial)
+    manifest = {"name": name, "started_at": _now(), "files": {}}
+    if archive is not None:
+        # Replaying from these segments on is safe even if the copy already has their commits
+        manifest["wal"] = {"generation": archive.generation, "start": archive.positions()}
+    try:
+        for path in database_files():
+            relative = _relative(path)
+            raw = os.path.join(partial, "copy.db")
+            online_backup(path, raw)
+            user_version = _user_version(raw)
+            target = os.path.join(partial, relative + ".gz")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            manifest["files"][relative] = {
+                "sha256": _compress(raw, target),
+                "bytes": os.path.getsize(raw),
+                "user_version": user_version,
+            }
+            os.remove(raw)
+        if archive is not None:
+            # Segments up to here hold the commits the copies may already include
+            archive.poll()
+            manifest["wal"]["end"] = archive.positions()
+        manifest["finished_at"] = _now()
+        with open(os.path.join(partial, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(partial, os.path.join(root, "snapshots", name))
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return name
+
+def list_snapshots(root=None):
+    """Manifests of the complete snapshots, oldest first"""
+    directory = os.path.join(root or backup_dir(), "snapshots")
+    manifests = []
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        path = os.path.join(directory, name, MANIFEST)
+        if not name.startswith(".") and os.path.exists(path):
+            with open(path) as f:
+                manifests.append(json.load(f))
+    return manifests
+
+def prune(keep=None, root=None, current_generation=None):
+    """Delete all but the newest keep snapshots and the WAL segments only older ones need"""
+    root = root or backup_dir()
+    keep = BACKUP_KEEP if keep is None else keep
+    manifests = list_snapshots(root)
+    for manifest in manifests[:-keep] if keep else manifests:
+        shutil.rmtree(os.path.join(root, "snapshots", manifest["name"]))
+    kept = manifests[-keep:] if keep else []
+
+    # Per generation and file, the oldest segment a kept snapshot replays from
+    needed = {}
+    for manifest in kept:
+        if "wal" in manifest:
+            starts = needed.setdefault(manifest["wal"]["generation"], {})
+            for relative, seq in manifest["wal"]["start"].items():
+                starts[relative] = min(seq, starts.get(relative, seq))
+    wal_root = os.path.join(root, "wal")
+    for generation in os.listdir(wal_root) if os.path.isdir(wal_root) else []:
+        if generation not in needed and generation != current_generation:
+            shutil.rmtree(os.path.join(wal_root, generation))
+            continue
+        for relative, seq in needed.get(generation, {}).items():
+            for path, segment, _ in _segments(root, generation, relative):
+                if segment < seq:
+                    os.remove(path)
+
+def _segments(root, generation, relative):
+    """(path, number, archived at in ms) of a file's WAL segments, in order"""
+    directory = os.path.join(root, "wal", generation, relative)
+    segments = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        if name.endswith(".wal.gz"):
+            seq, archived_at = name[:-len(".wal.gz")].split("-")
+            segments.append((os.path.join(directory, name), int(seq), int(archived_at)))
+    return sorted(segments, key=lambda segment: segment[1])
+
+def _replay(db_file, segments):
+    """Write the page images of the segments' frames into db_file, in commit order"""
+    pages = None
+    with open(db_file, "r+b") as f:
+        for path in segments:
+            with gzip.open(path, "rb") as segment:
+                data = segment.read()
+            page_size = struct.unpack_from(">I", data, 8)[0]
+            page_size = 65536 if page_size == 1 else page_size
+            for start in range(WAL_HEADER, len(data), FRAME_HEADER + page_size):
+                page, commit = struct.unpack_from(">II", data, start)
+                f.seek((page - 1) * page_size)
+                f.write(data[start + FRAME_HEADER:start + FRAME_HEADER + page_size])
+                if commit:
+                    pages = (commit, page_size)
+        if pages is not None:
+            f.truncate(pages[0] * pages[1])
+
+def _find(name=None, until=None, root=None):
+    manifests = list_snapshots(root)
+    if name is not None:
+        for manifest in manifests:
+            if manifest["name"] == name:
+                return manifest
+        raise ValueError(f"No snapshot named {name}")
+    if until is not None:
+        manifests = [m for m in manifests if datetime.datetime.fromisoformat(m["finished_at"]) <= until]
+    if not manifests:
+        raise ValueError("No snapshot to restore" + (f" finished by {until.isoformat()}" if until else ""))
+    return manifests[-1]
+
+def verify(name=None, root=None):
+    """Check a snapshot (default: the newest): checksums, integrity and schema version; returns the problems found"""
+    root = root or backup_dir()
+    manifest = _find(name, root=root)
+    problems = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for relative, expected in manifest["files"].items():
+            raw = os.path.join(scratch, "check.db")
+            if _decompress(os.path.join(root, "snapshots", manifest["name"], relative + ".gz"), raw) != expected["sha256"]:
+                problems.append(f"{relative}: checksum mismatch")
+                continue
+            check, user_version = _integrity(raw)
+            if check != "ok":
+                problems.append(f"{relative}: {check}")
+            if user_version != expected["user_version"]:
+                problems.append(f"{relative}: user_version {user_version}, expected {expected['user_version']}")
+    return problems
+
+def restore(target_dir, name=None, until=None, root=None):
+    """
+    Restore a snapshot into target_dir, which must not hold database files
+    yet; with until (an aware datetime) the newest snapshot finished by then
+    is rolled forward through the WAL archive. Returns the restored paths.
+    Stop the app and swap the files in to put them live.
+    """
+    root = root or backup_dir()
+    manifest = _find(name, until, root)
+    if until is not None and "wal" not in manifest:
+        raise ValueError(f"Snapshot {manifest['name']} was taken without the WAL archive")
+    until_ms = until.timestamp() * 1000 if until is not None else None
+
+    restored = []
+    for relative, expected in manifest["files"].items():
+        target = os.path.join(target_dir, relative)
+        if os.path.exists(target):
+            raise ValueError(f"{target} already exists")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if _decompress(os.path.join(root, "snapshots", manifest["name"], relative + ".gz"), target) != expected["sha256"]:
+            raise ValueError(f"{relative}: checksum mismatch")
+        if until is not None:
+            wal = manifest["wal"]
+            start, end = wal["start"][relative], wal["end"][relative]
+            segments = []
+            for path, seq, archived_at in _segments(root, wal["generation"], relative):
+                if seq < start or (seq >= end and archived_at > until_ms):
+                    continue
+                if seq != start + len(segments):
+                    raise ValueError(f"{relative}: WAL segment {start + len(segments)} is missing")
+                segments.append(path)
+            if len(segments) < end - start:
+                raise ValueError(f"{relative}: WAL segment {start + len(segments)} is missing")
+            _replay(target, segments)
+        check, _ = _integrity(target)
+        if check != "ok":
+            raise ValueError(f"{relative}: integrity check failed after restore: {check}")
+        restored.append(target)
+    return restored
+
+def _lock(root):
+    """Lock file held by the one process that runs the scheduler; None if another holds it"""
+    os.makedirs(root, exist_ok=True)
+    f = open(os.path.join(root, ".scheduler.lock"), "w")
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+    return f
+
+def _seconds_until_due(root):
+    manifests = list_snapshots(root)
+    if not manifests:
+        return 0
+    last = datetime.datetime.fromisoformat(manifests[-1]["finished_at"]).timestamp()
+    return max(0, last + BACKUP_INTERVAL - time.time())
+
+def _scheduler_loop(stop):
+    lock = archive = None
+    try:
+        while True:
+            try:
+                root = backup_dir()
+                lock = lock or _lock(root)
+                if lock is not None:
+                    if WAL_ARCHIVE and archive is None:
+                        archive = WalArchive(root=root)
+                        # A new archive generation starts from a fresh snapshot
+                        snapshot(archive, root)
+                        prune(root=root, current_generation=archive.generation)
+                    elif archive is not None:
+                        archive.poll()
+                    if _seconds_until_due(root) == 0:
+                        name = snapshot(archive, root)
+                        logger.info("backup snapshot %s taken", name)
+                        prune(root=root, current_generation=archive.generation if archive else None)
+            except Exception:
+                logger.exception("backup failed")
+            if lock is not None and not WAL_ARCHIVE:
+                wait = _seconds_until_due(backup_dir()) or RETRY_DELAY
+            else:
+                wait = WAL_INTERVAL
+            if stop.wait(wait):
+                return
+    finally:
+        if archive is not None:
+            archive.close()
+        if lock is not None:
+            lock.close()
+
+_scheduler = concurrency.Scheduler("backup-scheduler", _scheduler_loop, "BACKUP_SCHEDULER")
+
+def start_scheduler():
+    """Start the background backup thread once per process"""
+    if not isinstance(storage.get_storage(), SQLiteStorage):
+        return None
+    return _scheduler.start()
+
+def stop_scheduler():
+    """Stop the backup thread, e.g. in tests"""
+    _scheduler.stop()
+
+def _parse_time(value):
+    moment = datetime.datetime.fromisoformat(value)
+    # A time without zone is local time
+    return moment if moment.tzinfo else moment.astimezone()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=helpers.DB_PATH, help="main database")
+    parser.add_argument("--backup-dir", default=None, help="defaults to BACKUP_DIR")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("snapshot", help="take a snapshot now and apply the retention")
+    commands.add_parser("list", help="snapshots, oldest first")
+    verify_parser = commands.add_parser("verify", help="check a snapshot's checksums and integrity")
+    verify_parser.add_argument("snapshot", nargs="?")
+    restore_parser = commands.add_parser("restore", help="restore a snapshot into an empty directory")
+    restore_parser.add_argument("snapshot", nargs="?", help="default: the newest (finished by --until)")
+    restore_parser.add_argument("target_dir")
+    restore_parser.add_argument("--until", type=_parse_time, help="roll forward through the WAL archive to this time")
+    args = parser.parse_args()
+
+    helpers.DB_PATH = args.db
+    root = args.backup_dir or backup_dir()
+    if args.command == "snapshot":
+        name = snapshot(root=root)
+        prune(root=root)
+        print(f"snapshot {name} in {os.path.join(root, 'snapshots', name)}")
+    elif args.command == "list":
+        for manifest in list_snapshots(root):
+            size = sum(os.path.getsize(os.path.join(root, "snapshots", manifest["name"], relative + ".gz"))
+                       for relative in manifest["files"])
+            wal = " +WAL" if "wal" in manifest else ""
+            print(f"{manifest['name']}  {len(manifest['files'])} files  {size // 1024} KB{wal}")
+    elif args.command == "verify":
+        try:
+            problems = verify(args.snapshot, root)
+        except ValueError as e:
+            parser.error(str(e))
+        for problem in problems:
+            print(problem)
+        print("FAILED" if problems else "OK")
+        raise SystemExit(1 if problems else 0)
+    else:
+        try:
+            restored = restore(args.target_dir, args.snapshot, args.until, root)
+        except ValueError as e:
+            parser.error(str(e))
+        for path in restored:
+            print(f"restored {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Monthly budgets for Keuangan-Pintar
+A budget limits one month's spending on a jenis (e.g. all Pengeluaran) or on
+an item (Pengeluaran whose item matches, ignoring case). Spending is tracked
+by running counters that every write updates, and the limits each month
+crossed (storage.BUDGET_ALERT_LEVELS percent) are recorded as the write
+lands, so reading the alerts never rescans the transactions.
+"""
+import datetime
+
+from utils import helpers, storage
+from utils.metrics import timed
+
+SCOPES = {"jenis": "Jenis", "item": "Item"}
+# Jenis that count as spending; a limit on Pemasukan would not be a budget
+BUDGET_JENIS = [jenis for jenis in helpers.JENIS_OPTIONS if jenis != "Pemasukan"]
+
+def current_month(today=None):
+    return (today or datetime.date.today()).strftime("%Y-%m")
+
+def set_budget(email, kategori, batas, scope="jenis"):
+    """Create or change the monthly limit for a jenis or an item; returns the budget id"""
+    if scope not in SCOPES:
+        raise ValueError(f"Cakupan anggaran tidak dikenal: {scope}")
+    kategori = (kategori or "").strip()
+    if scope == "jenis" and kategori not in BUDGET_JENIS:
+        raise ValueError(f"Jenis tidak bisa dianggarkan: {kategori}")
+    if not kategori:
+        raise ValueError("Item wajib diisi")
+    batas = helpers.to_rupiah(batas)
+    if batas <= 0:
+        raise ValueError("Batas anggaran harus lebih dari 0")
+    return storage.get_storage().set_budget(email, scope, kategori, batas)
+
+def list_budgets(email, bulan=None):
+    """The user's budgets with terpakai (spent) in the month, default: this month"""
+    return storage.get_storage().get_budgets(email, bulan or current_month())
+
+def delete_budget(email, budget_id):
+    return storage.get_storage().delete_budget(email, int(budget_id))
+
+@timed("budgets.alerts")
+def alerts(email, bulan=None):
+    """Budgets that reached an alert level in the month (default: this month), with the level"""
+    return storage.get_storage().budget_alerts(email, bulan or current_month())
+
+def describe(budget):
+    """Indonesian label of a budget, e.g. 'Item "makan siang"'"""
+    if budget["scope"] == "item":
+        return f'Item "{budget["kategori"]}"'
+    return budget["kategori"]
+
+def alert_message(alert):
+    """Indonesian alert text for one row of alerts()"""
+    persen = alert["terpakai"] * 100 / alert["batas"]
+    status = "terlampaui" if alert["level"] >= 100 else "hampir habis"
+    return (
+        f"Anggaran {describe(alert)} {status}: Rp{alert['terpakai']:,.0f} dari Rp{alert['batas']:,.0f} ({persen:.0f}%)"
+    )
@@ -0,0 +1,281 @@
+"""
+Automatic categories for Keuangan-Pintar
+Every transaction gets a kategori (helpers.KATEGORI_OPTIONS) from a small
+multinomial naive Bayes classifier trained per user, in NumPy only. Features
+are the words, word pairs and character 3/4-grams of the item, the words of
+the catatan and the jenis, hashed with CRC32 so they are stable across
+processes. A built-in set of example items lets a new user get suggestions
+before labelling anything; every kategori the user picks by hand is a label
+that the next training weighs in, and is never overwritten.
+
+Training and classifying the user's unlabelled rows run together on a
+background thread (schedule_retrain), in vectorized batches over the distinct
+(item, jenis, catatan) texts, so a user with hundreds of thousands of rows
+costs one pass over a few thousand texts.
+"""
+import io
+import logging
+import re
+import threading
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from utils import helpers, storage
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+HASH_MASK = (1 << 24) - 1
+ALPHA = 0.1  # additive smoothing of the feature counts
+LABEL_WEIGHT = 5.0  # a user's label counts as this many seed examples, so one correction is enough
+MIN_CONFIDENCE = 0.6  # posterior below which no kategori is suggested
+PREDICT_BATCH = 5000  # texts scored at once, bounding the (classes x features) gather
+WRITE_BATCH = 5000  # predictions per storage write
+MODEL_TTL = 60  # seconds a loaded model is reused before reading it from storage again
+AUTO_LABEL = "🤖 Otomatis"  # form choice that leaves the kategori to the classifier
+
+# Example items per kategori, trained before the user's own labels
+SEED_EXAMPLES = {
+    "Makanan & Minuman": [
+        "Makan siang", "Makan malam", "Sarapan", "Kopi", "Jajan", "Warung makan", "Restoran", "Bakso",
+        "Nasi goreng", "Minuman", "Snack", "GoFood", "GrabFood", "Teh", "Roti",
+    ],
+    "Transportasi": [
+        "Bensin", "Pertamina", "Ojek online", "Gojek", "Grab", "Parkir", "Tol", "Kereta", "KRL", "Bus",
+        "Taksi", "Servis motor", "Tiket pesawat",
+    ],
+    "Belanja": [
+        "Belanja bulanan", "Supermarket", "Minimarket", "Indomaret", "Alfamart", "Pakaian", "Sepatu",
+        "Tokopedia", "Shopee", "Elektronik", "Sabun", "Sayur",
+    ],
+    "Tagihan": [
+        "Listrik", "Token PLN", "Air PDAM", "Internet", "Wifi", "Pulsa", "Paket data", "BPJS", "Asuransi",
+        "Tagihan", "Langganan TV",
+    ],
+    "Tempat Tinggal": ["Sewa kos", "Kontrakan", "Sewa rumah", "Laundry", "Perabot", "Renovasi", "Iuran RT", "Gas elpiji"],
+    "Kesehatan": ["Obat", "Apotek", "Dokter", "Klinik", "Rumah sakit", "Vitamin", "Cek darah"],
+    "Pendidikan": ["SPP", "Uang kuliah", "Buku", "Kursus", "Les", "Seminar", "Alat tulis"],
+    "Hiburan": ["Bioskop", "Netflix", "Spotify", "Game", "Liburan", "Konser", "Hotel", "Nonton"],
+    "Pendapatan": ["Gaji", "Bonus", "Penjualan", "Transfer masuk", "Honor", "Komisi", "THR", "Uang saku"],
+    "Tabungan & Investasi": ["Tabungan bank", "Deposito", "Reksa dana", "Emas", "Saham", "Menabung"],
+    "Cicilan & Hutang": ["Cicilan motor", "Pinjaman teman", "Kartu kredit", "Paylater", "KPR", "Bayar hutang"],
+    "Lainnya": ["Sumbangan", "Arisan", "Hadiah", "Lain-lain", "Zakat", "Infaq"],
+}
+SEED_JENIS = {"Pendapatan": "Pemasukan", "Tabungan & Investasi": "Tabungan", "Cicilan & Hutang": "Hutang", "Lainnya": "Lainnya"}
+
+_WORD = re.compile(r"[^\W_]+")
+
+_models = {}  # email -> (loaded at, Model)
+_models_lock = threading.Lock()
+_seed_model = None
+_pending = set()
+_worker = None
+_worker_cond = threading.Condition()
+
+def _fold(text):
+    """Lowercase without diacritics, so 'Kafé' and 'kafe' share features"""
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def features(item, jenis=None, catatan=""):
+    """Feature strings of one transaction"""
+    words = _WORD.findall(_fold(item))
+    result = ["w:" + word for word in words]
+    result += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        result += ["g:" + padded[i:i + n] for n in (3, 4) for i in range(len(padded) - n + 1)]
+    result += ["c:" + word for word in _WORD.findall(_fold(catatan))]
+    if jenis:
+        result.append("j:" + jenis)
+    return result
+
+def _featurize(texts):
+    """(item, jenis, catatan) tuples -> hashed features in CSR form (hashes, indptr)"""
+    hashes, indptr = [], [0]
+    for item, jenis, catatan in texts:
+        hashes.extend(zlib.crc32(feature.encode()) & HASH_MASK for feature in features(item, jenis, catatan))
+        indptr.append(len(hashes))
+    return np.array(hashes, dtype=np.int64), np.array(indptr, dtype=np.int64)
+
+class Model:
+    """Naive Bayes over the features seen in training; unseen features are ignored"""
+
+    def __init__(self, features, log_prob, log_prior, labels=0):
+        self.features = features  # sorted feature hashes, (V,)
+        self.log_prob = log_prob  # log P(feature | kategori), (C, V)
+        self.log_prior = log_prior  # (C,)
+        self.labels = labels  # user labels it was trained on
+
+    def predict(self, texts):
+        """Kategori (None when unsure) and posterior for each (item, jenis, catatan)"""
+        texts = list(texts)
+        kategori = np.full(len(texts), None, dtype=object)
+        confidence = np.zeros(len(texts))
+        classes = np.array(helpers.KATEGORI_OPTIONS, dtype=object)
+        for start in range(0, len(texts), PREDICT_BATCH):
+            batch = texts[start:start + PREDICT_BATCH]
+            hashes, indptr = _featurize(batch)
+            rows = np.repeat(np.arange(len(batch)), np.diff(indptr))
+            columns = np.minimum(np.searchsorted(self.features, hashes), len(self.features) - 1)
+            known = self.features[columns] == hashes
+            rows, columns = rows[known], columns[known]
+            gathered = self.log_prob[:, columns]
+            scores = np.stack([np.bincount(rows, weights=g, minlength=len(batch)) for g in gathered])
+            scores += self.log_prior[:, None]
+            best = scores.argmax(axis=0)
+            posterior = 1 / np.exp(scores - scores.max(axis=0)).sum(axis=0)
+            sure = (posterior >= MIN_CONFIDENCE) & (np.bincount(rows, minlength=len(batch)) > 0)
+            kategori[start:start + len(batch)][sure] = classes[best[sure]]
+            confidence[start:start + len(batch)] = posterior
+        return kategori, confidence
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, features=self.features, log_prob=self.log_prob, log_prior=self.log_prior)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data, labels=0):
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(arrays["features"], arrays["log_prob"], arrays["log_prior"], labels)
+
+def _seed_texts():
+    texts, kategori = [], []
+    for name, items in SEED_EXAMPLES.items():
+        for item in items:
+            texts.append((item, SEED_JENIS.get(name, "Pengeluaran"), ""))
+            kategori.append(name)
+    return texts, kategori
+
+def train(texts, kategori, weights=None):
+    """Train on (item, jenis, catatan) tuples and their kategori, plus the seed examples"""
+    seed_texts, seed_kategori = _seed_texts()
+    texts = seed_texts + list(texts)
+    labelled = np.ones(len(texts) - len(seed_texts)) if weights is None else np.asarray(weights, dtype=float)
+    weights = np.concatenate([np.ones(len(seed_texts)), labelled * LABEL_WEIGHT])
+    codes = {name: code for code, name in enumerate(helpers.KATEGORI_OPTIONS)}
+    labels = np.array([codes[name] for name in seed_kategori + list(kategori)], dtype=np.int64)
+
+    hashes, indptr = _featurize(texts)
+    vocabulary, columns = np.unique(hashes, return_inverse=True)
+    n_classes, n_features = len(codes), len(vocabulary)
+    lengths = np.diff(indptr)
+    counts = np.bincount(
+        np.repeat(labels, lengths) * n_features + columns, weights=np.repeat(weights, lengths), minlength=n_classes * n_features,
+    ).reshape(n_classes, n_features)
+    class_weights = np.bincount(labels, weights=weights, minlength=n_classes)
+
+    log_prob = np.log(counts + ALPHA) - np.log(counts.sum(axis=1, keepdims=True) + ALPHA * n_features)
+    log_prior = np.log(class_weights + 1) - np.log(class_weights.sum() + n_classes)
+    return Model(vocabulary, log_prob.astype(np.float32), log_prior.astype(np.float32), len(texts) - len(seed_texts))
+
+def _distinct(frame, columns):
+    """Group codes of the rows and the distinct rows, in order of first appearance"""
+    keys = frame[columns].fillna("")
+    return keys.groupby(columns, sort=False).ngroup().to_numpy(), keys.drop_duplicates()
+
+def _texts(frame):
+    return list(frame[["Item", "Jenis", "Catatan"]].itertuples(index=False, name=None))
+
+def train_user(rows):
+    """Train on the labelled rows of storage.get_category_rows()"""
+    labelled = rows[rows["Label"] == 1]
+    codes, distinct = _distinct(labelled, ["Item", "Jenis", "Catatan", "Kategori"])
+    return train(_texts(distinct), distinct["Kategori"].tolist(), np.bincount(codes, minlength=len(distinct)))
+
+def classify(model, rows):
+    """Predicted kategori (None when unsure) for every row, predicting each distinct text once"""
+    codes, distinct = _distinct(rows, ["Item", "Jenis", "Catatan"])
+    kategori, _ = model.predict(_texts(distinct))
+    return kategori[codes]
+
+def _default_model():
+    global _seed_model
+    if _seed_model is None:
+        _seed_model = train([], [])
+    return _seed_model
+
+def get_model(email):
+    """The user's model, or one trained on the seed examples alone before the first training"""
+    with _models_lock:
+        cached = _models.get(email)
+    if cached and time.monotonic() - cached[0] < MODEL_TTL:
+        return cached[1]
+    stored = storage.get_storage().get_category_model(email)
+    model = Model.from_bytes(stored[2], stored[0]) if stored else _default_model()
+    with _models_lock:
+        _models[email] = (time.monotonic(), model)
+    return model
+
+def has_model(email):
+    return storage.get_storage().get_category_model(email) is not None
+
+def suggest(email, item, jenis, catatan=""):
+    """Kategori for a transaction being entered, or None when the model is unsure"""
+    if not str(item or "").strip():
+        return None
+    kategori, _ = get_model(email).predict([(item, jenis, catatan or "")])
+    return kategori[0]
+
+@timed("categories.retrain")
+def retrain(email):
+    """
+    Train the user's model on their labels, store it and re-classify the rows
+    they did not label; returns the number of rows whose kategori changed
+    """
+    backend = storage.get_storage()
+    rows = backend.get_category_rows(email)
+    model = train_user(rows)
+    backend.save_category_model(email, model.labels, model.to_bytes())
+    with _models_lock:
+        _models[email] = (time.monotonic(), model)
+
+    unlabelled = rows[rows["Label"] == 0]
+    if unlabelled.empty:
+        return 0
+    predicted = pd.Series(classify(model, unlabelled), index=unlabelled.index)
+    changed = predicted.fillna("") != unlabelled["Kategori"].fillna("")
+    updates = list(zip(unlabelled.loc[changed, "id"].tolist(), predicted[changed].tolist()))
+    written = 0
+    for start in range(0, len(updates), WRITE_BATCH):
+        written += backend.set_categories(email, updates[start:start + WRITE_BATCH])
+    return written
+
+def _retrain_loop():
+    global _worker
+    while True:
+        with _worker_cond:
+            if not _pending:
+                _worker = None
+                _worker_cond.notify_all()
+                return
+            email = _pending.pop()
+        try:
+            count = retrain(email)
+            logger.info("retrained categories, %d rows re-classified", count)
+        except Exception:
+            logger.exception("category retraining failed")
+
+def schedule_retrain(email):
+    """Retrain the user's model on the background thread; repeated requests while queued run once"""
+    global _worker
+    with _worker_cond:
+        _pending.add(email)
+        if _worker is None:
+            _worker = threading.Thread(target=_retrain_loop, name="category-retrain", daemon=True)
+            _worker.start()
+
+def wait_for_retrains(timeout=None):
+    """Block until the background thread is idle, e.g. in tests; False on timeout"""
+    with _worker_cond:
+        return _worker_cond.wait_for(lambda: _worker is None, timeout)
+
+def forget_models():
+    """Drop the loaded models, e.g. in tests"""
+    with _models_lock:
+        _models.clear()
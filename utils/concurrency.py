@@ -0,0 +1,111 @@
+"""
+Helpers for work that runs concurrently in Keuangan-Pintar
+Every server process runs the same background schedulers (recurring
+transactions, backups, the archive, monthly statements), and the API and
+Streamlit processes share the on-disk caches (snapshots, reports,
+statements). This module has the pieces they have in common:
+
+    Scheduler     a daemon thread started at most once per process
+    periodic      the loop of a scheduler that runs one job every interval
+    KeyedLocks    one threading.Lock per key, e.g. per book
+    file_key      the name a book's files get, without its email in it
+    atomic_path   write a file that other threads or processes may write at the same time
+    remove_file   remove a file that another process may have removed already
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class Scheduler:
+    """
+    A daemon thread running loop(stop, *args) until the stop event is set;
+    setting the environment variable env to 0 keeps it from starting
+    """
+
+    def __init__(self, name, loop, env=None):
+        self.name = name
+        self.loop = loop
+        self.env = env
+        self._thread = None
+        self._stop = None
+        self._lock = threading.Lock()
+
+    def start(self, *args):
+        """Start the thread unless it is already running; returns it, or None when disabled"""
+        if self.env and os.getenv(self.env, "1") == "0":
+            return None
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self.loop, args=(self._stop, *args), name=self.name, daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def stop(self):
+        """Stop the thread and wait for it, e.g. in tests"""
+        with self._lock:
+            if self._thread is not None:
+                self._stop.set()
+                self._thread.join()
+                self._thread = None
+
+def periodic(job, description):
+    """
+    A Scheduler loop taking an interval in seconds: job() runs right away and
+    then every interval. Failures are logged and retried at the next run; a
+    job raising NotImplementedError (its storage backend cannot do it) ends it.
+    """
+    def loop(stop, interval):
+        while True:
+            try:
+                job()
+            except NotImplementedError:
+                logger.info("the storage backend does not support the %s; stopped", description)
+                return
+            except Exception:
+                logger.exception("%s failed", description)
+            if stop.wait(interval):
+                return
+    return loop
+
+class KeyedLocks:
+    """One threading.Lock per key, created on first use; call with the key to get its lock"""
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __call__(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+def file_key(email):
+    """A stable name for a book's files; emails never appear in file names"""
+    return hashlib.sha256(email.encode()).hexdigest()[:24]
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """
+    Yield a temporary path to write in full; on success it replaces path in
+    one step, on failure it is removed. Every call gets its own temporary
+    name, so threads and processes writing the same file never share one.
+    """
+    tmp = f"{path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        remove_file(tmp)
+
+def remove_file(path):
+    """Remove path; True if this call removed it, False if it was already gone"""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
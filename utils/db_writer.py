@@ -0,0 +1,151 @@
+"""
+Single-writer queue for the SQLite database
+All writes in a server process go through one background thread that groups
+pending jobs into a single transaction (group commit), so concurrent sessions
+no longer fight over the write lock. Reads keep using their own connections
+and, with WAL enabled, see a consistent snapshot while writes are in flight.
+"""
+import functools
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+MAX_BATCH = 64  # jobs committed together
+BUSY_TIMEOUT = 5.0  # seconds sqlite waits for a lock before raising
+RETRY_ATTEMPTS = 6
+RETRY_BASE_DELAY = 0.01  # seconds, doubled on every attempt
+
+def is_busy_error(error):
+    """True for SQLITE_BUSY, also when wrapped by another exception (e.g. pandas)"""
+    while error is not None:
+        message = str(error).lower()
+        if isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message):
+            return True
+        error = error.__cause__
+    return False
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for the given 0-based attempt"""
+    return RETRY_BASE_DELAY * (2 ** attempt) * (0.5 + random.random())
+
+def retry_on_busy(fn):
+    """Retry a read or write that failed with SQLITE_BUSY / 'database is locked'"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_busy_error(e) or attempt == RETRY_ATTEMPTS - 1:
+                    raise
+                time.sleep(backoff_delay(attempt))
+    return wrapper
+
+class _Job:
+    __slots__ = ("db_path", "fn", "done", "result", "error")
+
+    def __init__(self, db_path, fn):
+        self.db_path = db_path
+        self.fn = fn
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class WriteQueue:
+    """
+    Background writer thread; submit() blocks until the job's transaction commits
+    """
+
+    def __init__(self, max_batch=MAX_BATCH):
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._conn = None
+        self._conn_path = None
+
+    def submit(self, db_path, fn):
+        """
+        Run fn(cursor) inside the writer's transaction and return its result;
+        exceptions raised by fn are re-raised in the caller
+        """
+        self._ensure_started()
+        job = _Job(db_path, fn)
+        self._jobs.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def _connection(self, db_path):
+        if self._conn_path != db_path:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn_path = db_path
+        return self._conn
+
+    def _run(self):
+        while True:
+            batch = [self._jobs.get()]
+            # Group whatever else is already waiting into the same commit
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job.db_path != batch[0].db_path:
+                    self._commit_batch(batch)
+                    batch = []
+                batch.append(job)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                self._execute_batch(batch)
+                break
+            except Exception as e:
+                # Every waiting caller must be released, whatever went wrong
+                if is_busy_error(e) and attempt < RETRY_ATTEMPTS - 1:
+                    time.sleep(backoff_delay(attempt))
+                    continue
+                for job in batch:
+                    job.result, job.error = None, e
+                break
+        for job in batch:
+            job.done.set()
+
+    def _execute_batch(self, batch):
+        conn = self._connection(batch[0].db_path)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for job in batch:
+                # A savepoint per job keeps one failing job from aborting the others
+                cursor.execute("SAVEPOINT job")
+                try:
+                    job.result, job.error = job.fn(cursor), None
+                    cursor.execute("RELEASE job")
+                except Exception as e:
+                    if is_busy_error(e):
+                        raise
+                    cursor.execute("ROLLBACK TO job")
+                    cursor.execute("RELEASE job")
+                    job.result, job.error = None, e
+            cursor.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
@@ -1,10 +1,204 @@
+import datetime
 import io
+import os
+
 import pandas as pd
 from fpdf import FPDF
 
+from utils import concurrency, helpers, storage
+from utils.metrics import timed
+
+# XLSX reports need XlsxWriter; XLSX_AVAILABLE is False without it
+try:
+    import xlsxwriter
+    XLSX_AVAILABLE = True
+except ImportError:
+    xlsxwriter = None
+    XLSX_AVAILABLE = False
+
+EXPORT_PAGE_SIZE = 5000  # rows read and encoded per chunk by iter_csv and write_xlsx
+EXPORT_DIR = os.getenv("EXPORT_DIR")  # default: exports/ next to helpers.DB_PATH
+XLSX_COLUMNS = storage.TRANSACTION_COLUMNS + ["Kategori"]
+XLSX_SHEET_ROWS = 1048575  # data rows that fit on a sheet under its header; more continue on the next one
+NO_KATEGORI = "Tanpa Kategori"
+EXCEL_EPOCH = datetime.date(1899, 12, 30).toordinal()  # day 0 of Excel's date serials
+
+_lock = concurrency.KeyedLocks()  # email -> lock held while writing the report
+
+@timed("export.export_to_csv")
 def export_to_csv(df):
     return df.to_csv(index=False).encode('utf-8')
 
+def iter_csv(email, page_size=EXPORT_PAGE_SIZE):
+    """
+    The user's transactions as CSV chunks, newest first, read one keyset page
+    at a time so memory stays flat however many rows the user has
+    """
+    after = None
+    header = True
+    while True:
+        df, after = helpers.get_recent_transactions(email, page_size, after)
+        yield df.drop(columns="id").to_csv(index=False, header=header, date_format="%Y-%m-%d").encode('utf-8')
+        header = False
+        if after is None:
+            return
+
+def _columns(preferred, present):
+    """The names of present in the order of preferred, then the others sorted"""
+    return [name for name in preferred if name in present] + sorted(set(present) - set(preferred))
+
+def _transaction_sheet(workbook, index, formats):
+    sheet = workbook.add_worksheet("Transaksi" if index == 0 else f"Transaksi {index + 1}")
+    sheet.set_column(0, 0, 12)
+    sheet.set_column(1, 1, 13)
+    sheet.set_column(2, 2, 30)
+    sheet.set_column(3, 3, 14)
+    sheet.set_column(4, 5, 24)
+    sheet.freeze_panes(1, 0)
+    sheet.write_row(0, 0, XLSX_COLUMNS, formats["header"])
+    return sheet
+
+def _write_summary(workbook, formats, months, counts):
+    """Ringkasan Bulanan: per month, the total of each jenis, the saldo and the number of transactions"""
+    sheet = workbook.add_worksheet("Ringkasan Bulanan")
+    jenis_columns = _columns(helpers.JENIS_OPTIONS, {jenis for totals in months.values() for jenis in totals})
+    sheet.set_column(0, 0, 10)
+    sheet.set_column(1, len(jenis_columns) + 2, 15)
+    sheet.freeze_panes(1, 1)
+    sheet.write_row(0, 0, ["Bulan"] + jenis_columns + ["Saldo", "Transaksi"], formats["header"])
+    for row, bulan in enumerate(sorted(months), start=1):
+        totals = months[bulan]
+        sheet.write_string(row, 0, bulan)
+        for column, jenis in enumerate(jenis_columns, start=1):
+            sheet.write_number(row, column, totals.get(jenis, 0), formats["money"])
+        sheet.write_number(row, len(jenis_columns) + 1, totals.get("Pemasukan", 0) - totals.get("Pengeluaran", 0), formats["money"])
+        sheet.write_number(row, len(jenis_columns) + 2, counts[bulan])
+
+def _write_pivot(workbook, formats, spending):
+    """Pivot Pengeluaran: months down, spending categories across, with a stacked column chart of it"""
+    sheet = workbook.add_worksheet("Pivot Pengeluaran")
+    present = {kategori for totals in spending.values() for kategori in totals}
+    kategori_columns = _columns(helpers.KATEGORI_OPTIONS, present - {NO_KATEGORI}) + sorted(present & {NO_KATEGORI})
+    sheet.set_column(0, 0, 10)
+    sheet.set_column(1, len(kategori_columns) + 1, 15)
+    sheet.freeze_panes(1, 1)
+    sheet.write_row(0, 0, ["Bulan"] + kategori_columns + ["Total"], formats["header"])
+    bulan_list = sorted(spending)
+    for row, bulan in enumerate(bulan_list, start=1):
+        totals = spending[bulan]
+        sheet.write_string(row, 0, bulan)
+        for column, kategori in enumerate(kategori_columns, start=1):
+            sheet.write_number(row, column, totals.get(kategori, 0), formats["money"])
+        sheet.write_number(row, len(kategori_columns) + 1, sum(totals.values()), formats["money"])
+    if not bulan_list:
+        return
+
+    chart = workbook.add_chart({"type": "column", "subtype": "stacked"})
+    for column, kategori in enumerate(kategori_columns, start=1):
+        chart.add_series({
+            "name": ["Pivot Pengeluaran", 0, column],
+            "categories": ["Pivot Pengeluaran", 1, 0, len(bulan_list), 0],
+            "values": ["Pivot Pengeluaran", 1, column, len(bulan_list), column],
+        })
+    chart.set_title({"name": "Pengeluaran per Kategori"})
+    chart.set_y_axis({"num_format": "#,##0"})
+    chart.set_size({"width": 960, "height": 480})
+    sheet.insert_chart(len(bulan_list) + 2, 0, chart)
+
+@timed("export.write_xlsx")
+def write_xlsx(email, path, page_size=EXPORT_PAGE_SIZE):
+    """
+    Write the user's XLSX report to path: every transaction, oldest first,
+    then the monthly totals per jenis and a month by category pivot of
+    Pengeluaran. Rows stream from one database cursor into XlsxWriter's
+    constant_memory mode, which flushes each row to disk as soon as the next
+    one starts, and the totals are summed on the way, so memory stays flat
+    however many rows the user has. Returns the number of transactions.
+    """
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "tmpdir": os.path.dirname(path) or None})
+    formats = {
+        "header": workbook.add_format({"bold": True, "bg_color": "#DDEBF7", "border": 1}),
+        "date": workbook.add_format({"num_format": "yyyy-mm-dd"}),
+        "money": workbook.add_format({"num_format": "#,##0"}),
+    }
+    months, counts, spending, serials = {}, {}, {}, {}
+    sheets, row = 0, 0
+    sheet = _transaction_sheet(workbook, sheets, formats)
+    for rows in storage.get_storage().iter_transactions(email, XLSX_COLUMNS, page_size):
+        for tanggal, jenis, item, jumlah, catatan, kategori in rows:
+            if row == XLSX_SHEET_ROWS:
+                sheets, row = sheets + 1, 0
+                sheet = _transaction_sheet(workbook, sheets, formats)
+            row += 1
+            if tanggal:
+                # Dates are written as Excel day numbers; there are far fewer days than rows
+                serial = serials.get(tanggal)
+                if serial is None:
+                    serial = serials[tanggal] = datetime.date.fromisoformat(tanggal).toordinal() - EXCEL_EPOCH
+                sheet.write_number(row, 0, serial, formats["date"])
+            if jenis:
+                sheet.write_string(row, 1, jenis)
+            if item:
+                sheet.write_string(row, 2, item)
+            sheet.write_number(row, 3, jumlah or 0, formats["money"])
+            if catatan:
+                sheet.write_string(row, 4, catatan)
+            if kategori:
+                sheet.write_string(row, 5, kategori)
+
+            bulan, jenis = (tanggal[:7] if tanggal else ""), jenis or ""
+            totals = months.setdefault(bulan, {})
+            totals[jenis] = totals.get(jenis, 0) + (jumlah or 0)
+            counts[bulan] = counts.get(bulan, 0) + 1
+            if jenis == "Pengeluaran":
+                by_kategori = spending.setdefault(bulan, {})
+                kategori = kategori or NO_KATEGORI
+                by_kategori[kategori] = by_kategori.get(kategori, 0) + (jumlah or 0)
+
+    _write_summary(workbook, formats, months, counts)
+    _write_pivot(workbook, formats, spending)
+    workbook.close()
+    return sum(counts.values())
+
+def xlsx_path(email, version):
+    root = EXPORT_DIR or os.path.join(os.path.dirname(helpers.DB_PATH), "exports")
+    return os.path.join(root, f"{concurrency.file_key(email)}-{version}.xlsx")
+
+def xlsx_report(email, version=None):
+    """
+    Path of the user's XLSX report for their data version, written by
+    write_xlsx on the first request and reused until the version moves on,
+    when the reports of older versions are removed
+    """
+    if version is None:
+        version = helpers.get_data_version(email)
+    path = xlsx_path(email, version)
+    with _lock(email):
+        if not os.path.exists(path):
+            directory, name = os.path.split(path)
+            os.makedirs(directory, exist_ok=True)
+            with concurrency.atomic_path(path) as tmp:
+                write_xlsx(email, tmp)
+            prefix = name.rsplit("-", 1)[0] + "-"
+            for other in os.listdir(directory):
+                if other.startswith(prefix) and other.endswith(".xlsx") and int(other[len(prefix):-5]) < version:
+                    concurrency.remove_file(os.path.join(directory, other))
+    return path
+
+@timed("export.export_to_xlsx")
+def export_to_xlsx(email, version=None):
+    """The bytes of xlsx_report, for a download button"""
+    with open(xlsx_report(email, version), "rb") as f:
+        return f.read()
+
+@timed("export.export_to_parquet")
+def export_to_parquet(df):
+    """Columnar export for spreadsheets and analytics tools; needs pyarrow"""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False, compression="zstd")
+    return buffer.getvalue()
+
+@timed("export.export_to_pdf")
 def export_to_pdf(df):
     # Create a temporary file name
     import tempfile
@@ -36,7 +230,9 @@ def export_to_pdf(df):
                 pdf.cell(col_widths[i], 10, str(h), border=1)
             pdf.ln()
 
-            # Rows
+            # Rows; dates print without the midnight time of datetime64 columns
+            if pd.api.types.is_datetime64_any_dtype(df.get("Tanggal")):
+                df = df.assign(Tanggal=df["Tanggal"].dt.strftime("%Y-%m-%d"))
             pdf.set_font("Arial", size=10)
             for index, row in df.iterrows():
                 for i, item in enumerate(row):
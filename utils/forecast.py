@@ -0,0 +1,261 @@
+"""
+Cash-flow forecasts for Keuangan-Pintar
+Projects the user's daily and monthly Pemasukan and Pengeluaran for the coming
+months, and the saldo they lead to, with an 80% band. Each of the two series
+is split into
+- recurring items: the same item in nearly every recent month with a steady
+  amount (salary, rent, subscriptions), projected on its usual day;
+- everything else, summed per calendar month, with the month-of-year pattern
+  taken out by seasonal decomposition once there are two years of history, a
+  level and damped trend fitted by exponential smoothing, and each month's
+  total spread over its days by the user's weekday profile.
+
+All of it works on series bucketed with np.bincount, so a user with years of
+history costs a few milliseconds; callers cache the result per data version.
+"""
+import datetime
+import math
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+SERIES = ("Pemasukan", "Pengeluaran")
+MIN_HORIZON, MAX_HORIZON = 1, 24  # months after the current one
+HISTORY_MONTHS = 36  # complete months the smoothing is fitted on
+SEASONAL_MONTHS = 24  # history needed before a month-of-year pattern is estimated
+MIN_FIT_MONTHS = 4  # below this the forecast is the mean month
+PROFILE_DAYS = 364  # days of history in the weekday profile
+MIN_PROFILE_WEEKS = 8
+RECURRING_LOOKBACK = 12  # complete months searched for recurring items
+RECURRING_MIN_MONTHS = 3
+RECURRING_MAX_CV = 0.25  # coefficient of variation of the amount
+BAND_Z = 1.2816  # 80% two-sided normal band
+ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.8)
+BETAS = (0.0, 0.1, 0.2)
+PHI = 0.9  # trend damping per month
+
+# daily: per future day, Pemasukan, Pengeluaran, Saldo and its band (Saldo_bawah, Saldo_atas)
+# monthly: per month (Bulan "YYYY-MM"), the series with their bands and the closing Saldo;
+#   the current month only counts the days after today
+# recurring: detected items with Jenis, Item, Jumlah and Hari (day of month)
+Forecast = namedtuple("Forecast", ["daily", "monthly", "recurring"])
+
+def _weekday(days):
+    """Monday = 0 for datetime64[D] values; 1970-01-01 was a Thursday"""
+    return (days.astype(np.int64) + 3) % 7
+
+def _smooth(y):
+    """
+    Damped-trend exponential smoothing fitted by one-step squared error over
+    the ALPHAS x BETAS grid, all of it at once; returns (level, trend, alpha, beta, sigma)
+    """
+    alpha, beta = (grid.ravel() for grid in np.meshgrid(ALPHAS, BETAS))
+    level, trend, sse = np.full(len(alpha), y[0]), np.zeros(len(alpha)), np.zeros(len(alpha))
+    for value in y[1:]:
+        predicted = level + PHI * trend
+        error = value - predicted
+        sse += error * error
+        level = predicted + alpha * error
+        trend = PHI * trend + alpha * beta * error
+    best = sse.argmin()
+    return level[best], trend[best], alpha[best], beta[best], math.sqrt(sse[best] / (len(y) - 1))
+
+def _seasonal(y, first_month):
+    """Additive month-of-year indices (12,) by classical decomposition around a 2x12 moving average"""
+    if len(y) < SEASONAL_MONTHS:
+        return np.zeros(12)
+    trend = np.convolve(y, np.r_[0.5, np.ones(11), 0.5] / 12, mode="valid")
+    moy = (first_month + np.arange(6, 6 + len(trend))) % 12
+    counts = np.bincount(moy, minlength=12)
+    index = np.bincount(moy, weights=y[6:6 + len(trend)] - trend, minlength=12) / np.maximum(counts, 1)
+    return index - index.mean()
+
+def _monthly_forecast(y, first_month, steps, fallback):
+    """Mean forecast and standard deviation of the next steps months after y"""
+    if len(y) == 0:
+        return np.full(steps, fallback), np.full(steps, fallback)
+    if len(y) < MIN_FIT_MONTHS:
+        level = y.mean()
+        return np.full(steps, level), np.full(steps, max(y.std(), 0.25 * level))
+    seasonal = _seasonal(y, first_month)
+    months = first_month + np.arange(len(y) + steps)
+    level, trend, alpha, beta, sigma = _smooth(y - seasonal[months[:len(y)] % 12])
+    damping = np.cumsum(PHI ** np.arange(1, steps + 1))
+    mean = level + damping * trend + seasonal[months[len(y):] % 12]
+    # ETS(A,Ad,N) forecast variance: sigma^2 (1 + sum over j < h of (alpha (1 + beta phi_j))^2)
+    c = alpha * (1 + beta * damping[:-1])
+    std = sigma * np.sqrt(1 + np.r_[0, np.cumsum(c ** 2)])
+    return np.maximum(mean, 0), std
+
+def _weekday_profile(days, amounts, today):
+    """Relative spending per weekday over the last PROFILE_DAYS, 1 everywhere with too little history"""
+    start = today - PROFILE_DAYS + 1
+    recent = days >= start
+    if not recent.any() or (today - days.min()).astype(int) < 7 * MIN_PROFILE_WEEKS:
+        return np.ones(7)
+    daily = np.bincount((days[recent] - start).astype(np.int64), weights=amounts[recent], minlength=PROFILE_DAYS)
+    totals = np.bincount(_weekday(np.arange(start, today + 1)), weights=daily, minlength=7)
+    if totals.sum() <= 0:
+        return np.ones(7)
+    return totals / totals.mean()
+
+def _item_keys(items):
+    """Codes of the items ignoring case and surrounding spaces, and the number of distinct ones"""
+    codes, uniques = pd.factorize(items.fillna(""))
+    keys, names = pd.factorize(pd.Index(uniques).str.strip().str.lower())
+    return keys[codes], len(names), pd.Index(names).str.len().to_numpy() == 0
+
+def _recurring(month, dom, amounts, key, n, blank, this_month):
+    """
+    Items (key: _item_keys codes of the rows) that came in nearly every recent
+    complete month with a steady amount; month and dom are the rows' month
+    numbers and days of the month. Returns the mask of their rows and, per
+    item, its latest row, amount, day of the month and whether it was already
+    seen this month
+    """
+    recent = month >= this_month - RECURRING_LOOKBACK
+    key_r, amounts_r, day_r = key[recent], amounts[recent], dom[recent]
+    month_r = month[recent] - (this_month - RECURRING_LOOKBACK)  # RECURRING_LOOKBACK is this month
+    complete = month_r < RECURRING_LOOKBACK
+
+    # Which of the lookback months (and this month, the last column) each item came in
+    present = np.bincount(key_r * (RECURRING_LOOKBACK + 1) + month_r, minlength=n * (RECURRING_LOOKBACK + 1))
+    present = present.reshape(n, RECURRING_LOOKBACK + 1) > 0
+    count = np.bincount(key_r[complete], minlength=n)
+    months = present[:, :RECURRING_LOOKBACK].sum(axis=1)
+    first = np.where(present.any(axis=1), present.argmax(axis=1), RECURRING_LOOKBACK)
+    last = np.where(present.any(axis=1), RECURRING_LOOKBACK - present[:, ::-1].argmax(axis=1), -1)
+    total = np.bincount(key_r, weights=amounts_r, minlength=n)
+    squares = np.bincount(key_r, weights=amounts_r ** 2, minlength=n)
+    rows = np.maximum(np.bincount(key_r, minlength=n), 1)
+    mean = total / rows
+    cv = np.sqrt(np.maximum(squares / rows - mean ** 2, 0)) / np.maximum(mean, 1)
+    # From complete months, so an early or late payment this month does not move the projected day
+    day = np.bincount(key_r[complete], weights=day_r[complete], minlength=n) / np.maximum(count, 1)
+
+    is_recurring = (
+        (months >= RECURRING_MIN_MONTHS) & (months >= 0.75 * (RECURRING_LOOKBACK - first))
+        & (count <= 1.25 * months) & (last >= RECURRING_LOOKBACK - 1) & (cv <= RECURRING_MAX_CV)
+        & ~blank
+    )
+    selected = np.flatnonzero(is_recurring)
+    latest = [np.flatnonzero(key == k)[-1] for k in selected]
+    return (
+        is_recurring[key], latest, np.round(mean[selected]).astype(np.int64),
+        np.round(day[selected]).astype(np.int64), last[selected] == RECURRING_LOOKBACK,
+    )
+
+@timed("forecast.forecast")
+def forecast(df, months=6, today=None):
+    """
+    Forecast the days after today up to the end of the months-th month after
+    the current one; df holds the user's transactions with Tanggal, Jenis,
+    Item and Jumlah (e.g. views.load_analytics)
+    """
+    if not MIN_HORIZON <= months <= MAX_HORIZON:
+        raise ValueError(f"Horizon harus {MIN_HORIZON}-{MAX_HORIZON} bulan")
+    today = np.datetime64(today or datetime.date.today(), "D")
+    this_month = today.astype("datetime64[M]")
+    month_starts = np.arange(this_month, this_month + months + 1).astype("datetime64[D]")
+    end = (this_month + months + 1).astype("datetime64[D]") - 1
+    all_days = np.arange(month_starts[0], end + 1)  # whole months, for spreading totals
+    future = all_days > today
+    all_month = (all_days.astype("datetime64[M]") - this_month).astype(np.int64)
+    month_lengths = np.bincount(all_month)
+
+    tanggal = df["Tanggal"].to_numpy().astype("datetime64[D]")
+    valid = ~np.isnat(tanggal) & (tanggal <= today)
+    first_day = tanggal[valid].min() if valid.any() else today
+    # Month number and day of the month of every row, looked up per calendar day: converting
+    # each row to datetime64[M] would cost more than the rest of the forecast
+    calendar_days = np.arange(first_day, today + 1)
+    calendar_months = calendar_days.astype("datetime64[M]")
+    offset = np.where(valid, (tanggal - first_day).astype(np.int64), 0)
+    month = calendar_months.astype(np.int64)[offset]
+    dom = (calendar_days - calendar_months.astype("datetime64[D]")).astype(np.int64)[offset] + 1
+    this_month_number = int(this_month.astype(np.int64))
+
+    # Compared as integer codes; comparing the strings costs more than the whole forecast
+    jenis_codes, jenis_names = pd.factorize(df["Jenis"])
+    jenis = {name: jenis_codes == code for code, name in enumerate(jenis_names) if name in SERIES}
+    for name in SERIES:
+        jenis.setdefault(name, np.zeros(len(df), dtype=bool))
+    jumlah = df["Jumlah"].to_numpy(dtype=np.float64)
+    items = df["Item"] if "Item" in df else pd.Series("", index=df.index)
+    # Only the rows of the two series have their items compared
+    relevant = np.flatnonzero(valid & (jenis["Pemasukan"] | jenis["Pengeluaran"]))
+    item_key = np.full(len(df), -1)
+    item_key[relevant], n_items, blank = _item_keys(items.iloc[relevant])
+    # Complete months from the user's first, skipping a partial first month when there are others
+    first_month = int(calendar_months[0].astype(np.int64))
+    if first_day != calendar_months[0].astype("datetime64[D]") and first_month + 1 < this_month_number:
+        first_month += 1
+    first_month = max(first_month, this_month_number - HISTORY_MONTHS)
+    n_months = this_month_number - first_month
+
+    daily, variance, monthly, totals = {}, np.zeros(future.sum()), {}, {}
+    recurring = {"Jenis": [], "Item": [], "Jumlah": [], "Hari": []}
+    for name in SERIES:
+        rows = valid & jenis[name]
+        days, amounts, months_of = tanggal[rows], jumlah[rows], month[rows]
+        totals[name] = amounts.sum()
+        recurring_rows, latest, sizes, hari, seen = _recurring(
+            months_of, dom[rows], amounts, item_key[rows], n_items, blank, this_month_number,
+        )
+        # Shown with the spelling of the item's latest row
+        names = items.iloc[np.flatnonzero(rows)[latest]].tolist()
+        rest = ~recurring_rows
+        rest_days, rest_amounts, rest_months = days[rest], amounts[rest], months_of[rest]
+
+        in_history = rest_months >= first_month
+        y = np.bincount(rest_months[in_history] - first_month, weights=rest_amounts[in_history], minlength=n_months + 1)[:n_months]
+        # Without a complete month, the daily rate so far, never scaled up from less than a month
+        observed_days = len(calendar_days)
+        fallback = rest_amounts.sum() / max(observed_days, 30.44) * 30.44
+        mean, std = _monthly_forecast(y, first_month, months + 1, fallback)
+
+        profile = _weekday_profile(rest_days, rest_amounts, today)
+        weights = profile[_weekday(all_days)]
+        weights /= np.bincount(all_month, weights=weights)[all_month]
+        share = np.bincount(all_month[future], weights=weights[future], minlength=months + 1)
+        values = (mean[all_month] * weights)[future]
+
+        # Recurring items on their day, clamped to short months, unless already seen this month
+        for amount, day, seen_now in zip(sizes, hari, seen):
+            dates = month_starts + np.minimum(day, month_lengths) - 1
+            keep = (dates > today) & ~((np.arange(months + 1) == 0) & seen_now)
+            np.add.at(values, (dates[keep] - today - 1).astype(np.int64), amount)
+        for column, value in (("Jenis", [name] * len(names)), ("Item", names), ("Jumlah", sizes), ("Hari", hari)):
+            recurring[column].extend(value)
+
+        # Within a month the errors are one draw spread over its days, so they add linearly
+        within = np.cumsum(weights[future]) - np.r_[0, np.cumsum(share)][all_month[future]]
+        before = np.r_[0, np.cumsum((std * share) ** 2)][all_month[future]]
+        variance += before + (std[all_month[future]] * within) ** 2
+        daily[name] = values
+        monthly[name] = (np.bincount(all_month[future], weights=values, minlength=months + 1), std * share)
+
+    saldo_awal = totals["Pemasukan"] - totals["Pengeluaran"]
+    saldo = saldo_awal + np.cumsum(daily["Pemasukan"] - daily["Pengeluaran"])
+    band = BAND_Z * np.sqrt(variance)
+    # Built from one 2-D array: a single block is much cheaper than a dict of columns
+    daily_frame = pd.DataFrame(
+        np.column_stack([daily["Pemasukan"], daily["Pengeluaran"], saldo, saldo - band, saldo + band]),
+        columns=["Pemasukan", "Pengeluaran", "Saldo", "Saldo_bawah", "Saldo_atas"],
+        index=pd.DatetimeIndex(all_days[future], name="Tanggal"),
+    )
+
+    columns = {}
+    for name, (total, std) in monthly.items():
+        columns.update({name: total, f"{name}_bawah": np.maximum(total - BAND_Z * std, 0), f"{name}_atas": total + BAND_Z * std})
+    # Saldo on each month's last day; on the last day of a month the current month has no future days
+    last_day = np.cumsum(np.bincount(all_month[future], minlength=months + 1)) - 1
+    columns["Saldo"] = np.where(last_day >= 0, saldo[np.maximum(last_day, 0)], saldo_awal)
+    monthly_frame = pd.DataFrame(
+        np.column_stack(list(columns.values())), columns=list(columns),
+        index=pd.Index(month_starts.astype("datetime64[M]").astype(str), name="Bulan"),
+    )
+    return Forecast(daily_frame, monthly_frame, pd.DataFrame(recurring))
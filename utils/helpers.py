@@ -1,17 +1,478 @@
+import contextlib
+import logging
 import sqlite3
 import os
+import re
+import datetime
 import pandas as pd
 import hashlib
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from utils import storage
+from utils.db_writer import WriteQueue, BUSY_TIMEOUT
+from utils.metrics import timed, instrument_connection
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = "database/keuangan.db"
 
-def init_db():
-    if not os.path.exists("database"):
-        os.makedirs("database")
+# One writer thread per database file, so separate files (e.g. shards) commit in parallel
+_writers = {}
+_writers_lock = threading.Lock()
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+def get_connection(db_path=None):
+    """Open a connection to a SQLite database file, DB_PATH by default"""
+    return instrument_connection(sqlite3.connect(db_path or DB_PATH, timeout=BUSY_TIMEOUT))
+
+READ_POOL_SIZE = 8  # idle read connections kept per database file
+_read_pools = {}
+_read_pools_lock = threading.Lock()
+
+def _file_id(db_path):
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+@contextlib.contextmanager
+def read_connection(db_path=None):
+    """
+    Borrow a pooled connection for reads on db_path (DB_PATH by default),
+    saving the connect and schema load of get_connection on every query.
+    Connections to a file that has since been replaced, e.g. by a restore,
+    are closed instead of reused.
+    """
+    db_path = db_path or DB_PATH
+    file_id = _file_id(db_path)
+    conn = None
+    with _read_pools_lock:
+        idle = _read_pools.setdefault(db_path, [])
+        while idle and conn is None:
+            candidate, candidate_id = idle.pop()
+            if candidate_id == file_id:
+                conn = candidate
+            else:
+                candidate.close()
+    # Instrumented on every borrow, as metrics may have been enabled since the connect
+    conn = instrument_connection(conn or sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, check_same_thread=False))
+    try:
+        yield conn
+    except BaseException:
+        conn.close()
+        raise
+    if conn.in_transaction:
+        conn.rollback()
+    with _read_pools_lock:
+        idle = _read_pools.setdefault(db_path, [])
+        if file_id is not None and len(idle) < READ_POOL_SIZE:
+            idle.append((conn, file_id))
+            conn = None
+    if conn is not None:
+        conn.close()
+
+def close_read_connections():
+    """Close every idle pooled read connection"""
+    with _read_pools_lock:
+        pools = list(_read_pools.values())
+        _read_pools.clear()
+    for idle in pools:
+        for conn, _ in idle:
+            conn.close()
+
+def run_write(fn, db_path=None):
+    """
+    Run fn(cursor) on the writer thread of db_path (DB_PATH by default) and
+    return its result once committed
+    """
+    db_path = db_path or DB_PATH
+    writer = _writers.get(db_path)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.setdefault(db_path, WriteQueue())
+    return writer.submit(db_path, fn)
+
+# Amounts become exact whole rupiah. SQLite cannot change a column's type, so
+# the table is rebuilt; per-user totals from before the rebuild are kept in
+# money_migration_audit for the reconciliation tool (python -m utils.reconcile).
+INTEGER_MONEY_MIGRATION = (
+    """
+    CREATE TABLE IF NOT EXISTS money_migration_audit (
+        email TEXT PRIMARY KEY,
+        rows INTEGER NOT NULL,
+        max_id INTEGER NOT NULL,
+        real_total REAL NOT NULL,
+        rounded_total INTEGER NOT NULL,
+        fractional_rows INTEGER NOT NULL
+    )
+    """,
+    """
+    INSERT INTO money_migration_audit (email, rows, max_id, real_total, rounded_total, fractional_rows)
+    SELECT email, COUNT(*), MAX(id), TOTAL(jumlah),
+           SUM(CAST(ROUND(COALESCE(jumlah, 0)) AS INTEGER)), COALESCE(SUM(jumlah <> ROUND(jumlah)), 0)
+    FROM transactions GROUP BY email
+    """,
+    """
+    CREATE TABLE transactions_int (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT,
+        tanggal TEXT,
+        kategori_pengguna TEXT,
+        jenis TEXT,
+        item TEXT,
+        jumlah INTEGER NOT NULL DEFAULT 0,
+        catatan TEXT
+    )
+    """,
+    """
+    INSERT INTO transactions_int (id, email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan)
+    SELECT id, email, tanggal, kategori_pengguna, jenis, item, CAST(ROUND(COALESCE(jumlah, 0)) AS INTEGER), catatan
+    FROM transactions
+    """,
+    "DROP TABLE transactions",
+    "ALTER TABLE transactions_int RENAME TO transactions",
+    "CREATE INDEX idx_transactions_email_tanggal ON transactions (email, tanggal)",
+)
+
+# Rows are edited in place and deleted softly (deleted_at) so readers can
+# patch their caches: changed_version stamps every written row with the data
+# version it produced. monthly_totals is a per-month rollup kept in step by
+# triggers, so totals never rescan the transactions.
+EDITABLE_TRANSACTIONS_MIGRATION = (
+    "ALTER TABLE transactions ADD COLUMN deleted_at INTEGER",
+    "ALTER TABLE transactions ADD COLUMN changed_version INTEGER NOT NULL DEFAULT 0",
+    # Rows changed at or below this version may have been purged since
+    "ALTER TABLE data_versions ADD COLUMN compacted_through INTEGER NOT NULL DEFAULT 0",
+    "DROP INDEX IF EXISTS idx_transactions_email_tanggal",
+    "CREATE INDEX idx_transactions_live ON transactions (email, tanggal) WHERE deleted_at IS NULL",
+    "CREATE INDEX idx_transactions_changes ON transactions (email, changed_version)",
+    "CREATE INDEX idx_transactions_deleted ON transactions (deleted_at) WHERE deleted_at IS NOT NULL",
+    """
+    CREATE TABLE monthly_totals (
+        email TEXT NOT NULL,
+        bulan TEXT NOT NULL,
+        jenis TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        rows INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (email, bulan, jenis)
+    ) WITHOUT ROWID
+    """,
+    """
+    INSERT INTO monthly_totals (email, bulan, jenis, total, rows)
+    SELECT email, COALESCE(substr(tanggal, 1, 7), ''), COALESCE(jenis, ''), SUM(jumlah), COUNT(*)
+    FROM transactions WHERE email IS NOT NULL
+    GROUP BY email, COALESCE(substr(tanggal, 1, 7), ''), COALESCE(jenis, '')
+    """,
+    """
+    CREATE TRIGGER transactions_rollup_insert AFTER INSERT ON transactions
+    WHEN NEW.deleted_at IS NULL AND NEW.email IS NOT NULL
+    BEGIN
+        INSERT INTO monthly_totals (email, bulan, jenis, total, rows)
+        VALUES (NEW.email, COALESCE(substr(NEW.tanggal, 1, 7), ''), COALESCE(NEW.jenis, ''), NEW.jumlah, 1)
+        ON CONFLICT(email, bulan, jenis) DO UPDATE SET total = total + excluded.total, rows = rows + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_rollup_delete AFTER DELETE ON transactions
+    WHEN OLD.deleted_at IS NULL
+    BEGIN
+        UPDATE monthly_totals SET total = total - OLD.jumlah, rows = rows - 1
+        WHERE email = OLD.email AND bulan = COALESCE(substr(OLD.tanggal, 1, 7), '') AND jenis = COALESCE(OLD.jenis, '');
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_rollup_update AFTER UPDATE OF email, tanggal, jenis, jumlah, deleted_at ON transactions
+    BEGIN
+        UPDATE monthly_totals SET total = total - OLD.jumlah, rows = rows - 1
+        WHERE OLD.deleted_at IS NULL
+          AND email = OLD.email AND bulan = COALESCE(substr(OLD.tanggal, 1, 7), '') AND jenis = COALESCE(OLD.jenis, '');
+        INSERT INTO monthly_totals (email, bulan, jenis, total, rows)
+        SELECT NEW.email, COALESCE(substr(NEW.tanggal, 1, 7), ''), COALESCE(NEW.jenis, ''), NEW.jumlah, 1
+        WHERE NEW.deleted_at IS NULL AND NEW.email IS NOT NULL
+        ON CONFLICT(email, bulan, jenis) DO UPDATE SET total = total + excluded.total, rows = rows + 1;
+    END
+    """,
+)
+
+# Transactions materialized from a recurring rule carry (rule_id, rule_occurrence);
+# the unique index makes materializing the same occurrence twice a no-op
+RECURRING_TRANSACTIONS_MIGRATION = (
+    "ALTER TABLE transactions ADD COLUMN rule_id INTEGER",
+    "ALTER TABLE transactions ADD COLUMN rule_occurrence INTEGER",
+    """
+    CREATE UNIQUE INDEX idx_transactions_rule_occurrence ON transactions (rule_id, rule_occurrence)
+    WHERE rule_id IS NOT NULL
+    """,
+)
+
+# Full-text index over item and catatan for search_transactions. Contentless:
+# it only maps words to row ids, kept in step with live rows by triggers. The
+# FTS rowid is (owner id << 40) + transaction id, so one user's postings are a
+# single rowid range that FTS5 seeks into instead of walking every user's.
+# transactions_item_fts indexes item alone: hits on the item rank first, and
+# a column filter would have to decode the positions of every hit instead.
+# Prefix indexes make as-you-type prefixes up to 6 letters a single lookup.
+SEARCH_FTS_OPTIONS = """
+    content = '',
+    columnsize = 0,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4 5 6'
+"""
+
+SEARCH_MIGRATION = (
+    "CREATE TABLE search_owners (id INTEGER PRIMARY KEY, email TEXT UNIQUE NOT NULL)",
+    f"CREATE VIRTUAL TABLE transactions_fts USING fts5(item, catatan, {SEARCH_FTS_OPTIONS})",
+    f"CREATE VIRTUAL TABLE transactions_item_fts USING fts5(item, {SEARCH_FTS_OPTIONS})",
+    "INSERT INTO search_owners (email) SELECT DISTINCT email FROM transactions WHERE email IS NOT NULL",
+    """
+    INSERT INTO transactions_fts (rowid, item, catatan)
+    SELECT (o.id << 40) + t.id, t.item, t.catatan
+    FROM transactions t JOIN search_owners o ON o.email = t.email
+    WHERE t.deleted_at IS NULL
+    """,
+    """
+    INSERT INTO transactions_item_fts (rowid, item)
+    SELECT (o.id << 40) + t.id, t.item
+    FROM transactions t JOIN search_owners o ON o.email = t.email
+    WHERE t.deleted_at IS NULL
+    """,
+    # Not INSERT OR IGNORE: an outer INSERT OR REPLACE would turn it into a
+    # replace and renumber the owner
+    """
+    CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions
+    WHEN NEW.deleted_at IS NULL AND NEW.email IS NOT NULL
+    BEGIN
+        INSERT INTO search_owners (email) SELECT NEW.email
+        WHERE NOT EXISTS (SELECT 1 FROM search_owners WHERE email = NEW.email);
+        INSERT INTO transactions_fts (rowid, item, catatan)
+        SELECT (id << 40) + NEW.id, NEW.item, NEW.catatan FROM search_owners WHERE email = NEW.email;
+        INSERT INTO transactions_item_fts (rowid, item)
+        SELECT (id << 40) + NEW.id, NEW.item FROM search_owners WHERE email = NEW.email;
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions
+    WHEN OLD.deleted_at IS NULL AND OLD.email IS NOT NULL
+    BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, item, catatan)
+        SELECT 'delete', (id << 40) + OLD.id, OLD.item, OLD.catatan FROM search_owners WHERE email = OLD.email;
+        INSERT INTO transactions_item_fts (transactions_item_fts, rowid, item)
+        SELECT 'delete', (id << 40) + OLD.id, OLD.item FROM search_owners WHERE email = OLD.email;
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_fts_update AFTER UPDATE OF email, item, catatan, deleted_at ON transactions
+    BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, item, catatan)
+        SELECT 'delete', (id << 40) + OLD.id, OLD.item, OLD.catatan FROM search_owners
+        WHERE email = OLD.email AND OLD.deleted_at IS NULL;
+        INSERT INTO transactions_item_fts (transactions_item_fts, rowid, item)
+        SELECT 'delete', (id << 40) + OLD.id, OLD.item FROM search_owners
+        WHERE email = OLD.email AND OLD.deleted_at IS NULL;
+        INSERT INTO search_owners (email) SELECT NEW.email
+        WHERE NEW.email IS NOT NULL AND NOT EXISTS (SELECT 1 FROM search_owners WHERE email = NEW.email);
+        INSERT INTO transactions_fts (rowid, item, catatan)
+        SELECT (id << 40) + NEW.id, NEW.item, NEW.catatan FROM search_owners
+        WHERE email = NEW.email AND NEW.deleted_at IS NULL;
+        INSERT INTO transactions_item_fts (rowid, item)
+        SELECT (id << 40) + NEW.id, NEW.item FROM search_owners
+        WHERE email = NEW.email AND NEW.deleted_at IS NULL;
+    END
+    """,
+)
+
+# Monthly spending limits per jenis or per item. Spending per jenis is already
+# in monthly_totals; spending per budgeted item is counted in
+# budget_item_totals, only for items that have a budget. Triggers on both
+# counter tables record the thresholds a month crossed in budget_alerts as
+# each write lands, so checking a budget never rescans transactions.
+_BUDGET_LEVELS_SQL = " UNION ALL ".join(f"SELECT {level} AS level" for level in storage.BUDGET_ALERT_LEVELS)
+
+def _budget_alert_trigger(name, table, event, scope, key):
+    """Trigger keeping budget_alerts in step with one row of a counter table"""
+    return f"""
+    CREATE TRIGGER {name} AFTER {event} ON {table}
+    BEGIN
+        DELETE FROM budget_alerts
+        WHERE bulan = NEW.bulan AND budget_id IN (
+            SELECT id FROM budgets WHERE email = NEW.email AND scope = '{scope}' AND kategori = NEW.{key}
+        ) AND level * (SELECT batas FROM budgets WHERE id = budget_id) > NEW.total * 100;
+        INSERT INTO budget_alerts (budget_id, bulan, level, created_at)
+        SELECT b.id, NEW.bulan, l.level, CAST(strftime('%s', 'now') AS INTEGER)
+        FROM budgets b, ({_BUDGET_LEVELS_SQL}) l
+        WHERE b.email = NEW.email AND b.scope = '{scope}' AND b.kategori = NEW.{key}
+          AND NEW.total * 100 >= l.level * b.batas
+        ON CONFLICT DO NOTHING;
+    END
+    """
+
+BUDGET_MIGRATION = (
+    """
+    CREATE TABLE budgets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL,
+        scope TEXT NOT NULL CHECK (scope IN ('jenis', 'item')),
+        kategori TEXT NOT NULL,
+        batas INTEGER NOT NULL CHECK (batas > 0),
+        created_at INTEGER NOT NULL,
+        UNIQUE (email, scope, kategori)
+    )
+    """,
+    """
+    CREATE TABLE budget_item_totals (
+        email TEXT NOT NULL,
+        item TEXT NOT NULL,
+        bulan TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (email, item, bulan)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE budget_alerts (
+        budget_id INTEGER NOT NULL,
+        bulan TEXT NOT NULL,
+        level INTEGER NOT NULL,
+        created_at INTEGER NOT NULL,
+        PRIMARY KEY (budget_id, bulan, level)
+    ) WITHOUT ROWID
+    """,
+    # Item budgets count Pengeluaran whose item matches, ignoring case and outer spaces
+    """
+    CREATE TRIGGER transactions_budget_insert AFTER INSERT ON transactions
+    WHEN NEW.deleted_at IS NULL AND NEW.jenis = 'Pengeluaran' AND EXISTS (
+        SELECT 1 FROM budgets WHERE email = NEW.email AND scope = 'item' AND kategori = lower(trim(NEW.item))
+    )
+    BEGIN
+        INSERT INTO budget_item_totals (email, item, bulan, total)
+        VALUES (NEW.email, lower(trim(NEW.item)), substr(NEW.tanggal, 1, 7), NEW.jumlah)
+        ON CONFLICT (email, item, bulan) DO UPDATE SET total = total + excluded.total;
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_budget_delete AFTER DELETE ON transactions
+    WHEN OLD.deleted_at IS NULL AND OLD.jenis = 'Pengeluaran'
+    BEGIN
+        UPDATE budget_item_totals SET total = total - OLD.jumlah
+        WHERE email = OLD.email AND item = lower(trim(OLD.item)) AND bulan = substr(OLD.tanggal, 1, 7);
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_budget_update AFTER UPDATE OF email, tanggal, jenis, item, jumlah, deleted_at ON transactions
+    BEGIN
+        UPDATE budget_item_totals SET total = total - OLD.jumlah
+        WHERE OLD.deleted_at IS NULL AND OLD.jenis = 'Pengeluaran'
+          AND email = OLD.email AND item = lower(trim(OLD.item)) AND bulan = substr(OLD.tanggal, 1, 7);
+        INSERT INTO budget_item_totals (email, item, bulan, total)
+        SELECT NEW.email, lower(trim(NEW.item)), substr(NEW.tanggal, 1, 7), NEW.jumlah
+        WHERE NEW.deleted_at IS NULL AND NEW.jenis = 'Pengeluaran' AND EXISTS (
+            SELECT 1 FROM budgets WHERE email = NEW.email AND scope = 'item' AND kategori = lower(trim(NEW.item))
+        )
+        ON CONFLICT (email, item, bulan) DO UPDATE SET total = total + excluded.total;
+    END
+    """,
+    _budget_alert_trigger("monthly_totals_budget_insert", "monthly_totals", "INSERT", "jenis", "jenis"),
+    _budget_alert_trigger("monthly_totals_budget_update", "monthly_totals", "UPDATE OF total", "jenis", "jenis"),
+    _budget_alert_trigger("budget_item_totals_alert_insert", "budget_item_totals", "INSERT", "item", "item"),
+    _budget_alert_trigger("budget_item_totals_alert_update", "budget_item_totals", "UPDATE OF total", "item", "item"),
+)
+
+# Spending category of a transaction (see utils.categories). kategori_label is
+# 1 when the user chose the category, which makes the row a training example;
+# otherwise kategori is the classifier's prediction, or NULL. Each user's
+# trained model is kept in category_models.
+CATEGORY_MIGRATION = (
+    "ALTER TABLE transactions ADD COLUMN kategori TEXT",
+    "ALTER TABLE transactions ADD COLUMN kategori_label INTEGER NOT NULL DEFAULT 0",
+    "CREATE INDEX idx_transactions_kategori ON transactions (email, kategori) WHERE deleted_at IS NULL",
+    """
+    CREATE TABLE category_models (
+        email TEXT PRIMARY KEY,
+        labels INTEGER NOT NULL,
+        trained_at INTEGER NOT NULL,
+        model BLOB NOT NULL
+    )
+    """,
+)
+
+# Shared books (see utils.ledgers). A ledger's transactions, data version,
+# budgets, rules and category model are keyed by its book key wherever a
+# user's own are keyed by their email, so they take the same indexed paths
+# and rollups. Memberships are read per user, hence the (email, ledger_id) key.
+LEDGER_MIGRATION = (
+    """
+    CREATE TABLE ledgers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nama TEXT NOT NULL,
+        created_by TEXT NOT NULL,
+        created_at INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE ledger_members (
+        email TEXT NOT NULL,
+        ledger_id INTEGER NOT NULL REFERENCES ledgers (id),
+        role TEXT NOT NULL CHECK (role IN ('pemilik', 'editor', 'pembaca')),
+        added_at INTEGER NOT NULL,
+        PRIMARY KEY (email, ledger_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX idx_ledger_members_ledger ON ledger_members (ledger_id)",
+)
+
+# Closed years moved out of transactions into one table per year (see
+# archive_table and utils.archive). A row is moved by deleting it while its
+# year is flagged as moving; the delete triggers skip it then, so its
+# monthly_totals, budget_item_totals and search index entries stay: the
+# transaction still exists, only in another table.
+_ARCHIVING_SQL = "EXISTS (SELECT 1 FROM archived_years WHERE tahun = substr(OLD.tanggal, 1, 4) AND moving)"
+
+ARCHIVE_MIGRATION = (
+    """
+    CREATE TABLE archived_years (
+        tahun TEXT PRIMARY KEY,
+        rows INTEGER NOT NULL DEFAULT 0,
+        archived_at INTEGER NOT NULL,
+        moving INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "DROP TRIGGER transactions_rollup_delete",
+    f"""
+    CREATE TRIGGER transactions_rollup_delete AFTER DELETE ON transactions
+    WHEN OLD.deleted_at IS NULL AND NOT {_ARCHIVING_SQL}
+    BEGIN
+        UPDATE monthly_totals SET total = total - OLD.jumlah, rows = rows - 1
+        WHERE email = OLD.email AND bulan = COALESCE(substr(OLD.tanggal, 1, 7), '') AND jenis = COALESCE(OLD.jenis, '');
+    END
+    """,
+    "DROP TRIGGER transactions_fts_delete",
+    f"""
+    CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions
+    WHEN OLD.deleted_at IS NULL AND OLD.email IS NOT NULL AND NOT {_ARCHIVING_SQL}
+    BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, item, catatan)
+        SELECT 'delete', (id << 40) + OLD.id, OLD.item, OLD.catatan FROM search_owners WHERE email = OLD.email;
+        INSERT INTO transactions_item_fts (transactions_item_fts, rowid, item)
+        SELECT 'delete', (id << 40) + OLD.id, OLD.item FROM search_owners WHERE email = OLD.email;
+    END
+    """,
+    "DROP TRIGGER transactions_budget_delete",
+    f"""
+    CREATE TRIGGER transactions_budget_delete AFTER DELETE ON transactions
+    WHEN OLD.deleted_at IS NULL AND OLD.jenis = 'Pengeluaran' AND NOT {_ARCHIVING_SQL}
+    BEGIN
+        UPDATE budget_item_totals SET total = total - OLD.jumlah
+        WHERE email = OLD.email AND item = lower(trim(OLD.item)) AND bulan = substr(OLD.tanggal, 1, 7);
+    END
+    """,
+)
+
+# Schema migrations, applied in order. The database's PRAGMA user_version records
+# how many have run; append new entries and never edit applied ones.
+MIGRATIONS = [
+    (
+        """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             nama TEXT NOT NULL,
@@ -20,8 +481,8 @@ def init_db():
             kategori_pengguna TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    """)
-    cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS transactions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             email TEXT,
@@ -32,73 +493,389 @@ def init_db():
             jumlah REAL,
             catatan TEXT
         )
-    """)
-    conn.commit()
-    conn.close()
+        """,
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            email TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)",
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            email TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ),
+    (
+        # Serves per-user reads, date ranges and newest-first keyset pagination (id is the rowid)
+        "CREATE INDEX IF NOT EXISTS idx_transactions_email_tanggal ON transactions (email, tanggal)",
+    ),
+    INTEGER_MONEY_MIGRATION,
+    EDITABLE_TRANSACTIONS_MIGRATION,
+    RECURRING_TRANSACTIONS_MIGRATION + (
+        # Rules stay next to the users, also when transactions are sharded; see utils.recurring
+        """
+        CREATE TABLE recurring_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL,
+            kategori_pengguna TEXT,
+            jenis TEXT NOT NULL,
+            item TEXT NOT NULL DEFAULT '',
+            jumlah INTEGER NOT NULL,
+            catatan TEXT NOT NULL DEFAULT '',
+            unit TEXT NOT NULL CHECK (unit IN ('day', 'week', 'month')),
+            every INTEGER NOT NULL DEFAULT 1 CHECK (every > 0),
+            start_date TEXT NOT NULL,
+            end_date TEXT,
+            next_index INTEGER NOT NULL DEFAULT 0,
+            next_date TEXT,
+            created_at INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX idx_recurring_rules_email ON recurring_rules (email)",
+        "CREATE INDEX idx_recurring_rules_due ON recurring_rules (next_date) WHERE next_date IS NOT NULL",
+    ),
+    SEARCH_MIGRATION,
+    BUDGET_MIGRATION,
+    CATEGORY_MIGRATION,
+    LEDGER_MIGRATION,
+    ARCHIVE_MIGRATION,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+SOFT_DELETE_RETENTION = 7 * 24 * 60 * 60  # seconds a deleted row is kept before compaction
+COMPACT_INTERVAL = 24 * 60 * 60  # seconds between compactions in one process
+
+_bootstrap_lock = threading.Lock()
+_bootstrapped_path = None
+_last_compaction = 0.0
+
+def init_db(db_path=None, migrations=None):
+    """
+    Create the database if needed and apply pending schema migrations;
+    defaults to DB_PATH and MIGRATIONS
+    """
+    db_path = db_path or DB_PATH
+    migrations = MIGRATIONS if migrations is None else migrations
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    conn = get_connection(db_path)
+    try:
+        # WAL lets readers keep a snapshot while the writer thread commits; the mode persists in the file
+        if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+            conn.execute("PRAGMA journal_mode=WAL")
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(migrations):
+            return  # Up to date: no write lock taken
+
+        # Serialize concurrent migrators; re-read the version once we hold the lock
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for statements in migrations[version:]:
+            for statement in statements:
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {len(migrations)}")
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def bootstrap_db():
+    """
+    Initialise the configured storage backend once per server process; later
+    calls only check the database is still there
+    """
+    global _bootstrapped_path
+    backend = storage.get_storage()
+    if _bootstrapped_path == backend.location and backend.is_ready():
+        return
+    with _bootstrap_lock:
+        if _bootstrapped_path != backend.location or not backend.is_ready():
+            backend.init_schema()
+            _bootstrapped_path = backend.location
+    maybe_compact()
+
+def db_health_check():
+    """Return True if the database is reachable and fully migrated"""
+    return storage.get_storage().health_check()
 
 def hash_password(password):
     """Hash password using SHA256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+@timed("helpers.create_user")
 def create_user(nama, email, password, kategori_pengguna):
-    """Create a new user"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    try:
-        password_hash = hash_password(password)
-        cursor.execute("""
-            INSERT INTO users (nama, email, password_hash, kategori_pengguna)
-            VALUES (?, ?, ?, ?)
-        """, (nama, email, password_hash, kategori_pengguna))
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.IntegrityError:
-        conn.close()
-        return False  # Email already exists
+    """Create a new user; False if the email is taken, ValueError if it cannot be a user's"""
+    storage.check_user_email(email)
+    return storage.get_storage().create_user(nama, email, hash_password(password), kategori_pengguna)
 
+@timed("helpers.verify_user")
 def verify_user(email, password):
     """Verify user credentials"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    password_hash = hash_password(password)
-    cursor.execute("""
-        SELECT nama, kategori_pengguna FROM users 
-        WHERE email = ? AND password_hash = ?
-    """, (email, password_hash))
-    result = cursor.fetchone()
-    conn.close()
-    return result  # Returns (nama, kategori_pengguna) if valid, None otherwise
+    # Returns (nama, kategori_pengguna) if valid, None otherwise
+    if email.startswith(storage.BOOK_PREFIX):
+        return None  # never a user, even if such an account was registered before it was refused
+    return storage.get_storage().verify_user(email, hash_password(password))
 
+@timed("helpers.get_user_info")
 def get_user_info(email):
     """Get user information"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT nama, kategori_pengguna FROM users WHERE email = ?
-    """, (email,))
-    result = cursor.fetchone()
-    conn.close()
-    return result
+    return storage.get_storage().get_user_info(email)
 
-def save_transaction(email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def to_rupiah(value):
+    """Whole rupiah as an int, rounding halves away from zero like SQL ROUND"""
+    return int(Decimal(str(value)).to_integral_value(rounding=ROUND_HALF_UP))
+
+@timed("helpers.save_transaction")
+def save_transaction(email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan, kategori=None, kategori_label=True):
+    """
+    Insert one transaction; kategori is its spending category, chosen by the
+    user unless kategori_label is False (a suggestion that was not confirmed)
+    """
+    storage.get_storage().save_transaction(
+        email, tanggal, kategori_pengguna, jenis, item, to_rupiah(jumlah), catatan, kategori,
+        int(bool(kategori) and kategori_label),
+    )
+
+def bump_data_version(cursor, email, by=1):
+    """
+    Mark the user's transactions as changed; call inside the writing SQLite
+    transaction, with by= the number of rows inserted or changed
+    """
     cursor.execute("""
-        INSERT INTO transactions (email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (email, str(tanggal), kategori_pengguna, jenis, item, jumlah, catatan))
-    conn.commit()
-    conn.close()
-
-def get_transactions(email):
-    import pandas as pd
-    conn = sqlite3.connect(DB_PATH)
+        INSERT INTO data_versions (email, version) VALUES (?, ?)
+        ON CONFLICT(email) DO UPDATE SET version = version + excluded.version
+    """, (email, by))
+
+def next_change_version(cursor, email):
+    """
+    The data version the current write will produce, for stamping the rows'
+    changed_version; call before bump_data_version in the same transaction
+    """
+    row = cursor.execute("SELECT version FROM data_versions WHERE email = ?", (email,)).fetchone()
+    return (row[0] if row else 0) + 1
+
+def archive_table(tahun):
+    """Name of the table holding the archived transactions of a year, see ARCHIVE_MIGRATION"""
+    return f"transactions_{int(tahun):04d}"
+
+def create_archive_table(cursor, tahun):
+    """
+    Create the year's archive table if needed, with the columns transactions
+    has now; archived rows never change, so it is clustered by (email,
+    tanggal, id) and a user's year is read as one range. Returns its name.
+    """
+    table = archive_table(tahun)
+    columns = [
+        f"{name} {column_type}" + (" NOT NULL" if name in ("email", "tanggal") else "")
+        for _, name, column_type, _, _, _ in cursor.execute("PRAGMA table_info(transactions)").fetchall()
+    ]
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} ({", ".join(columns)}, PRIMARY KEY (email, tanggal, id)) WITHOUT ROWID
+    """)
+    # Search hits are looked up by id
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_id ON {table} (id)")
+    return table
+
+def get_data_version(email):
+    """Return a counter that changes whenever the user's transactions change"""
+    return storage.get_storage().get_data_version(email)
+
+def typed_transactions(df):
+    """
+    Convert raw transaction columns in place, one vectorized pass each:
+    datetime64 Tanggal, category Jenis and int64 rupiah Jumlah
+    """
+    if "Tanggal" in df:
+        df["Tanggal"] = pd.to_datetime(df["Tanggal"], format="ISO8601", errors="coerce")
+    if "Jenis" in df:
+        df["Jenis"] = df["Jenis"].astype("category")
+    if "Jumlah" in df:
+        df["Jumlah"] = pd.to_numeric(df["Jumlah"]).fillna(0).round().astype("int64")
+    return df
+
+@timed("helpers.get_transactions")
+def get_transactions(email, columns=None, start=None, end=None):
+    """
+    The user's transactions as a typed DataFrame (see typed_transactions),
+    limited to the given columns when the caller needs only some and to the
+    dates from start through end when given; archived years are only read
+    when the range reaches them
+    """
     df = None
     try:
-        df = pd.read_sql_query("SELECT tanggal AS Tanggal, jenis AS Jenis, item AS Item, jumlah AS Jumlah, catatan AS Catatan FROM transactions WHERE email = ?", conn, params=(email,))
+        df = storage.get_storage().get_transactions(email, columns, start, end)
     except Exception as e:
         print("Error membaca data:", e)
-        df = pd.DataFrame(columns=["Tanggal", "Jenis", "Item", "Jumlah", "Catatan"])
-    conn.close()
-    return df
+        df = pd.DataFrame(columns=columns or storage.TRANSACTION_COLUMNS)
+    return typed_transactions(df)
+
+@timed("helpers.get_recent_transactions")
+def get_recent_transactions(email, limit=50, after=None):
+    """
+    Newest-first page of the user's transactions with their ids; returns
+    (DataFrame, cursor for the next page)
+    """
+    df, cursor = storage.get_storage().page_transactions(email, limit, after)
+    return typed_transactions(df), cursor
+
+SEARCH_PAGE_SIZE = 20
+
+def search_terms(query):
+    """Lowercase words of a search box entry; punctuation and search operators are dropped"""
+    return [word.lower() for word in re.findall(r"[^\W_]+", query or "")]
+
+@timed("helpers.search_transactions")
+def search_transactions(email, query, page=0, page_size=SEARCH_PAGE_SIZE):
+    """
+    The user's transactions matching every word of query as a prefix of a
+    word in Item or Catatan, ignoring case and diacritics ('kafe' finds
+    'Kafé'); rows matching on Item alone rank first, newest first within
+    each; returns (typed DataFrame with id, whether a next page exists)
+    """
+    terms = search_terms(query)
+    if not terms:
+        return typed_transactions(pd.DataFrame(columns=["id"] + storage.TRANSACTION_COLUMNS)), False
+    df, has_more = storage.get_storage().search_transactions(email, terms, page_size, page * page_size)
+    return typed_transactions(df), has_more
+
+@timed("helpers.get_summary")
+def get_summary(email, start=None, end=None):
+    """Like calculate_summary, but aggregated by the database instead of in pandas"""
+    totals = storage.get_storage().summarize(email, start, end)
+    pemasukan = totals.get('Pemasukan', 0)
+    pengeluaran = totals.get('Pengeluaran', 0)
+    return {
+        'pemasukan': pemasukan,
+        'pengeluaran': pengeluaran,
+        'tabungan': totals.get('Tabungan', 0),
+        'saldo': pemasukan - pengeluaran,
+    }
+
+JENIS_OPTIONS = ["Pemasukan", "Pengeluaran", "Tabungan", "Hutang", "Lainnya"]
+# Spending categories, see utils.categories
+KATEGORI_OPTIONS = [
+    "Makanan & Minuman", "Transportasi", "Belanja", "Tagihan", "Tempat Tinggal", "Kesehatan",
+    "Pendidikan", "Hiburan", "Pendapatan", "Tabungan & Investasi", "Cicilan & Hutang", "Lainnya",
+]
+
+JUMLAH_RANGE = (-2 ** 63, 2 ** 63 - 1)  # the signed 64-bit column jumlah is stored in
+
+def _missing(value):
+    # pd.isna of a list is an array, not a bool
+    return value is None or (pd.api.types.is_scalar(value) and pd.isna(value))
+
+def _table_values(values):
+    """Validate DataFrame-style column values and map them to transactions table columns"""
+    row = {}
+    for column, value in values.items():
+        if column == "Kategori":
+            # Choosing a category by hand makes the row a training example
+            kategori = None if _missing(value) or value == "" else value
+            if kategori is not None and (not isinstance(kategori, str) or kategori not in KATEGORI_OPTIONS):
+                raise ValueError(f"Kategori tidak dikenal: {kategori}")
+            row.update(kategori=kategori, kategori_label=int(kategori is not None))
+            continue
+        if column not in storage.COLUMN_SOURCES:
+            raise ValueError(f"Kolom tidak dikenal: {column}")
+        if column == "Tanggal":
+            if _missing(value):
+                raise ValueError("Tanggal wajib diisi")
+            value = datetime.date.fromisoformat(str(value)[:10]).isoformat()
+        elif column == "Jumlah":
+            if _missing(value):
+                raise ValueError("Jumlah wajib diisi")
+            try:
+                value = to_rupiah(value)
+            except ArithmeticError:
+                raise ValueError(f"Jumlah harus berupa angka: {value}") from None
+            if not JUMLAH_RANGE[0] <= value <= JUMLAH_RANGE[1]:
+                raise ValueError(f"Jumlah terlalu besar: {value}")
+        elif column == "Jenis":
+            if not isinstance(value, str) or value not in JENIS_OPTIONS:
+                raise ValueError(f"Jenis tidak dikenal: {value}")
+        elif _missing(value):
+            value = ""
+        elif not isinstance(value, str):
+            raise ValueError(f"{column} harus berupa teks")
+        row[storage.COLUMN_SOURCES[column]] = value
+    return row
+
+@timed("helpers.apply_transaction_changes")
+def apply_transaction_changes(email, inserts=(), updates=None, deletes=(), kategori_pengguna=None):
+    """
+    Apply an edited table as one diff, committed in a single transaction:
+    inserts are {column: value} dicts with at least Tanggal, Jenis and Jumlah,
+    updates maps a transaction id to {column: new value} and deletes lists ids
+    to soft-delete. Rows of other users are never touched.
+
+    Returns {"inserted": n, "updated": n, "deleted": n, "ids": [ids of the inserted rows]}
+    """
+    rows = []
+    for values in inserts:
+        missing = {"Tanggal", "Jenis", "Jumlah"} - set(values)
+        if missing:
+            raise ValueError(f"Kolom wajib diisi: {', '.join(sorted(missing))}")
+        rows.append(dict({"item": "", "catatan": ""}, **_table_values(values)))
+    changes = {int(transaction_id): _table_values(values) for transaction_id, values in (updates or {}).items() if values}
+    deletes = [int(transaction_id) for transaction_id in deletes]
+    if not (rows or changes or deletes):
+        return {"inserted": 0, "updated": 0, "deleted": 0, "ids": []}
+
+    result = storage.get_storage().apply_changes(email, rows, changes, deletes, kategori_pengguna, int(time.time()))
+    if result["deleted"]:
+        maybe_compact()
+    return result
+
+def update_transaction(email, transaction_id, **values):
+    """Change some columns of one transaction, e.g. Jumlah=25000; False if it does not exist"""
+    return apply_transaction_changes(email, updates={transaction_id: values})["updated"] == 1
+
+def delete_transactions(email, transaction_ids):
+    """Soft-delete the user's transactions with the given ids; returns how many were deleted"""
+    return apply_transaction_changes(email, deletes=transaction_ids)["deleted"]
+
+def compact_deleted(retention=SOFT_DELETE_RETENTION):
+    """Permanently remove transactions deleted more than retention seconds ago; returns the row count"""
+    global _last_compaction
+    _last_compaction = time.time()
+    return storage.get_storage().compact_deleted(int(time.time()) - retention)
+
+def maybe_compact():
+    """Run compact_deleted at most once per COMPACT_INTERVAL in this process"""
+    if time.time() - _last_compaction < COMPACT_INTERVAL:
+        return 0
+    try:
+        return compact_deleted()
+    except Exception:
+        logger.exception("compacting deleted transactions failed")
+        return 0
+
+@timed("helpers.calculate_summary")
+def calculate_summary(df):
+    """Totals per jenis and the resulting saldo for a transactions DataFrame"""
+    # Integer rupiah stay on the int64 path; sums of other frames are rounded once at the end
+    totals = df.groupby('Jenis', observed=True)['Jumlah'].sum()
+    pemasukan = to_rupiah(totals.get('Pemasukan', 0))
+    pengeluaran = to_rupiah(totals.get('Pengeluaran', 0))
+    return {
+        'pemasukan': pemasukan,
+        'pengeluaran': pengeluaran,
+        'tabungan': to_rupiah(totals.get('Tabungan', 0)),
+        'saldo': pemasukan - pengeluaran,
+    }
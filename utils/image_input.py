@@ -10,6 +10,10 @@ from datetime import datetime, date
 import tempfile
 import os
 
+from utils import categories
+from utils.helpers import KATEGORI_OPTIONS
+from utils.metrics import timed
+
 # Check for cv2 and pytesseract availability by trying to import them
 # Only import when actually needed, not at module level to avoid libGL.so.1 errors
 def check_cv2_availability():
@@ -32,6 +36,7 @@ TESSERACT_AVAILABLE = check_tesseract_availability()
 # Image input availability depends on both cv2 and pytesseract
 IMAGE_INPUT_AVAILABLE = CV2_AVAILABLE and TESSERACT_AVAILABLE
 
+@timed("image_input.extract_financial_data_from_image")
 def extract_financial_data_from_image(image_path):
     """
     Extract financial data from receipt image using OCR
@@ -88,36 +93,56 @@ def extract_financial_data_from_image(image_path):
         if img is None:
             return None, None, None, None, None
         
-        # Preprocess image for better OCR
+        thresh = preprocess_receipt_image(img)
+        text = ocr_image(thresh)
+        
+        return parse_receipt_text(text)
+    
+    except Exception as e:
+        st.error(f"Error processing image: {str(e)}")
+        return None, None, None, None, None
+
+def preprocess_receipt_image(img):
+    """
+    Convert a BGR receipt image to a black and white image for better OCR
+    """
+    import cv2
+    with timed("image_input.preprocess"):
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
         # Apply threshold to get image with only black and white
         _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # Use pytesseract to extract text from image
-        # Try Indonesian first, but fall back to English if language pack is not available
+    return thresh
+
+def ocr_image(image):
+    """
+    Read the text of a preprocessed receipt image with Tesseract
+    """
+    import pytesseract
+    # Try Indonesian first, but fall back to English if language pack is not available
+    with timed("image_input.ocr"):
         try:
-            text = pytesseract.image_to_string(thresh, lang='ind')
+            return pytesseract.image_to_string(image, lang='ind')
         except:
             # If Indonesian language pack is not available, use English
             try:
-                text = pytesseract.image_to_string(thresh, lang='eng')
+                return pytesseract.image_to_string(image, lang='eng')
             except:
                 # If no language packs are available, use default (English)
-                text = pytesseract.image_to_string(thresh)
-        
-        # Extract financial information from text
+                return pytesseract.image_to_string(image)
+
+def parse_receipt_text(text):
+    """
+    Extract (transaction_type, amount, description, category, date) from receipt text
+    """
+    with timed("image_input.parse"):
         amount = extract_amount_from_text(text)
         description = extract_description_from_text(text)
         transaction_type = determine_transaction_type(text)
         date_from_receipt = extract_date_from_text(text)
-        
-        # Return with category (using "Struk" as the category for receipt-based entries)
-        return transaction_type, amount, description, "Struk", date_from_receipt
     
-    except Exception as e:
-        st.error(f"Error processing image: {str(e)}")
-        return None, None, None, None, None
+    # Return with category (using "Struk" as the category for receipt-based entries)
+    return transaction_type, amount, description, "Struk", date_from_receipt
 
 def extract_amount_from_text(text):
     """
@@ -281,69 +306,97 @@ def image_input_interface():
         help="Unggah foto struk dalam format JPG, JPEG, atau PNG"
     )
     
+    # A receipt confirmed in the editor fragment is handed to the caller on the next full run
+    confirmed = st.session_state.pop("confirmed_receipt", None)
+
     if uploaded_file is not None:
         # Display the uploaded image
         image = Image.open(uploaded_file)
         st.image(image, caption="Struk yang Diunggah", use_container_width=True)
-        
-        # Save uploaded file to temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            temp_path = tmp_file.name
-        
+
         try:
             # Extract financial data from the image
             with st.spinner("Membaca informasi dari struk..."):
-                transaction_type, amount, description, category, extracted_date = extract_financial_data_from_image(temp_path)
-            
-            if transaction_type is not None:
+                extracted = read_receipt(uploaded_file.getvalue(), os.path.splitext(uploaded_file.name)[1])
+
+            if extracted[0] is not None:
                 st.success("Berhasil membaca informasi dari struk!")
-                
-                # Display extracted data for confirmation and editing
-                st.subheader("📊 Data Terekam - Konfirmasi dan Edit:")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    selected_type = st.selectbox(
-                        "Jenis Transaksi", 
-                        ["Pemasukan", "Pengeluaran", "Tabungan", "Hutang", "Lainnya"],
-                        index=["Pemasukan", "Pengeluaran", "Tabungan", "Hutang", "Lainnya"].index(transaction_type) 
-                        if transaction_type in ["Pemasukan", "Pengeluaran", "Tabungan", "Hutang", "Lainnya"] else 1
-                    )
-                with col2:
-                    entered_amount = st.number_input("Jumlah (Rp)", min_value=0, value=amount if amount > 0 else 0, format="%d")
-                
-                entered_description = st.text_input("Deskripsi Item", value=description if description else "")
-                
-                # Date selection (use extracted date as default if valid)
-                entered_date = st.date_input("Tanggal", value=extracted_date if extracted_date else date.today())
-                
-                # Notes field
-                entered_notes = st.text_area(
-                    "Catatan Tambahan", 
-                    value=f"Data diambil dari struk: {uploaded_file.name}",
-                    help="Catatan tambahan tentang transaksi"
-                )
-                
-                # Confirmation button to save
-                if st.button("✅ Simpan Transaksi dari Struk", type="primary", use_container_width=True):
-                    return {
-                        'date': entered_date,
-                        'type': selected_type,
-                        'amount': entered_amount,
-                        'description': entered_description,
-                        'notes': entered_notes
-                    }
+                receipt_editor(extracted, uploaded_file.name)
             else:
                 st.error("Tidak dapat membaca informasi dari struk. Silakan coba dengan gambar yang lebih jelas.")
                 st.info("💡 Tips: Pastikan struk terlihat jelas, tidak blur, dan cukup cahaya. Sudut gambar juga penting untuk pembacaan yang akurat.")
-        
+
         except Exception as e:
             st.error(f"Terjadi kesalahan saat memproses gambar: {str(e)}")
-        
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-    
-    return None
\ No newline at end of file
+
+    return confirmed
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def read_receipt(image_bytes, suffix):
+    """
+    Run OCR on an uploaded receipt once per distinct file content
+    """
+    # Save uploaded file to temporary location
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        tmp_file.write(image_bytes)
+        temp_path = tmp_file.name
+
+    try:
+        return extract_financial_data_from_image(temp_path)
+    finally:
+        # Clean up temporary file
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@st.fragment
+def receipt_editor(extracted, file_name):
+    """
+    Editable form for the data read from a receipt; edits rerun only this fragment
+    """
+    transaction_type, amount, description, category, extracted_date = extracted
+
+    # Display extracted data for confirmation and editing
+    st.subheader("📊 Data Terekam - Konfirmasi dan Edit:")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_type = st.selectbox(
+            "Jenis Transaksi", 
+            ["Pemasukan", "Pengeluaran", "Tabungan", "Hutang", "Lainnya"],
+            index=["Pemasukan", "Pengeluaran", "Tabungan", "Hutang", "Lainnya"].index(transaction_type) 
+            if transaction_type in ["Pemasukan", "Pengeluaran", "Tabungan", "Hutang", "Lainnya"] else 1
+        )
+    with col2:
+        entered_amount = st.number_input("Jumlah (Rp)", min_value=0, value=amount if amount > 0 else 0, format="%d")
+
+    entered_description = st.text_input("Deskripsi Item", value=description if description else "")
+
+    # Suggested live as the description changes, since edits rerun this fragment
+    suggestion = categories.suggest(st.session_state.get("buku") or st.session_state.get("email", ""), entered_description, selected_type)
+    selected_category = st.selectbox(
+        "Kategori", [categories.AUTO_LABEL] + KATEGORI_OPTIONS,
+        format_func=lambda option: f"{option}: {suggestion or 'belum diketahui'}" if option == categories.AUTO_LABEL else option,
+    )
+
+    # Date selection (use extracted date as default if valid)
+    entered_date = st.date_input("Tanggal", value=extracted_date if extracted_date else date.today())
+
+    # Notes field
+    entered_notes = st.text_area(
+        "Catatan Tambahan", 
+        value=f"Data diambil dari struk: {file_name}",
+        help="Catatan tambahan tentang transaksi"
+    )
+
+    # Confirmation button to save
+    if st.button("✅ Simpan Transaksi dari Struk", type="primary", use_container_width=True):
+        st.session_state.confirmed_receipt = {
+            'date': entered_date,
+            'type': selected_type,
+            'amount': entered_amount,
+            'description': entered_description,
+            'notes': entered_notes,
+            'category': None if selected_category == categories.AUTO_LABEL else selected_category,
+        }
+        # Saving needs the page, so leave the fragment for a full rerun
+        st.rerun()
@@ -0,0 +1,122 @@
+"""
+Shared ledgers (buku bersama) for Keuangan-Pintar
+A ledger is a book of transactions kept by several users, e.g. a Keluarga's
+household or an UMKM team. Its pemilik manage the members, editors add and
+change transactions, pembaca only read. Every user also has their own book,
+keyed by their email.
+
+A ledger's data is keyed by book_key(id) wherever a user's is keyed by their
+email, so transactions, budgets, recurring rules, categories, search and the
+monthly rollup behind summaries work per ledger unchanged: a ledger with many
+members is one book, as cheap to summarize as a single user's.
+
+Each user's ledger list is cached in this process for LEDGER_CACHE_TTL
+seconds; changes made through this module refresh it for the members
+concerned right away.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from utils import storage
+from utils.metrics import timed
+
+ROLES = ["pemilik", "editor", "pembaca"]
+WRITE_ROLES = {"pemilik", "editor"}
+BOOK_PREFIX = storage.BOOK_PREFIX
+LEDGER_CACHE_TTL = 60  # seconds
+LEDGER_CACHE_SIZE = 1024
+
+_cache = OrderedDict()  # email -> (expires_at, ledgers DataFrame, {book key: role})
+_cache_lock = threading.Lock()
+
+def book_key(ledger_id):
+    """The key a ledger's transactions and other per-book data are stored under"""
+    return f"{BOOK_PREFIX}{int(ledger_id)}"
+
+def ledger_id(book):
+    """The ledger id of a book key, None for a user's own book"""
+    return int(book[len(BOOK_PREFIX):]) if book.startswith(BOOK_PREFIX) else None
+
+def forget_ledgers(*emails):
+    """Drop the cached ledger lists of the given users, or of everyone"""
+    with _cache_lock:
+        if not emails:
+            _cache.clear()
+        for email in emails:
+            _cache.pop(email, None)
+
+def _cached(email):
+    with _cache_lock:
+        entry = _cache.get(email)
+        if entry is not None and entry[0] > time.time():
+            _cache.move_to_end(email)
+            return entry
+    ledgers = storage.get_storage().get_user_ledgers(email)
+    entry = (time.time() + LEDGER_CACHE_TTL, ledgers, {book_key(row.id): row.role for row in ledgers.itertuples()})
+    with _cache_lock:
+        _cache[email] = entry
+        _cache.move_to_end(email)
+        while len(_cache) > LEDGER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return entry
+
+@timed("ledgers.user_ledgers")
+def user_ledgers(email):
+    """The ledgers the user belongs to (id, nama, role), ordered by nama; do not modify"""
+    return _cached(email)[1]
+
+def role(email, book):
+    """The user's role in a book: pemilik of their own, their member role in a ledger, or None"""
+    # A ledger's book key is never a user's own book, whoever logs in with it
+    if book == email and ledger_id(book) is None:
+        return "pemilik"
+    return _cached(email)[2].get(book)
+
+def can_write(role):
+    return role in WRITE_ROLES
+
+def create_ledger(email, nama):
+    """Create a ledger with the user as its pemilik; returns its id"""
+    nama = (nama or "").strip()
+    if not nama:
+        raise ValueError("Nama buku wajib diisi")
+    ledger = storage.get_storage().create_ledger(nama, email, int(time.time()))
+    forget_ledgers(email)
+    return ledger
+
+def members(ledger):
+    """Members of a ledger (email, nama, role), pemilik first"""
+    return storage.get_storage().get_ledger_members(int(ledger))
+
+def _check_owner(by, ledger):
+    if role(by, book_key(ledger)) != "pemilik":
+        raise PermissionError("Hanya pemilik buku yang dapat mengatur anggota")
+
+def _keeps_an_owner(ledger, email):
+    """True if the ledger has a pemilik other than email"""
+    current = members(ledger)
+    return ((current["role"] == "pemilik") & (current["email"] != email)).any()
+
+def set_member(by, ledger, email, role):
+    """Add a registered user to a ledger or change their role; only a pemilik may"""
+    email = (email or "").strip()
+    storage.check_user_email(email)
+    if role not in ROLES:
+        raise ValueError(f"Peran tidak dikenal: {role}")
+    _check_owner(by, ledger)
+    if role != "pemilik" and not _keeps_an_owner(ledger, email):
+        raise ValueError("Buku harus tetap memiliki minimal satu pemilik")
+    if not storage.get_storage().set_ledger_member(int(ledger), email, role, int(time.time())):
+        raise ValueError(f"Email belum terdaftar: {email}")
+    forget_ledgers(email)
+
+def remove_member(by, ledger, email):
+    """Take a member out of a ledger: a pemilik may remove anyone, others only leave; False if not a member"""
+    if by != email:
+        _check_owner(by, ledger)
+    if not _keeps_an_owner(ledger, email):
+        raise ValueError("Buku harus tetap memiliki minimal satu pemilik")
+    removed = storage.get_storage().remove_ledger_member(int(ledger), email)
+    forget_ledgers(email)
+    return removed
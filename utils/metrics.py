@@ -0,0 +1,231 @@
+"""
+Lightweight instrumentation for Keuangan-Pintar
+Records latency histograms for instrumented operations and SQL statement counts
+per Streamlit rerun, and renders them in the Prometheus text format.
+
+Instrumentation is off unless METRICS_ENABLED=1; when off, timed() only costs
+one flag check per call. Set METRICS_FILE to have the Prometheus text written
+there periodically.
+
+SQL counts are per thread: statements run on the WriteQueue writer thread
+(utils.db_writer), i.e. every INSERT, UPDATE and DELETE and their commits,
+are not counted in the rerun that queued them. rerun_sql_queries therefore
+counts the reads of a rerun.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+
+from utils import concurrency
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds; the last bucket catches everything else
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, float("inf"))
+EXPORT_INTERVAL = 10  # seconds between METRICS_FILE writes
+
+ENABLED = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+METRICS_FILE = os.getenv("METRICS_FILE")
+
+_lock = threading.Lock()
+_histograms = {}
+_rerun = threading.local()
+_last_rerun = {}
+_last_export = 0.0
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    """Drop all recorded measurements"""
+    with _lock:
+        _histograms.clear()
+        _last_rerun.clear()
+
+def observe(name, value, buckets=LATENCY_BUCKETS_MS):
+    """Add one observation to the histogram called name"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {
+                "buckets": buckets,
+                "counts": [0] * len(buckets),
+                "count": 0,
+                "sum": 0.0,
+            }
+        for i, bound in enumerate(histogram["buckets"]):
+            if value <= bound:
+                histogram["counts"][i] += 1
+                break
+        histogram["count"] += 1
+        histogram["sum"] += value
+
+class timed:
+    """
+    Record the latency of a block or function under name, e.g.
+
+        @timed("helpers.get_transactions")
+        def get_transactions(email): ...
+
+        with timed("grafik.figure"):
+            fig = build_figure()
+    """
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        if ENABLED:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is not None:
+            observe(self.name, (time.perf_counter() - self._start) * 1000)
+            self._start = None
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+
+def count_query(statement):
+    """sqlite3 trace callback: count statements executed during the current rerun"""
+    _rerun.queries = getattr(_rerun, "queries", 0) + 1
+
+def instrument_connection(conn):
+    """Attach the query counter to a new sqlite3 connection when enabled"""
+    if ENABLED:
+        conn.set_trace_callback(count_query)
+    return conn
+
+def begin_rerun():
+    """Mark the start of a Streamlit script run on this thread"""
+    if ENABLED:
+        _rerun.start = time.perf_counter()
+        _rerun.queries = 0
+
+def end_rerun(page=None):
+    """Record duration and SQL statement count of the script run started by begin_rerun"""
+    start = getattr(_rerun, "start", None)
+    if not ENABLED or start is None:
+        return
+    elapsed = (time.perf_counter() - start) * 1000
+    queries = getattr(_rerun, "queries", 0)
+    _rerun.start = None
+
+    observe("rerun", elapsed)
+    observe("rerun_sql_queries", queries, QUERY_BUCKETS)
+    if page:
+        observe(f"rerun.{page}", elapsed)
+        observe(f"rerun_sql_queries.{page}", queries, QUERY_BUCKETS)
+    with _lock:
+        _last_rerun.update({"page": page, "ms": elapsed, "queries": queries})
+
+    if METRICS_FILE and _export_due():
+        try:
+            write_prometheus(METRICS_FILE)
+        except Exception:
+            # Metrics must never break the page being rendered
+            logger.exception("writing metrics to %s failed", METRICS_FILE)
+
+def _export_due():
+    """True for the one caller that should write METRICS_FILE now"""
+    global _last_export
+    now = time.time()
+    with _lock:
+        if now - _last_export < EXPORT_INTERVAL:
+            return False
+        _last_export = now
+        return True
+
+def last_rerun():
+    with _lock:
+        return dict(_last_rerun)
+
+def _quantile(histogram, q):
+    """Upper bucket bound containing the q-quantile"""
+    target = q * histogram["count"]
+    seen = 0
+    for bound, count in zip(histogram["buckets"], histogram["counts"]):
+        seen += count
+        if seen >= target:
+            return bound
+    return float("inf")
+
+def summary():
+    """One row per histogram with count, mean and approximate p50/p95"""
+    with _lock:
+        rows = []
+        for name in sorted(_histograms):
+            histogram = _histograms[name]
+            count = histogram["count"]
+            rows.append({
+                "name": name,
+                "count": count,
+                "mean": histogram["sum"] / count if count else 0.0,
+                "p50": _quantile(histogram, 0.5),
+                "p95": _quantile(histogram, 0.95),
+            })
+        return rows
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+def render_prometheus():
+    """All histograms in the Prometheus text exposition format"""
+    families = {
+        "smartkeuangan_latency_ms": "Latency of instrumented operations in milliseconds",
+        "smartkeuangan_sql_queries": "SQL statements executed per Streamlit rerun",
+    }
+    lines = {family: [] for family in families}
+    with _lock:
+        for name in sorted(_histograms):
+            histogram = _histograms[name]
+            family = "smartkeuangan_sql_queries" if name.startswith("rerun_sql_queries") else "smartkeuangan_latency_ms"
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                lines[family].append(f'{family}_bucket{{op="{label}",le="{_format_bound(bound)}"}} {cumulative}')
+            lines[family].append(f'{family}_sum{{op="{label}"}} {histogram["sum"]:g}')
+            lines[family].append(f'{family}_count{{op="{label}"}} {histogram["count"]}')
+
+    output = []
+    for family, help_text in families.items():
+        output.append(f"# HELP {family} {help_text}")
+        output.append(f"# TYPE {family} histogram")
+        output.extend(lines[family])
+    return "\n".join(output) + "\n"
+
+def write_prometheus(path):
+    """Atomically write the Prometheus text file, e.g. for node_exporter's textfile collector"""
+    global _last_export
+    with _lock:
+        _last_export = time.time()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with concurrency.atomic_path(path) as tmp:
+        with open(tmp, "w") as f:
+            f.write(render_prometheus())
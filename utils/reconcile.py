@@ -0,0 +1,45 @@
+"""
+Reconciliation of the integer money migration
+For every user that had transactions when amounts moved from REAL to whole
+rupiah, checks that the same rows still exist and that their integer total
+equals the sum of the rounded amounts recorded at migration time. Also
+reports how far the old float total was from it (the drift the migration
+removed) and any amount that is still not an integer.
+
+Usage: python -m utils.reconcile [--db database/keuangan.db] [--all]
+Exits with status 1 when a user does not reconcile.
+"""
+import argparse
+import sys
+
+from utils import helpers, storage
+
+def reconcile():
+    """The backend's reconciliation frame with an ok column added"""
+    df = storage.get_storage().reconcile_money()
+    df["ok"] = (
+        (df["audited_rows"] == df["rows_now"])
+        & (df["expected_total"] == df["total_now"])
+        & (df["non_integer_rows"] == 0)
+    )
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=helpers.DB_PATH, help="main SQLite database (sqlite and sharded backends)")
+    parser.add_argument("--all", action="store_true", help="list users that reconcile too")
+    args = parser.parse_args()
+
+    helpers.DB_PATH = args.db
+    df = reconcile()
+    failed = df[~df["ok"]]
+    shown = df if args.all else failed
+    if not shown.empty:
+        print(shown.to_string(index=False))
+    print(f"{len(df)} users checked, {len(failed)} mismatched; "
+          f"{int(df['fractional_rows'].sum())} fractional amounts rounded, "
+          f"total float drift removed Rp{df['rounding_drift'].abs().sum():,.2f}")
+    sys.exit(1 if len(failed) else 0)
+
+if __name__ == "__main__":
+    main()
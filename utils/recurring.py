@@ -0,0 +1,174 @@
+"""
+Recurring transactions for Keuangan-Pintar
+A rule (e.g. salary every month on the 25th, rent every 4 weeks) produces
+occurrences 0, 1, 2, ... counted from its start date. A background thread in
+each server process materializes the occurrences that fell due, catching up
+on everything missed while no server was running.
+
+Materializing is idempotent and safe with several processes at once: every
+occurrence is inserted with its (rule_id, rule_occurrence) key, which a unique
+index keeps from being inserted twice, and a rule is only advanced past its
+occurrences with a compare-and-set on next_index. A process that crashes in
+between simply inserts nothing new on the next run.
+
+Configuration (environment):
+    RECURRING_INTERVAL    seconds between scheduler runs (default 3600)
+    RECURRING_SCHEDULER   set to 0 to not start the scheduler thread
+"""
+import calendar
+import datetime
+import logging
+import os
+
+from utils import concurrency, helpers, storage
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+UNITS = ("day", "week", "month")
+# Choices offered in Input Data: label -> (unit, every)
+FREQUENCIES = {"Bulanan": ("month", 1), "Mingguan": ("week", 1), "Harian": ("day", 1)}
+UNIT_LABELS = {"day": "hari", "week": "minggu", "month": "bulan"}
+
+BATCH_SIZE = 200  # rules materialized per round
+MAX_CATCH_UP = 400  # occurrences of one rule per round, bounding a single commit
+SCHEDULER_INTERVAL = int(os.getenv("RECURRING_INTERVAL", "3600"))
+
+def occurrence_date(start, unit, every, index):
+    """
+    Date of occurrence index (0 is the start date); monthly rules keep the
+    start day and fall back to the last day of shorter months
+    """
+    if unit == "day":
+        return start + datetime.timedelta(days=every * index)
+    if unit == "week":
+        return start + datetime.timedelta(weeks=every * index)
+    months = start.month - 1 + every * index
+    year, month = start.year + months // 12, months % 12 + 1
+    return datetime.date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+def _next_date(rule, index):
+    """Date of the rule's occurrence index, or None once past its end date"""
+    start = datetime.date.fromisoformat(rule["start_date"])
+    value = occurrence_date(start, rule["unit"], rule["every"], index)
+    if rule["end_date"] and value > datetime.date.fromisoformat(rule["end_date"]):
+        return None
+    return value
+
+def create_rule(email, kategori_pengguna, jenis, item, jumlah, catatan, start_date, unit="month", every=1,
+                end_date=None, today=None):
+    """
+    Store a recurring rule and materialize the occurrences due by today
+    (default: now); returns the rule id
+    """
+    if unit not in UNITS:
+        raise ValueError(f"Satuan tidak dikenal: {unit}")
+    if int(every) < 1:
+        raise ValueError("Interval minimal 1")
+    if jenis not in helpers.JENIS_OPTIONS:
+        raise ValueError(f"Jenis tidak dikenal: {jenis}")
+    start_date = datetime.date.fromisoformat(str(start_date)[:10])
+    if end_date is not None:
+        end_date = datetime.date.fromisoformat(str(end_date)[:10])
+        if end_date < start_date:
+            raise ValueError("Tanggal selesai sebelum tanggal mulai")
+
+    rule_id = storage.get_storage().create_rule(email, {
+        "kategori_pengguna": kategori_pengguna,
+        "jenis": jenis,
+        "item": item or "",
+        "jumlah": helpers.to_rupiah(jumlah),
+        "catatan": catatan or "",
+        "unit": unit,
+        "every": int(every),
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat() if end_date else None,
+        "next_index": 0,
+        "next_date": start_date.isoformat(),
+    })
+    run_due(today)
+    return rule_id
+
+def list_rules(email):
+    """The user's rules as a DataFrame (see storage.RULE_COLUMNS)"""
+    return storage.get_storage().get_rules(email)
+
+def delete_rule(email, rule_id):
+    """Stop a rule; transactions it already produced are kept"""
+    return storage.get_storage().delete_rule(email, int(rule_id))
+
+def describe(rule):
+    """Short Indonesian description of a rule's frequency, e.g. 'setiap 2 minggu'"""
+    if rule["every"] == 1:
+        return f"setiap {UNIT_LABELS[rule['unit']]}"
+    return f"setiap {rule['every']} {UNIT_LABELS[rule['unit']]}"
+
+def _materialize(rule, today):
+    """Occurrence rows from the rule's next_index up to today, and where the rule goes next"""
+    rows = []
+    index, value = rule["next_index"], _next_date(rule, rule["next_index"])
+    while value is not None and value <= today and len(rows) < MAX_CATCH_UP:
+        rows.append({
+            "tanggal": value.isoformat(),
+            "kategori_pengguna": rule["kategori_pengguna"],
+            "jenis": rule["jenis"],
+            "item": rule["item"],
+            "jumlah": rule["jumlah"],
+            "catatan": rule["catatan"],
+            "rule_id": rule["id"],
+            "rule_occurrence": index,
+        })
+        index += 1
+        value = _next_date(rule, index)
+    return rows, index, value.isoformat() if value else None
+
+@timed("recurring.run_due")
+def run_due(today=None):
+    """
+    Materialize every occurrence due on or before today (default: now);
+    returns the number of transactions inserted by this call
+    """
+    today = today or datetime.date.today()
+    backend = storage.get_storage()
+    inserted = 0
+    while True:
+        rules = backend.due_rules(today, BATCH_SIZE)
+        if not rules:
+            return inserted
+
+        # One batched insert per user; the writer queue groups them into few commits
+        plans, by_email = [], {}
+        for rule in rules:
+            rows, next_index, next_date = _materialize(rule, today)
+            plans.append((rule, next_index, next_date))
+            by_email.setdefault(rule["email"], []).extend(rows)
+        for email, rows in by_email.items():
+            if rows:
+                inserted += backend.insert_occurrences(email, rows)
+
+        advanced = 0
+        for rule, next_index, next_date in plans:
+            # Fails harmlessly when another process advanced the rule first
+            advanced += backend.advance_rule(rule["id"], rule["next_index"], next_index, next_date)
+        if advanced == 0 and len(rules) < BATCH_SIZE:
+            return inserted
+
+def _run_scheduled():
+    count = run_due()
+    if count:
+        logger.info("materialized %d recurring transactions", count)
+
+_scheduler = concurrency.Scheduler(
+    "recurring-scheduler", concurrency.periodic(_run_scheduled, "recurring transactions scheduler"), "RECURRING_SCHEDULER",
+)
+
+def start_scheduler(interval=None):
+    """
+    Start the background scheduler once per process; the first run happens
+    immediately, so occurrences missed while the server was down are caught up
+    """
+    return _scheduler.start(interval or SCHEDULER_INTERVAL)
+
+def stop_scheduler():
+    """Stop the scheduler thread, e.g. in tests"""
+    _scheduler.stop()
@@ -0,0 +1,147 @@
+"""
+Persistent login sessions for Keuangan-Pintar
+Logins are stored as signed tokens in the sessions table so they survive
+browser refreshes and server restarts, with an in-process LRU of sessions
+that have already been validated. A cached session is checked against the
+database again after SESSION_CACHE_TTL seconds, so a logout in another
+process (the API or another server) takes effect here within that time.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from utils import storage
+
+SESSION_TTL = 7 * 24 * 60 * 60  # seconds
+SESSION_CACHE_SIZE = 1024
+SESSION_CACHE_TTL = 60  # seconds a validated session is trusted without the database
+SECRET_ENV = "SESSION_SECRET"
+SECRET_FILE = "database/.session_secret"
+
+_secret = None
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _get_secret():
+    """Load the signing secret from the environment or the local secret file"""
+    global _secret
+    if _secret is not None:
+        return _secret
+
+    secret = os.getenv(SECRET_ENV)
+    if secret:
+        _secret = secret.encode()
+        return _secret
+
+    # Persist a generated secret so tokens stay valid across restarts. O_EXCL
+    # makes one process the creator when several start together; the file is
+    # private from the moment it exists.
+    os.makedirs(os.path.dirname(SECRET_FILE), exist_ok=True)
+    secret = secrets.token_hex(32).encode()
+    try:
+        fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        _secret = _read_secret()
+    else:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secret)
+        _secret = secret
+    return _secret
+
+def _read_secret():
+    # The creator may not have written it yet
+    for _ in range(50):
+        with open(SECRET_FILE, 'rb') as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+        time.sleep(0.01)
+    raise RuntimeError(f"{SECRET_FILE} is empty; remove it to generate a new secret")
+
+def _sign(session_id):
+    return hmac.new(_get_secret(), session_id.encode(), hashlib.sha256).hexdigest()
+
+def _storage_key(session_id):
+    # Only a hash of the session id is stored, so a leaked database holds no usable tokens
+    return hashlib.sha256(session_id.encode()).hexdigest()
+
+def _cache_put(token, session):
+    with _cache_lock:
+        _cache[token] = session
+        _cache.move_to_end(token)
+        while len(_cache) > SESSION_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _cache_get(token):
+    with _cache_lock:
+        session = _cache.get(token)
+        if session is not None:
+            _cache.move_to_end(token)
+        return session
+
+def _cache_drop(token):
+    with _cache_lock:
+        _cache.pop(token, None)
+
+def clear_session_cache():
+    """Forget every validated session held in memory"""
+    with _cache_lock:
+        _cache.clear()
+
+def create_session(email, ttl=SESSION_TTL):
+    """Create a session for an authenticated user and return its token"""
+    session_id = secrets.token_urlsafe(24)
+    now = int(time.time())
+    expires_at = now + ttl
+
+    storage.get_storage().create_session(_storage_key(session_id), email, now, expires_at)
+
+    return f"{session_id}.{_sign(session_id)}"
+
+def get_session(token):
+    """
+    Return (email, nama, kategori_pengguna) for a valid token, None otherwise
+    """
+    if not token or '.' not in token:
+        return None
+
+    now = time.time()
+    session = _cache_get(token)
+    if session is not None:
+        if session['expires_at'] <= now:
+            _cache_drop(token)
+            return None
+        if session['checked_until'] > now:
+            return session['email'], session['nama'], session['kategori_pengguna']
+        _cache_drop(token)  # Revoked elsewhere, perhaps: ask the database again
+
+    session_id, signature = token.rsplit('.', 1)
+    # Forged tokens are rejected without touching the database
+    if not hmac.compare_digest(signature, _sign(session_id)):
+        return None
+
+    result = storage.get_storage().get_session(_storage_key(session_id))
+    if result is None or result[3] <= now:
+        return None
+
+    email, nama, kategori_pengguna, expires_at = result
+    _cache_put(token, {
+        'email': email,
+        'nama': nama,
+        'kategori_pengguna': kategori_pengguna,
+        'expires_at': expires_at,
+        'checked_until': now + SESSION_CACHE_TTL,
+    })
+    return email, nama, kategori_pengguna
+
+def revoke_session(token):
+    """Invalidate a session token, e.g. on logout"""
+    if not token or '.' not in token:
+        return
+    _cache_drop(token)
+    session_id = token.rsplit('.', 1)[0]
+    storage.get_storage().delete_session(_storage_key(session_id))
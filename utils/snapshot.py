@@ -0,0 +1,199 @@
+"""
+Columnar per-user snapshots of the transactions table for analytics
+Each user's transactions are kept as Arrow IPC files under SNAPSHOT_DIR: a base
+file plus small delta files appended after new transactions, merged back into
+the base every MAX_DELTAS refreshes. Readers memory-map the files, so loading
+a snapshot does not pull rows through SQLite and pandas again.
+
+A snapshot is refreshed lazily on read when the user's data version moved on.
+Only the rows written since the snapshot's version are read from the
+database: pure inserts become a delta file, edits and deletes patch the table
+and write a new base. Purged or rebalanced rows rebuild it from scratch.
+
+Needs pyarrow; AVAILABLE is False without it and callers fall back to
+helpers.get_transactions.
+"""
+import json
+import os
+
+from utils import concurrency, helpers, storage
+from utils.metrics import timed
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    AVAILABLE = True
+except ImportError:
+    pa = pc = None
+    AVAILABLE = False
+
+MAX_DELTAS = 8
+LOAD_ATTEMPTS = 3
+FORMAT = 3  # bumped when the file schema changes; older snapshots are rebuilt
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")  # default: snapshots/ next to helpers.DB_PATH
+
+_lock = concurrency.KeyedLocks()  # email -> lock held while refreshing the snapshot
+
+def _schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("Tanggal", pa.timestamp("s")),
+        ("Jenis", pa.dictionary(pa.int32(), pa.string())),
+        ("Item", pa.string()),
+        ("Jumlah", pa.int64()),
+        ("Catatan", pa.string()),
+    ])
+
+def snapshot_dir(email):
+    root = SNAPSHOT_DIR or os.path.join(os.path.dirname(helpers.DB_PATH), "snapshots")
+    return os.path.join(root, concurrency.file_key(email))
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_atomic(path, write):
+    with concurrency.atomic_path(path) as tmp:
+        write(tmp)
+
+def _write_meta(directory, meta):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+    _write_atomic(os.path.join(directory, "meta.json"), write)
+
+def _write_table(path, table):
+    def write(tmp):
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    _write_atomic(path, write)
+
+def _to_table(df):
+    return pa.Table.from_pandas(helpers.typed_transactions(df), preserve_index=False).cast(_schema())
+
+def _open_table(directory, meta):
+    """Memory-map the base and delta files; the columns point into the mapped pages"""
+    tables = []
+    for name in [meta["base"]] + meta["deltas"]:
+        with pa.memory_map(os.path.join(directory, name), "r") as source:
+            tables.append(pa.ipc.open_file(source).read_all())
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+def _rebuild(directory, email, version, meta):
+    os.makedirs(directory, exist_ok=True)
+    # Rows written after version was read are fetched again by the next refresh
+    df = storage.get_storage().get_transactions(email, ["id"] + storage.TRANSACTION_COLUMNS)
+    generation = (meta["generation"] + 1) if meta else 0
+    base = f"base-{generation}.arrow"
+    _write_table(os.path.join(directory, base), _to_table(df))
+    new_meta = {
+        "format": FORMAT, "version": version, "generation": generation, "base": base, "deltas": [],
+        "rows": len(df), "max_id": int(df["id"].max()) if len(df) else 0,
+    }
+    _write_meta(directory, new_meta)
+    _remove_unused(directory, new_meta)
+    return new_meta
+
+def _remove_unused(directory, meta):
+    # Readers that still map an old file keep its pages after the unlink
+    keep = {meta["base"], "meta.json"} | set(meta["deltas"])
+    for name in os.listdir(directory):
+        # Temporary files may be another process's writes in progress
+        if name not in keep and not name.endswith(".tmp"):
+            concurrency.remove_file(os.path.join(directory, name))
+
+def _write_base(directory, meta, table):
+    generation = meta["generation"] + 1
+    base = f"base-{generation}.arrow"
+    _write_table(os.path.join(directory, base), table.combine_chunks())
+    return dict(meta, generation=generation, base=base, deltas=[])
+
+def _patch(directory, email, version, meta):
+    """Apply the rows written since the snapshot; None when a rebuild is needed instead"""
+    changes = storage.get_storage().get_changes(email, meta["version"], meta["max_id"])
+    if changes is None or changes.empty:
+        return None  # Purged rows, or a write that did not stamp its rows
+
+    live = changes[~changes["deleted"]].drop(columns="deleted")
+    if not changes["deleted"].any() and (changes["id"] > meta["max_id"]).all():
+        # Only new rows: append them as a delta, merging into one base now and then
+        rows = meta["rows"] + len(live)
+        if len(meta["deltas"]) >= MAX_DELTAS:
+            meta = _write_base(directory, meta, pa.concat_tables([_open_table(directory, meta), _to_table(live)]))
+        else:
+            delta = f"delta-{meta['generation']}-{int(live['id'].iloc[-1])}.arrow"
+            _write_table(os.path.join(directory, delta), _to_table(live))
+            meta = dict(meta, deltas=meta["deltas"] + [delta])
+    else:
+        # Edits and deletes: drop every changed id and add back the live versions
+        table = _open_table(directory, meta)
+        table = table.filter(pc.invert(pc.is_in(table["id"], pa.array(changes["id"], pa.int64()))))
+        table = pa.concat_tables([table, _to_table(live)])
+        rows = table.num_rows
+        meta = _write_base(directory, meta, table)
+
+    meta.update(
+        version=version,
+        rows=rows,
+        max_id=max(meta["max_id"], int(changes["id"].max())),
+    )
+    _write_meta(directory, meta)
+    _remove_unused(directory, meta)
+    return meta
+
+@timed("snapshot.refresh")
+def refresh(email, version=None):
+    """Bring the user's snapshot up to the given (or current) data version; returns its metadata"""
+    if version is None:
+        version = helpers.get_data_version(email)
+    directory = snapshot_dir(email)
+    meta = _read_meta(directory)
+    if meta is not None and meta["version"] == version and meta.get("format") == FORMAT:
+        return meta
+
+    with _lock(email):
+        meta = _read_meta(directory)
+        if meta is not None and meta.get("format") != FORMAT:
+            meta = dict(meta, version=-1)  # Stale file layout: never reuse or append to it
+        if meta is not None and meta["version"] == version:
+            return meta
+        if meta is not None and version > meta["version"] >= 0:
+            patched = _patch(directory, email, version, meta)
+            if patched is not None:
+                return patched
+        return _rebuild(directory, email, version, meta)
+
+def load_table(email, version=None):
+    """The user's transactions as a memory-mapped Arrow table, including the id column"""
+    for attempt in range(LOAD_ATTEMPTS):
+        meta = refresh(email, version)
+        try:
+            return _open_table(snapshot_dir(email), meta)
+        except FileNotFoundError:
+            # A concurrent refresh of the book replaced the files meta names; read its newer meta
+            if attempt == LOAD_ATTEMPTS - 1:
+                raise
+            version = None
+
+@timed("snapshot.load")
+def load(email, version=None, columns=None):
+    """
+    The user's transactions as a DataFrame typed like helpers.get_transactions,
+    limited to the given columns; unselected columns are never read from disk
+    """
+    table = load_table(email, version).select(list(columns or storage.TRANSACTION_COLUMNS))
+    # split_blocks avoids consolidating columns into new 2-D blocks, so numeric columns stay zero-copy
+    return table.to_pandas(split_blocks=True)
+
+def invalidate(email):
+    """Drop the user's snapshot so the next read rebuilds it"""
+    directory = snapshot_dir(email)
+    with _lock(email):
+        if os.path.exists(directory):
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
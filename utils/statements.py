@@ -0,0 +1,338 @@
+"""
+Monthly PDF statements for Keuangan-Pintar
+Once a month has ended, every book (a user's own or a ledger, see
+utils.ledgers) gets a statement for it: the month's totals, a daily spending
+chart, spending per category and the largest items. The Export Data page
+serves the stored PDF instead of rendering one while the user waits.
+
+Statements are stored content-addressed under STATEMENT_DIR (default
+statements/ next to helpers.DB_PATH): objects/<key>.pdf, where key is the
+SHA-256 of the book and everything its statement shows, plus one index file
+per book mapping each month to its key and the fingerprint of the rows it
+was made from.
+
+A background thread in each server process runs generate() every
+STATEMENT_INTERVAL seconds. A book whose data version has not moved since the
+last run, with no month closed since, is skipped after one comparison. For
+the others Storage.month_fingerprints tells which closed months changed; only
+those are read again, and only those whose content hash has no file yet are
+rendered, in a pool of STATEMENT_WORKERS processes. Run it by hand with:
+
+    python -m utils.statements run
+
+Configuration (environment):
+    STATEMENT_DIR         where statements are stored
+    STATEMENT_INTERVAL    seconds between scheduler runs (default 3600)
+    STATEMENT_WORKERS     processes rendering PDFs (default: the CPU count, at most 4)
+    STATEMENT_SCHEDULER   set to 0 to not start the scheduler thread
+"""
+import argparse
+import calendar
+import concurrent.futures
+import datetime
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+
+from fpdf import FPDF
+
+from utils import concurrency, helpers, ledgers, storage
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 1  # bumped when the layout changes; every statement is rendered again
+STATEMENT_DIR = os.getenv("STATEMENT_DIR")  # default: statements/ next to helpers.DB_PATH
+SCHEDULER_INTERVAL = int(os.getenv("STATEMENT_INTERVAL", "3600"))
+WORKERS = int(os.getenv("STATEMENT_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+RENDER_BATCH = 64  # statements rendered before their books' indexes are written
+COLUMNS = ["Tanggal", "Jenis", "Item", "Jumlah", "Kategori"]
+TOP_ITEMS = 10
+NO_KATEGORI = "Tanpa Kategori"
+BULAN_NAMES = [
+    "Januari", "Februari", "Maret", "April", "Mei", "Juni",
+    "Juli", "Agustus", "September", "Oktober", "November", "Desember",
+]
+SPENDING_COLOR = (231, 76, 60)
+CHART_HEIGHT = 45  # mm
+
+def _root():
+    return STATEMENT_DIR or os.path.join(os.path.dirname(helpers.DB_PATH), "statements")
+
+def _index_path(email):
+    return os.path.join(_root(), "index", f"{concurrency.file_key(email)}.json")
+
+def object_path(key):
+    return os.path.join(_root(), "objects", key[:2], f"{key}.pdf")
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with concurrency.atomic_path(path) as tmp:
+        with open(tmp, "wb") as f:
+            f.write(data)
+
+def _read_index(email):
+    try:
+        with open(_index_path(email)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {"format": FORMAT, "version": None, "open": None, "months": {}}
+    if index.get("format") != FORMAT:
+        return {"format": FORMAT, "version": None, "open": None, "months": {}}
+    return index
+
+def month_label(bulan):
+    """'2024-01' as 'Januari 2024'"""
+    tahun, month = bulan.split("-")
+    return f"{BULAN_NAMES[int(month) - 1]} {tahun}"
+
+def _month_rows(email, bulan):
+    tahun, month = map(int, bulan.split("-"))
+    end = f"{bulan}-{calendar.monthrange(tahun, month)[1]:02d}"
+    df = storage.get_storage().get_transactions(email, COLUMNS, f"{bulan}-01", end)
+    # Missing text comes back as NaN from the DataFrame
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+def statement_content(bulan, rows, nama=None):
+    """Everything a statement shows, from the month's rows of COLUMNS"""
+    totals, daily, kategori, items = {}, {}, {}, {}
+    for tanggal, jenis, item, jumlah, kategori_row in rows:
+        jumlah = helpers.to_rupiah(jumlah)
+        totals[jenis] = totals.get(jenis, 0) + jumlah
+        if jenis == "Pengeluaran":
+            day = int(tanggal[8:10])
+            daily[day] = daily.get(day, 0) + jumlah
+            kategori_row = kategori_row or NO_KATEGORI
+            kategori[kategori_row] = kategori.get(kategori_row, 0) + jumlah
+            entry = items.setdefault(item or "-", [0, 0])
+            entry[0] += 1
+            entry[1] += jumlah
+    tahun, month = map(int, bulan.split("-"))
+    top = sorted(items.items(), key=lambda pair: (-pair[1][1], pair[0]))[:TOP_ITEMS]
+    return {
+        "format": FORMAT,
+        "bulan": bulan,
+        "nama": nama,
+        "pemasukan": totals.get("Pemasukan", 0),
+        "pengeluaran": totals.get("Pengeluaran", 0),
+        "tabungan": totals.get("Tabungan", 0),
+        "saldo": totals.get("Pemasukan", 0) - totals.get("Pengeluaran", 0),
+        "transaksi": len(rows),
+        "harian": [daily.get(day, 0) for day in range(1, calendar.monthrange(tahun, month)[1] + 1)],
+        "kategori": sorted(([name, total] for name, total in kategori.items()), key=lambda pair: (-pair[1], pair[0])),
+        "item": [[item, count, total] for item, (count, total) in top],
+    }
+
+def content_key(email, content):
+    """The address of a statement: a hash of its book and of everything it shows"""
+    return hashlib.sha256(json.dumps([email, content], sort_keys=True).encode()).hexdigest()
+
+def _text(value):
+    # The core PDF fonts only have Latin-1 glyphs
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+def _rupiah(value):
+    return f"Rp{value:,.0f}"
+
+def _heading(pdf, title, space):
+    if pdf.get_y() + space > pdf.h - pdf.b_margin:
+        pdf.add_page()
+    pdf.ln(3)
+    pdf.set_font("Arial", style="B", size=12)
+    pdf.cell(0, 8, title, ln=1)
+    pdf.set_font("Arial", size=9)
+
+def _daily_chart(pdf, values):
+    _heading(pdf, "Pengeluaran Harian", CHART_HEIGHT + 20)
+    left, width = pdf.l_margin, pdf.w - pdf.l_margin - pdf.r_margin
+    top = pdf.get_y() + 4
+    peak = max(values) or 1
+    step = width / len(values)
+    pdf.set_font("Arial", size=7)
+    pdf.text(left, top - 1, f"maks. {_rupiah(peak)}")
+    pdf.set_fill_color(*SPENDING_COLOR)
+    for day, value in enumerate(values):
+        bar = CHART_HEIGHT * value / peak
+        if bar:
+            pdf.rect(left + day * step + step * 0.15, top + CHART_HEIGHT - bar, step * 0.7, bar, "F")
+    pdf.set_draw_color(120, 120, 120)
+    pdf.line(left, top + CHART_HEIGHT, left + width, top + CHART_HEIGHT)
+    for day in [1] + list(range(5, len(values) + 1, 5)):
+        pdf.text(left + (day - 1) * step + step * 0.2, top + CHART_HEIGHT + 3.5, str(day))
+    pdf.set_y(top + CHART_HEIGHT + 6)
+
+def _category_chart(pdf, kategori):
+    _heading(pdf, "Pengeluaran per Kategori", 20)
+    peak = max(total for _, total in kategori) or 1
+    pdf.set_fill_color(*SPENDING_COLOR)
+    for name, total in kategori:
+        if pdf.get_y() + 6 > pdf.h - pdf.b_margin:
+            pdf.add_page()
+        y = pdf.get_y()
+        pdf.cell(50, 6, _text(name))
+        pdf.rect(pdf.l_margin + 50, y + 1, max(100 * total / peak, 0.5), 4, "F")
+        pdf.set_x(pdf.l_margin + 155)
+        pdf.cell(35, 6, _rupiah(total), align="R", ln=1)
+
+def _item_table(pdf, items):
+    _heading(pdf, "Pengeluaran Terbesar", 20)
+    pdf.set_font("Arial", style="B", size=9)
+    for header, width, align in [("Item", 110, "L"), ("Transaksi", 30, "R"), ("Total", 50, "R")]:
+        pdf.cell(width, 7, header, border=1, align=align)
+    pdf.ln()
+    pdf.set_font("Arial", size=9)
+    for item, count, total in items:
+        pdf.cell(110, 7, _text(item)[:60], border=1)
+        pdf.cell(30, 7, str(count), border=1, align="R")
+        pdf.cell(50, 7, _rupiah(total), border=1, align="R", ln=1)
+
+def render_pdf(content):
+    """The statement PDF for a statement_content; runs in the worker processes"""
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, 15)
+    pdf.add_page()
+    pdf.set_font("Arial", style="B", size=16)
+    pdf.cell(0, 10, "Laporan Keuangan Bulanan", ln=1, align="C")
+    pdf.set_font("Arial", size=12)
+    subtitle = month_label(content["bulan"]) + (f" - {content['nama']}" if content["nama"] else "")
+    pdf.cell(0, 7, _text(subtitle), ln=1, align="C")
+    pdf.ln(4)
+
+    pdf.set_font("Arial", size=10)
+    for label, value in [
+        ("Pemasukan", _rupiah(content["pemasukan"])),
+        ("Pengeluaran", _rupiah(content["pengeluaran"])),
+        ("Tabungan", _rupiah(content["tabungan"])),
+        ("Saldo", _rupiah(content["saldo"])),
+        ("Jumlah transaksi", str(content["transaksi"])),
+    ]:
+        pdf.cell(60, 8, label, border=1)
+        pdf.cell(60, 8, value, border=1, align="R", ln=1)
+
+    if content["pengeluaran"]:
+        _daily_chart(pdf, content["harian"])
+        _category_chart(pdf, content["kategori"])
+        _item_table(pdf, content["item"])
+    return pdf.output(dest="S").encode("latin-1")
+
+def _owner_name(email):
+    if ledgers.ledger_id(email) is not None:
+        return None
+    info = storage.get_storage().get_user_info(email)
+    return info[0] if info else None
+
+def _render(jobs, pool):
+    """Render {key: content} and store the PDFs"""
+    keys = list(jobs)
+    if pool is None:
+        pdfs = map(render_pdf, (jobs[key] for key in keys))
+    else:
+        pdfs = pool.map(render_pdf, (jobs[key] for key in keys))
+    for key, pdf in zip(keys, pdfs):
+        _write_atomic(object_path(key), pdf)
+
+def _commit(pending):
+    """Write the indexes of the books whose statements are stored, then drop the objects they replaced"""
+    for email, index, replaced in pending:
+        _write_atomic(_index_path(email), json.dumps(index).encode())
+        kept = {entry["key"] for entry in index["months"].values()}
+        for key in replaced - kept:
+            concurrency.remove_file(object_path(key))
+
+def _pool(pool, workers, jobs):
+    """The worker pool, started the first time several statements wait to be rendered"""
+    if pool is None and workers > 1 and len(jobs) > 1:
+        # Spawned, not forked: the server process has threads of its own
+        pool = concurrent.futures.ProcessPoolExecutor(workers, multiprocessing.get_context("spawn"))
+    return pool
+
+@timed("statements.generate")
+def generate(today=None, workers=None):
+    """
+    Bring every book's statements up to date with the months ended before
+    today (default: now); returns the number of statements rendered
+    """
+    today = today or datetime.date.today()
+    current = f"{today:%Y-%m}"
+    workers = workers or WORKERS
+    backend = storage.get_storage()
+    pool = None
+    jobs, pending, rendered = {}, [], 0
+    try:
+        for email, version in backend.transaction_owners():
+            index = _read_index(email)
+            if index["version"] == version and index["open"] == current:
+                continue
+            months = {bulan: fingerprint for bulan, fingerprint in backend.month_fingerprints(email).items() if bulan < current}
+            entries = {bulan: entry for bulan, entry in index["months"].items() if bulan in months}
+            changed = [bulan for bulan in months if entries.get(bulan, {}).get("fingerprint") != months[bulan]]
+            nama = _owner_name(email) if changed else None
+            for bulan in changed:
+                content = statement_content(bulan, _month_rows(email, bulan), nama)
+                key = content_key(email, content)
+                entries[bulan] = {"fingerprint": months[bulan], "key": key}
+                if not os.path.exists(object_path(key)):
+                    jobs[key] = content
+            replaced = {entry["key"] for entry in index["months"].values()}
+            pending.append((email, {"format": FORMAT, "version": version, "open": current, "months": entries}, replaced))
+
+            if len(jobs) >= RENDER_BATCH:
+                pool = _pool(pool, workers, jobs)
+                _render(jobs, pool)
+                _commit(pending)
+                rendered, jobs, pending = rendered + len(jobs), {}, []
+        pool = _pool(pool, workers, jobs)
+        _render(jobs, pool)
+        _commit(pending)
+        rendered += len(jobs)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return rendered
+
+def available(email):
+    """The months the book has a statement for, newest first"""
+    return sorted(_read_index(email)["months"], reverse=True)
+
+def read(email, bulan):
+    """The book's statement for bulan as PDF bytes, None when there is none"""
+    entry = _read_index(email)["months"].get(bulan)
+    if entry is None:
+        return None
+    try:
+        with open(object_path(entry["key"]), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _run_scheduled():
+    count = generate()
+    if count:
+        logger.info("rendered %d monthly statements", count)
+
+_scheduler = concurrency.Scheduler("statement-scheduler", concurrency.periodic(_run_scheduled, "statement scheduler"), "STATEMENT_SCHEDULER")
+
+def start_scheduler(interval=None):
+    """Start the background statement generator once per process; the first run happens immediately"""
+    return _scheduler.start(interval or SCHEDULER_INTERVAL)
+
+def stop_scheduler():
+    """Stop the scheduler thread, e.g. in tests"""
+    _scheduler.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=helpers.DB_PATH, help="main database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="render the statements of months that closed or changed")
+    run_parser.add_argument("--workers", type=int, default=None, help="rendering processes")
+    args = parser.parse_args()
+
+    helpers.DB_PATH = args.db
+    helpers.bootstrap_db()
+    print(f"rendered {generate(workers=args.workers)} statements")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Storage backends for Keuangan-Pintar
+The functions in utils.helpers delegate persistence to one backend, chosen by
+the STORAGE_BACKEND environment variable:
+
+    sqlite    (default) the local file at utils.helpers.DB_PATH
+    sharded   users in DB_PATH, transactions spread over SHARD_COUNT SQLite files
+    postgres  a PostgreSQL server at DATABASE_URL, through a connection pool
+
+Every backend implements the Storage interface below.
+"""
+import datetime
+import importlib
+import os
+import threading
+
+BACKENDS = {
+    "sqlite": "utils.storage.sqlite.SQLiteStorage",
+    "sharded": "utils.storage.sharded.ShardedStorage",
+    "postgres": "utils.storage.postgres.PostgresStorage",
+}
+TRANSACTION_COLUMNS = ["Tanggal", "Jenis", "Item", "Jumlah", "Catatan"]
+RECONCILE_COLUMNS = [
+    "email", "audited_rows", "rows_now", "expected_total", "total_now",
+    "rounding_drift", "fractional_rows", "non_integer_rows",
+]
+# DataFrame column -> transactions table column
+COLUMN_SOURCES = {"Tanggal": "tanggal", "Jenis": "jenis", "Item": "item", "Jumlah": "jumlah", "Catatan": "catatan"}
+RULE_COLUMNS = [
+    "id", "email", "kategori_pengguna", "jenis", "item", "jumlah", "catatan",
+    "unit", "every", "start_date", "end_date", "next_index", "next_date",
+]
+# A budget and what was spent against it in one month
+BUDGET_COLUMNS = ["id", "scope", "kategori", "batas", "terpakai"]
+BUDGET_ALERT_LEVELS = (80, 100)  # percent of a budget's limit that raise an alert
+# Rows the category classifier trains on (Label: category chosen by the user) and classifies
+CATEGORY_COLUMNS = ["id", "Jenis", "Item", "Catatan", "Kategori", "Label"]
+LEDGER_COLUMNS = ["id", "nama", "role"]
+MEMBER_COLUMNS = ["email", "nama", "role"]
+ARCHIVE_COLUMNS = ["tahun", "rows", "archived_at"]
+# Ledgers' data is keyed by BOOK_PREFIX + id in the same columns as users' emails
+BOOK_PREFIX = "ledger:"
+# Also selectable by get_transactions, e.g. to edit rows, but not returned by default
+EXTRA_COLUMNS = {"id": "id", "Kategori": "kategori"}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+class Storage:
+    """
+    Persistence for users, sessions and transactions
+
+    Amounts are returned as numbers and dates as 'YYYY-MM-DD' strings, so every
+    backend produces the same DataFrames.
+    """
+    name = None
+
+    @property
+    def location(self):
+        """Identifies the database, e.g. a file path or a DSN without password"""
+        raise NotImplementedError
+
+    def is_ready(self):
+        """Cheap check that the database initialised earlier is still there"""
+        return True
+
+    def init_schema(self):
+        """Create tables and apply pending migrations"""
+        raise NotImplementedError
+
+    def health_check(self):
+        """True if the database is reachable and fully migrated"""
+        raise NotImplementedError
+
+    # Users
+
+    def create_user(self, nama, email, password_hash, kategori_pengguna):
+        """Insert a user; False if the email is already registered, ValueError if it cannot be one"""
+        raise NotImplementedError
+
+    def verify_user(self, email, password_hash):
+        """(nama, kategori_pengguna) for matching credentials, None otherwise"""
+        raise NotImplementedError
+
+    def get_user_info(self, email):
+        """(nama, kategori_pengguna) or None"""
+        raise NotImplementedError
+
+    # Sessions
+
+    def create_session(self, session_key, email, created_at, expires_at):
+        """Store a session and purge the ones that expired before created_at"""
+        raise NotImplementedError
+
+    def get_session(self, session_key):
+        """(email, nama, kategori_pengguna, expires_at) or None"""
+        raise NotImplementedError
+
+    def delete_session(self, session_key):
+        raise NotImplementedError
+
+    # Transactions
+
+    def save_transaction(self, email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan, kategori=None, kategori_label=0):
+        """Insert a transaction and bump the user's data version in the same commit"""
+        raise NotImplementedError
+
+    def get_data_version(self, email):
+        """Counter that changes whenever the user's transactions change"""
+        raise NotImplementedError
+
+    def apply_changes(self, email, inserts, updates, deletes, kategori_pengguna, now):
+        """
+        Insert rows ({table column: value} dicts), update rows ({id: {table
+        column: value}}) and soft-delete ids at time now, all in one commit.
+        Every row written is stamped with the data version the commit
+        produces, and the version advances once per row. Returns
+        {"inserted": n, "updated": n, "deleted": n, "ids": [new ids in insert order]}
+        """
+        raise NotImplementedError
+
+    def compact_deleted(self, deleted_before):
+        """Purge rows soft-deleted before the given unix time; returns how many were removed"""
+        raise NotImplementedError
+
+    def get_transactions(self, email, columns=None, start=None, end=None):
+        """
+        The user's live transactions ordered by (tanggal, id), all of them or
+        those dated from start through end, as a DataFrame with the given
+        subset of TRANSACTION_COLUMNS (all by default) or EXTRA_COLUMNS
+        """
+        raise NotImplementedError
+
+    def iter_transactions(self, email, columns=None, batch=1000):
+        """
+        Every live transaction of the user in get_transactions order, as lists
+        of at most batch row tuples fetched from one database cursor, so all
+        of them can be streamed without holding them in memory
+        """
+        raise NotImplementedError
+
+    def get_changes(self, email, since_version, after_id=None):
+        """
+        Rows written after data version since_version (or, when given, with
+        id > after_id), deleted ones included, as a DataFrame of id, TRANSACTION_COLUMNS and a
+        deleted flag; None when some of those rows were purged since.
+        Archiving moves rows without changing them, so it is not a change.
+        """
+        raise NotImplementedError
+
+    def count_transactions(self, email):
+        raise NotImplementedError
+
+    def page_transactions(self, email, limit=50, after=None):
+        """
+        Newest-first page of transactions using keyset pagination; returns
+        (DataFrame of id and TRANSACTION_COLUMNS, cursor) where cursor is
+        passed as after= for the next page and is None on the last page
+        """
+        raise NotImplementedError
+
+    def search_transactions(self, email, terms, limit=20, offset=0):
+        """
+        The user's live transactions whose item or catatan contain words
+        starting with every one of terms, those matching on item alone first
+        and newest first within each; returns (DataFrame with id and
+        TRANSACTION_COLUMNS, whether more hits follow)
+        """
+        raise NotImplementedError
+
+    def summarize(self, email, start=None, end=None):
+        """{jenis: total jumlah} aggregated by the database, optionally for a date range"""
+        raise NotImplementedError
+
+    def month_fingerprints(self, email):
+        """
+        {bulan "YYYY-MM": fingerprint} for every month the user has live
+        transactions in; a month's fingerprint changes whenever a row in it is
+        added, edited, deleted or moved to another month
+        """
+        raise NotImplementedError
+
+    def transaction_owners(self):
+        """(email, data version) of every book with transactions, users' and ledgers' alike"""
+        raise NotImplementedError
+
+    def transaction_years(self, email):
+        """
+        Years the user has transactions in, newest first, as (tahun, archived)
+        pairs; the transactions of an archived year can no longer be edited
+        """
+        raise NotImplementedError
+
+    def archive_before(self, tahun):
+        """
+        Move every live transaction dated before 1 January of tahun into the
+        archive of its year, keeping its id and its totals; returns {tahun:
+        rows moved}. NotImplementedError where the backend keeps every year in
+        one table.
+        """
+        raise NotImplementedError
+
+    def archived_years(self):
+        """Archived years with their rows, a DataFrame with ARCHIVE_COLUMNS"""
+        raise NotImplementedError
+
+    def reconcile_money(self):
+        """
+        Compare each user's rows and total from before the integer money
+        migration with the same rows now; a DataFrame with RECONCILE_COLUMNS
+        """
+        raise NotImplementedError
+
+    # Recurring rules (see utils.recurring)
+
+    def create_rule(self, email, rule):
+        """Store a rule ({RULE_COLUMNS column: value}, without id); returns its id"""
+        raise NotImplementedError
+
+    def get_rules(self, email):
+        """The user's rules as a DataFrame with RULE_COLUMNS"""
+        raise NotImplementedError
+
+    def delete_rule(self, email, rule_id):
+        """Remove one of the user's rules; True if it existed"""
+        raise NotImplementedError
+
+    def due_rules(self, today, limit):
+        """Up to limit rules with next_date <= today, as dicts keyed by RULE_COLUMNS"""
+        raise NotImplementedError
+
+    def insert_occurrences(self, email, rows):
+        """
+        Insert materialized occurrences (dicts of table columns including
+        rule_id and rule_occurrence) in one commit, skipping occurrences that
+        already exist; returns how many were inserted
+        """
+        raise NotImplementedError
+
+    def advance_rule(self, rule_id, from_index, next_index, next_date):
+        """Move a rule past its materialized occurrences if nobody else did; True on success"""
+        raise NotImplementedError
+
+    # Budgets (see utils.budgets)
+
+    def set_budget(self, email, scope, kategori, batas):
+        """
+        Create or change the user's monthly limit for a jenis or an item
+        (matched ignoring case), counting spending already recorded; returns its id
+        """
+        raise NotImplementedError
+
+    def get_budgets(self, email, bulan):
+        """The user's budgets with their spending in month bulan ('YYYY-MM'), as a DataFrame with BUDGET_COLUMNS"""
+        raise NotImplementedError
+
+    def delete_budget(self, email, budget_id):
+        """Remove one of the user's budgets; True if it existed"""
+        raise NotImplementedError
+
+    def budget_alerts(self, email, bulan):
+        """
+        The user's budgets that reached one of BUDGET_ALERT_LEVELS
+        in month bulan: BUDGET_COLUMNS plus the highest level reached
+        """
+        raise NotImplementedError
+
+    # Spending categories (see utils.categories)
+
+    def get_category_rows(self, email):
+        """The user's live transactions as a DataFrame with CATEGORY_COLUMNS, in id order"""
+        raise NotImplementedError
+
+    def set_categories(self, email, predictions):
+        """
+        Store predicted categories, [(id, kategori or None)], on rows whose
+        category the user did not choose, in one commit; the data version
+        advances once per row that changed. Returns how many changed
+        """
+        raise NotImplementedError
+
+    def save_category_model(self, email, labels, model):
+        """Replace the user's trained model (bytes), trained on labels labelled rows"""
+        raise NotImplementedError
+
+    def get_category_model(self, email):
+        """(labels, trained_at, model bytes) of the user's model, or None"""
+        raise NotImplementedError
+
+    # Shared ledgers (see utils.ledgers)
+
+    def create_ledger(self, nama, email, now):
+        """Create a ledger with email as its pemilik, in one commit; returns its id"""
+        raise NotImplementedError
+
+    def get_user_ledgers(self, email):
+        """The ledgers email is a member of, as a DataFrame with LEDGER_COLUMNS ordered by nama"""
+        raise NotImplementedError
+
+    def get_ledger_members(self, ledger_id):
+        """Members of a ledger with their names, as a DataFrame with MEMBER_COLUMNS"""
+        raise NotImplementedError
+
+    def set_ledger_member(self, ledger_id, email, role, now):
+        """Add a registered user to a ledger or change their role; False if no user has that email"""
+        raise NotImplementedError
+
+    def remove_ledger_member(self, ledger_id, email):
+        """Take a member out of a ledger; True if they were in it"""
+        raise NotImplementedError
+
+def check_user_email(email):
+    """Raise ValueError for an email a user cannot have: one that reads as a ledger's book key"""
+    if email.startswith(BOOK_PREFIX):
+        raise ValueError(f"Email tidak valid: {email}")
+
+def select_columns(columns, sources=COLUMN_SOURCES):
+    """Validated DataFrame column names and the matching SQL select list"""
+    columns = list(columns or TRANSACTION_COLUMNS)
+    sources = dict(sources, **EXTRA_COLUMNS)
+    unknown = set(columns) - set(sources)
+    if unknown:
+        raise ValueError(f"Unknown transaction columns: {', '.join(sorted(unknown))}")
+    return columns, ", ".join(f'{sources[column]} AS "{column}"' for column in columns)
+
+def whole_months(start=None, end=None):
+    """
+    (first, last) 'YYYY-MM' months, either None when unbounded, if the date
+    range covers whole calendar months; None if a bound falls mid-month
+    """
+    first = last = None
+    if start is not None:
+        start = datetime.date.fromisoformat(str(start)[:10])
+        if start.day != 1:
+            return None
+        first = start.strftime("%Y-%m")
+    if end is not None:
+        end = datetime.date.fromisoformat(str(end)[:10])
+        if (end + datetime.timedelta(days=1)).day != 1:
+            return None
+        last = end.strftime("%Y-%m")
+    return first, last
+
+def create_storage(backend=None, **options):
+    """Instantiate a backend by name; defaults to STORAGE_BACKEND"""
+    backend = backend or os.getenv("STORAGE_BACKEND", "sqlite")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+    module_name, class_name = BACKENDS[backend].rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)(**options)
+
+def get_storage():
+    """The process-wide backend, created from the environment on first use"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+def set_storage(storage):
+    """Replace the process-wide backend (e.g. in tests); returns the previous one"""
+    global _storage
+    with _storage_lock:
+        previous, _storage = _storage, storage
+    return previous
@@ -0,0 +1,302 @@
+"""
+Sharded SQLite storage backend
+Users, sessions, recurring rules and ledger memberships stay in the main
+database (utils.helpers.DB_PATH); each user's transactions, data version,
+budgets and category model live in one of N shard files, chosen by
+consistent hashing of the email. A shared ledger is placed by its book key
+(utils.ledgers.book_key) the same way. Every per-user read and write touches exactly
+one shard, and each shard has its own writer thread.
+
+Configuration (environment):
+    SHARD_COUNT   number of shard files (default 4)
+    SHARD_DIR     directory of the shard files (default: shards/ next to DB_PATH)
+
+Changing SHARD_COUNT moves roughly 1/N of the users; move their rows with the
+rebalance command while the app is stopped:
+
+    python -m utils.storage.sharded rebalance --shards 8 [--dry-run]
+    python -m utils.storage.sharded stats
+    python -m utils.storage.sharded query "SELECT jenis, COUNT(*) FROM transactions GROUP BY jenis"
+"""
+import argparse
+import bisect
+import glob
+import hashlib
+import os
+import sqlite3
+
+import pandas as pd
+
+from utils import helpers
+from utils.db_writer import BUSY_TIMEOUT, retry_on_busy
+from utils.storage.sqlite import SQLiteStorage
+
+VNODES = 64  # points per shard on the ring; more points give a more even spread
+SHARD_PREFIX = "shard_"
+
+# The transaction tables of helpers.MIGRATIONS; any later migration touching
+# transactions or data_versions has to be appended here as well
+SHARD_MIGRATIONS = [
+    (
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT,
+            tanggal TEXT,
+            kategori_pengguna TEXT,
+            jenis TEXT,
+            item TEXT,
+            jumlah REAL,
+            catatan TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_transactions_email_tanggal ON transactions (email, tanggal)",
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            email TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ),
+    helpers.INTEGER_MONEY_MIGRATION,
+    helpers.EDITABLE_TRANSACTIONS_MIGRATION,
+    helpers.RECURRING_TRANSACTIONS_MIGRATION,
+    helpers.SEARCH_MIGRATION,
+    helpers.BUDGET_MIGRATION,
+    helpers.CATEGORY_MIGRATION,
+    helpers.ARCHIVE_MIGRATION,
+]
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+def shard_name(index):
+    return f"{SHARD_PREFIX}{index:02d}"
+
+class HashRing:
+    """Consistent hash ring: adding a node only takes keys from the others"""
+
+    def __init__(self, nodes, vnodes=VNODES):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[index]
+
+class ShardedStorage(SQLiteStorage):
+    name = "sharded"
+
+    def __init__(self, shards=None, shard_dir=None, vnodes=VNODES):
+        count = shards or int(os.getenv("SHARD_COUNT", "4"))
+        self.shards = [shard_name(i) for i in range(count)]
+        self.ring = HashRing(self.shards, vnodes)
+        self._shard_dir = shard_dir or os.getenv("SHARD_DIR")
+
+    @property
+    def shard_dir(self):
+        return self._shard_dir or os.path.join(os.path.dirname(helpers.DB_PATH), "shards")
+
+    @property
+    def location(self):
+        return f"{helpers.DB_PATH} + {len(self.shards)} shards in {self.shard_dir}"
+
+    def shard_path(self, shard):
+        return os.path.join(self.shard_dir, f"{shard}.db")
+
+    def shard_for(self, email):
+        return self.ring.node_for(email)
+
+    def transactions_path(self, email):
+        return self.shard_path(self.shard_for(email))
+
+    def transaction_files(self):
+        # The main database still holds rows that were never rebalanced
+        return [helpers.DB_PATH] + [self.shard_path(shard) for shard in self.shards]
+
+    def is_ready(self):
+        return super().is_ready() and all(os.path.exists(self.shard_path(shard)) for shard in self.shards)
+
+    def init_schema(self):
+        super().init_schema()
+        for shard in self.shards:
+            helpers.init_db(self.shard_path(shard), SHARD_MIGRATIONS)
+
+    def health_check(self):
+        if not super().health_check():
+            return False
+        try:
+            for shard in self.shards:
+                conn = helpers.get_connection(self.shard_path(shard))
+                try:
+                    if conn.execute("PRAGMA user_version").fetchone()[0] != len(SHARD_MIGRATIONS):
+                        return False
+                finally:
+                    conn.close()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @retry_on_busy
+    def query_all(self, query, params=()):
+        """Run a read-only query on every shard and concatenate the results with a shard column"""
+        frames = []
+        for shard in self.shards:
+            conn = helpers.get_connection(self.shard_path(shard))
+            try:
+                df = pd.read_sql_query(query, conn, params=params)
+            finally:
+                conn.close()
+            df.insert(0, "shard", shard)
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True)
+
+    def shard_stats(self):
+        """Users, transactions and file size per shard"""
+        stats = self.query_all("SELECT COUNT(DISTINCT email) AS users, COUNT(*) AS transactions FROM transactions")
+        stats["size_kb"] = [os.path.getsize(self.shard_path(shard)) // 1024 for shard in stats["shard"]]
+        return stats
+
+def _transaction_columns(conn, schema):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(transactions)") if row[1] != "id"]
+
+def _archived_years(conn, schema="main"):
+    """Years archived in the schema, none in a file the archive migration has not reached"""
+    if conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'archived_years'").fetchone() is None:
+        return []
+    return [tahun for tahun, in conn.execute(f"SELECT tahun FROM {schema}.archived_years")]
+
+def _move_user(email, source, target):
+    """Move one user's transactions, data version, budgets and category model from source to target; returns rows moved"""
+    conn = sqlite3.connect(target, timeout=BUSY_TIMEOUT, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (source,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Budgets first, so the triggers count the moved rows against them
+            conn.execute("""
+                INSERT INTO main.budgets (email, scope, kategori, batas, created_at)
+                SELECT email, scope, kategori, batas, created_at FROM src.budgets WHERE email = ?
+                ON CONFLICT (email, scope, kategori) DO UPDATE SET batas = excluded.batas
+            """, (email,))
+            columns = ", ".join(_transaction_columns(conn, "main"))
+            moved = conn.execute(f"""
+                INSERT INTO main.transactions ({columns})
+                SELECT {columns} FROM src.transactions WHERE email = ? ORDER BY id
+            """, (email,)).rowcount
+            # Archived rows arrive as live rows, counted and indexed by the
+            # target's triggers; the next archive run moves them again
+            for tahun in _archived_years(conn, "src"):
+                table = helpers.archive_table(tahun)
+                moved += conn.execute(f"""
+                    INSERT INTO main.transactions ({columns})
+                    SELECT {columns} FROM src.{table} WHERE email = ? ORDER BY id
+                """, (email,)).rowcount
+                # Their search entries in the source stayed when they were archived
+                conn.execute(f"""
+                    INSERT INTO src.transactions_fts (transactions_fts, rowid, item, catatan)
+                    SELECT 'delete', (o.id << 40) + a.id, a.item, a.catatan
+                    FROM src.{table} a JOIN src.search_owners o ON o.email = a.email WHERE a.email = ?
+                """, (email,))
+                conn.execute(f"""
+                    INSERT INTO src.transactions_item_fts (transactions_item_fts, rowid, item)
+                    SELECT 'delete', (o.id << 40) + a.id, a.item
+                    FROM src.{table} a JOIN src.search_owners o ON o.email = a.email WHERE a.email = ?
+                """, (email,))
+                removed = conn.execute(f"DELETE FROM src.{table} WHERE email = ?", (email,)).rowcount
+                conn.execute("UPDATE src.archived_years SET rows = rows - ? WHERE tahun = ?", (removed, tahun))
+            # Continue above both versions so caches keyed on the old one are
+            # invalidated; the rows got new ids, so nothing older can be patched
+            row = conn.execute("SELECT version FROM src.data_versions WHERE email = ?", (email,)).fetchone()
+            conn.execute("""
+                INSERT INTO main.data_versions (email, version) VALUES (?, ?)
+                ON CONFLICT(email) DO UPDATE SET version = max(version + 1, excluded.version)
+            """, (email, (row[0] if row else 0) + 1))
+            conn.execute("UPDATE main.data_versions SET compacted_through = version WHERE email = ?", (email,))
+            conn.execute("""
+                INSERT OR REPLACE INTO main.category_models (email, labels, trained_at, model)
+                SELECT email, labels, trained_at, model FROM src.category_models WHERE email = ?
+            """, (email,))
+            conn.execute("DELETE FROM src.transactions WHERE email = ?", (email,))
+            conn.execute("DELETE FROM src.data_versions WHERE email = ?", (email,))
+            # Left over for archived rows, which no trigger counted out
+            conn.execute("DELETE FROM src.monthly_totals WHERE email = ?", (email,))
+            conn.execute("DELETE FROM src.budget_alerts WHERE budget_id IN (SELECT id FROM src.budgets WHERE email = ?)", (email,))
+            conn.execute("DELETE FROM src.budget_item_totals WHERE email = ?", (email,))
+            conn.execute("DELETE FROM src.budgets WHERE email = ?", (email,))
+            conn.execute("DELETE FROM src.category_models WHERE email = ?", (email,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return moved
+    finally:
+        conn.close()
+
+def rebalance(storage, dry_run=False):
+    """
+    Move every user whose rows are not in the shard the ring assigns them to,
+    including rows still in the unsharded main database and in shard files
+    left over from a larger SHARD_COUNT. Run while the app is stopped: with
+    WAL a crash mid-move is not atomic across the two files.
+
+    Returns a list of (email, source, target, rows moved).
+    """
+    if not dry_run:
+        storage.init_schema()
+    sources = [helpers.DB_PATH] + sorted(glob.glob(os.path.join(storage.shard_dir, f"{SHARD_PREFIX}*.db")))
+
+    moves = []
+    for source in sources:
+        if not os.path.exists(source):
+            continue
+        conn = sqlite3.connect(source, timeout=BUSY_TIMEOUT)
+        try:
+            emails = [row[0] for row in conn.execute("""
+                SELECT email FROM transactions UNION SELECT email FROM data_versions UNION SELECT email FROM budgets
+            """)]
+            tables = ["transactions"] + [helpers.archive_table(tahun) for tahun in _archived_years(conn)]
+            counts = dict(conn.execute(f"""
+                SELECT email, COUNT(*) FROM ({" UNION ALL ".join(f"SELECT email FROM {table}" for table in tables)}) GROUP BY email
+            """).fetchall())
+        finally:
+            conn.close()
+
+        for email in emails:
+            target = storage.transactions_path(email)
+            if os.path.abspath(target) == os.path.abspath(source):
+                continue
+            rows = counts.get(email, 0) if dry_run else _move_user(email, source, target)
+            moves.append((email, source, target, rows))
+    return moves
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=helpers.DB_PATH, help="main database")
+    parser.add_argument("--shard-dir", default=None)
+    parser.add_argument("--shards", type=int, default=None, help="defaults to SHARD_COUNT")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebalance_parser = commands.add_parser("rebalance", help="move users to the shard the ring assigns them")
+    rebalance_parser.add_argument("--dry-run", action="store_true")
+    commands.add_parser("stats", help="users, transactions and size per shard")
+    query_parser = commands.add_parser("query", help="run a read-only query on every shard")
+    query_parser.add_argument("sql")
+    args = parser.parse_args()
+
+    helpers.DB_PATH = args.db
+    storage = ShardedStorage(args.shards, args.shard_dir)
+
+    if args.command == "rebalance":
+        moves = rebalance(storage, args.dry_run)
+        for email, source, target, rows in moves:
+            print(f"{email}: {source} -> {target} ({rows} rows)")
+        action = "would move" if args.dry_run else "moved"
+        print(f"{action} {len(moves)} users, {sum(move[3] for move in moves)} transactions")
+    elif args.command == "stats":
+        print(storage.shard_stats().to_string(index=False))
+    else:
+        print(storage.query_all(args.sql).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
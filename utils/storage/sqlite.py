@@ -0,0 +1,655 @@
+"""
+SQLite storage backend: the database file at utils.helpers.DB_PATH
+Writes go through the helpers writer queue, reads borrow a pooled connection
+(helpers.read_connection) and retry while the database is busy.
+"""
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from utils import helpers
+from utils.db_writer import retry_on_busy
+from utils.storage import (
+    Storage, ARCHIVE_COLUMNS, BUDGET_ALERT_LEVELS, BUDGET_COLUMNS, CATEGORY_COLUMNS, LEDGER_COLUMNS, MEMBER_COLUMNS,
+    RECONCILE_COLUMNS, RULE_COLUMNS, TRANSACTION_COLUMNS, check_user_email, select_columns, whole_months,
+)
+
+CHANGE_COLUMNS = ["id"] + TRANSACTION_COLUMNS + ["deleted"]
+SEARCH_OWNER_SHIFT = 40  # FTS rowids are (owner id << 40) + transaction id, see helpers.SEARCH_MIGRATION
+ARCHIVE_BATCH = 5000  # rows archived per commit, so writers queue behind one batch at most
+
+def _date_range(start=None, end=None):
+    """SQL conditions and parameters for tanggal from start through end, either None for unbounded"""
+    condition, params = "", []
+    if start is not None:
+        condition += " AND tanggal >= ?"
+        params.append(str(start))
+    if end is not None:
+        condition += " AND tanggal <= ?"
+        params.append(str(end))
+    return condition, params
+
+def _union(query, tables, params):
+    """query (with a {table} placeholder) over each table joined by UNION ALL, and its parameters"""
+    return " UNION ALL ".join(query.format(table=table) for table in tables), list(params) * len(tables)
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    @property
+    def location(self):
+        # Read on every access so tests and benchmarks can repoint helpers.DB_PATH
+        return helpers.DB_PATH
+
+    def is_ready(self):
+        return os.path.exists(helpers.DB_PATH)
+
+    def init_schema(self):
+        helpers.init_db()
+
+    def health_check(self):
+        try:
+            conn = helpers.get_connection()
+            try:
+                return conn.execute("PRAGMA user_version").fetchone()[0] == helpers.SCHEMA_VERSION
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return False
+
+    def transactions_path(self, email):
+        """File holding the user's transactions and data version"""
+        return helpers.DB_PATH
+
+    def transaction_files(self):
+        """Every file that holds transactions"""
+        return [helpers.DB_PATH]
+
+    @retry_on_busy
+    def _fetchone(self, query, params, db_path=None):
+        with helpers.read_connection(db_path) as conn:
+            cursor = conn.execute(query, params)
+            try:
+                return cursor.fetchone()
+            finally:
+                cursor.close()  # A pooled connection must not keep the statement's read snapshot
+
+    @retry_on_busy
+    def _fetchall(self, query, params, db_path=None):
+        with helpers.read_connection(db_path) as conn:
+            return conn.execute(query, params).fetchall()
+
+    def create_user(self, nama, email, password_hash, kategori_pengguna):
+        check_user_email(email)
+        def write(cursor):
+            cursor.execute("""
+                INSERT INTO users (nama, email, password_hash, kategori_pengguna)
+                VALUES (?, ?, ?, ?)
+            """, (nama, email, password_hash, kategori_pengguna))
+
+        try:
+            helpers.run_write(write)
+            return True
+        except sqlite3.IntegrityError:
+            return False  # Email already exists
+
+    def verify_user(self, email, password_hash):
+        return self._fetchone("""
+            SELECT nama, kategori_pengguna FROM users
+            WHERE email = ? AND password_hash = ?
+        """, (email, password_hash))
+
+    def get_user_info(self, email):
+        return self._fetchone("SELECT nama, kategori_pengguna FROM users WHERE email = ?", (email,))
+
+    def create_session(self, session_key, email, created_at, expires_at):
+        def write(cursor):
+            cursor.execute("DELETE FROM sessions WHERE expires_at <= ?", (created_at,))
+            cursor.execute("""
+                INSERT INTO sessions (id, email, created_at, expires_at)
+                VALUES (?, ?, ?, ?)
+            """, (session_key, email, created_at, expires_at))
+
+        helpers.run_write(write)
+
+    def get_session(self, session_key):
+        return self._fetchone("""
+            SELECT s.email, u.nama, u.kategori_pengguna, s.expires_at
+            FROM sessions s JOIN users u ON u.email = s.email
+            WHERE s.id = ?
+        """, (session_key,))
+
+    def delete_session(self, session_key):
+        helpers.run_write(lambda cursor: cursor.execute("DELETE FROM sessions WHERE id = ?", (session_key,)))
+
+    def save_transaction(self, email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan, kategori=None, kategori_label=0):
+        def write(cursor):
+            cursor.execute("""
+                INSERT INTO transactions (
+                    email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan, kategori, kategori_label, changed_version
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (email, str(tanggal), kategori_pengguna, jenis, item, jumlah, catatan, kategori, kategori_label,
+                  helpers.next_change_version(cursor, email)))
+            helpers.bump_data_version(cursor, email)
+
+        helpers.run_write(write, self.transactions_path(email))
+
+    def apply_changes(self, email, inserts, updates, deletes, kategori_pengguna, now):
+        def write(cursor):
+            stamp = helpers.next_change_version(cursor, email)
+            ids = []
+            for row in inserts:
+                cursor.execute("""
+                    INSERT INTO transactions (
+                        email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan, kategori, kategori_label, changed_version
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (email, row["tanggal"], kategori_pengguna, row["jenis"], row["item"], row["jumlah"], row["catatan"],
+                      row.get("kategori"), row.get("kategori_label", 0), stamp))
+                ids.append(cursor.lastrowid)
+            updated = 0
+            for transaction_id, values in updates.items():
+                assignments = ", ".join(f"{column} = ?" for column in values)
+                updated += cursor.execute(f"""
+                    UPDATE transactions SET {assignments}, changed_version = ?
+                    WHERE id = ? AND email = ? AND deleted_at IS NULL
+                """, (*values.values(), stamp, transaction_id, email)).rowcount
+            deleted = 0
+            for transaction_id in deletes:
+                deleted += cursor.execute("""
+                    UPDATE transactions SET deleted_at = ?, changed_version = ?
+                    WHERE id = ? AND email = ? AND deleted_at IS NULL
+                """, (now, stamp, transaction_id, email)).rowcount
+            if inserts or updated or deleted:
+                helpers.bump_data_version(cursor, email, len(inserts) + updated + deleted)
+            return {"inserted": len(inserts), "updated": updated, "deleted": deleted, "ids": ids}
+
+        return helpers.run_write(write, self.transactions_path(email))
+
+    def compact_deleted(self, deleted_before):
+        def write(cursor):
+            # Readers holding state older than the purge have to reload from scratch
+            cursor.execute("""
+                UPDATE data_versions SET compacted_through = version
+                WHERE email IN (SELECT email FROM transactions WHERE deleted_at < ?)
+            """, (deleted_before,))
+            purged = cursor.execute("DELETE FROM transactions WHERE deleted_at < ?", (deleted_before,)).rowcount
+            cursor.execute("DELETE FROM monthly_totals WHERE rows = 0")
+            return purged
+
+        return sum(helpers.run_write(write, path) for path in self.transaction_files() if os.path.exists(path))
+
+    def get_data_version(self, email):
+        result = self._fetchone("SELECT version FROM data_versions WHERE email = ?", (email,), self.transactions_path(email))
+        return result[0] if result else 0
+
+    def _tables(self, path, start=None, end=None, cursor=None):
+        """
+        transactions plus the archive tables of the archived years that the
+        date range reaches, read in the writing transaction when cursor is given
+        """
+        query, params = "SELECT tahun FROM archived_years WHERE 1", []
+        if start is not None:
+            query += " AND tahun >= ?"
+            params.append(str(start)[:4])
+        if end is not None:
+            query += " AND tahun <= ?"
+            params.append(str(end)[:4])
+        query += " ORDER BY tahun"
+        years = cursor.execute(query, params).fetchall() if cursor is not None else self._fetchall(query, params, path)
+        return ["transactions"] + [helpers.archive_table(tahun) for tahun, in years]
+
+    def _transactions_query(self, path, email, select, columns, start=None, end=None):
+        """The query behind get_transactions and iter_transactions, and its parameters"""
+        condition, bounds = _date_range(start, end)
+        tables = self._tables(path, start, end)
+        if len(tables) == 1:
+            # (email, tanggal) order of the live-row index, with the rowid breaking ties, so no sort is needed
+            return f"""
+                SELECT {select} FROM transactions WHERE email = ? AND deleted_at IS NULL{condition} ORDER BY tanggal, id
+            """, [email] + bounds
+        # Archived years in the range are read back in and sorted with the live rows
+        parts, params = _union(f"""
+            SELECT {select}, tanggal AS _tanggal, id AS _id FROM {{table}}
+            WHERE email = ? AND deleted_at IS NULL{condition}
+        """, tables, [email] + bounds)
+        selected = ", ".join(f'"{column}"' for column in columns)
+        return f"SELECT {selected} FROM ({parts}) ORDER BY _tanggal, _id", params
+
+    def get_transactions(self, email, columns=None, start=None, end=None):
+        columns, select = select_columns(columns)
+        path = self.transactions_path(email)
+        query, params = self._transactions_query(path, email, select, columns, start, end)
+        return pd.DataFrame(self._fetchall(query, params, path), columns=columns)
+
+    def iter_transactions(self, email, columns=None, batch=1000):
+        columns, select = select_columns(columns)
+        path = self.transactions_path(email)
+        query, params = self._transactions_query(path, email, select, columns)
+        # One statement, so every batch comes from the same read snapshot
+        with helpers.read_connection(path) as conn:
+            cursor = conn.execute(query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch)
+                    if not rows:
+                        return
+                    yield rows
+            finally:
+                cursor.close()
+
+    def get_changes(self, email, since_version, after_id=None):
+        path = self.transactions_path(email)
+        result = self._fetchone("SELECT compacted_through FROM data_versions WHERE email = ?", (email,), path)
+        if result is not None and result[0] > since_version:
+            return None
+        select = "SELECT id, tanggal, jenis, item, jumlah, catatan, deleted_at IS NOT NULL FROM transactions"
+        query = f"{select} WHERE email = ? AND changed_version > ?"
+        params = [email, since_version]
+        if after_id is not None:
+            # Rows inserted without a version stamp are still found by walking
+            # the rowid; +email keeps sqlite off the email index for that half
+            query += f" UNION {select} WHERE id > ? AND +email = ?"
+            params += [after_id, email]
+        df = pd.DataFrame(self._fetchall(query + " ORDER BY id", params, path), columns=CHANGE_COLUMNS)
+        df["deleted"] = df["deleted"].astype(bool)
+        return df
+
+    def count_transactions(self, email):
+        path = self.transactions_path(email)
+        parts, params = _union(
+            "SELECT COUNT(*) AS n FROM {table} WHERE email = ? AND deleted_at IS NULL", self._tables(path), [email],
+        )
+        return self._fetchone(f"SELECT SUM(n) FROM ({parts})", params, path)[0]
+
+    def page_transactions(self, email, limit=50, after=None):
+        path = self.transactions_path(email)
+        query = "SELECT id, tanggal, jenis, item, jumlah, catatan FROM {table} WHERE email = ? AND deleted_at IS NULL"
+        params = [email]
+        if after is not None:
+            query += " AND (tanggal, id) < (?, ?)"
+            params.extend(after)
+        rows = self._fetchall(query.format(table="transactions") + " ORDER BY tanggal DESC, id DESC LIMIT ?", params + [limit], path)
+
+        # A full page of live rows rules out every archived year older than its last row
+        oldest = rows[-1][1] if len(rows) == limit else None
+        archives = self._tables(path, oldest, after[0] if after is not None else None)[1:]
+        if archives:
+            if oldest is not None:
+                query += " AND tanggal >= ?"
+                params.append(oldest)
+            parts, union_params = _union(query, archives, params)
+            rows += self._fetchall(f"{parts} ORDER BY tanggal DESC, id DESC LIMIT ?", union_params + [limit], path)
+            rows = sorted(rows, key=lambda row: (row[1], row[0]), reverse=True)[:limit]
+
+        cursor = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return pd.DataFrame(rows, columns=["id"] + TRANSACTION_COLUMNS), cursor
+
+    @retry_on_busy
+    def search_transactions(self, email, terms, limit=20, offset=0):
+        words = " AND ".join(f'"{term}"*' for term in terms)
+        wanted = offset + limit + 1
+        conn = helpers.get_connection(self.transactions_path(email))
+        try:
+            owner = conn.execute("SELECT id FROM search_owners WHERE email = ?", (email,)).fetchone()
+            if owner is None:
+                return pd.DataFrame(columns=["id"] + TRANSACTION_COLUMNS), False
+            # Ranked by walking the user's rowid range newest first: hits on item
+            # alone, then the rest, each walk stopping once the page is filled.
+            # bm25() would score every hit and read whole doclists for its idf.
+            query = """
+                SELECT rowid FROM {0} WHERE {0} MATCH ? AND rowid BETWEEN ? AND ?
+                ORDER BY rowid DESC LIMIT ?
+            """
+            bounds = (owner[0] << SEARCH_OWNER_SHIFT, ((owner[0] + 1) << SEARCH_OWNER_SHIFT) - 1)
+            ids = [rowid for rowid, in conn.execute(query.format("transactions_item_fts"), (words, *bounds, wanted))]
+            if len(ids) < wanted:
+                # Every item hit is known now; the rest are the other hits
+                item_hits = set(ids)
+                rest = conn.execute(query.format("transactions_fts"), (words, *bounds, wanted + len(ids))).fetchall()
+                ids += [rowid for rowid, in rest if rowid not in item_hits][:wanted - len(ids)]
+            ids = [rowid & ((1 << SEARCH_OWNER_SHIFT) - 1) for rowid in ids]
+            page = ids[offset:offset + limit]
+            query = f"""
+                SELECT id, tanggal, jenis, item, jumlah, catatan FROM {{table}}
+                WHERE id IN ({", ".join("?" for _ in page)})
+            """
+            rows = conn.execute(query.format(table="transactions"), page).fetchall()
+            if len(rows) < len(page):
+                # Archived rows keep their index entries; look up the hits the live table lacks
+                years = conn.execute("SELECT tahun FROM archived_years ORDER BY tahun").fetchall()
+                if years:
+                    parts, params = _union(query, [helpers.archive_table(tahun) for tahun, in years], page)
+                    rows += conn.execute(parts, params).fetchall()
+        finally:
+            conn.close()
+        position = {transaction_id: i for i, transaction_id in enumerate(page)}
+        rows.sort(key=lambda row: position[row[0]])
+        return pd.DataFrame(rows, columns=["id"] + TRANSACTION_COLUMNS), len(ids) > offset + limit
+
+    def summarize(self, email, start=None, end=None):
+        path = self.transactions_path(email)
+        months = whole_months(start, end)
+        if months is None:
+            # Other ranges are summed from the live rows and the archived years the range reaches
+            condition, bounds = _date_range(start, end)
+            parts, params = _union(
+                f"SELECT jenis, jumlah FROM {{table}} WHERE email = ? AND deleted_at IS NULL{condition}",
+                self._tables(path, start, end), [email] + bounds,
+            )
+            return dict(self._fetchall(f"SELECT jenis, SUM(jumlah) FROM ({parts}) GROUP BY jenis", params, path))
+
+        # Whole months are summed from the rollup, which keeps counting archived rows
+        query, params = "SELECT jenis, SUM(total) FROM monthly_totals WHERE email = ?", [email]
+        for condition, value in [("bulan >= ?", months[0]), ("bulan <= ?", months[1])]:
+            if value is not None:
+                query += f" AND {condition}"
+                params.append(value)
+        query += " GROUP BY jenis"
+        return dict(self._fetchall(query, params, path))
+
+    def month_fingerprints(self, email):
+        # Every write stamps its rows with a changed_version above all earlier ones,
+        # so an edit raises its month's maximum; deletes and moves change the counts
+        path = self.transactions_path(email)
+        parts, params = _union("""
+            SELECT substr(tanggal, 1, 7) AS bulan, COUNT(*) AS n, SUM(jumlah) AS total,
+                   MAX(changed_version) AS version, MAX(id) AS last_id
+            FROM {table} WHERE email = ? AND deleted_at IS NULL GROUP BY bulan
+        """, self._tables(path), [email])
+        rows = self._fetchall(f"""
+            SELECT bulan, SUM(n), SUM(total), MAX(version), MAX(last_id) FROM ({parts}) GROUP BY bulan ORDER BY bulan
+        """, params, path)
+        return {bulan: f"{n}:{total}:{version}:{last_id}" for bulan, n, total, version, last_id in rows if bulan}
+
+    def transaction_owners(self):
+        owners = []
+        for path in self.transaction_files():
+            if os.path.exists(path):
+                rows = self._fetchall("SELECT email, version FROM data_versions ORDER BY email", (), path)
+                # Only the file a book is read from counts, not leftovers of a rebalance
+                owners += [(email, version) for email, version in rows if self.transactions_path(email) == path]
+        return owners
+
+    def transaction_years(self, email):
+        # The rollup has a row per month with transactions, archived or not
+        rows = self._fetchall("""
+            SELECT substr(m.bulan, 1, 4) AS tahun, EXISTS (SELECT 1 FROM archived_years a WHERE a.tahun = substr(m.bulan, 1, 4))
+            FROM monthly_totals m WHERE m.email = ? AND m.rows > 0 AND m.bulan <> ''
+            GROUP BY tahun ORDER BY tahun DESC
+        """, (email,), self.transactions_path(email))
+        return [(tahun, bool(archived)) for tahun, archived in rows]
+
+    def archive_before(self, tahun):
+        cutoff = f"{int(tahun):04d}-01-01"
+        moved = {}
+        for path in self.transaction_files():
+            if not os.path.exists(path):
+                continue
+            # Live rows per user and year, counted from the live-row index
+            groups = self._fetchall("""
+                SELECT email, substr(tanggal, 1, 4) AS tahun, COUNT(*) FROM transactions
+                WHERE email IS NOT NULL AND tanggal < ? AND tanggal GLOB '[0-9][0-9][0-9][0-9]-*' AND deleted_at IS NULL
+                GROUP BY email, tahun
+            """, (cutoff,), path)
+            batch, size = [], 0
+            for index, (email, year, count) in enumerate(groups):
+                batch.append((email, year))
+                size += count
+                if size >= ARCHIVE_BATCH or index == len(groups) - 1:
+                    for year, count in helpers.run_write(lambda cursor, batch=batch: self._archive_batch(cursor, batch), path).items():
+                        moved[year] = moved.get(year, 0) + count
+                    batch, size = [], 0
+        return moved
+
+    def _archive_batch(self, cursor, groups):
+        """Move the live rows of each (email, year) into the year's archive table; returns {year: rows moved}"""
+        moved, columns = {}, {}
+        now = int(time.time())
+        for email, year in groups:
+            table = helpers.archive_table(year)
+            if table not in columns:
+                helpers.create_archive_table(cursor, year)
+                columns[table] = ", ".join(row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall())
+            rows = "email = ? AND tanggal >= ? AND tanggal < ? AND deleted_at IS NULL"
+            params = (email, f"{year}-01-01", f"{int(year) + 1:04d}-01-01")
+            # Flagged as moving, the delete below leaves the year's totals and search entries alone
+            cursor.execute("""
+                INSERT INTO archived_years (tahun, archived_at, moving) VALUES (?, ?, 1)
+                ON CONFLICT (tahun) DO UPDATE SET archived_at = excluded.archived_at, moving = 1
+            """, (year, now))
+            count = cursor.execute(
+                f"INSERT INTO {table} ({columns[table]}) SELECT {columns[table]} FROM transactions WHERE {rows}", params,
+            ).rowcount
+            cursor.execute(f"DELETE FROM transactions WHERE {rows}", params)
+            cursor.execute("UPDATE archived_years SET rows = rows + ?, moving = 0 WHERE tahun = ?", (count, year))
+            moved[year] = moved.get(year, 0) + count
+        return moved
+
+    def archived_years(self):
+        frames = [
+            pd.DataFrame(self._fetchall("SELECT tahun, rows, archived_at FROM archived_years", (), path), columns=ARCHIVE_COLUMNS)
+            for path in self.transaction_files() if os.path.exists(path)
+        ]
+        # Sharded files archive the same years separately
+        df = pd.concat(frames, ignore_index=True)
+        return df.groupby("tahun", as_index=False).agg({"rows": "sum", "archived_at": "max"}).sort_values("tahun", ignore_index=True)
+
+    def reconcile_money(self):
+        frames = []
+        for path in self.transaction_files():
+            # Archived rows were live rows too
+            parts, _ = _union("SELECT email, id, jumlah FROM {table}", self._tables(path), ())
+            rows = self._fetchall(f"""
+                SELECT a.email, a.rows, COUNT(t.id), a.rounded_total, COALESCE(SUM(t.jumlah), 0),
+                       a.real_total - a.rounded_total, a.fractional_rows,
+                       COALESCE(SUM(typeof(t.jumlah) <> 'integer'), 0)
+                FROM money_migration_audit a
+                LEFT JOIN ({parts}) t ON t.email = a.email AND t.id <= a.max_id
+                GROUP BY a.email
+            """, (), path)
+            frames.append(pd.DataFrame(rows, columns=RECONCILE_COLUMNS))
+        return pd.concat(frames, ignore_index=True)
+
+    def create_rule(self, email, rule):
+        rule = dict(rule, email=email, created_at=int(time.time()))
+
+        def write(cursor):
+            cursor.execute(f"""
+                INSERT INTO recurring_rules ({", ".join(rule)}) VALUES ({", ".join("?" for _ in rule)})
+            """, tuple(rule.values()))
+            return cursor.lastrowid
+
+        return helpers.run_write(write)
+
+    def get_rules(self, email):
+        rows = self._fetchall(f"SELECT {', '.join(RULE_COLUMNS)} FROM recurring_rules WHERE email = ? ORDER BY id", (email,))
+        return pd.DataFrame(rows, columns=RULE_COLUMNS)
+
+    def delete_rule(self, email, rule_id):
+        return helpers.run_write(lambda cursor: cursor.execute(
+            "DELETE FROM recurring_rules WHERE id = ? AND email = ?", (rule_id, email),
+        ).rowcount) == 1
+
+    def due_rules(self, today, limit):
+        rows = self._fetchall(f"""
+            SELECT {', '.join(RULE_COLUMNS)} FROM recurring_rules
+            WHERE next_date <= ? ORDER BY next_date, id LIMIT ?
+        """, (str(today), limit))
+        return [dict(zip(RULE_COLUMNS, row)) for row in rows]
+
+    def insert_occurrences(self, email, rows):
+        def write(cursor):
+            stamp = helpers.next_change_version(cursor, email)
+            inserted = cursor.executemany("""
+                INSERT INTO transactions (
+                    email, tanggal, kategori_pengguna, jenis, item, jumlah, catatan, changed_version, rule_id, rule_occurrence
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (rule_id, rule_occurrence) WHERE rule_id IS NOT NULL DO NOTHING
+            """, [
+                (email, row["tanggal"], row["kategori_pengguna"], row["jenis"], row["item"], row["jumlah"],
+                 row["catatan"], stamp, row["rule_id"], row["rule_occurrence"])
+                for row in rows
+            ]).rowcount
+            if inserted:
+                helpers.bump_data_version(cursor, email, inserted)
+            return inserted
+
+        return helpers.run_write(write, self.transactions_path(email))
+
+    def advance_rule(self, rule_id, from_index, next_index, next_date):
+        return helpers.run_write(lambda cursor: cursor.execute("""
+            UPDATE recurring_rules SET next_index = ?, next_date = ?
+            WHERE id = ? AND next_index = ?
+        """, (next_index, next_date, rule_id, from_index)).rowcount) == 1
+
+    def set_budget(self, email, scope, kategori, batas):
+        # Item budgets match lower(trim(item)) in SQL, as the triggers do
+        key = "lower(trim(?))" if scope == "item" else "?"
+        levels = " UNION ALL ".join(f"SELECT {level} AS level" for level in BUDGET_ALERT_LEVELS)
+        path = self.transactions_path(email)
+
+        def write(cursor):
+            cursor.execute(f"""
+                INSERT INTO budgets (email, scope, kategori, batas, created_at) VALUES (?, ?, {key}, ?, ?)
+                ON CONFLICT (email, scope, kategori) DO UPDATE SET batas = excluded.batas
+            """, (email, scope, kategori, batas, int(time.time())))
+            budget_id, kategori_key = cursor.execute(
+                f"SELECT id, kategori FROM budgets WHERE email = ? AND scope = ? AND kategori = {key}", (email, scope, kategori),
+            ).fetchone()
+            # Past months are evaluated once here; later writes keep them current
+            cursor.execute("DELETE FROM budget_alerts WHERE budget_id = ?", (budget_id,))
+            if scope == "item":
+                cursor.execute("DELETE FROM budget_item_totals WHERE email = ? AND item = ?", (email, kategori_key))
+                # The counter triggers add the alerts for these rows
+                parts, params = _union("""
+                    SELECT tanggal, jumlah FROM {table}
+                    WHERE email = ? AND deleted_at IS NULL AND jenis = 'Pengeluaran' AND lower(trim(item)) = ?
+                """, self._tables(path, cursor=cursor), (email, kategori_key))
+                cursor.execute(f"""
+                    INSERT INTO budget_item_totals (email, item, bulan, total)
+                    SELECT ?, ?, substr(tanggal, 1, 7), SUM(jumlah) FROM ({parts})
+                    GROUP BY substr(tanggal, 1, 7)
+                """, [email, kategori_key] + params)
+            else:
+                cursor.execute(f"""
+                    INSERT INTO budget_alerts (budget_id, bulan, level, created_at)
+                    SELECT ?, m.bulan, l.level, ? FROM monthly_totals m, ({levels}) l
+                    WHERE m.email = ? AND m.jenis = ? AND m.total * 100 >= l.level * ?
+                """, (budget_id, int(time.time()), email, kategori_key, batas))
+            return budget_id
+
+        return helpers.run_write(write, path)
+
+    def _budget_query(self, email, bulan, alerts):
+        spent_join = """
+            LEFT JOIN monthly_totals m ON b.scope = 'jenis' AND m.email = b.email AND m.bulan = ? AND m.jenis = b.kategori
+            LEFT JOIN budget_item_totals i ON b.scope = 'item' AND i.email = b.email AND i.item = b.kategori AND i.bulan = ?
+        """
+        level = ""
+        if alerts:
+            level = ", a.level"
+            spent_join += """
+                JOIN (SELECT budget_id, MAX(level) AS level FROM budget_alerts WHERE bulan = ? GROUP BY budget_id) a
+                ON a.budget_id = b.id
+            """
+        return self._fetchall(f"""
+            SELECT b.id, b.scope, b.kategori, b.batas, COALESCE(m.total, i.total, 0){level}
+            FROM budgets b {spent_join}
+            WHERE b.email = ? ORDER BY b.scope, b.kategori
+        """, (bulan, bulan) + ((bulan,) if alerts else ()) + (email,), self.transactions_path(email))
+
+    def get_budgets(self, email, bulan):
+        return pd.DataFrame(self._budget_query(email, bulan, alerts=False), columns=BUDGET_COLUMNS)
+
+    def delete_budget(self, email, budget_id):
+        def write(cursor):
+            row = cursor.execute("SELECT scope, kategori FROM budgets WHERE id = ? AND email = ?", (budget_id, email)).fetchone()
+            if row is None:
+                return False
+            cursor.execute("DELETE FROM budget_alerts WHERE budget_id = ?", (budget_id,))
+            if row[0] == "item":
+                cursor.execute("DELETE FROM budget_item_totals WHERE email = ? AND item = ?", (email, row[1]))
+            cursor.execute("DELETE FROM budgets WHERE id = ?", (budget_id,))
+            return True
+
+        return helpers.run_write(write, self.transactions_path(email))
+
+    def budget_alerts(self, email, bulan):
+        return pd.DataFrame(self._budget_query(email, bulan, alerts=True), columns=BUDGET_COLUMNS + ["level"])
+
+    def get_category_rows(self, email):
+        path = self.transactions_path(email)
+        query = """
+            SELECT id, jenis, item, catatan, kategori, kategori_label FROM {table}
+            WHERE email = ? AND deleted_at IS NULL
+        """
+        # Archived rows are only learned from: the labels, not the rows to re-classify
+        tables = self._tables(path)
+        parts, params = _union(query + " AND kategori_label = 1", tables[1:], [email])
+        parts = " UNION ALL ".join([query.format(table="transactions")] + ([parts] if parts else []))
+        rows = self._fetchall(f"{parts} ORDER BY id", [email] + params, path)
+        return pd.DataFrame(rows, columns=CATEGORY_COLUMNS)
+
+    def set_categories(self, email, predictions):
+        def write(cursor):
+            stamp = helpers.next_change_version(cursor, email)
+            changed = cursor.executemany("""
+                UPDATE transactions SET kategori = ?, changed_version = ?
+                WHERE id = ? AND email = ? AND kategori_label = 0 AND deleted_at IS NULL AND kategori IS NOT ?
+            """, [(kategori, stamp, transaction_id, email, kategori) for transaction_id, kategori in predictions]).rowcount
+            if changed:
+                helpers.bump_data_version(cursor, email, changed)
+            return changed
+
+        return helpers.run_write(write, self.transactions_path(email))
+
+    def save_category_model(self, email, labels, model):
+        helpers.run_write(lambda cursor: cursor.execute("""
+            INSERT INTO category_models (email, labels, trained_at, model) VALUES (?, ?, ?, ?)
+            ON CONFLICT (email) DO UPDATE SET labels = excluded.labels, trained_at = excluded.trained_at, model = excluded.model
+        """, (email, labels, int(time.time()), model)), self.transactions_path(email))
+
+    def get_category_model(self, email):
+        return self._fetchone(
+            "SELECT labels, trained_at, model FROM category_models WHERE email = ?", (email,), self.transactions_path(email),
+        )
+
+    def create_ledger(self, nama, email, now):
+        def write(cursor):
+            cursor.execute("INSERT INTO ledgers (nama, created_by, created_at) VALUES (?, ?, ?)", (nama, email, now))
+            ledger_id = cursor.lastrowid
+            cursor.execute("""
+                INSERT INTO ledger_members (email, ledger_id, role, added_at) VALUES (?, ?, 'pemilik', ?)
+            """, (email, ledger_id, now))
+            return ledger_id
+
+        return helpers.run_write(write)
+
+    def get_user_ledgers(self, email):
+        rows = self._fetchall("""
+            SELECT l.id, l.nama, m.role FROM ledger_members m JOIN ledgers l ON l.id = m.ledger_id
+            WHERE m.email = ? ORDER BY l.nama, l.id
+        """, (email,))
+        return pd.DataFrame(rows, columns=LEDGER_COLUMNS)
+
+    def get_ledger_members(self, ledger_id):
+        rows = self._fetchall("""
+            SELECT m.email, u.nama, m.role FROM ledger_members m JOIN users u ON u.email = m.email
+            WHERE m.ledger_id = ? ORDER BY m.role = 'pembaca', m.role = 'editor', u.nama
+        """, (ledger_id,))
+        return pd.DataFrame(rows, columns=MEMBER_COLUMNS)
+
+    def set_ledger_member(self, ledger_id, email, role, now):
+        check_user_email(email)
+        return helpers.run_write(lambda cursor: cursor.execute("""
+            INSERT INTO ledger_members (email, ledger_id, role, added_at)
+            SELECT email, ?, ?, ? FROM users WHERE email = ?
+            ON CONFLICT (email, ledger_id) DO UPDATE SET role = excluded.role
+        """, (ledger_id, role, now, email)).rowcount) == 1
+
+    def remove_ledger_member(self, ledger_id, email):
+        return helpers.run_write(lambda cursor: cursor.execute(
+            "DELETE FROM ledger_members WHERE ledger_id = ? AND email = ?", (ledger_id, email),
+        ).rowcount) == 1
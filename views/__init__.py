@@ -0,0 +1,129 @@
+"""
+Page registry for Keuangan-Pintar
+Each page lives in its own module that is imported the first time the page is
+visited, and declares up front which data it needs to render.
+"""
+import importlib
+import logging
+import os
+import time
+from collections import namedtuple
+
+import streamlit as st
+
+from utils.helpers import get_transactions, get_data_version, get_summary, get_recent_transactions, search_transactions
+from utils import budgets, snapshot
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# name: menu key stored in st.session_state.menu
+# requires: data loaded before render() is called, see DATA_LOADERS
+# admin: only listed for and rendered to the emails in ADMIN_EMAILS
+Page = namedtuple("Page", ["name", "icon", "module", "requires", "admin"], defaults=(False,))
+
+PAGES = [
+    Page("Beranda", "🏠", "views.beranda", ("data_version", "summary", "recent_transactions", "budget_alerts")),
+    Page("Input Data", "➕", "views.input_data", ()),
+    Page("Lihat Catatan", "📋", "views.catatan", ("data_version",)),
+    Page("Grafik & Insight", "📊", "views.grafik", ("data_version",)),
+    Page("AI Assistant", "🤖", "views.ai_assistant", ("data_version",)),
+    Page("Export Data", "📤", "views.export_data", ("data_version", "transactions")),
+    Page("Buku Bersama", "👥", "views.buku", ()),
+    Page("Debug", "🛠️", "views.debug", (), admin=True),
+]
+PAGES_BY_NAME = {page.name: page for page in PAGES}
+
+ADMIN_EMAILS = {email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+def is_admin(email):
+    return email in ADMIN_EMAILS
+
+def visible_pages(email):
+    """Pages the user may navigate to"""
+    return [page for page in PAGES if not page.admin or is_admin(email)]
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_transactions(email, version, columns, start, end):
+    return get_transactions(email, list(columns) if columns else None, start, end)
+
+def load_transactions(email, version=None, columns=None, start=None, end=None):
+    """
+    The user's transactions (optionally only some columns, or only those
+    dated from start through end), cached until their data version changes
+    """
+    if version is None:
+        version = get_data_version(email)
+    return _cached_transactions(email, version, tuple(columns) if columns else None, start, end)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_summary(email, version):
+    return get_summary(email)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_recent_transactions(email, version, limit):
+    return get_recent_transactions(email, limit)[0]
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_search(email, version, query, page):
+    return search_transactions(email, query, page)
+
+def search(email, version, query, page=0):
+    """A page of search_transactions hits, cached until the user's data version changes"""
+    return _cached_search(email, version, query.strip(), page)
+
+def load_analytics(email, version=None, columns=None):
+    """
+    The user's transactions from the memory-mapped columnar snapshot, falling
+    back to load_transactions when pyarrow is not installed
+    """
+    if not snapshot.AVAILABLE:
+        return load_transactions(email, version, columns)
+    return snapshot.load(email, version, columns)
+
+RECENT_LIMIT = 5
+
+DATA_LOADERS = {
+    "data_version": lambda ctx: get_data_version(ctx["buku"]),
+    "transactions": lambda ctx: load_transactions(ctx["buku"], ctx.get("data_version")),
+    # Totals and the newest rows come straight from the database, without loading every transaction
+    "summary": lambda ctx: _cached_summary(ctx["buku"], ctx["data_version"]),
+    "recent_transactions": lambda ctx: _cached_recent_transactions(ctx["buku"], ctx["data_version"], RECENT_LIMIT),
+    # Not cached: changing a budget does not move the data version, and the read is a few key lookups
+    "budget_alerts": lambda ctx: budgets.alerts(ctx["buku"]),
+}
+
+# Per-page timings of the most recent visit, in milliseconds
+PAGE_TIMINGS = {}
+
+def page_timings():
+    """Return the import/load/render timings recorded for each visited page"""
+    return {name: dict(timing) for name, timing in PAGE_TIMINGS.items()}
+
+def render_page(name, ctx):
+    """Import the page module if needed, load its declared data and render it"""
+    page = PAGES_BY_NAME.get(name, PAGES[0])
+    if page.admin and not is_admin(ctx["email"]):
+        page = PAGES[0]
+    timing = PAGE_TIMINGS.setdefault(page.name, {"import_ms": 0.0, "load_ms": 0.0, "render_ms": 0.0, "visits": 0})
+
+    start = time.perf_counter()
+    module = importlib.import_module(page.module)
+    imported = time.perf_counter()
+
+    with timed(f"page_load.{page.name}"):
+        for key in page.requires:
+            ctx[key] = DATA_LOADERS[key](ctx)
+    loaded = time.perf_counter()
+
+    with timed(f"page_render.{page.name}"):
+        module.render(ctx)
+    rendered = time.perf_counter()
+
+    if timing["visits"] == 0:
+        timing["import_ms"] = (imported - start) * 1000
+    timing["load_ms"] = (loaded - imported) * 1000
+    timing["render_ms"] = (rendered - loaded) * 1000
+    timing["visits"] += 1
+    logger.debug("page %s: load %.1f ms, render %.1f ms", page.name, timing["load_ms"], timing["render_ms"])
+    return page.name
@@ -0,0 +1,16 @@
+import streamlit as st
+
+from utils.ai import generate_financial_advice
+from views import load_analytics
+
+def render(ctx):
+    st.markdown('<h1 class="sub-header">🤖 AI Assistant Keuangan</h1>', unsafe_allow_html=True)
+    # The advice only needs totals per jenis
+    df = load_analytics(ctx["buku"], ctx["data_version"], ("Jenis", "Jumlah"))
+    if df.empty:
+        st.info("Masukkan data terlebih dahulu untuk mendapatkan saran keuangan otomatis.")
+    else:
+        with st.spinner("AI sedang menganalisis keuangan Anda..."):
+            advice = generate_financial_advice(df, ctx["kategori_pengguna"])
+
+        st.markdown(f'<div class="advice-box">{advice}</div>', unsafe_allow_html=True)
@@ -0,0 +1,48 @@
+import streamlit as st
+
+from utils.budgets import alert_message
+from views.layout import TRANSACTION_COLUMN_CONFIG
+
+def render(ctx):
+    st.markdown('<h1 class="sub-header">🏠 Beranda</h1>', unsafe_allow_html=True)
+
+    # Budgets that reached a limit this month, recorded as the transactions were saved
+    for alert in ctx["budget_alerts"].to_dict("records"):
+        if alert["level"] >= 100:
+            st.error(f"🚨 {alert_message(alert)}")
+        else:
+            st.warning(f"⚠️ {alert_message(alert)}")
+
+    # Newest transactions and totals, both prepared by the storage backend
+    df = ctx["recent_transactions"]
+
+    # Display summary metrics
+    if not df.empty:
+        summary = ctx["summary"]
+        total_pemasukan = summary['pemasukan']
+        total_pengeluaran = summary['pengeluaran']
+        total_tabungan = summary['tabungan']
+        saldo = summary['saldo']
+
+        # Display metrics in cards
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.markdown(f'<div class="metric-card"><h3>Rp{total_pemasukan:,.0f}</h3><p>Pemasukan</p></div>', unsafe_allow_html=True)
+        with col2:
+            st.markdown(f'<div class="metric-card"><h3 class="negative">Rp{total_pengeluaran:,.0f}</h3><p>Pengeluaran</p></div>', unsafe_allow_html=True)
+        with col3:
+            st.markdown(f'<div class="metric-card"><h3 class="positive">Rp{total_tabungan:,.0f}</h3><p>Tabungan</p></div>', unsafe_allow_html=True)
+        with col4:
+            color_class = "positive" if saldo >= 0 else "negative"
+            st.markdown(f'<div class="metric-card"><h3 class="{color_class}">Rp{saldo:,.0f}</h3><p>Saldo</p></div>', unsafe_allow_html=True)
+
+        # Recent transactions preview
+        st.subheader("Transaksi Terbaru")
+        st.dataframe(df.drop(columns="id"), use_container_width=True, column_config=TRANSACTION_COLUMN_CONFIG)
+
+    else:
+        st.info("Belum ada data keuangan.")
+        # Button that redirects to input data page
+        if st.button("➕ Input Data Keuangan", use_container_width=True, type="primary"):
+            st.session_state.menu = "Input Data"
+            st.rerun()
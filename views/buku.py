@@ -0,0 +1,73 @@
+import streamlit as st
+
+from utils import ledgers
+
+def render_ledger(ctx, ledger):
+    """Members of one ledger; a pemilik can add, change and remove them"""
+    book = ledgers.book_key(ledger.id)
+    if book != ctx["buku"] and st.button("📂 Buka buku ini", key=f"buku_{ledger.id}_open"):
+        st.session_state.buku = book
+        st.rerun()
+
+    members = ledgers.members(ledger.id)
+    st.dataframe(members.rename(columns={"email": "Email", "nama": "Nama", "role": "Peran"}), hide_index=True, use_container_width=True)
+
+    if ledger.role == "pemilik":
+        with st.form(f"buku_{ledger.id}_member", clear_on_submit=True):
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                email = st.text_input("Email anggota", help="Anggota harus sudah mendaftar di aplikasi")
+            with col2:
+                role = st.selectbox("Peran", ledgers.ROLES, index=1)
+            if st.form_submit_button("👤 Tambah / Ubah Peran"):
+                try:
+                    ledgers.set_member(ctx["email"], ledger.id, email, role)
+                except (ValueError, PermissionError) as e:
+                    st.error(str(e))
+                else:
+                    st.rerun()
+
+        others = [member for member in members["email"] if member != ctx["email"]]
+        if others:
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                member = st.selectbox("Anggota", others, key=f"buku_{ledger.id}_remove_email", label_visibility="collapsed")
+            with col2:
+                if st.button("🗑️ Keluarkan", key=f"buku_{ledger.id}_remove", use_container_width=True):
+                    ledgers.remove_member(ctx["email"], ledger.id, member)
+                    st.rerun()
+
+    if st.button("🚪 Keluar dari buku ini", key=f"buku_{ledger.id}_leave"):
+        try:
+            ledgers.remove_member(ctx["email"], ledger.id, ctx["email"])
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.rerun()
+
+def render(ctx):
+    st.markdown('<h1 class="sub-header">👥 Buku Bersama</h1>', unsafe_allow_html=True)
+    st.caption(
+        "Catat keuangan keluarga atau usaha bersama tanpa berbagi password. "
+        "Pemilik mengatur anggota, editor menambah dan mengubah transaksi, pembaca hanya melihat."
+    )
+
+    with st.form("buku_baru", clear_on_submit=True):
+        nama = st.text_input("Nama buku baru", placeholder="mis. Keuangan Keluarga")
+        if st.form_submit_button("➕ Buat Buku", type="primary"):
+            try:
+                ledger = ledgers.create_ledger(ctx["email"], nama)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                # Open the new book right away
+                st.session_state.buku = ledgers.book_key(ledger)
+                st.rerun()
+
+    joined = ledgers.user_ledgers(ctx["email"])
+    if joined.empty:
+        st.info("Anda belum tergabung di buku bersama mana pun.")
+        return
+    for ledger in joined.itertuples():
+        with st.expander(f"📒 {ledger.nama} ({ledger.role})", expanded=ledgers.book_key(ledger.id) == ctx["buku"]):
+            render_ledger(ctx, ledger)
@@ -0,0 +1,164 @@
+import datetime
+
+import streamlit as st
+
+from utils import archive, categories
+from utils.helpers import apply_transaction_changes, calculate_summary, JENIS_OPTIONS, KATEGORI_OPTIONS
+from utils.ledgers import can_write
+from utils.storage import TRANSACTION_COLUMNS
+from views import load_transactions, search
+
+EDITOR_KEY = "catatan_editor"
+MESSAGE_KEY = "catatan_message"
+SEARCH_KEY = "catatan_search"
+SEARCH_PAGE_KEY = "catatan_search_page"
+CATEGORIES_KEY = "catatan_categories_checked"
+YEAR_KEY = "catatan_tahun"
+ALL_YEARS = "Semua tahun"
+
+EDITOR_COLUMN_CONFIG = {
+    "Tanggal": st.column_config.DateColumn("Tanggal", format="YYYY-MM-DD", required=True),
+    "Jenis": st.column_config.SelectboxColumn("Jenis", options=JENIS_OPTIONS, required=True),
+    "Jumlah": st.column_config.NumberColumn("Jumlah", min_value=0, step=1, format="Rp%d", required=True),
+    "Kategori": st.column_config.SelectboxColumn(
+        "Kategori", options=KATEGORI_OPTIONS, help="Kategori yang Anda ubah dipakai untuk melatih kategori otomatis",
+    ),
+}
+
+def editor_changes(df, state):
+    """
+    Translate st.data_editor's edit state into apply_transaction_changes
+    arguments; rows are addressed by position, df is indexed by transaction id
+    """
+    ids = df.index
+    updates = {int(ids[position]): values for position, values in state.get("edited_rows", {}).items()}
+    deletes = [int(ids[position]) for position in state.get("deleted_rows", [])]
+    # A row edited and then deleted in the same session is only deleted
+    for transaction_id in deletes:
+        updates.pop(transaction_id, None)
+    inserts = [row for row in state.get("added_rows", []) if row]
+    return inserts, updates, deletes
+
+def labels_changed(inserts, updates):
+    """Whether the edits set a kategori, i.e. gave the classifier new labels"""
+    return any(row.get("Kategori") for row in inserts + list(updates.values()))
+
+def _reset_search_page():
+    st.session_state[SEARCH_PAGE_KEY] = 0
+
+def render_search(ctx):
+    """Search box with paginated hits on item and catatan"""
+    query = st.text_input(
+        "🔍 Cari transaksi", key=SEARCH_KEY, on_change=_reset_search_page,
+        placeholder="Misalnya: kopi, gaji, bensin", help="Mencari awal kata di Item dan Catatan, tanpa membedakan huruf besar dan aksen",
+    )
+    if not query.strip():
+        return
+    page = st.session_state.get(SEARCH_PAGE_KEY, 0)
+    hits, has_more = search(ctx["buku"], ctx["data_version"], query, page)
+    if hits.empty:
+        st.info("Tidak ada transaksi yang cocok." if page == 0 else "Tidak ada hasil lagi.")
+    else:
+        st.dataframe(hits.drop(columns="id"), hide_index=True, use_container_width=True)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if page > 0 and st.button("← Sebelumnya", key="catatan_search_prev"):
+            st.session_state[SEARCH_PAGE_KEY] = page - 1
+            st.rerun()
+    with col2:
+        st.caption(f"Halaman {page + 1}")
+    with col3:
+        if has_more and st.button("Berikutnya →", key="catatan_search_next"):
+            st.session_state[SEARCH_PAGE_KEY] = page + 1
+            st.rerun()
+
+def select_year(years):
+    """
+    The year to show, this year by default; returns (tahun, start, end),
+    start and end None for every year
+    """
+    this_year = str(datetime.date.today().year)
+    options = [this_year] + [tahun for tahun in years if tahun != this_year] + [ALL_YEARS]
+    tahun = st.selectbox(
+        "Tahun", options, key=YEAR_KEY,
+        format_func=lambda tahun: f"{tahun} (arsip)" if years.get(tahun) else tahun,
+    )
+    if tahun == ALL_YEARS:
+        return tahun, None, None
+    return tahun, f"{tahun}-01-01", f"{tahun}-12-31"
+
+def render(ctx):
+    st.markdown('<h1 class="sub-header">📋 Riwayat Catatan Keuangan</h1>', unsafe_allow_html=True)
+    if MESSAGE_KEY in st.session_state:
+        st.success(st.session_state.pop(MESSAGE_KEY))
+    # Only the chosen year is read: older years may sit in their archive tables
+    years = dict(archive.transaction_years(ctx["buku"]))
+    tahun, start, end = select_year(years)
+    df = load_transactions(ctx["buku"], ctx["data_version"], ["id"] + TRANSACTION_COLUMNS + ["Kategori"], start, end)
+    # Rows saved before automatic categories existed are classified once, in the background
+    if not df.empty and st.session_state.get(CATEGORIES_KEY) != ctx["buku"]:
+        st.session_state[CATEGORIES_KEY] = ctx["buku"]
+        if not categories.has_model(ctx["buku"]):
+            categories.schedule_retrain(ctx["buku"])
+
+    if not years:
+        st.info("Belum ada data keuangan.")
+    elif df.empty:
+        st.info(f"Belum ada transaksi di tahun {tahun}.")
+    else:
+        # Summary section
+        summary = calculate_summary(df)
+        total_pemasukan = summary['pemasukan']
+        total_pengeluaran = summary['pengeluaran']
+        saldo = summary['saldo']
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Pemasukan", f"Rp{total_pemasukan:,.0f}")
+        with col2:
+            st.metric("Pengeluaran", f"Rp{total_pengeluaran:,.0f}")
+        with col3:
+            color = "inverse" if saldo < 0 else "normal"
+            st.metric("Saldo", f"Rp{saldo:,.0f}", delta_color=color)
+
+    if years:
+        render_search(ctx)
+
+    # Edits stay in the browser until submitted, then go to the database as one diff
+    st.subheader("Detail Transaksi")
+    rows = df.set_index("id").astype({"Jenis": str})
+    archived = years.get(tahun) or (tahun == ALL_YEARS and any(years.values()))
+    if not can_write(ctx["peran"]) or archived:
+        if archived and can_write(ctx["peran"]):
+            st.caption("Tahun yang sudah diarsipkan hanya bisa dilihat. Pilih tahun lain untuk mengubah catatan.")
+        st.dataframe(rows, hide_index=True, height=500, use_container_width=True, column_config=EDITOR_COLUMN_CONFIG)
+        return
+    st.caption("Ubah sel langsung di tabel, tambah baris di bagian bawah, atau pilih baris lalu hapus.")
+    # Keyed by year and data version, so the edit state starts empty again after a save
+    key = f"{EDITOR_KEY}_{tahun}_{ctx['data_version']}"
+    with st.form("catatan_form", border=False):
+        st.data_editor(
+            rows, key=key, num_rows="dynamic", hide_index=True, height=500,
+            use_container_width=True, column_config=EDITOR_COLUMN_CONFIG,
+        )
+        submitted = st.form_submit_button("💾 Simpan Perubahan", type="primary")
+
+    if submitted:
+        inserts, updates, deletes = editor_changes(rows, st.session_state.get(key, {}))
+        try:
+            result = apply_transaction_changes(
+                ctx["buku"], inserts, updates, deletes, kategori_pengguna=ctx["kategori_pengguna"],
+            )
+        except (ValueError, ArithmeticError) as e:
+            st.error(f"Perubahan tidak disimpan: {e}")
+            return
+        if labels_changed(inserts, updates):
+            categories.schedule_retrain(ctx["buku"])
+        if any(result.values()):
+            st.session_state[MESSAGE_KEY] = (
+                f"Tersimpan: {result['inserted']} ditambah, {result['updated']} diubah, {result['deleted']} dihapus."
+            )
+            st.rerun()
+        else:
+            st.info("Tidak ada perubahan.")
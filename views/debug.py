@@ -0,0 +1,48 @@
+import pandas as pd
+import streamlit as st
+
+from utils import metrics, storage
+from utils.helpers import db_health_check
+from views import page_timings
+
+def render(ctx):
+    st.markdown('<h1 class="sub-header">🛠️ Debug & Profiling</h1>', unsafe_allow_html=True)
+
+    if not metrics.ENABLED:
+        st.info("Instrumentasi nonaktif. Jalankan dengan METRICS_ENABLED=1 untuk merekam latensi dan jumlah query.")
+
+    col1, col2, col3 = st.columns(3)
+    last = metrics.last_rerun()
+    with col1:
+        st.metric("Database", "OK" if db_health_check() else "Bermasalah")
+    with col2:
+        st.metric("Rerun terakhir", f"{last['ms']:.1f} ms" if last else "-")
+    with col3:
+        st.metric("Query SQL rerun terakhir", last["queries"] if last else "-")
+
+    st.subheader("Latensi per Operasi")
+    rows = metrics.summary()
+    if rows:
+        df = pd.DataFrame(rows).rename(columns={
+            "name": "Operasi", "count": "Jumlah", "mean": "Rata-rata", "p50": "p50 ≤", "p95": "p95 ≤",
+        })
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    else:
+        st.write("Belum ada data.")
+
+    backend = storage.get_storage()
+    if hasattr(backend, "shard_stats"):
+        st.subheader(f"Shard ({len(backend.shards)})")
+        st.dataframe(backend.shard_stats(), use_container_width=True, hide_index=True)
+
+    st.subheader("Waktu per Halaman (kunjungan terakhir, ms)")
+    timings = page_timings()
+    if timings:
+        st.dataframe(pd.DataFrame(timings).T, use_container_width=True)
+
+    st.download_button(
+        label="📥 Download metrics.prom",
+        data=metrics.render_prometheus(),
+        file_name="metrics.prom",
+        mime="text/plain",
+    )
@@ -0,0 +1,92 @@
+import streamlit as st
+
+from utils import export, snapshot, statements
+from utils.export import export_to_csv, export_to_parquet, export_to_pdf, export_to_xlsx
+from utils.helpers import calculate_summary
+from views.layout import TRANSACTION_COLUMN_CONFIG
+
+def render(ctx):
+    st.markdown('<h1 class="sub-header">📤 Export Laporan</h1>', unsafe_allow_html=True)
+    df = ctx["transactions"]
+    if df.empty:
+        st.info("Tidak ada data untuk diekspor.")
+    else:
+        # Summary information
+        summary = calculate_summary(df)
+        total_pemasukan = summary['pemasukan']
+        total_pengeluaran = summary['pengeluaran']
+        saldo = summary['saldo']
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Pemasukan", f"Rp{total_pemasukan:,.0f}")
+        with col2:
+            st.metric("Total Pengeluaran", f"Rp{total_pengeluaran:,.0f}")
+        with col3:
+            st.metric("Saldo", f"Rp{saldo:,.0f}")
+
+        st.subheader("Pilih Format Ekspor")
+
+        # Export options in columns, each file built only when its button is clicked;
+        # Parquet needs pyarrow, which also powers the snapshots
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.download_button(
+                label="📥 Download CSV",
+                data=lambda: export_to_csv(df),
+                file_name="laporan_keuangan.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+        with col2:
+            st.download_button(
+                label="📄 Download PDF",
+                data=lambda: export_to_pdf(df),
+                file_name="laporan_keuangan.pdf",
+                mime="application/pdf",
+                use_container_width=True
+            )
+        with col3:
+            if snapshot.AVAILABLE:
+                st.download_button(
+                    label="🗂️ Download Parquet",
+                    data=lambda: export_to_parquet(df),
+                    file_name="laporan_keuangan.parquet",
+                    mime="application/vnd.apache.parquet",
+                    use_container_width=True
+                )
+        with col4:
+            if export.XLSX_AVAILABLE:
+                # Written only when clicked, in the background, and kept on disk until the data changes
+                buku, version = ctx["buku"], ctx["data_version"]
+                st.download_button(
+                    label="📊 Download Excel",
+                    data=lambda: export_to_xlsx(buku, version),
+                    file_name="laporan_keuangan.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+
+        # Statements of ended months are rendered in the background by utils.statements
+        st.subheader("Laporan Bulanan")
+        months = statements.available(ctx["buku"])
+        if not months:
+            st.caption("Laporan bulanan dibuat otomatis setelah bulan berakhir.")
+        else:
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                bulan = st.selectbox("Bulan", months, format_func=statements.month_label)
+            with col2:
+                statement = statements.read(ctx["buku"], bulan)
+                st.download_button(
+                    label="📄 Download Laporan Bulanan",
+                    data=statement or b"",
+                    file_name=f"laporan_keuangan_{bulan}.pdf",
+                    mime="application/pdf",
+                    disabled=statement is None,
+                    use_container_width=True
+                )
+
+        # Show preview of data to be exported
+        st.subheader("Pratinjau Data")
+        st.dataframe(df, use_container_width=True, column_config=TRANSACTION_COLUMN_CONFIG)
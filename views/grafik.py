@@ -0,0 +1,221 @@
+import streamlit as st
+import pandas as pd
+import datetime
+import calendar
+
+from utils import forecast
+from utils.helpers import calculate_summary
+from utils.metrics import timed
+from views import load_analytics
+
+# Try to import plotly with error handling for deployment environments
+try:
+    import plotly.graph_objects as go
+    PLOTLY_AVAILABLE = True
+except ImportError:
+    PLOTLY_AVAILABLE = False
+    go = None
+
+# Charts and insights never look at Item or Catatan
+ANALYSIS_COLUMNS = ("Tanggal", "Jenis", "Jumlah")
+# The forecast needs Item to find recurring transactions
+FORECAST_COLUMNS = ("Tanggal", "Jenis", "Item", "Jumlah")
+FORECAST_HORIZONS = [3, 6, 9, 12]
+
+def render(ctx):
+    st.markdown('<h1 class="sub-header">📊 Analisis Keuangan</h1>', unsafe_allow_html=True)
+
+    # Show success message if a transaction was just saved
+    if st.session_state.get('transaction_saved', False):
+        st.success("✅ Data berhasil disimpan")
+        st.session_state.transaction_saved = False  # Reset the flag
+
+    if load_analytics(ctx["buku"], ctx["data_version"], ANALYSIS_COLUMNS).empty:
+        st.info("Belum ada data untuk dianalisis.")
+    else:
+        analysis_fragment(ctx["buku"], ctx["data_version"])
+        forecast_fragment(ctx["buku"], ctx["data_version"])
+
+@timed("grafik.chart_series")
+def chart_series(df, start_date, end_date):
+    """Transactions within the date range and their daily Pemasukan/Pengeluaran series"""
+    # Filter data based on date selection
+    if start_date is not None and end_date is not None:
+        filtered_df = df[(df["Tanggal"] >= pd.Timestamp(start_date)) & (df["Tanggal"] <= pd.Timestamp(end_date))].copy()
+    else:
+        filtered_df = df
+
+    # Prepare data for charts - group by day to show daily data points on x-axis
+    filtered_df['Tanggal_only'] = filtered_df['Tanggal'].dt.normalize()
+    pemasukan = filtered_df[filtered_df["Jenis"] == "Pemasukan"].groupby("Tanggal_only")["Jumlah"].sum()
+    pengeluaran = filtered_df[filtered_df["Jenis"] == "Pengeluaran"].groupby("Tanggal_only")["Jumlah"].sum()
+
+    # Create combined dataframe
+    chart_data = pd.DataFrame({
+        "Pemasukan": pemasukan,
+        "Pengeluaran": pengeluaran
+    }).fillna(0)
+
+    return filtered_df, chart_data
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def period_data(email, version, start_date, end_date):
+    """chart_series for the user's transactions, cached per data version and date range"""
+    return chart_series(load_analytics(email, version, ANALYSIS_COLUMNS), start_date, end_date)
+
+@st.fragment
+def analysis_fragment(email, version):
+    """Date range, metrics, chart and insight; widget changes rerun only this fragment"""
+    # Set default date range to current month
+    today = datetime.date.today()
+    first_day_current_month = today.replace(day=1)
+
+    # Calculate the last day of current month
+    if today.month == 12:
+        last_day_current_month = today.replace(day=31)
+    else:
+        # Get first day of next month, then subtract one day
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        last_day_current_month = today.replace(day=days_in_month)
+
+    # Default to current month (1st to last day of month)
+    start_date_default = first_day_current_month
+    end_date_default = last_day_current_month
+
+    # Time range filter - default to current month
+    date_range = st.date_input("Pilih Rentang Tanggal", value=[start_date_default, end_date_default])
+
+    if len(date_range) == 2:
+        start_date, end_date = date_range
+    else:
+        start_date, end_date = None, None
+    filtered_df, chart_data = period_data(email, version, start_date, end_date)
+
+    if not filtered_df.empty:
+        # Calculate financial metrics
+        summary = calculate_summary(filtered_df)
+        total_pemasukan = summary['pemasukan']
+        total_pengeluaran = summary['pengeluaran']
+        saldo = summary['saldo']
+
+        # Display metrics
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Pemasukan", f"Rp{total_pemasukan:,.0f}")
+        with col2:
+            st.metric("Total Pengeluaran", f"Rp{total_pengeluaran:,.0f}")
+        with col3:
+            st.metric("Saldo", f"Rp{saldo:,.0f}")
+
+        if PLOTLY_AVAILABLE:
+            # Chart options
+            chart_type = st.selectbox("Pilih Jenis Grafik", ["Garis", "Batang", "Area"])
+
+            with timed("grafik.figure"):
+                # Create chart using Plotly for better date formatting
+                dates = chart_data.index
+                fig = go.Figure()
+
+                if chart_type == "Garis":
+                    fig.add_trace(go.Scatter(x=dates, y=chart_data["Pemasukan"], mode='lines+markers', name='Pemasukan', line=dict(color='#2ecc71')))
+                    fig.add_trace(go.Scatter(x=dates, y=chart_data["Pengeluaran"], mode='lines+markers', name='Pengeluaran', line=dict(color='#e74c3c')))
+                elif chart_type == "Batang":
+                    fig.add_trace(go.Bar(x=dates, y=chart_data["Pemasukan"], name='Pemasukan', marker_color='#2ecc71'))
+                    fig.add_trace(go.Bar(x=dates, y=chart_data["Pengeluaran"], name='Pengeluaran', marker_color='#e74c3c'))
+                else:  # Area
+                    fig.add_trace(go.Scatter(x=dates, y=chart_data["Pemasukan"], mode='lines', fill='tonexty', name='Pemasukan', line=dict(color='#2ecc71', width=0), fillcolor='rgba(46, 204, 113, 0.2)'))
+                    fig.add_trace(go.Scatter(x=dates, y=chart_data["Pengeluaran"], mode='lines', fill='tonexty', name='Pengeluaran', line=dict(color='#e74c3c', width=0), fillcolor='rgba(231, 76, 60, 0.2)'))
+
+                # Update layout with date formatting
+                fig.update_layout(
+                    title="Analisis Pemasukan dan Pengeluaran",
+                    xaxis_title="Tanggal",
+                    yaxis_title="Jumlah (Rp)",
+                    xaxis=dict(
+                        tickformat="%d %B",  # Format: Day Month (e.g., 01 Januari)
+                        dtick="D1",  # Show daily ticks
+                    ),
+                    hovermode='x unified',
+                    template='plotly_white'
+                )
+
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.warning("Modul plotly tidak tersedia. Menampilkan grafik menggunakan alternatif...")
+
+            # Use Streamlit's built-in charting as fallback
+            # Prepare data for charts - group by day to show daily data points
+            chart_data = filtered_df.groupby(['Tanggal_only', 'Jenis'])['Jumlah'].sum().unstack(fill_value=0)
+
+            # Rename columns to English for Streamlit compatibility
+            chart_data.columns = [col.replace('Pemasukan', 'Pemasukan').replace('Pengeluaran', 'Pengeluaran') for col in chart_data.columns]
+
+            st.line_chart(chart_data)
+
+        # Additional insights
+        st.subheader("Insight")
+        total_pengeluaran = filtered_df.loc[filtered_df['Jenis'] == 'Pengeluaran', 'Jumlah'].sum()
+        total_pemasukan = filtered_df.loc[filtered_df['Jenis'] == 'Pemasukan', 'Jumlah'].sum()
+
+        if total_pengeluaran > 0:
+            rasio = total_pemasukan / total_pengeluaran
+            if rasio > 1:
+                st.info(f"Rasio pemasukan terhadap pengeluaran: {rasio:.2f}x (baik, pemasukan lebih besar dari pengeluaran)")
+            else:
+                st.warning(f"Rasio pemasukan terhadap pengeluaran: {rasio:.2f}x (peringatan, pengeluaran lebih besar dari pemasukan)")
+    else:
+        st.warning("Tidak ada data dalam rentang tanggal yang dipilih.")
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def forecast_data(email, version, months, today):
+    """forecast.forecast for the user's transactions, cached per data version, horizon and day"""
+    return forecast.forecast(load_analytics(email, version, FORECAST_COLUMNS), months, today)
+
+@st.fragment
+def forecast_fragment(email, version):
+    """Projected saldo with its 80% band and monthly Pemasukan/Pengeluaran for the chosen horizon"""
+    st.subheader("Proyeksi Arus Kas")
+    months = st.select_slider("Proyeksi untuk", FORECAST_HORIZONS, value=6, format_func=lambda m: f"{m} bulan")
+    result = forecast_data(email, version, months, datetime.date.today())
+    daily, monthly = result.daily, result.monthly
+    st.caption(
+        "Perkiraan dari transaksi berulang yang terdeteksi, pola musiman dan tren pengeluaran Anda; "
+        "area berwarna menunjukkan rentang 80% kemungkinan saldo."
+    )
+
+    if PLOTLY_AVAILABLE:
+        with timed("grafik.forecast_figure"):
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=daily.index, y=daily["Saldo_atas"], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(
+                x=daily.index, y=daily["Saldo_bawah"], mode='lines', fill='tonexty', line=dict(width=0),
+                fillcolor='rgba(52, 152, 219, 0.2)', name='Rentang 80%',
+            ))
+            fig.add_trace(go.Scatter(x=daily.index, y=daily["Saldo"], mode='lines', name='Saldo', line=dict(color='#3498db')))
+            fig.update_layout(
+                title="Proyeksi Saldo", xaxis_title="Tanggal", yaxis_title="Saldo (Rp)",
+                xaxis=dict(tickformat="%b %Y"), hovermode='x unified', template='plotly_white',
+            )
+        st.plotly_chart(fig, use_container_width=True)
+
+        bars = go.Figure()
+        for name, color in (("Pemasukan", '#2ecc71'), ("Pengeluaran", '#e74c3c')):
+            bars.add_trace(go.Bar(
+                x=monthly.index, y=monthly[name], name=name, marker_color=color,
+                error_y=dict(
+                    type='data', symmetric=False,
+                    array=monthly[f"{name}_atas"] - monthly[name], arrayminus=monthly[name] - monthly[f"{name}_bawah"],
+                ),
+            ))
+        bars.update_layout(title="Proyeksi per Bulan", yaxis_title="Jumlah (Rp)", template='plotly_white')
+        st.plotly_chart(bars, use_container_width=True)
+    else:
+        st.line_chart(daily[["Saldo_bawah", "Saldo", "Saldo_atas"]])
+
+    table = monthly.round(0).astype("int64").rename(columns=lambda c: c.replace("_bawah", " (min)").replace("_atas", " (maks)"))
+    st.dataframe(table.map(lambda v: f"Rp{v:,.0f}"), use_container_width=True)
+    st.caption("Bulan berjalan hanya menghitung hari setelah hari ini.")
+    if not result.recurring.empty:
+        st.markdown("**Transaksi berulang yang terdeteksi**")
+        for row in result.recurring.to_dict("records"):
+            st.markdown(f"- {row['Item']} · {row['Jenis']} Rp{row['Jumlah']:,.0f} sekitar tanggal {row['Hari']}")
@@ -0,0 +1,188 @@
+import streamlit as st
+from datetime import date
+
+from utils import budgets, categories, recurring
+from utils.ledgers import can_write
+from utils.helpers import save_transaction, JENIS_OPTIONS, KATEGORI_OPTIONS
+
+def render(ctx):
+    st.markdown('<h1 class="sub-header">➕ Input Data Keuangan</h1>', unsafe_allow_html=True)
+    if not can_write(ctx["peran"]):
+        st.info("👀 Anda pembaca di buku ini: transaksi hanya bisa dilihat.")
+        return
+    kategori = ctx["kategori_pengguna"]
+
+    # Create tabs for different input methods - removing voice tab
+    image_tab, manual_tab, recurring_tab, budget_tab = st.tabs(["📸 Struk", "✏️ Manual", "🔁 Berulang", "🎯 Anggaran"])
+
+    input_data = None
+
+    with image_tab:
+        # Check if image input is available
+        try:
+            from utils.image_input import IMAGE_INPUT_AVAILABLE, image_input_interface
+            if IMAGE_INPUT_AVAILABLE:
+                # Get input data using image input
+                image_data = image_input_interface()
+                if image_data:
+                    input_data = image_data
+            else:
+                # Import specific check variables
+                from utils.image_input import CV2_AVAILABLE, TESSERACT_AVAILABLE
+                if not CV2_AVAILABLE:
+                    st.warning("Modul OpenCV (cv2) tidak tersedia. Fitur pemrosesan struk terbatas.")
+                    st.info("Fitur ini membutuhkan OpenCV untuk prapemrosesan gambar dan Tesseract OCR untuk ekstraksi teks.")
+                elif not TESSERACT_AVAILABLE:
+                    st.warning("Modul OCR (pytesseract) tidak tersedia. Fitur pemrosesan struk terbatas.")
+                    st.info("Untuk menggunakannya, install pytesseract dan Tesseract OCR di sistem Anda.")
+        except ImportError:
+            st.error("Modul image input tidak tersedia.")
+
+    with manual_tab:
+        with st.form("manual_input_main", clear_on_submit=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                tanggal = st.date_input("Tanggal", date.today())
+                jenis = st.selectbox("Jenis Transaksi", JENIS_OPTIONS)
+            with col2:
+                nilai = st.number_input("Jumlah (Rp)", min_value=0, format="%d")
+                pilihan_kategori = st.selectbox(
+                    "Kategori", [categories.AUTO_LABEL] + KATEGORI_OPTIONS,
+                    help="Otomatis: ditebak dari deskripsi item dan catatan; pilihan Anda dipakai untuk melatih tebakan berikutnya",
+                )
+
+            item = st.text_input("Deskripsi Item")
+            catatan = st.text_area("Catatan Tambahan")
+
+            manual_submit = st.form_submit_button("Simpan Transaksi 💰", use_container_width=True, type="primary")
+
+            if manual_submit:
+                input_data = {
+                    'date': tanggal,
+                    'type': jenis,
+                    'amount': nilai,
+                    'description': item,
+                    'notes': catatan,
+                    'category': None if pilihan_kategori == categories.AUTO_LABEL else pilihan_kategori,
+                }
+
+    with recurring_tab:
+        render_recurring(ctx)
+
+    with budget_tab:
+        render_budgets(ctx)
+
+    # If data was captured (from any method), save it
+    if input_data:
+        # A kategori the user picked is a label; otherwise the classifier's guess is stored unlabelled
+        label = input_data.get('category')
+        pilihan = label or categories.suggest(ctx["buku"], input_data['description'], input_data['type'], input_data['notes'])
+        # Save the transaction
+        save_transaction(
+            ctx["buku"],
+            input_data['date'],
+            kategori,
+            input_data['type'],
+            input_data['description'],
+            input_data['amount'],
+            input_data['notes'],
+            kategori=pilihan,
+            kategori_label=label is not None,
+        )
+        if label is not None:
+            categories.schedule_retrain(ctx["buku"])
+        st.session_state.transaction_saved = True
+        st.success(f"✅ Data berhasil disimpan! Kategori: {pilihan or 'belum diketahui'}")
+        # The save already updated the budget counters; this only reads the month's alerts
+        for alert in budgets.alerts(ctx["buku"], str(input_data['date'])[:7]).to_dict("records"):
+            st.warning(f"⚠️ {budgets.alert_message(alert)}")
+
+    # Add button to see all records after successful save (outside the form)
+    if st.session_state.transaction_saved:
+        if st.button("📋 Lihat Catatan Keuangan", use_container_width=True, type="secondary"):
+            st.session_state.menu = "Lihat Catatan"
+            st.rerun()
+
+def render_recurring(ctx):
+    """Rules for transactions that repeat, like salary, rent and utilities"""
+    st.caption("Transaksi berulang dicatat otomatis pada setiap tanggal jatuh tempo, termasuk yang terlewat.")
+    with st.form("recurring_input", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            jenis = st.selectbox("Jenis Transaksi", JENIS_OPTIONS, key="recurring_jenis")
+            nilai = st.number_input("Jumlah (Rp)", min_value=0, format="%d", key="recurring_jumlah")
+            item = st.text_input("Deskripsi Item", key="recurring_item")
+        with col2:
+            mulai = st.date_input("Mulai", date.today(), key="recurring_mulai")
+            frekuensi = st.selectbox("Frekuensi", list(recurring.FREQUENCIES) + ["Kustom"], key="recurring_frekuensi")
+            selesai = st.date_input("Selesai (opsional)", value=None, key="recurring_selesai")
+        custom1, custom2 = st.columns(2)
+        with custom1:
+            every = st.number_input("Kustom: setiap", min_value=1, value=1, step=1, key="recurring_every")
+        with custom2:
+            unit = st.selectbox("Kustom: satuan", list(recurring.UNITS), format_func=recurring.UNIT_LABELS.get, key="recurring_unit")
+        catatan = st.text_input("Catatan Tambahan", key="recurring_catatan")
+        submitted = st.form_submit_button("Simpan Aturan 🔁", use_container_width=True, type="primary")
+
+    if submitted:
+        if frekuensi != "Kustom":
+            unit, every = recurring.FREQUENCIES[frekuensi]
+        try:
+            recurring.create_rule(ctx["buku"], ctx["kategori_pengguna"], jenis, item, nilai, catatan, mulai, unit, every, selesai)
+            st.success("✅ Aturan transaksi berulang disimpan!")
+        except ValueError as e:
+            st.error(f"Aturan tidak disimpan: {e}")
+
+    rules = recurring.list_rules(ctx["buku"])
+    if rules.empty:
+        return
+    st.subheader("Aturan Aktif")
+    for rule in rules.to_dict("records"):
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            berikutnya = rule["next_date"] or "selesai"
+            st.markdown(
+                f"**{rule['item'] or rule['jenis']}** · {rule['jenis']} Rp{rule['jumlah']:,.0f} "
+                f"{recurring.describe(rule)} · berikutnya: {berikutnya}"
+            )
+        with col2:
+            if st.button("Hapus", key=f"recurring_delete_{rule['id']}"):
+                recurring.delete_rule(ctx["buku"], rule["id"])
+                st.rerun()
+
+def render_budgets(ctx):
+    """Monthly spending limits per jenis or per item"""
+    st.caption("Batas pengeluaran per bulan. Peringatan muncul di Beranda saat pemakaian mencapai 80% dan 100%.")
+    with st.form("budget_input", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            scope = st.radio("Cakupan", list(budgets.SCOPES), format_func=budgets.SCOPES.get, horizontal=True, key="budget_scope")
+            jenis = st.selectbox("Jenis (cakupan Jenis)", budgets.BUDGET_JENIS, key="budget_jenis")
+            item = st.text_input("Item (cakupan Item)", placeholder="Misalnya: makan siang", key="budget_item")
+        with col2:
+            batas = st.number_input("Batas per bulan (Rp)", min_value=0, format="%d", key="budget_batas")
+        submitted = st.form_submit_button("Simpan Anggaran 🎯", use_container_width=True, type="primary")
+
+    if submitted:
+        try:
+            budgets.set_budget(ctx["buku"], jenis if scope == "jenis" else item, batas, scope)
+            st.success("✅ Anggaran disimpan!")
+        except ValueError as e:
+            st.error(f"Anggaran tidak disimpan: {e}")
+
+    df = budgets.list_budgets(ctx["buku"])
+    if df.empty:
+        return
+    st.subheader(f"Anggaran Bulan Ini ({budgets.current_month()})")
+    for budget in df.to_dict("records"):
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            persen = budget["terpakai"] / budget["batas"]
+            st.progress(
+                min(persen, 1.0),
+                text=f"**{budgets.describe(budget)}** · Rp{budget['terpakai']:,.0f} dari Rp{budget['batas']:,.0f} ({persen:.0%})",
+            )
+        with col2:
+            if st.button("Hapus", key=f"budget_delete_{budget['id']}"):
+                budgets.delete_budget(ctx["buku"], budget["id"])
+                st.rerun()
@@ -0,0 +1,174 @@
+"""
+Shared layout for Keuangan-Pintar: CSS, sidebar and mobile navigation
+The static markup is built once per process when this module is imported.
+"""
+import streamlit as st
+
+from utils.ledgers import book_key, user_ledgers
+from utils.session import revoke_session
+from views import visible_pages
+
+CUSTOM_CSS = """
+<style>
+    .main-header {
+        font-size: 1.5rem;
+        color: #2c3e50;
+        margin-top: 0.5rem;
+        margin-bottom: 1rem;
+        text-align: center;
+    }
+    .sub-header {
+        font-size: 1.3rem;
+        color: #34495e;
+        margin-bottom: 1rem;
+    }
+    .metric-card {
+        background-color: #f8f9fa;
+        padding: 1.2rem;
+        border-radius: 8px;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        text-align: center;
+    }
+    .finance-card {
+        background-color: #e8f4fd;
+        padding: 1rem;
+        border-radius: 8px;
+        margin: 0.5rem 0;
+    }
+    .positive {
+        color: #2ecc71;
+    }
+    .negative {
+        color: #e74c3c;
+    }
+    .advice-box {
+        background-color: #f0f7ff;
+        padding: 1.2rem;
+        border-radius: 8px;
+        border-left: 5px solid #3498db;
+    }
+    .data-table {
+        background-color: white;
+        border-radius: 8px;
+        overflow: hidden;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    }
+    .small-text {
+        font-size: 0.9rem;
+    }
+
+    /* Mobile adjustments */
+    @media (max-width: 600px) {
+        .block-container {
+            padding-top: 3rem;
+        }
+    }
+</style>
+"""
+
+# st.dataframe settings for transaction frames: Tanggal is datetime64 but has no time of day
+TRANSACTION_COLUMN_CONFIG = {
+    "Tanggal": st.column_config.DateColumn("Tanggal", format="YYYY-MM-DD"),
+}
+
+_SOCIAL_LINK = (
+    '<a href="{url}" target="_blank" style="text-decoration:none; color:white; display:block; background:{background}; padding:8px; border-radius:6px; text-align:center; font-weight:bold;">'
+    '<span style="font-size:1.2em;">{icon}</span><br>{label}</a>'
+)
+
+# Pairs of links rendered side by side in the sidebar
+SOCIAL_LINKS = [
+    (
+        _SOCIAL_LINK.format(url="https://github.com", background="#333", icon="💻", label="Github"),
+        _SOCIAL_LINK.format(url="https://linkedin.com", background="#0077B5", icon="👔", label="LinkedIn"),
+    ),
+    (
+        _SOCIAL_LINK.format(url="https://twitter.com", background="#1DA1F2", icon="🐦", label="Twitter"),
+        _SOCIAL_LINK.format(
+            url="https://instagram.com",
+            background="linear-gradient(45deg, #405DE6, #5851DB, #833AB4, #C13584, #E1306C, #FD1D1D)",
+            icon="📱",
+            label="Instagram",
+        ),
+    ),
+]
+
+def render_css():
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+def logout():
+    """Revoke the persisted session and clear all session state"""
+    revoke_session(st.query_params.get("sid"))
+    st.query_params.clear()
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+
+def _navigation_buttons(key_prefix):
+    """One button per registered page plus logout; a click reruns the whole app"""
+    for page in visible_pages(st.session_state.email):
+        if st.button(f"{page.icon} {page.name}", use_container_width=True, key=f"{key_prefix}_{page.name}"):
+            st.session_state.menu = page.name
+            st.rerun()
+
+def _book_selector():
+    """Switch between the user's own book and the shared ledgers they belong to"""
+    email = st.session_state.email
+    ledgers = user_ledgers(email)
+    if ledgers.empty:
+        return
+    names = {email: "Buku pribadi"}
+    names.update((book_key(row.id), f"{row.nama} ({row.role})") for row in ledgers.itertuples())
+    options = list(names)
+    current = st.session_state.buku if st.session_state.buku in names else email
+    # No widget key: the index follows the book chosen elsewhere, e.g. on the Buku Bersama page
+    chosen = st.selectbox("📒 Buku", options, index=options.index(current), format_func=names.get)
+    if chosen != st.session_state.buku:
+        st.session_state.buku = chosen
+        st.rerun()
+
+@st.fragment
+def render_sidebar():
+    """Sidebar with user information, navigation and social links"""
+    # Compact title in sidebar
+    st.markdown('<h1 class="main-header">📒 Smart Keuangan</h1>', unsafe_allow_html=True)
+
+    # User information
+    st.markdown(f"""
+    <div class="small-text">
+        <p><strong>👤 {st.session_state.nama}</strong></p>
+        <p><strong>Kategori:</strong> {st.session_state.kategori_pengguna}</p>
+        <p><strong>Email:</strong> {st.session_state.email}</p>
+    </div>
+    """, unsafe_allow_html=True)
+    _book_selector()
+
+    st.divider()
+
+    st.subheader("Navigasi")
+    _navigation_buttons("sidebar")
+
+    st.divider()  # Add separator before logout
+
+    if st.button("🔒 Logout", use_container_width=True, type="secondary", key="sidebar_logout"):
+        logout()
+        st.rerun()
+
+    st.divider()  # Add separator before social media
+
+    st.markdown("### 🌐 Follow Kami")
+    for left, right in SOCIAL_LINKS:
+        left_col, right_col = st.columns(2)
+        with left_col:
+            st.markdown(left, unsafe_allow_html=True)
+        with right_col:
+            st.markdown(right, unsafe_allow_html=True)
+
+@st.fragment
+def render_mobile_nav():
+    """Burger menu for navigation on small screens"""
+    with st.popover("☰", use_container_width=False):
+        st.write("Navigasi")
+        _navigation_buttons("mobile")
+        if st.button("🔒 Logout", use_container_width=True, key="mobile_logout"):
+            logout()
+            st.rerun()